@@ -15,8 +15,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 import os
 import socket
+import time
 import uuid
 
 import eventlet
@@ -39,6 +41,7 @@ from quantum.openstack.common import jsonutils
 from quantum.openstack.common import log as logging
 from quantum.openstack.common import lockutils
 from quantum.openstack.common import loopingcall
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.openstack.common.rpc import dispatcher as rpc_dispatcher
 from quantum.openstack.common.rpc import proxy
 from quantum.openstack.common import service
@@ -52,10 +55,58 @@ METADATA_DEFAULT_IP = '169.254.169.254/%d' % METADATA_DEFAULT_PREFIX
 METADATA_PORT = 80
 
 
+def run_with_network_lock(network_id, f, *args):
+    """Calls f, serialized with the other calls about the same network."""
+    @lockutils.synchronized('network-%s' % network_id, 'dhcp-')
+    def locked():
+        return f(*args)
+    return locked()
+
+
+def synchronized_network(get_network_id):
+    """Serializes the handling of the notifications about each network.
+
+    get_network_id returns the id of the network a notification is about,
+    given the agent and the notification payload.
+    """
+    def wrap(f):
+        def notified(self, network_id, context, payload):
+            self._network_notified(network_id)
+            return f(self, context, payload)
+
+        @functools.wraps(f)
+        def inner(self, context, payload):
+            network_id = get_network_id(self, payload)
+            return run_with_network_lock(network_id, notified, self,
+                                         network_id, context, payload)
+        return inner
+    return wrap
+
+
+def _cached_subnet_network_id(agent, payload):
+    network = agent.cache.get_network_by_subnet_id(payload['subnet_id'])
+    return network and network.id
+
+
+def _cached_port_network_id(agent, payload):
+    port = agent.cache.get_port_by_id(payload['port_id'])
+    return port and port.network_id
+
+
 class DhcpAgent(manager.Manager):
     OPTS = [
         cfg.IntOpt('resync_interval', default=5,
                    help=_("Interval to resync.")),
+        cfg.IntOpt('num_sync_threads', default=4,
+                   help=_("Number of networks synchronized concurrently.")),
+        cfg.IntOpt('sync_chunk_size', default=100,
+                   help=_("Number of networks whose information is fetched "
+                          "with each RPC call during a resync.")),
+        cfg.FloatOpt('port_reload_delay', default=0.5,
+                     help=_("Seconds during which the port notifications "
+                            "about a network are gathered before reloading "
+                            "its DHCP server once. 0 reloads it for each "
+                            "notification.")),
         cfg.StrOpt('dhcp_driver',
                    default='quantum.agent.linux.dhcp.Dnsmasq',
                    help=_("The driver used to manage the DHCP server.")),
@@ -74,6 +125,14 @@ class DhcpAgent(manager.Manager):
     def __init__(self, host=None):
         super(DhcpAgent, self).__init__(host=host)
         self.needs_resync = False
+        # Set to False once the plugin rejected get_networks_info
+        self.networks_info_supported = True
+        # Networks whose DHCP server is about to be reloaded after port
+        # notifications, with True if its options must be rebuilt too
+        self.pending_reloads = {}
+        # For each chunk of networks fetched by the running resync, the
+        # networks notified since it was fetched
+        self._notified_networks = []
         self.conf = cfg.CONF
         self.cache = NetworkCache()
         self.root_helper = config.get_root_helper(self.conf)
@@ -155,21 +214,106 @@ class DhcpAgent(manager.Manager):
             self.needs_resync = True
             LOG.exception(_('Unable to update lease'))
 
+    def _sync_network(self, helper, network_id, *args):
+        try:
+            run_with_network_lock(network_id, helper, network_id, *args)
+        except Exception:
+            self.needs_resync = True
+            LOG.exception(_('Unable to sync network state on %s.'),
+                          network_id)
+
+    def _get_networks_info(self, network_ids):
+        """Returns the networks by id, None if the plugin cannot send them
+        in bulk.
+        """
+        if self.networks_info_supported:
+            try:
+                networks = self.plugin_rpc.get_networks_info(network_ids)
+                return dict((network.id, network) for network in networks)
+            except rpc_common.RemoteError as e:
+                if e.exc_type not in ('UnsupportedRpcVersion',
+                                      'AttributeError'):
+                    raise
+                LOG.info(_("Plugin does not support get_networks_info, "
+                           "fetching the networks one by one"))
+                self.networks_info_supported = False
+
+    def _network_notified(self, network_id):
+        for notified in self._notified_networks:
+            notified.add(network_id)
+
+    def _refresh_networks(self, pool, network_ids):
+        notified = set()
+        self._notified_networks.append(notified)
+        networks = self._get_networks_info(network_ids)
+        for network_id in network_ids:
+            if networks is None:
+                pool.spawn_n(self._sync_network, self.refresh_dhcp_helper,
+                             network_id)
+            else:
+                pool.spawn_n(self._sync_network, self._refresh_fetched_network,
+                             network_id, networks.get(network_id), notified)
+
+    def _refresh_fetched_network(self, network_id, network, notified):
+        """Refreshes a network with the information fetched by a resync.
+
+        network is None if it was deleted since the active networks were
+        listed. A network notified since it was fetched is fetched again,
+        the information may be older than the notification.
+        """
+        if network_id in notified:
+            if network is not None:
+                LOG.debug(_("Network %s changed since it was fetched, "
+                            "fetching it again"), network_id)
+                self.refresh_dhcp_helper(network_id)
+        elif network is not None:
+            self.refresh_dhcp_helper(network_id, network)
+        else:
+            self.disable_dhcp_helper(network_id)
+
     def sync_state(self):
-        """Sync the local DHCP state with Quantum."""
+        """Sync the local DHCP state with Quantum.
+
+        The information of the active networks is fetched sync_chunk_size
+        networks at a time, and the networks are disabled or refreshed
+        concurrently by up to num_sync_threads green threads.
+        """
         LOG.info(_('Synchronizing state'))
+        pool = eventlet.GreenPool(self.conf.num_sync_threads)
         known_networks = set(self.cache.get_network_ids())
 
         try:
+            start = time.time()
             active_networks = set(self.plugin_rpc.get_active_networks())
-            for deleted_id in known_networks - active_networks:
-                self.disable_dhcp_helper(deleted_id)
+            fetched = time.time()
 
-            for network_id in active_networks:
-                self.refresh_dhcp_helper(network_id)
+            for deleted_id in known_networks - active_networks:
+                pool.spawn_n(self._sync_network, self.disable_dhcp_helper,
+                             deleted_id)
+            pool.waitall()
+            disabled = time.time()
+
+            active_networks = list(active_networks)
+            chunk_size = self.conf.sync_chunk_size
+            for i in xrange(0, len(active_networks), chunk_size):
+                self._refresh_networks(pool,
+                                       active_networks[i:i + chunk_size])
+            pool.waitall()
+            LOG.info(_('Synchronized state of %(networks)d networks in '
+                       '%(total).2f seconds: %(fetch).2f to get the active '
+                       'networks, %(disable).2f to disable deleted networks '
+                       'and %(refresh).2f to fetch and refresh active '
+                       'networks'),
+                     {'networks': len(active_networks),
+                      'total': time.time() - start,
+                      'fetch': fetched - start,
+                      'disable': disabled - fetched,
+                      'refresh': time.time() - disabled})
         except:
             self.needs_resync = True
             LOG.exception(_('Unable to sync network state.'))
+        finally:
+            del self._notified_networks[:]
 
     def _periodic_resync_helper(self):
         """Resync the dhcp state at the configured interval."""
@@ -183,14 +327,19 @@ class DhcpAgent(manager.Manager):
         """Spawn a thread to periodically resync the dhcp state."""
         eventlet.spawn(self._periodic_resync_helper)
 
-    def enable_dhcp_helper(self, network_id):
-        """Enable DHCP for a network that meets enabling criteria."""
-        try:
-            network = self.plugin_rpc.get_network_info(network_id)
-        except:
-            self.needs_resync = True
-            LOG.exception(_('Network %s RPC info call failed.'), network_id)
-            return
+    def enable_dhcp_helper(self, network_id, network=None):
+        """Enable DHCP for a network that meets enabling criteria.
+
+        The network is fetched from the plugin unless it is given.
+        """
+        if network is None:
+            try:
+                network = self.plugin_rpc.get_network_info(network_id)
+            except:
+                self.needs_resync = True
+                LOG.exception(_('Network %s RPC info call failed.'),
+                              network_id)
+                return
 
         if not network.admin_state_up:
             return
@@ -214,22 +363,25 @@ class DhcpAgent(manager.Manager):
             if self.call_driver('disable', network):
                 self.cache.remove(network)
 
-    def refresh_dhcp_helper(self, network_id):
+    def refresh_dhcp_helper(self, network_id, network=None):
         """Refresh or disable DHCP for a network depending on the current state
         of the network.
 
+        The network is fetched from the plugin unless it is given.
         """
         old_network = self.cache.get_network_by_id(network_id)
         if not old_network:
             # DHCP current not running for network.
-            return self.enable_dhcp_helper(network_id)
+            return self.enable_dhcp_helper(network_id, network)
 
-        try:
-            network = self.plugin_rpc.get_network_info(network_id)
-        except:
-            self.needs_resync = True
-            LOG.exception(_('Network %s RPC info call failed.'), network_id)
-            return
+        if network is None:
+            try:
+                network = self.plugin_rpc.get_network_info(network_id)
+            except:
+                self.needs_resync = True
+                LOG.exception(_('Network %s RPC info call failed.'),
+                              network_id)
+                return
 
         old_cidrs = set(s.cidr for s in old_network.subnets if s.enable_dhcp)
         new_cidrs = set(s.cidr for s in network.subnets if s.enable_dhcp)
@@ -243,13 +395,13 @@ class DhcpAgent(manager.Manager):
         else:
             self.disable_dhcp_helper(network.id)
 
-    @lockutils.synchronized('agent', 'dhcp-')
+    @synchronized_network(lambda self, payload: payload['network']['id'])
     def network_create_end(self, context, payload):
         """Handle the network.create.end notification event."""
         network_id = payload['network']['id']
         self.enable_dhcp_helper(network_id)
 
-    @lockutils.synchronized('agent', 'dhcp-')
+    @synchronized_network(lambda self, payload: payload['network']['id'])
     def network_update_end(self, context, payload):
         """Handle the network.update.end notification event."""
         network_id = payload['network']['id']
@@ -258,12 +410,13 @@ class DhcpAgent(manager.Manager):
         else:
             self.disable_dhcp_helper(network_id)
 
-    @lockutils.synchronized('agent', 'dhcp-')
+    @synchronized_network(lambda self, payload: payload['network_id'])
     def network_delete_end(self, context, payload):
         """Handle the network.delete.end notification event."""
         self.disable_dhcp_helper(payload['network_id'])
 
-    @lockutils.synchronized('agent', 'dhcp-')
+    @synchronized_network(
+        lambda self, payload: payload['subnet']['network_id'])
     def subnet_update_end(self, context, payload):
         """Handle the subnet.update.end notification event."""
         network_id = payload['subnet']['network_id']
@@ -272,7 +425,7 @@ class DhcpAgent(manager.Manager):
     # Use the update handler for the subnet create event.
     subnet_create_end = subnet_update_end
 
-    @lockutils.synchronized('agent', 'dhcp-')
+    @synchronized_network(_cached_subnet_network_id)
     def subnet_delete_end(self, context, payload):
         """Handle the subnet.delete.end notification event."""
         subnet_id = payload['subnet_id']
@@ -280,7 +433,7 @@ class DhcpAgent(manager.Manager):
         if network:
             self.refresh_dhcp_helper(network.id)
 
-    @lockutils.synchronized('agent', 'dhcp-')
+    @synchronized_network(lambda self, payload: payload['port']['network_id'])
     def port_update_end(self, context, payload):
         """Handle the port.update.end notification event."""
         port = DictModel(payload['port'])
@@ -294,12 +447,13 @@ class DhcpAgent(manager.Manager):
                                                {'port_id': port.id})
                 return
             self.cache.put_port(port)
-            self.call_driver('reload_allocations', network)
+            self.schedule_reload(network.id,
+                                 device_owner == constants.DEVICE_OWNER_DHCP)
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
 
-    @lockutils.synchronized('agent', 'dhcp-')
+    @synchronized_network(_cached_port_network_id)
     def port_delete_end(self, context, payload):
         """Handle the port.delete.end notification event."""
         self._unlocked_port_delete_end(context, payload)
@@ -307,9 +461,37 @@ class DhcpAgent(manager.Manager):
     def _unlocked_port_delete_end(self, context, payload):
         port = self.cache.get_port_by_id(payload['port_id'])
         if port:
-            network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
-            self.call_driver('reload_allocations', network)
+            self.schedule_reload(
+                port.network_id,
+                port.device_owner == constants.DEVICE_OWNER_DHCP)
+
+    def schedule_reload(self, network_id, options_changed=False):
+        """Reload the DHCP server of a network after its ports changed.
+
+        The notifications received within port_reload_delay seconds are
+        applied with a single reload. The options are only rebuilt if the
+        DHCP port itself changed. Must be called with the network lock.
+        """
+        if self.conf.port_reload_delay <= 0:
+            self.pending_reloads[network_id] = options_changed
+            self._reload_network(network_id)
+        elif network_id in self.pending_reloads:
+            self.pending_reloads[network_id] |= options_changed
+        else:
+            self.pending_reloads[network_id] = options_changed
+            eventlet.spawn_after(self.conf.port_reload_delay,
+                                 run_with_network_lock, network_id,
+                                 self._reload_network, network_id)
+
+    def _reload_network(self, network_id):
+        options_changed = self.pending_reloads.pop(network_id, False)
+        network = self.cache.get_network_by_id(network_id)
+        if network:
+            if options_changed:
+                self.call_driver('reload_allocations', network)
+            else:
+                self.call_driver('reload_hosts', network)
 
     def enable_isolated_metadata_proxy(self, network):
 
@@ -393,6 +575,15 @@ class DhcpPluginApi(proxy.RpcProxy):
                                                  host=self.host),
                                    topic=self.topic))
 
+    def get_networks_info(self, network_ids):
+        """Make a remote process call to retrieve the info of networks."""
+        return [DictModel(network)
+                for network in self.call(self.context,
+                                         self.make_msg('get_networks_info',
+                                                       network_ids=network_ids,
+                                                       host=self.host),
+                                         topic=self.topic)]
+
     def get_dhcp_port(self, network_id, device_id):
         """Make a remote process call to create the dhcp port."""
         return DictModel(self.call(self.context,
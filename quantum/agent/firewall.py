@@ -54,6 +54,10 @@ class FirewallDriver(object):
 
     __metaclass__ = abc.ABCMeta
 
+    # Whether the rules refer to the remote security groups, whose member
+    # ips are given through update_security_group_members
+    use_ipset = False
+
     def prepare_port_filter(self, port):
         """Prepare filters for the port.
 
@@ -84,6 +88,33 @@ class FirewallDriver(object):
         """Stop filtering port"""
         raise NotImplementedError()
 
+    def update_security_group_members(self, sg_id, sg_members):
+        """Update the member ips of a remote security group.
+
+        sg_members maps each ethertype to the member ips. This method is
+        only called on the drivers which use_ipset, before the filters of
+        the ports are updated.
+        """
+        pass
+
+    def update_filters(self, ports, removed_devices=()):
+        """Update the filters of a batch of ports at once.
+
+        Filtered ports are updated, the other ports are prepared and the
+        filters of removed_devices are removed. The rules are applied once
+        for the whole batch.
+        """
+        with self.defer_apply():
+            for device in removed_devices:
+                port = self.ports.get(device)
+                if port:
+                    self.remove_port_filter(port)
+            for port in ports:
+                if port['device'] in self.ports:
+                    self.update_port_filter(port)
+                else:
+                    self.prepare_port_filter(port)
+
     def filter_defer_apply_on(self):
         """Defer application of filtering rule"""
         pass
@@ -19,6 +19,8 @@
 #
 """
 
+import time
+
 import eventlet
 from eventlet import semaphore
 import netaddr
@@ -149,6 +151,8 @@ class L3NATAgent(manager.Manager):
                           "by the agents.")),
         cfg.BoolOpt('enable_multi_host', default=False,
                     help=_("Support multi-host routers.")),
+        cfg.IntOpt('num_router_threads', default=4,
+                   help=_("Number of routers processed concurrently.")),
     ]
 
     def __init__(self, host, conf=None):
@@ -175,6 +179,16 @@ class L3NATAgent(manager.Manager):
             topics.PLUGIN, host)
         self.fullsync = True
         self.sync_sem = semaphore.Semaphore(1)
+        self.router_pool = eventlet.GreenPool(self.conf.num_router_threads)
+        # Latest pending update of each router, None for a deletion, with
+        # the external network id and the time of the oldest update merged
+        # into it
+        self._router_updates = {}
+        # Routers which have a green thread applying their updates
+        self._busy_routers = set()
+        # Routers updated or deleted by a notification since the full sync
+        # in progress started fetching the routers, None out of a full sync
+        self._notified_routers = None
         if self.conf.use_namespaces and not self.conf.enable_multi_host:
             self._destroy_router_namespaces(self.conf.router_id)
         super(L3NATAgent, self).__init__(host=host)
@@ -250,12 +264,15 @@ class L3NATAgent(manager.Manager):
         ri.router['gw_port'] = None
         ri.router[l3_constants.INTERFACE_KEY] = []
         ri.router[l3_constants.FLOATINGIP_KEY] = []
-        self.process_router(ri)
-        for c, r in self.metadata_filter_rules():
-            ri.iptables_manager.ipv4['filter'].remove_rule(c, r)
-        for c, r in self.metadata_nat_rules():
-            ri.iptables_manager.ipv4['nat'].remove_rule(c, r)
-        ri.iptables_manager.apply()
+        ri.iptables_manager.defer_apply_on()
+        try:
+            self.process_router(ri)
+            for c, r in self.metadata_filter_rules():
+                ri.iptables_manager.ipv4['filter'].remove_rule(c, r)
+            for c, r in self.metadata_nat_rules():
+                ri.iptables_manager.ipv4['nat'].remove_rule(c, r)
+        finally:
+            ri.iptables_manager.defer_apply_off()
         self._destroy_metadata_proxy(ri)
         del self.router_info[router_id]
         self._destroy_router_namespace(ri.ns_name())
@@ -582,29 +599,27 @@ class L3NATAgent(manager.Manager):
                 ('float-snat', '-s %s -j SNAT --to %s' %
                  (fixed_ip, floating_ip))]
 
+    def _router_notified(self, router_id):
+        if self._notified_routers is not None:
+            self._notified_routers.add(router_id)
+
     def router_deleted(self, context, router_id):
         """Deal with router deletion RPC message."""
-        with self.sync_sem:
-            if router_id in self.router_info:
-                try:
-                    self._router_removed(router_id)
-                except Exception:
-                    msg = _("Failed dealing with router "
-                            "'%s' deletion RPC message")
-                    LOG.debug(msg, router_id)
-                    self.fullsync = True
+        self._router_notified(router_id)
+        self._queue_router_update(router_id, None)
 
     def routers_updated(self, context, routers):
         """Deal with routers modification and creation RPC message."""
         if not routers:
             return
-        with self.sync_sem:
-            try:
-                self._process_routers(routers)
-            except Exception:
-                msg = _("Failed dealing with routers update RPC message")
-                LOG.debug(msg)
-                self.fullsync = True
+        for r in routers:
+            self._router_notified(r['id'])
+        try:
+            self._process_routers(routers)
+        except Exception:
+            msg = _("Failed dealing with routers update RPC message")
+            LOG.debug(msg)
+            self.fullsync = True
 
     def router_removed_from_agent(self, context, payload):
         self.router_deleted(context, payload['router_id'])
@@ -620,48 +635,100 @@ class L3NATAgent(manager.Manager):
             return
 
         target_ex_net_id = self._fetch_external_net_id()
+        # The routers of a full sync were fetched before the notifications
+        # received since, which are newer
+        notified = set()
+        if all_routers:
+            notified = self._notified_routers or set()
+        for r in routers:
+            if r['id'] not in notified:
+                self._queue_router_update(r['id'], r, target_ex_net_id)
         # if routers are all the routers we have (They are from router sync on
         # starting or when error occurs during running), we seek the
         # routers which should be removed.
-        # If routers are from server side notification, we seek them
-        # from subset of incoming routers and ones we have now.
         if all_routers:
-            prev_router_ids = set(self.router_info)
-        else:
-            prev_router_ids = set(self.router_info) & set(
-                [router['id'] for router in routers])
-        cur_router_ids = set()
-        for r in routers:
-            if not r['admin_state_up']:
-                continue
-            if (self.conf.enable_multi_host and
-                not r.get(l3_constants.MULTIHOST_NET)):
-                continue
-            # If namespaces are disabled, only process the router associated
-            # with the configured agent id.
-            if (not self.conf.use_namespaces and
-                r['id'] != self.conf.router_id):
-                continue
-
-            ex_net_id = (r['external_gateway_info'] or {}).get('network_id')
-            if not ex_net_id and not self.conf.handle_internal_only_routers:
-                continue
-
-            if ex_net_id and ex_net_id != target_ex_net_id:
-                continue
-            cur_router_ids.add(r['id'])
-            if r['id'] not in self.router_info:
-                self._router_added(r['id'], r)
-            ri = self.router_info[r['id']]
-            ri.router = r
+            router_ids = set(r['id'] for r in routers)
+            for router_id in set(self.router_info) - router_ids - notified:
+                self._queue_router_update(router_id, None)
+
+    def _queue_router_update(self, router_id, router, target_ex_net_id=None):
+        """Queue the update of a router, or its deletion if router is None.
+
+        An update replaces the pending one of the same router. The routers
+        are processed by up to num_router_threads green threads, and the
+        updates of each router one at a time.
+        """
+        queued_at = self._router_updates.get(router_id,
+                                             (None, None, time.time()))[2]
+        self._router_updates[router_id] = (router, target_ex_net_id,
+                                           queued_at)
+        if router_id not in self._busy_routers:
+            self._busy_routers.add(router_id)
+            self.router_pool.spawn_n(self._process_router_updates, router_id)
+
+    def _process_router_updates(self, router_id):
+        """Apply the updates of a router until none is pending."""
+        try:
+            while router_id in self._router_updates:
+                router, target_ex_net_id, queued_at = (
+                    self._router_updates.pop(router_id))
+                started = time.time()
+                try:
+                    self._process_router_update(router_id, router,
+                                                target_ex_net_id)
+                except Exception:
+                    LOG.exception(_("Failed processing router %s"),
+                                  router_id)
+                    self.fullsync = True
+                finished = time.time()
+                LOG.debug(_("Processed router %(router_id)s in %(duration).3f "
+                            "seconds, %(latency).3f seconds after its update "
+                            "was queued"),
+                          {'router_id': router_id,
+                           'duration': finished - started,
+                           'latency': finished - queued_at})
+        finally:
+            self._busy_routers.discard(router_id)
+
+    def _is_router_wanted(self, router, target_ex_net_id):
+        if not router['admin_state_up']:
+            return False
+        if (self.conf.enable_multi_host and
+            not router.get(l3_constants.MULTIHOST_NET)):
+            return False
+        # If namespaces are disabled, only process the router associated
+        # with the configured agent id.
+        if (not self.conf.use_namespaces and
+            router['id'] != self.conf.router_id):
+            return False
+
+        ex_net_id = (router['external_gateway_info'] or {}).get('network_id')
+        if not ex_net_id and not self.conf.handle_internal_only_routers:
+            return False
+
+        return not ex_net_id or ex_net_id == target_ex_net_id
+
+    def _process_router_update(self, router_id, router, target_ex_net_id):
+        if router is None or not self._is_router_wanted(router,
+                                                        target_ex_net_id):
+            if router_id in self.router_info:
+                self._router_removed(router_id)
+            return
+
+        if router_id not in self.router_info:
+            self._router_added(router_id, router)
+        ri = self.router_info[router_id]
+        ri.router = router
+        # Apply the iptables rules of all the interfaces and floating ips
+        # at once
+        ri.iptables_manager.defer_apply_on()
+        try:
             self.process_router(ri)
-        # identify and remove routers that no longer exist
-        for router_id in prev_router_ids - cur_router_ids:
-            self._router_removed(router_id)
+        finally:
+            ri.iptables_manager.defer_apply_off()
 
     @periodic_task.periodic_task
     def _sync_routers_task(self, context):
-        # we need to sync with router deletion RPC message
         with self.sync_sem:
             if self.fullsync:
                 try:
@@ -669,13 +736,18 @@ class L3NATAgent(manager.Manager):
                         router_id = self.conf.router_id
                     else:
                         router_id = None
+                    self._notified_routers = set()
                     routers = self.plugin_rpc.get_routers(
                         context, router_id)
-                    self._process_routers(routers, all_routers=True)
+                    # Failures while processing the routers set it again
                     self.fullsync = False
+                    self._process_routers(routers, all_routers=True)
+                    self.router_pool.waitall()
                 except Exception:
                     LOG.exception(_("Failed synchronizing routers"))
                     self.fullsync = True
+                finally:
+                    self._notified_routers = None
 
     def after_start(self):
         LOG.info(_("L3 agent started"))
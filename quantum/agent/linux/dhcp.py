@@ -95,6 +95,10 @@ class DhcpBase(object):
     def reload_allocations(self):
         """Force the DHCP server to reload the assignment database."""
 
+    def reload_hosts(self):
+        """Reload the assignment database when only the ports changed."""
+        self.reload_allocations()
+
     @classmethod
     def existing_dhcp_networks(cls, conf, root_helper):
         """Return a list of existing networks ids (ones we have configs for)"""
@@ -166,6 +170,19 @@ class DhcpLocalProcess(DhcpBase):
 
         return os.path.join(conf_dir, kind)
 
+    def _replace_conf_file(self, kind, contents):
+        """Writes a config file, returns False if it was already up to date.
+        """
+        file_name = self.get_conf_file_name(kind)
+        try:
+            with open(file_name, 'r') as f:
+                if f.read() == contents:
+                    return False
+        except IOError:
+            pass
+        utils.replace_file(file_name, contents)
+        return True
+
     def _get_value_from_conf_file(self, kind, converter=None):
         """A helper function to read a value from one of the state files."""
         file_name = self.get_conf_file_name(kind)
@@ -326,7 +343,11 @@ class Dnsmasq(DhcpLocalProcess):
             utils.execute(cmd, self.root_helper)
 
     def reload_allocations(self):
-        """Rebuild the dnsmasq config and signal the dnsmasq to reload."""
+        """Rebuild the dnsmasq config and signal the dnsmasq to reload.
+
+        dnsmasq is signalled even if the files are unchanged, since they may
+        have been written by a reload which then failed to signal it.
+        """
 
         # If all subnets turn off dhcp, kill the process.
         if not self._enable_dhcp():
@@ -335,9 +356,28 @@ class Dnsmasq(DhcpLocalProcess):
                         'turned off DHCP: %s'), self.network.id)
             return
 
-        self._output_hosts_file()
-        self._output_opts_file()
+        self._replace_conf_file('host', self._build_hosts())
+        self._replace_conf_file('opts', self._build_opts())
+        self._reload()
+
+    def reload_hosts(self):
+        """Rebuild the dnsmasq hosts file and signal the dnsmasq to reload.
 
+        The options only depend on the subnets and the addresses of the
+        DHCP port, they are left alone. dnsmasq is not signalled if the
+        hosts are unchanged, a failed reload being retried by the resync
+        with reload_allocations.
+        """
+        if not self._enable_dhcp():
+            return self.reload_allocations()
+
+        if self._replace_conf_file('host', self._build_hosts()):
+            self._reload()
+        else:
+            LOG.debug(_('DHCP hosts of network %s are unchanged'),
+                      self.network.id)
+
+    def _reload(self):
         if self.active:
             cmd = ['kill', '-HUP', self.pid]
 
@@ -352,6 +392,10 @@ class Dnsmasq(DhcpLocalProcess):
 
     def _output_hosts_file(self):
         """Writes a dnsmasq compatible hosts file."""
+        self._replace_conf_file('host', self._build_hosts())
+        return self.get_conf_file_name('host')
+
+    def _build_hosts(self):
         r = re.compile('[:.]')
         buf = StringIO.StringIO()
 
@@ -361,14 +405,14 @@ class Dnsmasq(DhcpLocalProcess):
                                   self.conf.dhcp_domain)
                 buf.write('%s,%s,%s\n' %
                           (port.mac_address, name, alloc.ip_address))
-
-        name = self.get_conf_file_name('host')
-        utils.replace_file(name, buf.getvalue())
-        return name
+        return buf.getvalue()
 
     def _output_opts_file(self):
         """Write a dnsmasq compatible options file."""
+        self._replace_conf_file('opts', self._build_opts())
+        return self.get_conf_file_name('opts')
 
+    def _build_opts(self):
         subnet_to_interface_ip = self._make_subnet_interface_ip_map()
 
         options = []
@@ -411,9 +455,7 @@ class Dnsmasq(DhcpLocalProcess):
                     options.append(self._format_option(i, 'router'))
         options_str = '\n'.join(options)
         LOG.debug(_('dnsmasq option file contents: %s'), options_str)
-        name = self.get_conf_file_name('opts')
-        utils.replace_file(name, options_str)
-        return name
+        return options_str
 
     def _make_subnet_interface_ip_map(self):
         ip_dev = ip_lib.IPDevice(
@@ -0,0 +1,80 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Implements ipsets holding the member ips of security groups."""
+
+from quantum.agent.linux import utils
+from quantum.common import constants
+from quantum.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+# An ipset name is up to 31 characters long
+MAX_IPSET_NAME_LEN = 31
+IPSET_FAMILY = {constants.IPv4: 'inet',
+                constants.IPv6: 'inet6'}
+
+
+def get_ipset_name(security_group_id, ethertype):
+    return ('%s%s' % (ethertype, security_group_id))[:MAX_IPSET_NAME_LEN]
+
+
+class IpsetManager(object):
+    """Wrapper for ipset.
+
+    The members of each set are cached, so that a membership change only
+    adds and deletes the ips which changed, with a single ipset restore.
+
+    """
+
+    def __init__(self, _execute=None, root_helper=None):
+        if _execute:
+            self.execute = _execute
+        else:
+            self.execute = utils.execute
+
+        self.root_helper = root_helper
+        # Members of the sets, keyed by set name
+        self.sets = {}
+
+    def set_members(self, name, ethertype, member_ips):
+        """Create or update a set so that it holds exactly member_ips."""
+        lines = []
+        current_ips = self.sets.get(name)
+        if current_ips is None:
+            # The set may be left over from a previous run
+            family = IPSET_FAMILY[ethertype]
+            lines += ['create %s hash:ip family %s' % (name, family),
+                      'flush %s' % name]
+            current_ips = set()
+        member_ips = set(member_ips)
+        lines += ['add %s %s' % (name, ip)
+                  for ip in sorted(member_ips - current_ips)]
+        lines += ['del %s %s' % (name, ip)
+                  for ip in sorted(current_ips - member_ips)]
+        if lines:
+            LOG.debug(_("Updating members of ipset %s"), name)
+            lines.append('')
+            self.execute(['ipset', 'restore', '-exist'],
+                         process_input='\n'.join(lines),
+                         root_helper=self.root_helper)
+        self.sets[name] = member_ips
+
+    def destroy(self, name):
+        """Destroy a set, which must not be referenced anymore."""
+        self.execute(['ipset', 'destroy', name],
+                     root_helper=self.root_helper)
+        del self.sets[name]
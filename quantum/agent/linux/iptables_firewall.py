@@ -19,6 +19,7 @@ import netaddr
 from oslo.config import cfg
 
 from quantum.agent import firewall
+from quantum.agent.linux import ipset_manager
 from quantum.agent.linux import iptables_manager
 from quantum.common import constants
 from quantum.openstack.common import log as logging
@@ -31,6 +32,11 @@ EGRESS_DIRECTION = 'egress'
 CHAIN_NAME_PREFIX = {INGRESS_DIRECTION: 'i',
                      EGRESS_DIRECTION: 'o'}
 LINUX_DEV_LEN = 14
+IPSET_DIRECTION = {INGRESS_DIRECTION: 'src',
+                   EGRESS_DIRECTION: 'dst'}
+
+cfg.CONF.import_opt('enable_ipset', 'quantum.agent.securitygroups_rpc',
+                    'SECURITYGROUP')
 
 
 class IptablesFirewallDriver(firewall.FirewallDriver):
@@ -42,9 +48,13 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.iptables = iptables_manager.IptablesManager(
             root_helper=cfg.CONF.AGENT.root_helper,
             use_ipv6=True)
+        self.use_ipset = cfg.CONF.SECURITYGROUP.enable_ipset
+        self.ipset = ipset_manager.IpsetManager(
+            root_helper=cfg.CONF.AGENT.root_helper)
         # list of port which has security group
         self.filtered_ports = {}
         self._add_fallback_chain_v4v6()
+        self._add_chain_by_name_v4v6(SG_CHAIN)
 
     @property
     def ports(self):
@@ -52,11 +62,11 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
 
     def prepare_port_filter(self, port):
         LOG.debug(_("Preparing device (%s) filter"), port['device'])
-        self._remove_chains()
-        self.filtered_ports[port['device']] = port
+        if port['device'] in self.filtered_ports:
+            self._remove_chains(self.filtered_ports[port['device']])
         # each security group has it own chains
-        self._setup_chains()
-        self.iptables.apply()
+        self._setup_chains(port)
+        self._apply()
 
     def update_port_filter(self, port):
         LOG.debug(_("Updating device (%s) filter"), port['device'])
@@ -64,10 +74,12 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             LOG.info(_('Attempted to update port filter which is not '
                        'filtered %s'), port['device'])
             return
-        self._remove_chains()
-        self.filtered_ports[port['device']] = port
-        self._setup_chains()
-        self.iptables.apply()
+        if self.filtered_ports[port['device']] == port:
+            LOG.debug(_("Device (%s) filter is up to date"), port['device'])
+            return
+        self._remove_chains(self.filtered_ports[port['device']])
+        self._setup_chains(port)
+        self._apply()
 
     def remove_port_filter(self, port):
         LOG.debug(_("Removing device (%s) filter"), port['device'])
@@ -75,26 +87,54 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             LOG.info(_('Attempted to remove port filter which is not '
                        'filtered %r'), port)
             return
-        self._remove_chains()
-        self.filtered_ports.pop(port['device'], None)
-        self._setup_chains()
+        self._remove_chains(self.filtered_ports[port['device']])
+        self._apply()
+
+    def update_security_group_members(self, sg_id, sg_members):
+        LOG.debug(_("Updating members of security group %s"), sg_id)
+        for ethertype, member_ips in sg_members.items():
+            self.ipset.set_members(
+                ipset_manager.get_ipset_name(sg_id, ethertype),
+                ethertype, member_ips)
+
+    def _apply(self):
         self.iptables.apply()
+        if not self.iptables.iptables_apply_deferred:
+            self._remove_unused_ipsets()
 
-    def _setup_chains(self):
-        """Setup ingress and egress chain for a port. """
-        self._add_chain_by_name_v4v6(SG_CHAIN)
+    def _remove_unused_ipsets(self):
+        """Destroy the ipsets no iptables rule refers to anymore."""
+        used_ipsets = set()
         for port in self.filtered_ports.values():
-            self._setup_chain(port, INGRESS_DIRECTION)
-            self._setup_chain(port, EGRESS_DIRECTION)
-            self.iptables.ipv4['filter'].add_rule(SG_CHAIN, '-j ACCEPT')
-            self.iptables.ipv6['filter'].add_rule(SG_CHAIN, '-j ACCEPT')
+            for rule in port.get('security_group_rules', []):
+                if rule.get('remote_group_id'):
+                    used_ipsets.add(ipset_manager.get_ipset_name(
+                        rule['remote_group_id'], rule['ethertype']))
+        for name in set(self.ipset.sets) - used_ipsets:
+            try:
+                self.ipset.destroy(name)
+            except RuntimeError:
+                LOG.exception(_("Failed to destroy ipset %s"), name)
+
+    def _setup_chains(self, port):
+        """Setup ingress and egress chain for a port. """
+        # The rule accepting packets must stay the last one of SG_CHAIN
+        if self.filtered_ports:
+            self._remove_rule_from_chain_v4v6(SG_CHAIN, ['-j ACCEPT'],
+                                              ['-j ACCEPT'])
+        self.filtered_ports[port['device']] = port
+        self._setup_chain(port, INGRESS_DIRECTION)
+        self._setup_chain(port, EGRESS_DIRECTION)
+        self._add_rule_to_chain_v4v6(SG_CHAIN, ['-j ACCEPT'], ['-j ACCEPT'])
 
-    def _remove_chains(self):
+    def _remove_chains(self, port):
         """Remove ingress and egress chain for a port"""
-        for port in self.filtered_ports.values():
-            self._remove_chain(port, INGRESS_DIRECTION)
-            self._remove_chain(port, EGRESS_DIRECTION)
-        self._remove_chain_by_name_v4v6(SG_CHAIN)
+        self._remove_chain(port, INGRESS_DIRECTION)
+        self._remove_chain(port, EGRESS_DIRECTION)
+        del self.filtered_ports[port['device']]
+        if not self.filtered_ports:
+            self._remove_rule_from_chain_v4v6(SG_CHAIN, ['-j ACCEPT'],
+                                              ['-j ACCEPT'])
 
     def _setup_chain(self, port, DIRECTION):
         self._add_chain(port, DIRECTION)
@@ -102,6 +142,10 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
 
     def _remove_chain(self, port, DIRECTION):
         chain_name = self._port_chain_name(port, DIRECTION)
+        # Removing the chain removes the rules jumping to it, but not the
+        # rule of the FORWARD chain jumping to SG_CHAIN
+        jump_rule = [self._physdev_jump_rule(port, DIRECTION, SG_CHAIN)]
+        self._remove_rule_from_chain_v4v6('FORWARD', jump_rule, jump_rule)
         self._remove_chain_by_name_v4v6(chain_name)
 
     def _add_fallback_chain_v4v6(self):
@@ -125,6 +169,14 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         for rule in ipv6_rules:
             self.iptables.ipv6['filter'].add_rule(chain_name, rule)
 
+    def _remove_rule_from_chain_v4v6(self, chain_name, ipv4_rules,
+                                     ipv6_rules):
+        for rule in ipv4_rules:
+            self.iptables.ipv4['filter'].remove_rule(chain_name, rule)
+
+        for rule in ipv6_rules:
+            self.iptables.ipv6['filter'].remove_rule(chain_name, rule)
+
     def _get_device_name(self, port):
         return port['device']
 
@@ -138,23 +190,22 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         # We accept the packet at the end of SG_CHAIN.
 
         # jump to the security group chain
-        device = self._get_device_name(port)
-        jump_rule = ['-m physdev --physdev-is-bridged --%s '
-                     '%s -j $%s' % (self.IPTABLES_DIRECTION[direction],
-                                    device,
-                                    SG_CHAIN)]
+        jump_rule = [self._physdev_jump_rule(port, direction, SG_CHAIN)]
         self._add_rule_to_chain_v4v6('FORWARD', jump_rule, jump_rule)
 
         # jump to the chain based on the device
-        jump_rule = ['-m physdev --physdev-is-bridged --%s '
-                     '%s -j $%s' % (self.IPTABLES_DIRECTION[direction],
-                                    device,
-                                    chain_name)]
+        jump_rule = [self._physdev_jump_rule(port, direction, chain_name)]
         self._add_rule_to_chain_v4v6(SG_CHAIN, jump_rule, jump_rule)
 
         if direction == EGRESS_DIRECTION:
             self._add_rule_to_chain_v4v6('INPUT', jump_rule, jump_rule)
 
+    def _physdev_jump_rule(self, port, direction, chain_name):
+        return ('-m physdev --physdev-is-bridged --%s '
+                '%s -j $%s' % (self.IPTABLES_DIRECTION[direction],
+                               self._get_device_name(port),
+                               chain_name))
+
     def _split_sgr_by_ethertype(self, security_group_rules):
         ipv4_sg_rules = []
         ipv6_sg_rules = []
@@ -162,8 +213,10 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             if rule.get('ethertype') == constants.IPv4:
                 ipv4_sg_rules.append(rule)
             elif rule.get('ethertype') == constants.IPv6:
+                # Do not modify the port, it is compared with the next
+                # version of the port to find out whether it changed
                 if rule.get('protocol') == 'icmp':
-                    rule['protocol'] = 'icmpv6'
+                    rule = dict(rule, protocol='icmpv6')
                 ipv6_sg_rules.append(rule)
         return ipv4_sg_rules, ipv6_sg_rules
 
@@ -234,6 +287,8 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                         rule.get('source_ip_prefix'))
             args += self._ip_prefix_arg('d',
                                         rule.get('dest_ip_prefix'))
+            if self.use_ipset and rule.get('remote_group_id'):
+                args += self._remote_group_arg(rule)
             iptables_rules += [' '.join(args)]
 
         iptables_rules += ['-j $sg-fallback']
@@ -273,6 +328,15 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             return ['-%s' % direction, ip_prefix]
         return []
 
+    def _remote_group_arg(self, rule):
+        name = ipset_manager.get_ipset_name(rule['remote_group_id'],
+                                            rule['ethertype'])
+        if name not in self.ipset.sets:
+            # the members of the group are not known yet
+            self.ipset.set_members(name, rule['ethertype'], [])
+        return ['-m set', '--match-set', name,
+                IPSET_DIRECTION[rule['direction']]]
+
     def _port_chain_name(self, port, direction):
         return iptables_manager.get_chain_name(
             '%s%s' % (CHAIN_NAME_PREFIX[direction], port['device'][3:]))
@@ -282,6 +346,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
 
     def filter_defer_apply_off(self):
         self.iptables.defer_apply_off()
+        self._remove_unused_ipsets()
 
 
 class OVSHybridIptablesFirewallDriver(IptablesFirewallDriver):
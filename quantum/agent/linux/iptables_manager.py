@@ -49,6 +49,19 @@ def get_chain_name(chain_name, wrap=True):
         return chain_name[:MAX_CHAIN_LEN_NOWRAP]
 
 
+def _weed_out_duplicates(lines):
+    """Remove duplicated lines, letting the *last* occurrence win."""
+    seen_lines = set()
+    result = []
+    for line in reversed(lines):
+        stripped = line.strip()
+        if stripped not in seen_lines:
+            seen_lines.add(stripped)
+            result.append(line)
+    result.reverse()
+    return tuple(result)
+
+
 class IptablesRule(object):
     """An iptables rule.
 
@@ -87,6 +100,8 @@ class IptablesTable(object):
         self.rules = []
         self.chains = set()
         self.unwrapped_chains = set()
+        # Whether the table changed since it was last applied
+        self.dirty = True
 
     def add_chain(self, name, wrap=True):
         """Adds a named chain to the table.
@@ -105,6 +120,7 @@ class IptablesTable(object):
             self.chains.add(name)
         else:
             self.unwrapped_chains.add(name)
+        self.dirty = True
 
     def _select_chain_set(self, wrap):
         if wrap:
@@ -143,13 +159,14 @@ class IptablesTable(object):
             return
 
         chain_set.remove(name)
-        self.rules = filter(lambda r: r.chain != name, self.rules)
         if wrap:
             jump_snippet = '-j %s-%s' % (binary_name, name)
         else:
             jump_snippet = '-j %s' % (name,)
 
-        self.rules = filter(lambda r: jump_snippet not in r.rule, self.rules)
+        self.rules = [r for r in self.rules
+                      if r.chain != name and jump_snippet not in r.rule]
+        self.dirty = True
 
     def add_rule(self, chain, rule, wrap=True, top=False):
         """Add a rule to the table.
@@ -170,6 +187,7 @@ class IptablesTable(object):
             rule = ' '.join(map(self._wrap_target_chain, rule.split(' ')))
 
         self.rules.append(IptablesRule(chain, rule, wrap, top))
+        self.dirty = True
 
     def _wrap_target_chain(self, s):
         if s.startswith('$'):
@@ -185,8 +203,11 @@ class IptablesTable(object):
 
         """
         chain = get_chain_name(chain, wrap)
+        if '$' in rule:
+            rule = ' '.join(map(self._wrap_target_chain, rule.split(' ')))
         try:
             self.rules.remove(IptablesRule(chain, rule, wrap, top))
+            self.dirty = True
         except ValueError:
             LOG.warn(_('Tried to remove rule that was not there:'
                        ' %(chain)r %(rule)r %(wrap)r %(top)r'),
@@ -196,10 +217,30 @@ class IptablesTable(object):
     def empty_chain(self, chain, wrap=True):
         """Remove all rules from a chain."""
         chain = get_chain_name(chain, wrap)
-        chained_rules = [rule for rule in self.rules
-                         if rule.chain == chain and rule.wrap == wrap]
-        for rule in chained_rules:
-            self.rules.remove(rule)
+        self.rules = [rule for rule in self.rules
+                      if rule.chain != chain or rule.wrap != wrap]
+        self.dirty = True
+
+    def get_rules_by_chain(self):
+        """Return the rules of the table grouped by chain.
+
+        Returns a tuple of a dict mapping each wrapped chain to the tuple of
+        its rules, without duplicates, and of a tuple describing the
+        unwrapped chains and rules, which are shared with other components
+        and can't be rewritten chain by chain.
+
+        """
+        wrapped = dict((name, []) for name in self.chains)
+        unwrapped = []
+        for rule in self.rules:
+            if rule.wrap:
+                wrapped[rule.chain].append(str(rule))
+            else:
+                unwrapped.append(str(rule))
+        wrapped = dict((name, _weed_out_duplicates(rules))
+                       for name, rules in wrapped.iteritems())
+        return wrapped, (tuple(sorted(self.unwrapped_chains)),
+                         tuple(unwrapped))
 
 
 class IptablesManager(object):
@@ -236,6 +277,9 @@ class IptablesManager(object):
         self.root_helper = root_helper
         self.namespace = namespace
         self.iptables_apply_deferred = False
+        # Rules of each table as they were last applied, as returned by
+        # IptablesTable.get_rules_by_chain, keyed by command and table name
+        self.applied_rules = {}
 
         self.ipv4 = {'filter': IptablesTable()}
         self.ipv6 = {'filter': IptablesTable()}
@@ -313,9 +357,14 @@ class IptablesManager(object):
     def _apply(self):
         """Apply the current in-memory set of iptables rules.
 
-        This will blow away any rules left over from previous runs of the
-        same component of Nova, and replace them with our current set of
-        rules. This happens atomically, thanks to iptables-restore.
+        The first time a table is applied, this will blow away any rules
+        left over from previous runs of the same component of Nova, and
+        replace them with our current set of rules. Afterwards, tables which
+        did not change are skipped, and only the wrapped chains which changed
+        are rewritten, with iptables-restore --noflush. The unwrapped chains
+        are shared with other components, so a change to them rewrites the
+        whole table again. This happens atomically, thanks to
+        iptables-restore.
 
         """
         s = [('iptables', self.ipv4)]
@@ -324,30 +373,73 @@ class IptablesManager(object):
 
         for cmd, tables in s:
             for table in tables:
-                args = ['%s-save' % cmd, '-t', table]
-                if self.namespace:
-                    args = ['ip', 'netns', 'exec', self.namespace] + args
-                current_table = (self.execute(args,
-                                 root_helper=self.root_helper))
-                current_lines = current_table.split('\n')
-                new_filter = self._modify_rules(current_lines,
-                                                tables[table])
-                args = ['%s-restore' % (cmd)]
-                if self.namespace:
-                    args = ['ip', 'netns', 'exec', self.namespace] + args
-                self.execute(args,
-                             process_input='\n'.join(new_filter),
-                             root_helper=self.root_helper)
+                if not tables[table].dirty:
+                    continue
+                rules = tables[table].get_rules_by_chain()
+                applied = self.applied_rules.get((cmd, table))
+                if applied == rules:
+                    pass
+                elif applied and applied[1] == rules[1]:
+                    try:
+                        self._apply_changed_chains(cmd, table, applied[0],
+                                                   rules[0])
+                    except RuntimeError:
+                        LOG.warn(_("Failed to update the changed chains of "
+                                   "table %(table)s with %(cmd)s-restore, "
+                                   "restoring the whole table"),
+                                 {'table': table, 'cmd': cmd})
+                        self._apply_table(cmd, table, tables[table])
+                else:
+                    self._apply_table(cmd, table, tables[table])
+                self.applied_rules[(cmd, table)] = rules
+                tables[table].dirty = False
         LOG.debug(_("IPTablesManager.apply completed with success"))
 
+    def _execute(self, args, **kwargs):
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        return self.execute(args, root_helper=self.root_helper, **kwargs)
+
+    def _apply_table(self, cmd, table_name, table):
+        current_table = self._execute(['%s-save' % cmd, '-t', table_name])
+        current_lines = current_table.split('\n')
+        new_filter = self._modify_rules(current_lines, table)
+        self._execute(['%s-restore' % cmd],
+                      process_input='\n'.join(new_filter))
+
+    def _apply_changed_chains(self, cmd, table_name, old_chains, new_chains):
+        changed = sorted(name for name, rules in new_chains.iteritems()
+                         if old_chains.get(name) != rules)
+        removed = sorted(name for name in old_chains
+                         if name not in new_chains)
+
+        # Declaring an existing chain flushes it with --noflush, so the
+        # removed chains can then be deleted
+        lines = ['*%s' % table_name]
+        lines += [':%s-%s - [0:0]' % (binary_name, name)
+                  for name in sorted(changed + removed)]
+        for name in changed:
+            lines += new_chains[name]
+        lines += ['-X %s-%s' % (binary_name, name) for name in removed]
+        lines += ['COMMIT', '']
+        self._execute(['%s-restore' % cmd, '--noflush'],
+                      process_input='\n'.join(lines))
+
     def _modify_rules(self, current_lines, table, binary=None):
         unwrapped_chains = table.unwrapped_chains
         chains = table.chains
         rules = table.rules
 
+        our_rules = [str(rule) for rule in rules]
+        # rule.top == True means we want this rule to be at the top.
+        # Further down, we weed out duplicates from the bottom of the
+        # list, so here we remove the dupes ahead of time.
+        top_rules = set(str(rule).strip() for rule in rules if rule.top)
+
         # Remove any trace of our rules
-        new_filter = filter(lambda line: binary_name
-                            not in line, current_lines)
+        new_filter = [line for line in current_lines
+                      if binary_name not in line and
+                      line.strip() not in top_rules]
 
         seen_chains = False
         rules_index = 0
@@ -359,38 +451,9 @@ class IptablesManager(object):
                 if not rule.startswith(':'):
                     break
 
-        our_rules = []
-        for rule in rules:
-            rule_str = str(rule)
-            if rule.top:
-                # rule.top == True means we want this rule to be at the top.
-                # Further down, we weed out duplicates from the bottom of the
-                # list, so here we remove the dupes ahead of time.
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                                    new_filter)
-            our_rules += [rule_str]
-
-        new_filter[rules_index:rules_index] = our_rules
-
-        new_filter[rules_index:rules_index] = [':%s - [0:0]' % (name)
-                                               for name in unwrapped_chains]
-        new_filter[rules_index:rules_index] = [':%s-%s - [0:0]' %
-                                               (binary_name, name)
-                                               for name in chains]
-
-        seen_lines = set()
-
-        def _weed_out_duplicates(line):
-            line = line.strip()
-            if line in seen_lines:
-                return False
-            else:
-                seen_lines.add(line)
-                return True
-
-        # We filter duplicates, letting the *last* occurrence take
-        # precedence.
-        new_filter.reverse()
-        new_filter = filter(_weed_out_duplicates, new_filter)
-        new_filter.reverse()
-        return new_filter
+        new_filter[rules_index:rules_index] = (
+            [':%s-%s - [0:0]' % (binary_name, name) for name in chains] +
+            [':%s - [0:0]' % (name) for name in unwrapped_chains] +
+            our_rules)
+
+        return list(_weed_out_duplicates(new_filter))
@@ -21,10 +21,43 @@
 import re
 
 from quantum.agent.linux import utils
+from quantum.openstack.common import jsonutils
 from quantum.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# Columns of the Interface table needed to build a VifPort
+VIF_PORT_COLUMNS = ['ofport', 'external_ids']
+
+
+def parse_ovsdb_value(value):
+    """Converts a value from the OVSDB JSON notation to python.
+
+    Maps become dicts, sets become lists and uuids become strings.
+    """
+    if isinstance(value, list) and len(value) == 2:
+        kind, data = value
+        if kind == 'map':
+            return dict((parse_ovsdb_value(k), parse_ovsdb_value(v))
+                        for k, v in data)
+        elif kind == 'set':
+            return [parse_ovsdb_value(v) for v in data]
+        elif kind in ('uuid', 'named-uuid'):
+            return data
+    return value
+
+
+def parse_ovsdb_table(output):
+    """Returns the rows of a table printed with --format=json.
+
+    This is the output format of the ovs-vsctl list and find commands,
+    and of ovsdb-client monitor. Each row is a dict keyed by column.
+    """
+    table = jsonutils.loads(output)
+    headings = table['headings']
+    return [dict(zip(headings, [parse_ovsdb_value(v) for v in data]))
+            for data in table.get('data', [])]
+
 
 class VifPort:
     def __init__(self, port_name, ofport, vif_id, vif_mac, switch):
@@ -216,42 +249,66 @@ class OVSBridge:
             LOG.error(_("Unable to execute %(cmd)s. Exception: %(exception)s"),
                       {'cmd': args, 'exception': e})
 
+    def get_interfaces(self, columns):
+        """Returns the interfaces of the bridge ports as dicts.
+
+        A single ovs-vsctl call lists the name and the given columns of
+        all the interfaces, followed by the names of the bridge ports.
+        An unset ofport is returned as -1.
+        """
+        args = ['--format=json', '--',
+                '--columns=%s' % ','.join(['name'] + columns),
+                'list', 'Interface', '--', 'list-ports', self.br_name]
+        output = self.run_vsctl(args)
+        if not output:
+            return []
+        table, _sep, port_names = output.partition('\n')
+        try:
+            interfaces = parse_ovsdb_table(table)
+        except (ValueError, KeyError, TypeError), e:
+            LOG.error(_("Unable to parse the interfaces of %(bridge)s. "
+                        "Exception: %(exception)s"),
+                      {'bridge': self.br_name, 'exception': e})
+            return []
+        port_names = set(port_names.split())
+        interfaces = [iface for iface in interfaces
+                      if iface['name'] in port_names]
+        if 'ofport' in columns:
+            for iface in interfaces:
+                if not isinstance(iface['ofport'], int):
+                    iface['ofport'] = -1
+        return interfaces
+
+    def _get_vif_port(self, iface):
+        external_ids = iface['external_ids']
+        if "attached-mac" not in external_ids:
+            return
+        if "iface-id" in external_ids:
+            iface_id = external_ids["iface-id"]
+        elif "xs-vif-uuid" in external_ids:
+            # if this is a xenserver and iface-id is not automatically
+            # synced to OVS from XAPI, we grab it from XAPI directly
+            iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
+        else:
+            return
+        return VifPort(iface['name'], iface['ofport'], iface_id,
+                       external_ids["attached-mac"], self)
+
     # returns a VIF object for each VIF port
     def get_vif_ports(self):
         edge_ports = []
-        port_names = self.get_port_name_list()
-        for name in port_names:
-            external_ids = self.db_get_map("Interface", name, "external_ids")
-            ofport = self.db_get_val("Interface", name, "ofport")
-            if "iface-id" in external_ids and "attached-mac" in external_ids:
-                p = VifPort(name, ofport, external_ids["iface-id"],
-                            external_ids["attached-mac"], self)
-                edge_ports.append(p)
-            elif ("xs-vif-uuid" in external_ids and
-                  "attached-mac" in external_ids):
-                # if this is a xenserver and iface-id is not automatically
-                # synced to OVS from XAPI, we grab it from XAPI directly
-                iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
-                p = VifPort(name, ofport, iface_id,
-                            external_ids["attached-mac"], self)
-                edge_ports.append(p)
-
+        for iface in self.get_interfaces(VIF_PORT_COLUMNS):
+            port = self._get_vif_port(iface)
+            if port:
+                edge_ports.append(port)
         return edge_ports
 
+    def get_vif_ports_by_id(self):
+        """Returns the VIF ports of the bridge keyed by port id."""
+        return dict((port.vif_id, port) for port in self.get_vif_ports())
+
     def get_vif_port_set(self):
-        edge_ports = set()
-        port_names = self.get_port_name_list()
-        for name in port_names:
-            external_ids = self.db_get_map("Interface", name, "external_ids")
-            if "iface-id" in external_ids and "attached-mac" in external_ids:
-                edge_ports.add(external_ids['iface-id'])
-            elif ("xs-vif-uuid" in external_ids and
-                  "attached-mac" in external_ids):
-                # if this is a xenserver and iface-id is not automatically
-                # synced to OVS from XAPI, we grab it from XAPI directly
-                iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
-                edge_ports.add(iface_id)
-        return edge_ports
+        return set(port.vif_id for port in self.get_vif_ports())
 
     def get_vif_port_by_id(self, port_id):
         args = ['--', '--columns=external_ids,name,ofport',
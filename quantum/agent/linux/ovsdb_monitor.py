@@ -0,0 +1,136 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Follows the changes of an OVSDB table with ovsdb-client monitor."""
+
+import shlex
+
+import eventlet
+from eventlet.green import subprocess
+from eventlet import queue
+
+from quantum.agent.linux import ovs_lib
+from quantum.common import utils
+from quantum.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Actions of the rows printed by ovsdb-client monitor, and the event
+# reported for them. The 'old' rows of an update only hold the previous
+# value of the modified columns and are followed by a 'new' row.
+ROW_ACTIONS = {'initial': 'added',
+               'insert': 'added',
+               'delete': 'removed',
+               'new': 'updated'}
+
+
+class OvsdbMonitor(object):
+    """Reports the changes of an OVSDB table.
+
+    ovsdb-client monitor prints the initial contents of the table, then
+    every change to the monitored columns as one line of JSON. The lines
+    are parsed in a green thread and the rows are queued until the caller
+    collects them with get_rows.
+    """
+
+    def __init__(self, table_name, columns=None, root_helper=None):
+        self.cmd = ['ovsdb-client', 'monitor', table_name]
+        if columns:
+            self.cmd.append(','.join(columns))
+        self.cmd.append('--format=json')
+        self.root_helper = root_helper
+        self._process = None
+        self._reader = None
+        self._rows = queue.Queue()
+
+    def start(self):
+        cmd = self.cmd
+        if self.root_helper:
+            cmd = shlex.split(self.root_helper) + cmd
+        LOG.debug(_("Running command: %s"), cmd)
+        self._process = utils.subprocess_popen(cmd,
+                                               stdout=subprocess.PIPE,
+                                               stderr=subprocess.PIPE)
+        self._reader = eventlet.spawn(self._read_stdout, self._process)
+
+    def stop(self):
+        if self._reader:
+            self._reader.kill()
+            self._reader = None
+        if self._process:
+            # ovsdb-client exits on its next write once stdout is closed,
+            # even when the root helper does not let us kill it
+            self._process.stdout.close()
+            try:
+                self._process.kill()
+            except OSError:
+                pass
+            self._process = None
+
+    def is_active(self):
+        return self._process is not None and self._process.poll() is None
+
+    def _read_stdout(self, process):
+        for line in iter(process.stdout.readline, ''):
+            try:
+                # Each row has the monitored columns, with the 'row' uuid
+                # and the 'action' which changed it
+                rows = ovs_lib.parse_ovsdb_table(line)
+            except (ValueError, KeyError, TypeError):
+                LOG.warn(_("Unable to parse ovsdb monitor output: %s"), line)
+                continue
+            for row in rows:
+                self._rows.put(row)
+        LOG.warn(_("ovsdb monitor %(cmd)s exited: %(stderr)s"),
+                 {'cmd': self.cmd, 'stderr': process.stderr.read()})
+        process.wait()
+
+    def get_rows(self):
+        """Returns the rows received since the last call, without waiting."""
+        rows = []
+        while True:
+            try:
+                rows.append(self._rows.get_nowait())
+            except queue.Empty:
+                return rows
+
+
+class InterfaceMonitor(OvsdbMonitor):
+    """Reports the interfaces which are added, removed or updated."""
+
+    def __init__(self, root_helper=None):
+        super(InterfaceMonitor, self).__init__(
+            'Interface', columns=['name', 'ofport', 'external_ids'],
+            root_helper=root_helper)
+
+    def get_events(self):
+        """Returns the interface events received since the last call.
+
+        Each event is a dict with the 'action' (added, removed or updated),
+        the 'name', 'ofport' and 'external_ids' of the interface.
+        """
+        events = []
+        for row in self.get_rows():
+            action = ROW_ACTIONS.get(row.get('action'))
+            if not action:
+                continue
+            ofport = row.get('ofport')
+            events.append({'action': action,
+                           'name': row.get('name'),
+                           'ofport': ofport if ofport != [] else None,
+                           'external_ids': row.get('external_ids') or {}})
+        return events
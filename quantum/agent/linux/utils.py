@@ -25,39 +25,63 @@ import struct
 import tempfile
 
 from eventlet.green import subprocess
+from oslo.config import cfg
 
 from quantum.common import utils
 from quantum.openstack.common import log as logging
+from quantum.rootwrap import client
 
 
 LOG = logging.getLogger(__name__)
 
+_rootwrap_clients = {}
+
+
+def get_rootwrap_client():
+    """Returns the root helper daemon client, None if none is configured."""
+    try:
+        daemon_cmd = cfg.CONF.AGENT.root_helper_daemon
+    except cfg.NoSuchOptError:
+        return None
+    if not daemon_cmd:
+        return None
+    if daemon_cmd not in _rootwrap_clients:
+        _rootwrap_clients[daemon_cmd] = client.Client(daemon_cmd)
+    return _rootwrap_clients[daemon_cmd]
+
 
 def execute(cmd, root_helper=None, process_input=None, addl_env=None,
             check_exit_code=True, return_stderr=False):
-    if root_helper:
-        cmd = shlex.split(root_helper) + cmd
     cmd = map(str, cmd)
-
-    LOG.debug(_("Running command: %s"), cmd)
-    env = os.environ.copy()
-    if addl_env:
-        env.update(addl_env)
-    obj = utils.subprocess_popen(cmd, shell=False,
-                                 stdin=subprocess.PIPE,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE,
-                                 env=env)
-
-    _stdout, _stderr = (process_input and
-                        obj.communicate(process_input) or
-                        obj.communicate())
-    obj.stdin.close()
+    rootwrap_client = root_helper and not addl_env and get_rootwrap_client()
+    if rootwrap_client:
+        LOG.debug(_("Running command with the root helper daemon: %s"), cmd)
+        returncode, _stdout, _stderr = rootwrap_client.execute(
+            cmd, process_input)
+    else:
+        if root_helper:
+            cmd = shlex.split(root_helper) + cmd
+
+        LOG.debug(_("Running command: %s"), cmd)
+        env = os.environ.copy()
+        if addl_env:
+            env.update(addl_env)
+        obj = utils.subprocess_popen(cmd, shell=False,
+                                     stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE,
+                                     env=env)
+
+        _stdout, _stderr = (process_input and
+                            obj.communicate(process_input) or
+                            obj.communicate())
+        obj.stdin.close()
+        returncode = obj.returncode
     m = _("\nCommand: %(cmd)s\nExit code: %(code)s\nStdout: %(stdout)r\n"
-          "Stderr: %(stderr)r") % {'cmd': cmd, 'code': obj.returncode,
+          "Stderr: %(stderr)r") % {'cmd': cmd, 'code': returncode,
                                    'stdout': _stdout, 'stderr': _stderr}
     LOG.debug(m)
-    if obj.returncode and check_exit_code:
+    if returncode and check_exit_code:
         raise RuntimeError(m)
 
     return return_stderr and (_stdout, _stderr) or _stdout
@@ -16,15 +16,18 @@
 #
 # @author: Mark McClain, DreamHost
 
+import collections
 import hashlib
 import hmac
 import os
 import socket
+import time
 import urlparse
 
 import eventlet
 import httplib2
 from oslo.config import cfg
+from quantumclient.common import exceptions as qclient_exc
 from quantumclient.v2_0 import client
 import webob
 
@@ -38,6 +41,38 @@ LOG = logging.getLogger(__name__)
 DEVICE_OWNER_ROUTER_INTF = "network:router_interface"
 
 
+class InstanceCache(object):
+    """Remembers the instance of a remote address for ttl seconds.
+
+    At most size instances are remembered, the oldest one is dropped to add
+    another one.
+    """
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._instances = collections.OrderedDict()
+
+    def get(self, key):
+        instance = self._instances.get(key)
+        if instance and instance[1] > time.time():
+            self.hits += 1
+            return instance[0]
+        if instance:
+            del self._instances[key]
+        self.misses += 1
+
+    def set(self, key, instance_id):
+        if self.ttl <= 0 or self.size <= 0:
+            return
+        self._instances.pop(key, None)
+        if len(self._instances) >= self.size:
+            self._instances.popitem(last=False)
+        self._instances[key] = (instance_id, time.time() + self.ttl)
+
+
 class MetadataProxyHandler(object):
     OPTS = [
         cfg.StrOpt('admin_user',
@@ -61,11 +96,24 @@ class MetadataProxyHandler(object):
         cfg.StrOpt('metadata_proxy_shared_secret',
                    default='',
                    help=_('Shared secret to sign instance-id request'),
-                   secret=True)
+                   secret=True),
+        cfg.IntOpt('instance_cache_ttl', default=5,
+                   help=_("Number of seconds the instance of a remote "
+                          "address is cached for, 0 disables the cache")),
+        cfg.IntOpt('instance_cache_size', default=1000,
+                   help=_("Maximum number of cached instances")),
     ]
 
     def __init__(self, conf):
         self.conf = conf
+        # Token and endpoint shared by the Quantum clients, which
+        # authenticate again only when the token is refused
+        self.auth_token = None
+        self.endpoint_url = None
+        self.instances = InstanceCache(self.conf.instance_cache_ttl,
+                                       self.conf.instance_cache_size)
+        # Idle keep-alive connections to the Nova metadata server
+        self.nova_connections = []
 
     def _get_quantum_client(self):
         qclient = client.Client(
@@ -75,9 +123,15 @@ class MetadataProxyHandler(object):
             auth_url=self.conf.auth_url,
             auth_strategy=self.conf.auth_strategy,
             region_name=self.conf.auth_region,
+            token=self.auth_token,
+            endpoint_url=self.endpoint_url,
         )
         return qclient
 
+    def _save_auth_info(self, qclient):
+        self.auth_token = qclient.httpclient.auth_token
+        self.endpoint_url = qclient.httpclient.endpoint_url
+
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
         try:
@@ -96,12 +150,45 @@ class MetadataProxyHandler(object):
             return webob.exc.HTTPInternalServerError(explanation=unicode(msg))
 
     def _get_instance_id(self, req):
-        qclient = self._get_quantum_client()
-
         remote_address = req.headers.get('X-Forwarded-For')
         network_id = req.headers.get('X-Quantum-Network-ID')
         router_id = req.headers.get('X-Quantum-Router-ID')
 
+        key = (network_id or router_id, remote_address)
+        instance_id = self.instances.get(key)
+        LOG.debug(_("Instance cache %(result)s for %(key)s, %(hits)d hits "
+                    "and %(misses)d misses so far"),
+                  {'result': instance_id and 'hit' or 'miss', 'key': key,
+                   'hits': self.instances.hits,
+                   'misses': self.instances.misses})
+        if instance_id:
+            return instance_id
+
+        instance_id = self._lookup_instance_id(remote_address, network_id,
+                                               router_id)
+        if instance_id:
+            self.instances.set(key, instance_id)
+        return instance_id
+
+    def _lookup_instance_id(self, remote_address, network_id, router_id):
+        try:
+            return self._find_instance_id(remote_address, network_id,
+                                          router_id)
+        except qclient_exc.Unauthorized:
+            if not self.auth_token:
+                raise
+            # Not every client version authenticates again when it is
+            # given a token and an endpoint: forget the refused token
+            LOG.debug(_("Quantum refused the saved token, authenticating "
+                        "again"))
+            self.auth_token = None
+            self.endpoint_url = None
+            return self._find_instance_id(remote_address, network_id,
+                                          router_id)
+
+    def _find_instance_id(self, remote_address, network_id, router_id):
+        qclient = self._get_quantum_client()
+
         if network_id:
             networks = [network_id]
         else:
@@ -114,6 +201,7 @@ class MetadataProxyHandler(object):
         ports = qclient.list_ports(
             network_id=networks,
             fixed_ips=['ip_address=%s' % remote_address])['ports']
+        self._save_auth_info(qclient)
 
         if len(ports) == 1:
             return ports[0]['device_id']
@@ -133,9 +221,13 @@ class MetadataProxyHandler(object):
             req.query_string,
             ''))
 
-        h = httplib2.Http()
+        try:
+            h = self.nova_connections.pop()
+        except IndexError:
+            h = httplib2.Http()
         resp, content = h.request(url, method=req.method, headers=headers,
                                   body=req.body)
+        self.nova_connections.append(h)
 
         if resp.status == 200:
             LOG.debug(str(resp))
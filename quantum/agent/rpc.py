@@ -23,6 +23,7 @@ from quantum.openstack.common import log as logging
 from quantum.openstack.common.notifier import api
 from quantum.openstack.common.notifier import rpc_notifier
 from quantum.openstack.common import rpc
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.openstack.common.rpc import proxy
 from quantum.openstack.common import timeutils
 from quantum.openstack.common import uuidutils
@@ -71,14 +72,47 @@ class PluginApi(proxy.RpcProxy):
 
     API version history:
         1.0 - Initial version.
+        1.2 - get_devices_details_list and update_devices_down.
 
     '''
 
     BASE_RPC_API_VERSION = '1.0'
+    DEVICES_LIST_RPC_API_VERSION = '1.2'
 
     def __init__(self, topic):
         super(PluginApi, self).__init__(
             topic=topic, default_version=self.BASE_RPC_API_VERSION)
+        # Set to False once the plugin rejected a device list method
+        self.devices_list_supported = True
+
+    def _call_devices_list(self, context, method, devices, agent_id,
+                           fallback):
+        """Call method for all devices, or fallback for each of them.
+
+        Plugins not supporting the version of the device list methods
+        reply with an error, in which case fallback is called for each
+        device, as it is from then on.
+        """
+        if self.devices_list_supported:
+            try:
+                return self.call(context,
+                                 self.make_msg(method, devices=devices,
+                                               agent_id=agent_id),
+                                 topic=self.topic,
+                                 version=self.DEVICES_LIST_RPC_API_VERSION)
+            except rpc_common.RemoteError as e:
+                if e.exc_type not in ('UnsupportedRpcVersion',
+                                      'AttributeError'):
+                    raise
+                LOG.info(_("Plugin does not support %s, falling back to "
+                           "one call per device"), method)
+                self.devices_list_supported = False
+        return [fallback(context, device, agent_id) for device in devices]
+
+    def get_devices_details_list(self, context, devices, agent_id):
+        return self._call_devices_list(context, 'get_devices_details_list',
+                                       devices, agent_id,
+                                       self.get_device_details)
 
     def get_device_details(self, context, device, agent_id):
         return self.call(context,
@@ -92,6 +126,11 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id),
                          topic=self.topic)
 
+    def update_devices_down(self, context, devices, agent_id):
+        return self._call_devices_list(context, 'update_devices_down',
+                                       devices, agent_id,
+                                       self.update_device_down)
+
     def update_device_up(self, context, device, agent_id):
         return self.call(context,
                          self.make_msg('update_device_up', device=device,
@@ -28,7 +28,12 @@ SG_RPC_VERSION = "1.1"
 security_group_opts = [
     cfg.StrOpt(
         'firewall_driver',
-        default='quantum.agent.firewall.NoopFirewallDriver')
+        default='quantum.agent.firewall.NoopFirewallDriver'),
+    cfg.BoolOpt(
+        'enable_ipset',
+        default=False,
+        help=_('Match the members of remote security groups with one '
+               'ipset per group instead of one rule per member'))
 ]
 cfg.CONF.register_opts(security_group_opts, 'SECURITYGROUP')
 
@@ -57,6 +62,15 @@ class SecurityGroupServerRpcApiMixin(object):
                          version=SG_RPC_VERSION,
                          topic=self.topic)
 
+    def security_group_info_for_devices(self, context, devices):
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        return self.call(context,
+                         self.make_msg('security_group_info_for_devices',
+                                       devices=devices),
+                         version=SG_RPC_VERSION,
+                         topic=self.topic)
+
 
 class SecurityGroupAgentRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -107,11 +121,18 @@ class SecurityGroupAgentRpcMixin(object):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
-        with self.firewall.defer_apply():
-            for device in devices.values():
-                self.firewall.prepare_port_filter(device)
+        devices = self._security_group_rules_for_devices(list(device_ids))
+        self.firewall.update_filters(devices.values())
+
+    def _security_group_rules_for_devices(self, device_ids):
+        if not self.firewall.use_ipset:
+            return self.plugin_rpc.security_group_rules_for_devices(
+                self.context, device_ids)
+        devices_info = self.plugin_rpc.security_group_info_for_devices(
+            self.context, device_ids)
+        for sg_id, sg_members in devices_info['sg_member_ips'].items():
+            self.firewall.update_security_group_members(sg_id, sg_members)
+        return devices_info['devices']
 
     def security_groups_rule_updated(self, security_groups):
         LOG.info(_("Security group "
@@ -144,24 +165,17 @@ class SecurityGroupAgentRpcMixin(object):
         if not device_ids:
             return
         LOG.info(_("Remove device filter for %r"), device_ids)
-        with self.firewall.defer_apply():
-            for device_id in device_ids:
-                device = self.firewall.ports.get(device_id)
-                if not device:
-                    continue
-                self.firewall.remove_port_filter(device)
+        self.firewall.update_filters([], removed_devices=device_ids)
 
     def refresh_firewall(self):
         LOG.info(_("Refresh firewall rules"))
         device_ids = self.firewall.ports.keys()
         if not device_ids:
             return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
-        with self.firewall.defer_apply():
-            for device in devices.values():
-                LOG.debug(_("Update port filter for %s"), device)
-                self.firewall.update_port_filter(device)
+        devices = self._security_group_rules_for_devices(device_ids)
+        # only refresh the devices which are still filtered
+        self.firewall.update_filters([device for device in devices.values()
+                                      if device['device'] in device_ids])
 
 
 class SecurityGroupAgentRpcApiMixin(object):
@@ -198,15 +198,18 @@ class Controller(object):
             # FIXME(salvatore-orlando): obj_getter might return references to
             # other resources. Must check authZ on them too.
             # Omit items from list that should not be visible
-            obj_list = [obj for obj in obj_list
-                        if policy.check(request.context,
+            allowed = policy.check_many(request.context,
                                         self._plugin_handlers[self.SHOW],
-                                        obj,
-                                        plugin=self._plugin)]
-        collection = {self._collection:
-                      [self._view(obj,
-                                  fields_to_strip=fields_to_add)
-                       for obj in obj_list]}
+                                        obj_list,
+                                        plugin=self._plugin)
+            obj_list = [obj for obj, is_allowed in zip(obj_list, allowed)
+                        if is_allowed]
+        # The views are built while the response is sent when streaming
+        items = (self._view(obj, fields_to_strip=fields_to_add)
+                 for obj in obj_list)
+        if not cfg.CONF.stream_collection_responses:
+            items = list(items)
+        collection = {self._collection: items}
         pagination_links = pagination_helper.get_links(obj_list)
         if pagination_links:
             collection[self._collection + "_links"] = pagination_links
@@ -34,6 +34,21 @@ class Request(wsgi.Request):
     pass
 
 
+def _is_streamed(result):
+    return (isinstance(result, dict) and
+            any(hasattr(value, 'next') for value in result.itervalues()))
+
+
+def _stream(serializer, result, action):
+    # The status is already sent when the items fail to be serialized
+    try:
+        for chunk in serializer.stream(result):
+            yield chunk
+    except Exception:
+        LOG.exception(_('%s failed while streaming the response'), action)
+        raise
+
+
 def Resource(controller, faults=None, deserializers=None, serializers=None):
     """Represents an API entity resource and the associated serialization and
     deserialization logic
@@ -105,6 +120,15 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             raise webob.exc.HTTPInternalServerError(**kwargs)
 
         status = action_status.get(action, 200)
+        if _is_streamed(result):
+            if hasattr(serializer, 'stream'):
+                return webob.Response(request=request, status=status,
+                                      content_type=content_type,
+                                      app_iter=_stream(serializer, result,
+                                                       action))
+            result = dict((key, list(value) if hasattr(value, 'next')
+                           else value)
+                          for key, value in result.iteritems())
         body = serializer.serialize(result)
         # NOTE(jkoelker) Comply with RFC2616 section 9.7
         if status == 204:
@@ -39,12 +39,18 @@ core_opts = [
                help=_("The host IP to bind to")),
     cfg.IntOpt('bind_port', default=9696,
                help=_("The port to bind to")),
+    cfg.IntOpt('api_workers', default=0,
+               help=_("Number of separate worker processes serving the "
+                      "API, 0 serves it in the server process")),
     cfg.StrOpt('api_paste_config', default="api-paste.ini",
                help=_("The API paste config file to use")),
     cfg.StrOpt('api_extensions_path', default="",
                help=_("The path for API extensions")),
     cfg.StrOpt('policy_file', default="policy.json",
                help=_("The policy file to use")),
+    cfg.IntOpt('policy_reload_interval', default=10,
+               help=_("Seconds between checks for changes of the policy "
+                      "file, 0 disables reloading")),
     cfg.StrOpt('auth_strategy', default='keystone',
                help=_("The type of authentication to use")),
     cfg.StrOpt('core_plugin',
@@ -65,6 +71,9 @@ core_opts = [
                help=_("The maximum number of items returned in a single "
                       "response, value was 'infinite' or negative integer "
                       "means no limit")),
+    cfg.BoolOpt('stream_collection_responses', default=False,
+                help=_("Serialize the JSON responses listing resources "
+                       "while they are sent, one item at a time")),
     cfg.IntOpt('max_dns_nameservers', default=5,
                help=_("Maximum number of DNS nameservers")),
     cfg.IntOpt('max_subnet_host_routes', default=20,
@@ -82,6 +91,10 @@ core_opts = [
                help=_("The hostname Quantum is running on")),
     cfg.BoolOpt('force_gateway_on_subnet', default=False,
                 help=_("Ensure that configured gateway is on subnet")),
+    cfg.StrOpt('ipam_driver',
+               default='quantum.db.ipam_db.RangeIpamDriver',
+               help=_("The driver used to manage the free addresses of "
+                      "subnet allocation pools")),
 ]
 
 core_cli_opts = [
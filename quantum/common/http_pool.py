@@ -0,0 +1,108 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Keep-alive HTTP connections to the controllers driven by the plugins."""
+
+import errno
+import httplib
+import os
+import socket
+
+from eventlet import pools
+
+from quantum.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class _StaleConnection(Exception):
+    """The server closed an idle connection before answering a request."""
+
+
+class ConnectionPool(pools.Pool):
+    """Keep-alive connections to a server, opened when needed.
+
+    kwargs are passed to the HTTPConnection or HTTPSConnection, such as
+    timeout or the key_file and cert_file of SSL. A process forked after
+    connections were opened opens its own ones.
+    """
+
+    def __init__(self, host, port, ssl=False, max_size=1, **kwargs):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.kwargs = kwargs
+        self._pid = os.getpid()
+        super(ConnectionPool, self).__init__(max_size=max_size,
+                                             order_as_stack=True)
+
+    def create(self):
+        if self.ssl:
+            return httplib.HTTPSConnection(self.host, self.port,
+                                           **self.kwargs)
+        return httplib.HTTPConnection(self.host, self.port, **self.kwargs)
+
+    def get(self):
+        if self._pid != os.getpid():
+            # The connections were opened by the parent process, which keeps
+            # using them: closing them here only releases the descriptors
+            self._pid = os.getpid()
+            while self.free_items:
+                self.free_items.pop().close()
+            self.current_size = 0
+        return super(ConnectionPool, self).get()
+
+    def request(self, method, url, body=None, headers=None):
+        """Sends a request and returns the response and its content.
+
+        The request is sent again on a new connection only if the server
+        closed the idle connection it was sent on before answering, when it
+        cannot have processed it. A timeout is never retried.
+        """
+        conn = self.get()
+        try:
+            reused = getattr(conn, 'sock', None) is not None
+            try:
+                return self._request(conn, method, url, body, headers,
+                                     reused)
+            except _StaleConnection:
+                LOG.debug(_("Connection to %(host)s:%(port)s was closed, "
+                            "reconnecting"),
+                          {'host': self.host, 'port': self.port})
+                conn.close()
+                return self._request(conn, method, url, body, headers,
+                                     False)
+        except Exception:
+            conn.close()
+            raise
+        finally:
+            self.put(conn)
+
+    def _request(self, conn, method, url, body, headers, reused):
+        try:
+            conn.request(method, url, body, headers or {})
+        except socket.error as e:
+            if reused and e.errno in (errno.ECONNRESET, errno.EPIPE):
+                raise _StaleConnection()
+            raise
+        try:
+            response = conn.getresponse()
+        except httplib.BadStatusLine:
+            if reused:
+                raise _StaleConnection()
+            raise
+        return response, response.read()
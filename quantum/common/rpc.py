@@ -17,6 +17,7 @@
 
 from quantum import context
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import rpc
 from quantum.openstack.common.rpc import dispatcher
 
 
@@ -41,3 +42,14 @@ class PluginRpcDispatcher(dispatcher.RpcDispatcher):
         quantum_ctxt = context.Context(user_id, tenant_id, **rpc_ctxt_dict)
         return super(PluginRpcDispatcher, self).dispatch(
             quantum_ctxt, version, method, **kwargs)
+
+
+def reset_connection_pool():
+    """Forgets the pooled connections inherited from the parent process.
+
+    They are not closed, as the parent process may still be using them, and
+    new connections are created when needed.
+    """
+    connection_cls = getattr(rpc._get_impl(), 'Connection', None)
+    if connection_cls is not None and getattr(connection_cls, 'pool', None):
+        connection_cls.pool = None
@@ -189,6 +189,15 @@ def configure_db():
                 retry_registration(remaining, reconnect_interval)
 
 
+def dispose_engine():
+    """Closes the connections of the engine, e.g. in a forked process.
+
+    The connections are opened again when needed.
+    """
+    if _ENGINE:
+        _ENGINE.pool.dispose()
+
+
 def clear_db(base=BASE):
     global _ENGINE, _MAKER
     assert _ENGINE
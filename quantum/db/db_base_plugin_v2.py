@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import datetime
 import random
 
@@ -27,6 +28,7 @@ from quantum.api.v2 import attributes
 from quantum.common import constants
 from quantum.common import exceptions as q_exc
 from quantum.db import api as db
+from quantum.db import ipam_db
 from quantum.db import models_v2
 from quantum.db import sqlalchemyutils
 from quantum.openstack.common import log as logging
@@ -74,6 +76,10 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
     # api resources. Mixins can use this dict for adding their own methods
     # TODO(salvatore-orlando): Avoid using class-level variables
     _dict_extend_functions = {}
+    # This dictionary will store, for each api resource, the names of the
+    # methods loading with a single query the rows needed by the extend
+    # methods for a whole collection (see _dict_extension_prefetch)
+    _dict_prefetch_functions = {}
 
     def __init__(self):
         # NOTE(jkoelker) This is an incomlete implementation. Subclasses
@@ -127,6 +133,50 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         cur_funcs.extend(funcs)
         cls._dict_extend_functions[resource] = cur_funcs
 
+    @classmethod
+    def register_dict_prefetch_funcs(cls, resource, func_names):
+        cur_funcs = cls._dict_prefetch_functions.get(resource, [])
+        for name in func_names:
+            if name not in cur_funcs:
+                cur_funcs.append(name)
+        cls._dict_prefetch_functions[resource] = cur_funcs
+
+    @contextlib.contextmanager
+    def _dict_extension_prefetch(self, context, resource, items):
+        """Prefetch the rows needed for extending the dicts of items.
+
+        While the context is active, the first lookup made by an extend
+        method through _get_prefetched calls the matching prefetch method
+        registered for resource once, with the ids of all the items. The
+        prefetch method returns a dict mapping ids to rows, so that extend
+        methods do not issue one query per item.
+        """
+        previous = getattr(context, '_dict_prefetched', None)
+        context._dict_prefetched = {
+            'resource': resource,
+            'ids': set(item['id'] for item in items),
+            'rows': {}}
+        try:
+            yield
+        finally:
+            context._dict_prefetched = previous
+
+    def _get_prefetched(self, context, name, id):
+        """Returns a (found, row) tuple for id from the prefetch method name.
+
+        found is False when id was not prefetched, in which case the caller
+        must query the database itself. row is None when there is no row.
+        """
+        prefetched = getattr(context, '_dict_prefetched', None)
+        if (not prefetched or id not in prefetched['ids'] or
+            name not in self._dict_prefetch_functions.get(
+                prefetched['resource'], [])):
+            return False, None
+        if name not in prefetched['rows']:
+            prefetched['rows'][name] = getattr(self, name)(
+                context, prefetched['ids'])
+        return True, prefetched['rows'][name].get(id)
+
     @classmethod
     def register_model_query_hook(cls, model, name, query_hook, filter_hook,
                                   result_filters=None):
@@ -264,16 +314,23 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         return self._get_collection_query(context, model, filters).count()
 
     @staticmethod
-    def _generate_mac(context, network_id):
+    def _random_mac():
         base_mac = cfg.CONF.base_mac.split(':')
+        mac = [int(base_mac[0], 16), int(base_mac[1], 16),
+               int(base_mac[2], 16), random.randint(0x00, 0xff),
+               random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
+        if base_mac[3] != '00':
+            mac[3] = int(base_mac[3], 16)
+        return ':'.join(map(lambda x: "%02x" % x, mac))
+
+    @staticmethod
+    def _generate_mac(context, network_id):
+        reserved = getattr(context, '_bulk_port_reservation', None)
+        if reserved and reserved['macs'].get(network_id):
+            return reserved['macs'][network_id].pop()
         max_retries = cfg.CONF.mac_generation_retries
         for i in range(max_retries):
-            mac = [int(base_mac[0], 16), int(base_mac[1], 16),
-                   int(base_mac[2], 16), random.randint(0x00, 0xff),
-                   random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
-            if base_mac[3] != '00':
-                mac[3] = int(base_mac[3], 16)
-            mac_address = ':'.join(map(lambda x: "%02x" % x, mac))
+            mac_address = QuantumDbPluginV2._random_mac()
             if QuantumDbPluginV2._check_unique_mac(context, network_id,
                                                    mac_address):
                 LOG.debug(_("Generated mac for network %(network_id)s "
@@ -288,6 +345,40 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                   max_retries)
         raise q_exc.MacAddressGenerationFailure(net_id=network_id)
 
+    @staticmethod
+    def _generate_macs(context, network_id, count, excluded=()):
+        """Generate count unique MAC addresses for the network.
+
+        Candidates are checked against the ports of the network with a
+        single query per attempt. MACs in excluded are never returned.
+        """
+        macs = set()
+        max_retries = cfg.CONF.mac_generation_retries
+        for i in range(max_retries):
+            candidates = set()
+            while len(candidates) < count - len(macs):
+                mac_address = QuantumDbPluginV2._random_mac()
+                if mac_address not in macs:
+                    candidates.add(mac_address)
+            mac_qry = context.session.query(models_v2.Port.mac_address)
+            mac_qry = mac_qry.filter(
+                models_v2.Port.network_id == network_id,
+                models_v2.Port.mac_address.in_(candidates))
+            in_use = set(row[0] for row in mac_qry)
+            in_use.update(candidates.intersection(excluded))
+            macs.update(candidates - in_use)
+            if len(macs) == count:
+                LOG.debug(_("Generated %(count)d macs for network "
+                            "%(network_id)s"), locals())
+                return list(macs)
+            LOG.debug(_("%(in_use)d generated macs exist. Remaining "
+                        "attempts %(max_retries)s."),
+                      {'in_use': len(in_use),
+                       'max_retries': max_retries - (i + 1)})
+        LOG.error(_("Unable to generate mac address after %s attempts"),
+                  max_retries)
+        raise q_exc.MacAddressGenerationFailure(net_id=network_id)
+
     @staticmethod
     def _check_unique_mac(context, network_id, mac_address):
         mac_qry = context.session.query(models_v2.Port)
@@ -348,81 +439,8 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         """Return an IP address to the pool of free IP's on the network
         subnet.
         """
-        # Grab all allocation pools for the subnet
-        pool_qry = context.session.query(
-            models_v2.IPAllocationPool).with_lockmode('update')
-        allocation_pools = pool_qry.filter_by(subnet_id=subnet_id).all()
-        # Find the allocation pool for the IP to recycle
-        pool_id = None
-        for allocation_pool in allocation_pools:
-            allocation_pool_range = netaddr.IPRange(
-                allocation_pool['first_ip'],
-                allocation_pool['last_ip'])
-            if netaddr.IPAddress(ip_address) in allocation_pool_range:
-                pool_id = allocation_pool['id']
-                break
-        if not pool_id:
-            error_message = _("No allocation pool found for "
-                              "ip address:%s") % ip_address
-            raise q_exc.InvalidInput(error_message=error_message)
-        # Two requests will be done on the database. The first will be to
-        # search if an entry starts with ip_address + 1 (r1). The second
-        # will be to see if an entry ends with ip_address -1 (r2).
-        # If 1 of the above holds true then the specific entry will be
-        # modified. If both hold true then the two ranges will be merged.
-        # If there are no entries then a single entry will be added.
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).with_lockmode('update')
-        ip_first = str(netaddr.IPAddress(ip_address) + 1)
-        ip_last = str(netaddr.IPAddress(ip_address) - 1)
-        LOG.debug(_("Recycle %s"), ip_address)
-        try:
-            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     first_ip=ip_first).one()
-            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        except exc.NoResultFound:
-            r1 = []
-        try:
-            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     last_ip=ip_last).one()
-            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        except exc.NoResultFound:
-            r2 = []
-
-        if r1 and r2:
-            # Merge the two ranges
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=r2['first_ip'],
-                last_ip=r1['last_ip'])
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
-                        "%(first_ip2)s-%(last_ip2)s"),
-                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
-                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
-            context.session.delete(r1)
-            context.session.delete(r2)
-        elif r1:
-            # Update the range with matched first IP
-            r1['first_ip'] = ip_address
-            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        elif r2:
-            # Update the range with matched last IP
-            r2['last_ip'] = ip_address
-            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        else:
-            # Create a new range
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=ip_address,
-                last_ip=ip_address)
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': ip_address, 'last_ip': ip_address})
+        ipam_db.get_ipam_driver(context).release_ip(context, subnet_id,
+                                                    ip_address)
         QuantumDbPluginV2._delete_ip_allocation(context, network_id, subnet_id,
                                                 ip_address)
 
@@ -468,72 +486,17 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
         The IP address will be generated from one of the subnets defined on
         the network.
         """
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        for subnet in subnets:
-            range = range_qry.filter_by(subnet_id=subnet['id']).first()
-            if not range:
-                LOG.debug(_("All IP's from subnet %(subnet_id)s (%(cidr)s) "
-                            "allocated"),
-                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
-                continue
-            ip_address = range['first_ip']
-            LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
-                        "to %(last_ip)s"),
-                      {'ip_address': ip_address,
-                       'first_ip': range['first_ip'],
-                       'last_ip': range['last_ip']})
-            if range['first_ip'] == range['last_ip']:
-                # No more free indices on subnet => delete
-                LOG.debug(_("No more free IP's in slice. Deleting allocation "
-                            "pool."))
-                context.session.delete(range)
-            else:
-                # increment the first free
-                # skip x.x.x.0 and x.x.x.254
-                lastNo = ip_address.split('.')[3]
-                if lastNo == '254':
-                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 3)
-                else:
-                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-
-            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
-        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+        reserved = getattr(context, '_bulk_port_reservation', None)
+        key = tuple(subnet['id'] for subnet in subnets)
+        if reserved and reserved['ips'].get(key):
+            return reserved['ips'][key].pop(0)
+        return ipam_db.get_ipam_driver(context).generate_ip(context, subnets)
 
     @staticmethod
     def _allocate_specific_ip(context, subnet_id, ip_address):
         """Allocate a specific IP address on the subnet."""
-        ip = int(netaddr.IPAddress(ip_address))
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange,
-            models_v2.IPAllocationPool).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        results = range_qry.filter_by(subnet_id=subnet_id).all()
-        for (range, pool) in results:
-            first = int(netaddr.IPAddress(range['first_ip']))
-            last = int(netaddr.IPAddress(range['last_ip']))
-            if first <= ip <= last:
-                if first == last:
-                    context.session.delete(range)
-                    return
-                elif first == ip:
-                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-                    return
-                elif last == ip:
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    return
-                else:
-                    # Split into two ranges
-                    new_first = str(netaddr.IPAddress(ip_address) + 1)
-                    new_last = range['last_ip']
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    ip_range = models_v2.IPAvailabilityRange(
-                        allocation_pool_id=pool['id'],
-                        first_ip=new_first,
-                        last_ip=new_last)
-                    context.session.add(ip_range)
-                    return
+        ipam_db.get_ipam_driver(context).allocate_specific_ip(
+            context, subnet_id, ip_address)
 
     @staticmethod
     def _check_unique_ip(context, network_id, subnet_id, ip_address):
@@ -721,24 +684,104 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                                            p['fixed_ips'])
             ips = self._allocate_fixed_ips(context, network, configured_ips)
         else:
-            filter = {'network_id': [p['network_id']]}
-            subnets = self.get_subnets(context, filters=filter)
-            # Split into v4 and v6 subnets
-            v4 = []
-            v6 = []
-            for subnet in subnets:
-                if subnet['ip_version'] == 4:
-                    v4.append(subnet)
-                else:
-                    v6.append(subnet)
-            version_subnets = [v4, v6]
-            for subnets in version_subnets:
+            for subnets in self._get_subnets_by_version(context,
+                                                        p['network_id']):
                 if subnets:
                     result = QuantumDbPluginV2._generate_ip(context, subnets)
                     ips.append({'ip_address': result['ip_address'],
                                 'subnet_id': result['subnet_id']})
         return ips
 
+    def _get_subnets_by_version(self, context, network_id):
+        """Return the v4 and v6 subnets of the network."""
+        reserved = getattr(context, '_bulk_port_reservation', None)
+        if reserved and network_id in reserved['subnets']:
+            return reserved['subnets'][network_id]
+        filter = {'network_id': [network_id]}
+        subnets = self.get_subnets(context, filters=filter)
+        # Split into v4 and v6 subnets
+        v4 = []
+        v6 = []
+        for subnet in subnets:
+            if subnet['ip_version'] == 4:
+                v4.append(subnet)
+            else:
+                v6.append(subnet)
+        return [v4, v6]
+
+    def _reserve_bulk_port_addresses(self, context, ports):
+        """Generate the MAC and IP addresses of a batch of ports.
+
+        MACs are generated per network and IPs per set of candidate
+        subnets in a single pass, and stored in the context where
+        _generate_mac and _generate_ip pick them up while each port
+        is created. Networks on which a port of the batch requests a
+        specific IP address keep allocating IPs port by port.
+        """
+        reserved = {'macs': {}, 'ips': {}, 'subnets': {}}
+        mac_count = {}
+        requested_macs = {}
+        requested_ip_networks = set()
+        ip_count = {}
+        ip_subnets = {}
+        for item in ports:
+            p = item['port']
+            network_id = p['network_id']
+            mac_address = p.get('mac_address', attributes.ATTR_NOT_SPECIFIED)
+            if mac_address is attributes.ATTR_NOT_SPECIFIED:
+                mac_count[network_id] = mac_count.get(network_id, 0) + 1
+            else:
+                requested_macs.setdefault(network_id, set()).add(mac_address)
+            fixed_ips = p.get('fixed_ips', attributes.ATTR_NOT_SPECIFIED)
+            if fixed_ips is attributes.ATTR_NOT_SPECIFIED:
+                if network_id not in reserved['subnets']:
+                    self._recycle_expired_ip_allocations(context, network_id)
+                    reserved['subnets'][network_id] = (
+                        self._get_subnets_by_version(context, network_id))
+                candidates = [subnets for subnets in
+                              reserved['subnets'][network_id] if subnets]
+            else:
+                candidates = []
+                for fixed in fixed_ips:
+                    if 'ip_address' in fixed:
+                        requested_ip_networks.add(network_id)
+                    elif 'subnet_id' in fixed:
+                        self._recycle_expired_ip_allocations(context,
+                                                             network_id)
+                        candidates.append(
+                            [self._get_subnet(context, fixed['subnet_id'])])
+            for subnets in candidates:
+                key = tuple(subnet['id'] for subnet in subnets)
+                ip_subnets[key] = subnets
+                ip_count[key] = ip_count.get(key, 0) + 1
+
+        for network_id, count in mac_count.iteritems():
+            reserved['macs'][network_id] = self._generate_macs(
+                context, network_id, count,
+                requested_macs.get(network_id, ()))
+        ipam_driver = ipam_db.get_ipam_driver(context)
+        for key, count in ip_count.iteritems():
+            # Addresses requested explicitly by a port of the batch could
+            # be handed out to another one, let those networks allocate
+            # port by port
+            if ip_subnets[key][0]['network_id'] in requested_ip_networks:
+                continue
+            reserved['ips'][key] = ipam_driver.generate_ips(
+                context, ip_subnets[key], count)
+        context._bulk_port_reservation = reserved
+
+    def _release_bulk_port_addresses(self, context):
+        """Return the reserved addresses which were not used."""
+        reserved = getattr(context, '_bulk_port_reservation', None)
+        if not reserved:
+            return
+        del context._bulk_port_reservation
+        ipam_driver = ipam_db.get_ipam_driver(context)
+        for ips in reserved['ips'].itervalues():
+            for ip in ips:
+                ipam_driver.release_ip(context, ip['subnet_id'],
+                                       ip['ip_address'])
+
     def _validate_subnet_cidr(self, context, network, new_subnet_cidr):
         """Validate the CIDR for a subnet.
 
@@ -1189,16 +1232,13 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                         nexthop=rt['nexthop'])
                     context.session.add(route)
 
+            ipam_driver = ipam_db.get_ipam_driver(context)
             for pool in s['allocation_pools']:
                 ip_pool = models_v2.IPAllocationPool(subnet=subnet,
                                                      first_ip=pool['start'],
                                                      last_ip=pool['end'])
                 context.session.add(ip_pool)
-                ip_range = models_v2.IPAvailabilityRange(
-                    ipallocationpool=ip_pool,
-                    first_ip=pool['start'],
-                    last_ip=pool['end'])
-                context.session.add(ip_range)
+                ipam_driver.add_pool(context, subnet, ip_pool)
 
         return self._make_subnet_dict(subnet)
 
@@ -1308,7 +1348,15 @@ class QuantumDbPluginV2(quantum_plugin_base_v2.QuantumPluginBaseV2):
                                           filters=filters)
 
     def create_port_bulk(self, context, ports):
-        return self._create_bulk('port', context, ports)
+        with context.session.begin(subtransactions=True):
+            self._reserve_bulk_port_addresses(context, ports['ports'])
+            try:
+                objects = self._create_bulk('port', context, ports)
+            except Exception:
+                del context._bulk_port_reservation
+                raise
+            self._release_bulk_port_addresses(context)
+        return objects
 
     def create_port(self, context, port):
         p = port['port']
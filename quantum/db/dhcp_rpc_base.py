@@ -34,13 +34,7 @@ class DhcpRpcCallbackMixin(object):
         host = kwargs.get('host')
         LOG.debug(_('Network list requested from %s'), host)
         plugin = manager.QuantumManager.get_plugin()
-        enable_multi_host = False
-        if utils.is_extension_supported(plugin, constants.AGENT_EXT_ALIAS):
-            agent = plugin.get_agent_by_type_and_host(
-                context, constants.AGENT_TYPE_DHCP, host)
-            enable_multi_host = agent['configurations'].get(
-                'enable_multi_host', False)
-        if enable_multi_host:
+        if self._is_multi_host(context, plugin, host):
             filters = {'admin_state_up': [True],
                        constants.MULTIHOST: [True]}
             nets = plugin.get_networks(context, filters=filters)
@@ -55,6 +49,26 @@ class DhcpRpcCallbackMixin(object):
             nets = plugin.get_networks(context, filters=filters)
         return [net['id'] for net in nets]
 
+    def _is_multi_host(self, context, plugin, host):
+        if utils.is_extension_supported(plugin, constants.AGENT_EXT_ALIAS):
+            agent = plugin.get_agent_by_type_and_host(
+                context, constants.AGENT_TYPE_DHCP, host)
+            return agent['configurations'].get('enable_multi_host', False)
+        return False
+
+    def _get_wanted_ports(self, context, plugin, host, ports):
+        """Drop the compute ports of other hosts from multi-host agents."""
+        if not self._is_multi_host(context, plugin, host):
+            return ports
+        wanted_ports = []
+        for port in ports:
+            device_owner = port.get('device_owner')
+            if (device_owner and device_owner.startswith('compute:') and
+                host != port.get('binding:host_id')):
+                continue
+            wanted_ports.append(port)
+        return wanted_ports
+
     def get_network_info(self, context, **kwargs):
         """Retrieve and return a extended information about a network."""
         network_id = kwargs.get('network_id')
@@ -67,25 +81,41 @@ class DhcpRpcCallbackMixin(object):
         filters = dict(network_id=[network_id])
         network['subnets'] = plugin.get_subnets(context, filters=filters)
         ports = plugin.get_ports(context, filters=filters)
-        enable_multi_host = False
-        if utils.is_extension_supported(plugin, constants.AGENT_EXT_ALIAS):
-            agent = plugin.get_agent_by_type_and_host(
-                context, constants.AGENT_TYPE_DHCP, host)
-            enable_multi_host = agent['configurations'].get(
-                'enable_multi_host', False)
-        if enable_multi_host:
-            wanted_ports = []
-            for port in ports:
-                device_owner = port.get('device_owner')
-                if (device_owner and device_owner.startswith('compute:') and
-                    host != port.get('binding:host_id')):
-                    continue
-                wanted_ports.append(port)
-            network['ports'] = wanted_ports
-        else:
-            network['ports'] = ports
+        network['ports'] = self._get_wanted_ports(context, plugin, host, ports)
         return network
 
+    def get_networks_info(self, context, **kwargs):
+        """Retrieve and return the extended information about networks.
+
+        The networks, their subnets and their ports are each fetched with
+        one query, whatever the number of networks. The networks which do
+        not exist are left out.
+        """
+        network_ids = kwargs.get('network_ids')
+        host = kwargs.get('host')
+        LOG.debug(_('%(count)d networks requested from %(host)s'),
+                  {'count': len(network_ids), 'host': host})
+        plugin = manager.QuantumManager.get_plugin()
+        networks = plugin.get_networks(context,
+                                       filters=dict(id=network_ids))
+        filters = dict(network_id=network_ids)
+        subnets = plugin.get_subnets(context, filters=filters)
+        ports = self._get_wanted_ports(context, plugin, host,
+                                       plugin.get_ports(context,
+                                                        filters=filters))
+        networks_by_id = {}
+        for network in networks:
+            network['subnets'] = []
+            network['ports'] = []
+            networks_by_id[network['id']] = network
+        for subnet in subnets:
+            if subnet['network_id'] in networks_by_id:
+                networks_by_id[subnet['network_id']]['subnets'].append(subnet)
+        for port in ports:
+            if port['network_id'] in networks_by_id:
+                networks_by_id[port['network_id']]['ports'].append(port)
+        return networks
+
     def get_dhcp_port(self, context, **kwargs):
         """Allocate a DHCP port for the host and return port information.
 
@@ -0,0 +1,508 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+IP address management drivers for QuantumDbPluginV2.
+
+The driver in use is selected with the 'ipam_driver' option. A driver
+keeps track of the free addresses of the allocation pools of a subnet;
+the IPAllocation rows themselves are still managed by the plugin.
+
+Only the table of the driver recorded in IPAMActiveDriver is up to date.
+A server using another driver rebuilds the table of its driver from the
+allocations the first time it uses it, so all the servers sharing a
+database must use the same driver.
+"""
+
+import netaddr
+from oslo.config import cfg
+import sqlalchemy as sa
+from sqlalchemy import orm
+from sqlalchemy.orm import exc
+
+from quantum.common import exceptions as q_exc
+from quantum.db import model_base
+from quantum.db import models_v2
+from quantum.openstack.common import importutils
+from quantum.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+RANGE_IPAM_DRIVER = 'quantum.db.ipam_db.RangeIpamDriver'
+INTEGER_IPAM_DRIVER = 'quantum.db.ipam_db.IntegerRangeIpamDriver'
+
+# Width of the hexadecimal keys used by IPAvailabilityIntRange. 32 digits
+# hold any IPv6 address.
+IP_KEY_WIDTH = 32
+
+_drivers = {}
+
+
+def get_ipam_driver(context):
+    """Return the IPAM driver selected by the 'ipam_driver' option.
+
+    The driver is activated within the transaction of context the first
+    time it is used.
+    """
+    driver_class = cfg.CONF.ipam_driver
+    if driver_class not in _drivers:
+        LOG.debug(_("Loading IPAM driver %s"), driver_class)
+        _drivers[driver_class] = importutils.import_object(driver_class)
+    driver = _drivers[driver_class]
+    if not driver.active:
+        driver.activate(context, driver_class)
+    return driver
+
+
+def ip_to_key(ip_address):
+    """Return the fixed width, sortable key for an IP address."""
+    return '%0*x' % (IP_KEY_WIDTH, int(netaddr.IPAddress(ip_address)))
+
+
+def key_to_ip(key, ip_version):
+    """Return the IP address string for a key built by ip_to_key."""
+    return str(netaddr.IPAddress(int(key, 16), ip_version))
+
+
+class IPAvailabilityIntRange(model_base.BASEV2):
+    """Free address range of an allocation pool keyed by integer value.
+
+    first_ip and last_ip hold the integer value of the addresses as fixed
+    width hexadecimal strings, so that lexical order matches numerical
+    order for both IPv4 and IPv6. The subnet id is stored along with the
+    range so that every lookup is served by one of the two indexes below
+    instead of a scan over all the ranges of the subnet.
+    """
+    allocation_pool_id = sa.Column(sa.String(36),
+                                   sa.ForeignKey('ipallocationpools.id',
+                                                 ondelete="CASCADE"),
+                                   nullable=False,
+                                   primary_key=True)
+    subnet_id = sa.Column(sa.String(36),
+                          sa.ForeignKey('subnets.id', ondelete="CASCADE"),
+                          nullable=False)
+    first_ip = sa.Column(sa.String(IP_KEY_WIDTH), nullable=False,
+                         primary_key=True)
+    last_ip = sa.Column(sa.String(IP_KEY_WIDTH), nullable=False)
+    ipallocationpool = orm.relationship(
+        models_v2.IPAllocationPool,
+        backref=orm.backref('available_int_ranges',
+                            lazy='dynamic',
+                            cascade='delete'))
+    __table_args__ = (sa.Index('ix_ipavailabilityintranges_subnet_first',
+                               'subnet_id', 'first_ip'),
+                      sa.Index('ix_ipavailabilityintranges_subnet_last',
+                               'subnet_id', 'last_ip'),
+                      model_base.BASEV2.__table_args__)
+
+    def __repr__(self):
+        return "%s - %s" % (self.first_ip, self.last_ip)
+
+
+class IPAMActiveDriver(model_base.BASEV2):
+    """The IPAM driver whose table holds the free addresses."""
+    driver = sa.Column(sa.String(255), primary_key=True)
+
+
+class IpamDriverBase(object):
+    """Interface of the IP address management drivers.
+
+    All the methods are invoked within the transaction of the plugin
+    operation that needs the address.
+    """
+
+    active = False
+
+    def activate(self, context, driver_class):
+        """Rebuild the free addresses if another driver was used last."""
+        with context.session.begin(subtransactions=True):
+            recorded = context.session.query(
+                IPAMActiveDriver).with_lockmode('update').first()
+            if not recorded or recorded['driver'] != driver_class:
+                LOG.info(_("IPAM driver changed to %s, rebuilding the free "
+                           "addresses"), driver_class)
+                self._rebuild(context)
+                if recorded:
+                    context.session.delete(recorded)
+                context.session.add(IPAMActiveDriver(driver=driver_class))
+        self.active = True
+
+    def _rebuild(self, context):
+        """Replace the free ranges by the pools minus the allocations."""
+        self._delete_ranges(context)
+        allocated = {}
+        for alloc in context.session.query(models_v2.IPAllocation):
+            allocated.setdefault(alloc['subnet_id'], netaddr.IPSet()).add(
+                alloc['ip_address'])
+        for pool in context.session.query(models_v2.IPAllocationPool):
+            free = netaddr.IPSet(netaddr.IPRange(pool['first_ip'],
+                                                 pool['last_ip']))
+            free -= allocated.get(pool['subnet_id'], netaddr.IPSet())
+            for ip_range in free.iter_ipranges():
+                self._add_range(context, pool, ip_range[0], ip_range[-1])
+
+    def _delete_ranges(self, context):
+        raise NotImplementedError()
+
+    def _add_range(self, context, ip_pool, first_ip, last_ip):
+        raise NotImplementedError()
+
+    def add_pool(self, context, subnet, ip_pool):
+        """Make all the addresses of a new allocation pool available."""
+        raise NotImplementedError()
+
+    def generate_ip(self, context, subnets):
+        """Allocate the next free address from one of the subnets.
+
+        :returns: a dict with 'ip_address' and 'subnet_id' keys
+        :raises: IpAddressGenerationFailure
+        """
+        raise NotImplementedError()
+
+    def generate_ips(self, context, subnets, count):
+        """Allocate count free addresses from the subnets.
+
+        The subnets are used in order, the next one being used once the
+        previous one is exhausted.
+
+        :returns: a list of dicts with 'ip_address' and 'subnet_id' keys
+        :raises: IpAddressGenerationFailure
+        """
+        return [self.generate_ip(context, subnets) for i in range(count)]
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        """Remove a specific address from the free addresses."""
+        raise NotImplementedError()
+
+    def release_ip(self, context, subnet_id, ip_address):
+        """Return an address to the free addresses of its pool.
+
+        :raises: InvalidInput if the address is not in any pool
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def _get_pool_id(context, subnet_id, ip_address):
+        pool_qry = context.session.query(
+            models_v2.IPAllocationPool).with_lockmode('update')
+        ip = int(netaddr.IPAddress(ip_address))
+        for pool in pool_qry.filter_by(subnet_id=subnet_id):
+            if (int(netaddr.IPAddress(pool['first_ip'])) <= ip <=
+                    int(netaddr.IPAddress(pool['last_ip']))):
+                return pool['id']
+        error_message = _("No allocation pool found for "
+                          "ip address:%s") % ip_address
+        raise q_exc.InvalidInput(error_message=error_message)
+
+    @staticmethod
+    def _next_free(ip_address):
+        # skip x.x.x.255 and x.x.x.0 once x.x.x.254 has been handed out
+        ip = netaddr.IPAddress(ip_address)
+        if ip.version == 4 and ip.words[3] == 254:
+            return ip + 3
+        return ip + 1
+
+
+class RangeIpamDriver(IpamDriverBase):
+    """Keep free addresses as first_ip/last_ip strings.
+
+    This is the original engine, backed by IPAvailabilityRange.
+    """
+
+    def _delete_ranges(self, context):
+        context.session.query(models_v2.IPAvailabilityRange).delete()
+
+    def _add_range(self, context, ip_pool, first_ip, last_ip):
+        context.session.add(models_v2.IPAvailabilityRange(
+            allocation_pool_id=ip_pool['id'],
+            first_ip=str(first_ip),
+            last_ip=str(last_ip)))
+
+    def add_pool(self, context, subnet, ip_pool):
+        ip_range = models_v2.IPAvailabilityRange(
+            ipallocationpool=ip_pool,
+            first_ip=ip_pool['first_ip'],
+            last_ip=ip_pool['last_ip'])
+        context.session.add(ip_range)
+
+    def generate_ip(self, context, subnets):
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        for subnet in subnets:
+            range = range_qry.filter_by(subnet_id=subnet['id']).first()
+            if not range:
+                LOG.debug(_("All IP's from subnet %(subnet_id)s (%(cidr)s) "
+                            "allocated"),
+                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+                continue
+            ip_address = range['first_ip']
+            LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
+                        "to %(last_ip)s"),
+                      {'ip_address': ip_address,
+                       'first_ip': range['first_ip'],
+                       'last_ip': range['last_ip']})
+            if range['first_ip'] == range['last_ip']:
+                # No more free indices on subnet => delete
+                LOG.debug(_("No more free IP's in slice. Deleting allocation "
+                            "pool."))
+                context.session.delete(range)
+            else:
+                # increment the first free
+                range['first_ip'] = str(self._next_free(ip_address))
+
+            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def generate_ips(self, context, subnets, count):
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        ips = []
+        for subnet in subnets:
+            for range in range_qry.filter_by(subnet_id=subnet['id']):
+                while len(ips) < count:
+                    ip_address = range['first_ip']
+                    ips.append({'ip_address': ip_address,
+                                'subnet_id': subnet['id']})
+                    next_free = self._next_free(ip_address)
+                    if next_free > netaddr.IPAddress(range['last_ip']):
+                        context.session.delete(range)
+                        break
+                    range['first_ip'] = str(next_free)
+                if len(ips) == count:
+                    return ips
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        ip = int(netaddr.IPAddress(ip_address))
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange,
+            models_v2.IPAllocationPool).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        results = range_qry.filter_by(subnet_id=subnet_id).all()
+        for (range, pool) in results:
+            first = int(netaddr.IPAddress(range['first_ip']))
+            last = int(netaddr.IPAddress(range['last_ip']))
+            if first <= ip <= last:
+                if first == last:
+                    context.session.delete(range)
+                    return
+                elif first == ip:
+                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
+                    return
+                elif last == ip:
+                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
+                    return
+                else:
+                    # Split into two ranges
+                    new_first = str(netaddr.IPAddress(ip_address) + 1)
+                    new_last = range['last_ip']
+                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
+                    ip_range = models_v2.IPAvailabilityRange(
+                        allocation_pool_id=pool['id'],
+                        first_ip=new_first,
+                        last_ip=new_last)
+                    context.session.add(ip_range)
+                    return
+
+    def release_ip(self, context, subnet_id, ip_address):
+        pool_id = self._get_pool_id(context, subnet_id, ip_address)
+        # Two requests will be done on the database. The first will be to
+        # search if an entry starts with ip_address + 1 (r1). The second
+        # will be to see if an entry ends with ip_address -1 (r2).
+        # If 1 of the above holds true then the specific entry will be
+        # modified. If both hold true then the two ranges will be merged.
+        # If there are no entries then a single entry will be added.
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).with_lockmode('update')
+        ip_first = str(netaddr.IPAddress(ip_address) + 1)
+        ip_last = str(netaddr.IPAddress(ip_address) - 1)
+        LOG.debug(_("Recycle %s"), ip_address)
+        try:
+            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
+                                     first_ip=ip_first).one()
+            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
+        except exc.NoResultFound:
+            r1 = []
+        try:
+            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
+                                     last_ip=ip_last).one()
+            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
+        except exc.NoResultFound:
+            r2 = []
+
+        if r1 and r2:
+            # Merge the two ranges
+            ip_range = models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool_id,
+                first_ip=r2['first_ip'],
+                last_ip=r1['last_ip'])
+            context.session.add(ip_range)
+            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
+                        "%(first_ip2)s-%(last_ip2)s"),
+                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
+                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
+            context.session.delete(r1)
+            context.session.delete(r2)
+        elif r1:
+            # Update the range with matched first IP
+            r1['first_ip'] = ip_address
+            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
+        elif r2:
+            # Update the range with matched last IP
+            r2['last_ip'] = ip_address
+            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
+        else:
+            # Create a new range
+            ip_range = models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool_id,
+                first_ip=ip_address,
+                last_ip=ip_address)
+            context.session.add(ip_range)
+            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': ip_address, 'last_ip': ip_address})
+
+
+class IntegerRangeIpamDriver(IpamDriverBase):
+    """Keep free addresses as integer keyed ranges.
+
+    Ranges live in IPAvailabilityIntRange. Every operation locks and
+    touches at most the two ranges adjacent to the address through an
+    index lookup, so its cost does not depend on how fragmented the free
+    space of the subnet is.
+    """
+
+    def _range_query(self, context, subnet_id):
+        return context.session.query(
+            IPAvailabilityIntRange).with_lockmode('update').filter_by(
+                subnet_id=subnet_id)
+
+    def _delete_ranges(self, context):
+        context.session.query(IPAvailabilityIntRange).delete()
+
+    def _add_range(self, context, ip_pool, first_ip, last_ip):
+        context.session.add(IPAvailabilityIntRange(
+            allocation_pool_id=ip_pool['id'],
+            subnet_id=ip_pool['subnet_id'],
+            first_ip=ip_to_key(first_ip),
+            last_ip=ip_to_key(last_ip)))
+
+    def add_pool(self, context, subnet, ip_pool):
+        ip_range = IPAvailabilityIntRange(
+            ipallocationpool=ip_pool,
+            subnet_id=subnet['id'],
+            first_ip=ip_to_key(ip_pool['first_ip']),
+            last_ip=ip_to_key(ip_pool['last_ip']))
+        context.session.add(ip_range)
+
+    def generate_ip(self, context, subnets):
+        for subnet in subnets:
+            range = self._range_query(context, subnet['id']).order_by(
+                IPAvailabilityIntRange.first_ip).first()
+            if not range:
+                LOG.debug(_("All IP's from subnet %(subnet_id)s (%(cidr)s) "
+                            "allocated"),
+                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+                continue
+            ip_address = key_to_ip(range['first_ip'], subnet['ip_version'])
+            next_free = ip_to_key(self._next_free(ip_address))
+            if next_free > range['last_ip']:
+                context.session.delete(range)
+            else:
+                range['first_ip'] = next_free
+            LOG.debug(_("Allocated IP - %(ip_address)s (%(subnet_id)s)"),
+                      {'ip_address': ip_address, 'subnet_id': subnet['id']})
+            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def generate_ips(self, context, subnets, count):
+        ips = []
+        for subnet in subnets:
+            ranges = self._range_query(context, subnet['id']).order_by(
+                IPAvailabilityIntRange.first_ip)
+            for range in ranges:
+                while len(ips) < count:
+                    ip_address = key_to_ip(range['first_ip'],
+                                           subnet['ip_version'])
+                    ips.append({'ip_address': ip_address,
+                                'subnet_id': subnet['id']})
+                    next_free = ip_to_key(self._next_free(ip_address))
+                    if next_free > range['last_ip']:
+                        context.session.delete(range)
+                        break
+                    range['first_ip'] = next_free
+                if len(ips) == count:
+                    return ips
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        ip = netaddr.IPAddress(ip_address)
+        key = ip_to_key(ip)
+        # The only range which may hold the address is the one with the
+        # greatest first_ip not above it
+        range = self._range_query(context, subnet_id).filter(
+            IPAvailabilityIntRange.first_ip <= key).order_by(
+                IPAvailabilityIntRange.first_ip.desc()).first()
+        if not range or range['last_ip'] < key:
+            return
+        first, last = range['first_ip'], range['last_ip']
+        if first == last:
+            context.session.delete(range)
+        elif first == key:
+            range['first_ip'] = ip_to_key(ip + 1)
+        elif last == key:
+            range['last_ip'] = ip_to_key(ip - 1)
+        else:
+            # Split into two ranges
+            range['last_ip'] = ip_to_key(ip - 1)
+            ip_range = IPAvailabilityIntRange(
+                allocation_pool_id=range['allocation_pool_id'],
+                subnet_id=subnet_id,
+                first_ip=ip_to_key(ip + 1),
+                last_ip=last)
+            context.session.add(ip_range)
+
+    def release_ip(self, context, subnet_id, ip_address):
+        pool_id = self._get_pool_id(context, subnet_id, ip_address)
+        ip = netaddr.IPAddress(ip_address)
+        key = ip_to_key(ip)
+        LOG.debug(_("Recycle %s"), ip_address)
+        range_qry = self._range_query(context, subnet_id).filter_by(
+            allocation_pool_id=pool_id)
+        # r1 starts right after the address, r2 ends right before it
+        r1 = range_qry.filter_by(first_ip=ip_to_key(ip + 1)).first()
+        r2 = range_qry.filter_by(last_ip=ip_to_key(ip - 1)).first()
+        if r1 and r2:
+            # Merge the two ranges into r2
+            r2['last_ip'] = r1['last_ip']
+            context.session.delete(r1)
+        elif r1:
+            r1['first_ip'] = key
+        elif r2:
+            r2['last_ip'] = key
+        else:
+            context.session.add(IPAvailabilityIntRange(
+                allocation_pool_id=pool_id,
+                subnet_id=subnet_id,
+                first_ip=key,
+                last_ip=key))
@@ -30,6 +30,7 @@ from quantum.common import exceptions as q_exc
 from quantum.db import db_base_plugin_v2
 from quantum.db import model_base
 from quantum.db import models_v2
+from quantum.db import sqlalchemyutils
 from quantum.extensions import l3
 from quantum.openstack.common import log as logging
 from quantum.openstack.common.notifier import api as notifier_api
@@ -805,10 +806,24 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         except exc.NoResultFound:
             return False
 
+    def _prefetch_network_dict_l3(self, context, network_ids):
+        query = context.session.query(ExternalNetwork)
+        return dict((ext_net.network_id, ext_net) for ext_net in
+                    sqlalchemyutils.query_in(query, ExternalNetwork.network_id,
+                                             network_ids))
+
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attributes.NETWORKS, ['_prefetch_network_dict_l3'])
+
     def _extend_network_dict_l3(self, context, network):
         if self._check_l3_view_auth(context, network):
-            network[l3.EXTERNAL] = self._network_is_external(
-                context, network['id'])
+            found, ext_net = self._get_prefetched(
+                context, '_prefetch_network_dict_l3', network['id'])
+            if found:
+                network[l3.EXTERNAL] = ext_net is not None
+            else:
+                network[l3.EXTERNAL] = self._network_is_external(
+                    context, network['id'])
 
     def _process_l3_create(self, context, net_data, net_id):
         external = net_data.get(l3.EXTERNAL)
@@ -0,0 +1,81 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Integer keyed IP availability ranges and active IPAM driver
+
+Revision ID: 3a520dd165d0
+Revises: 176a85fc7d79
+Create Date: 2013-04-02 10:12:31.402113
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3a520dd165d0'
+down_revision = '176a85fc7d79'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = ['*']
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import expression as sa_expr
+
+from quantum.db import migration
+
+
+def upgrade(active_plugin=None, options=None):
+    if not migration.should_run(active_plugin, migration_for_plugins):
+        return
+
+    op.create_table(
+        'ipavailabilityintranges',
+        sa.Column('allocation_pool_id', sa.String(length=36), nullable=False),
+        sa.Column('subnet_id', sa.String(length=36), nullable=False),
+        sa.Column('first_ip', sa.String(length=32), nullable=False),
+        sa.Column('last_ip', sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(['allocation_pool_id'],
+                                ['ipallocationpools.id'],
+                                ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['subnet_id'], ['subnets.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('allocation_pool_id', 'first_ip')
+    )
+    op.create_index('ix_ipavailabilityintranges_subnet_first',
+                    'ipavailabilityintranges', ['subnet_id', 'first_ip'])
+    op.create_index('ix_ipavailabilityintranges_subnet_last',
+                    'ipavailabilityintranges', ['subnet_id', 'last_ip'])
+
+    op.create_table(
+        'ipamactivedrivers',
+        sa.Column('driver', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('driver')
+    )
+    # The free addresses are in the table of the original driver, the one
+    # of another driver is built when it is first used
+    active_drivers = sa_expr.table('ipamactivedrivers',
+                                   sa_expr.column('driver'))
+    op.bulk_insert(active_drivers,
+                   [{'driver': 'quantum.db.ipam_db.RangeIpamDriver'}])
+
+
+def downgrade(active_plugin=None, options=None):
+    if not migration.should_run(active_plugin, migration_for_plugins):
+        return
+
+    op.drop_table('ipamactivedrivers')
+    op.drop_table('ipavailabilityintranges')
@@ -27,6 +27,7 @@ from quantum.db import db_base_plugin_v2
 from quantum.db import l3_db
 from quantum.db import model_base
 from quantum.db import models_v2
+from quantum.db import sqlalchemyutils
 from quantum.extensions import l3
 from quantum.extensions import multihost
 from quantum import manager
@@ -150,10 +151,24 @@ class Multihost_db_mixin(object):
         except exc.NoResultFound:
             return ''
 
+    def _prefetch_network_dict_multihost(self, context, network_ids):
+        query = context.session.query(MultiHostNetwork)
+        return dict((net.network_id, net) for net in
+                    sqlalchemyutils.query_in(
+                        query, MultiHostNetwork.network_id, network_ids))
+
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attributes.NETWORKS, ['_prefetch_network_dict_multihost'])
+
     def _extend_network_dict_multihost(self, context, network):
         if self._check_mutihost_net_view_auth(context, network):
-            network[multihost.MULTIHOST] = self.is_multihost_network(
-                context, network['id'])
+            found, net = self._get_prefetched(
+                context, '_prefetch_network_dict_multihost', network['id'])
+            if found:
+                network[multihost.MULTIHOST] = net is not None
+            else:
+                network[multihost.MULTIHOST] = self.is_multihost_network(
+                    context, network['id'])
 
     def _process_multihost_net_create(self, context, net_data, net_id):
         multihost_flat = net_data.get(multihost.MULTIHOST)
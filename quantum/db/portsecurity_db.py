@@ -19,7 +19,10 @@
 import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
+from quantum.api.v2 import attributes
+from quantum.db import db_base_plugin_v2
 from quantum.db import model_base
+from quantum.db import sqlalchemyutils
 from quantum.extensions import portsecurity as psec
 from quantum.openstack.common import log as logging
 
@@ -51,13 +54,45 @@ class PortSecurityDbMixin(object):
             context.session.add(db)
         return self._make_network_port_security_dict(db)
 
+    def _prefetch_network_port_security(self, context, network_ids):
+        query = self._model_query(context, NetworkSecurityBinding)
+        return dict((binding.network_id, binding) for binding in
+                    sqlalchemyutils.query_in(
+                        query, NetworkSecurityBinding.network_id,
+                        network_ids))
+
+    def _prefetch_port_port_security(self, context, port_ids):
+        query = self._model_query(context, PortSecurityBinding)
+        return dict((binding.port_id, binding) for binding in
+                    sqlalchemyutils.query_in(
+                        query, PortSecurityBinding.port_id, port_ids))
+
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attributes.NETWORKS, ['_prefetch_network_port_security'])
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attributes.PORTS, ['_prefetch_port_port_security'])
+
     def _extend_network_port_security_dict(self, context, network):
-        network[psec.PORTSECURITY] = self._get_network_security_binding(
-            context, network['id'])
+        found, binding = self._get_prefetched(
+            context, '_prefetch_network_port_security', network['id'])
+        if not found:
+            network[psec.PORTSECURITY] = self._get_network_security_binding(
+                context, network['id'])
+        elif binding is not None:
+            network[psec.PORTSECURITY] = binding[psec.PORTSECURITY]
+        else:
+            raise psec.PortSecurityBindingNotFound()
 
     def _extend_port_port_security_dict(self, context, port):
-        port[psec.PORTSECURITY] = self._get_port_security_binding(
-            context, port['id'])
+        found, binding = self._get_prefetched(
+            context, '_prefetch_port_port_security', port['id'])
+        if not found:
+            port[psec.PORTSECURITY] = self._get_port_security_binding(
+                context, port['id'])
+        elif binding is not None:
+            port[psec.PORTSECURITY] = binding[psec.PORTSECURITY]
+        else:
+            raise psec.PortSecurityBindingNotFound()
 
     def _get_network_security_binding(self, context, network_id):
         try:
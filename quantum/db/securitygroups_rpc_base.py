@@ -16,11 +16,13 @@
 #    under the License.
 
 import netaddr
+import sqlalchemy as sa
 
 from quantum.common import constants as q_const
 from quantum.common import utils
 from quantum.db import models_v2
 from quantum.db import securitygroups_db as sg_db
+from quantum.db import sqlalchemyutils
 from quantum.extensions import securitygroup as ext_sg
 from quantum.openstack.common import log as logging
 
@@ -35,6 +37,70 @@ DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
                        'egress': 'dest_ip_prefix'}
 
 
+def get_ports_from_port_ids(session, port_ids, match_prefix=False):
+    """Get the ports of port_ids with their security groups and fixed ips
+
+    The ports are loaded with their security group bindings in a single
+    query, and their fixed ips in another one, whatever the number of ports.
+
+    :param match_prefix: if True, port_ids are prefixes of the port ids
+    :returns: dict of port dicts, keyed by the entry of port_ids they match
+    """
+    port_ids = list(port_ids)
+    if not port_ids:
+        return {}
+    query = session.query(models_v2.Port)
+    if match_prefix:
+        prefix_lens = set(len(port_id) for port_id in port_ids)
+        ports = []
+        for start in xrange(0, len(port_ids),
+                            sqlalchemyutils.IN_CLAUSE_MAX_VALUES):
+            chunk = port_ids[start:start +
+                             sqlalchemyutils.IN_CLAUSE_MAX_VALUES]
+            ports.extend(query.filter(sa.or_(
+                *[models_v2.Port.id.startswith(port_id)
+                  for port_id in chunk])))
+    else:
+        ports = list(sqlalchemyutils.query_in(query, models_v2.Port.id,
+                                              port_ids))
+    if not ports:
+        return {}
+
+    ips_by_port = {}
+    ip_query = session.query(models_v2.IPAllocation.port_id,
+                             models_v2.IPAllocation.ip_address)
+    for port_id, ip_address in sqlalchemyutils.query_in(
+            ip_query, models_v2.IPAllocation.port_id,
+            [port.id for port in ports]):
+        ips_by_port.setdefault(port_id, []).append(ip_address)
+
+    port_dicts = {}
+    requested = set(port_ids)
+    for port in ports:
+        port_dict = {'id': port.id,
+                     'name': port.name,
+                     'network_id': port.network_id,
+                     'tenant_id': port.tenant_id,
+                     'mac_address': port.mac_address,
+                     'admin_state_up': port.admin_state_up,
+                     'status': port.status,
+                     'device_id': port.device_id,
+                     'device_owner': port.device_owner,
+                     ext_sg.SECURITYGROUPS: [
+                         binding.security_group_id
+                         for binding in port.security_groups],
+                     'security_group_rules': [],
+                     'security_group_source_groups': [],
+                     'fixed_ips': ips_by_port.get(port.id, [])}
+        if not match_prefix:
+            port_dicts[port.id] = port_dict
+            continue
+        for prefix_len in prefix_lens:
+            if port.id[:prefix_len] in requested:
+                port_dicts[port.id[:prefix_len]] = port_dict
+    return port_dicts
+
+
 class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
 
     def create_security_group_rule(self, context, security_group_rule):
@@ -137,16 +203,66 @@ class SecurityGroupServerRpcCallbackMixin(object):
         :returns: port correspond to the devices with security group rules
         """
         devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        return self._security_group_rules_for_ports(context, ports)
+
+    def security_group_info_for_devices(self, context, **kwargs):
+        """ return security group rules and members for each port
+
+        unlike security_group_rules_for_devices, remote_group_id rules
+        are not converted to one rule per member ip. The member ips of
+        the remote groups are returned separately, so that the agent
+        can keep each group in one ipset.
+
+        :params devices: list of devices
+        :returns: dict with the ports correspond to the devices with
+                  security group rules under 'devices', and the member ips
+                  of each remote group by ethertype under 'sg_member_ips'
+        """
+        devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        self._add_security_group_rules_to_ports(context, ports)
+        remote_group_ids = self._select_remote_group_ids(ports)
+        ips = self._select_ips_for_remote_group(context, remote_group_ids)
+        sg_member_ips = {}
+        for remote_group_id, member_ips in ips.items():
+            sg_member_ips[remote_group_id] = {q_const.IPv4: [],
+                                              q_const.IPv6: []}
+            for ip in member_ips:
+                ethertype = 'IPv%s' % netaddr.IPAddress(ip).version
+                sg_member_ips[remote_group_id][ethertype].append(ip)
+        for port in ports.values():
+            for rule in port['security_group_rules']:
+                remote_group_id = rule.get('remote_group_id')
+                if remote_group_id:
+                    port['security_group_source_groups'].append(
+                        remote_group_id)
+        return {'devices': ports, 'sg_member_ips': sg_member_ips}
+
+    def get_ports_from_devices(self, devices):
+        """ return the ports of devices, with their security groups
+
+        plugins should override this to fetch the ports of all the devices
+        at once. By default get_port_from_device is called for each device.
 
+        :params devices: list of devices
+        :returns: dict of port dicts, keyed by device. devices which
+                  have no port are not in the dict
+        """
         ports = {}
         for device in devices:
             port = self.get_port_from_device(device)
-            if not port:
-                continue
+            if port:
+                ports[device] = port
+        return ports
+
+    def _get_ports_for_devices(self, devices):
+        ports = {}
+        for port in self.get_ports_from_devices(devices).values():
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
+        return ports
 
     def _select_rules_for_ports(self, context, ports):
         if not ports:
@@ -281,6 +397,10 @@ class SecurityGroupServerRpcCallbackMixin(object):
             self._add_ingress_dhcp_rule(port, ips)
 
     def _security_group_rules_for_ports(self, context, ports):
+        self._add_security_group_rules_to_ports(context, ports)
+        return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+    def _add_security_group_rules_to_ports(self, context, ports):
         rules_in_db = self._select_rules_for_ports(context, ports)
         for (binding, rule_in_db) in rules_in_db:
             port_id = binding['port_id']
@@ -301,4 +421,3 @@ class SecurityGroupServerRpcCallbackMixin(object):
                     rule_dict[key] = rule_in_db[key]
             port['security_group_rules'].append(rule_dict)
         self._apply_provider_rule(context, ports)
-        return self._convert_remote_group_id_to_ip_prefix(context, ports)
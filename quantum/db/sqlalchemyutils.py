@@ -24,6 +24,36 @@ from quantum.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# Maximum number of values bound in a single IN clause. sqlite does not
+# accept more than 999 variables in a statement.
+IN_CLAUSE_MAX_VALUES = 500
+
+
+def query_in(query, column, values):
+    """Yields the rows of query for which column is in values.
+
+    Values are split in chunks, so that a large set of values does not exceed
+    the number of parameters the database backend accepts in a statement.
+    """
+    values = list(values)
+    for start in xrange(0, len(values), IN_CLAUSE_MAX_VALUES):
+        chunk = values[start:start + IN_CLAUSE_MAX_VALUES]
+        for row in query.filter(column.in_(chunk)):
+            yield row
+
+
+def update_in(query, column, values, updates):
+    """Updates with one statement per chunk the rows whose column is in values.
+
+    :param updates: dict mapping the names of the columns to update to their
+                    new values
+    """
+    values = list(values)
+    for start in xrange(0, len(values), IN_CLAUSE_MAX_VALUES):
+        chunk = values[start:start + IN_CLAUSE_MAX_VALUES]
+        query.filter(column.in_(chunk)).update(updates,
+                                               synchronize_session=False)
+
 
 def paginate_query(query, model, limit, sorts, marker_obj=None):
     """Returns a query with sorting / pagination criteria added.
@@ -0,0 +1,79 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2013 Big Switch Networks, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Journal of the topology changes sent to the network controllers.
+
+Every change of a network, port, router or router interface adds a row,
+whose id is the version of the topology once the change is made. A server
+which was not used for a while only needs the resources changed since the
+version it was last synchronized at. Only the last rows are kept; a server
+which missed more changes than that gets the whole topology again.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import func
+
+from quantum.db import model_base
+
+NETWORK = 'network'
+PORT = 'port'
+ROUTER = 'router'
+ROUTER_INTERFACE = 'router_interface'
+
+
+class TopologyChange(model_base.BASEV2):
+    """Represents a change of a resource sent to the network controllers."""
+    __tablename__ = 'bsn_topology_changes'
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    resource = sa.Column(sa.String(16), nullable=False)
+    resource_id = sa.Column(sa.String(36), nullable=False)
+    tenant_id = sa.Column(sa.String(255))
+    # The network of a port, or the one a router interface is on
+    network_id = sa.Column(sa.String(36))
+
+
+def add_topology_change(session, resource, resource_id, tenant_id,
+                        network_id=None, journal_size=None):
+    """Records a change and returns the new version of the topology."""
+    with session.begin(subtransactions=True):
+        change = TopologyChange(resource=resource, resource_id=resource_id,
+                                tenant_id=tenant_id, network_id=network_id)
+        session.add(change)
+        session.flush()
+        if journal_size:
+            session.query(TopologyChange).filter(
+                TopologyChange.id <= change.id - journal_size).delete(
+                    synchronize_session=False)
+    return change.id
+
+
+def get_topology_version(session):
+    return session.query(func.max(TopologyChange.id)).scalar() or 0
+
+
+def get_topology_changes(session, since):
+    """Returns the changes made after version since, the oldest first.
+
+    Returns None if some of them were already dropped from the journal.
+    """
+    first = session.query(func.min(TopologyChange.id)).scalar()
+    if first is None:
+        return [] if not since else None
+    if first > since + 1:
+        return None
+    query = session.query(TopologyChange).filter(TopologyChange.id > since)
+    return query.order_by(TopologyChange.id).all()
@@ -45,16 +45,21 @@ on port-attach) on an additional PUT to do a bulk dump of all persistent data.
 """
 
 import base64
+import collections
 import copy
 import httplib
 import json
 import socket
+import time
 
 from oslo.config import cfg
+from sqlalchemy import orm
 
 from quantum.api.rpc.agentnotifiers import dhcp_rpc_agent_api
+from quantum.api.v2 import attributes
 from quantum.common import constants as const
 from quantum.common import exceptions
+from quantum.common import http_pool
 from quantum.common import rpc as q_rpc
 from quantum.common import topics
 from quantum.common import utils
@@ -63,11 +68,13 @@ from quantum.db import api as db
 from quantum.db import db_base_plugin_v2
 from quantum.db import dhcp_rpc_base
 from quantum.db import l3_db
+from quantum.db import models_v2
+from quantum.db import sqlalchemyutils
 from quantum.extensions import l3
 from quantum.extensions import portbindings
-from quantum.openstack.common import lockutils
 from quantum.openstack.common import log as logging
 from quantum.openstack.common import rpc
+from quantum.plugins.bigswitch import db as bsn_db
 from quantum.plugins.bigswitch.version import version_string_with_vcs
 from quantum import policy
 
@@ -85,9 +92,16 @@ restproxy_opts = [
                 help=_("Use SSL to connect")),
     cfg.BoolOpt('sync_data', default=False,
                 help=_("Sync data on connect")),
+    cfg.IntOpt('sync_journal_size', default=10000,
+               help=_("Number of topology changes remembered to send a "
+                      "server only the changes it missed, instead of the "
+                      "whole topology")),
     cfg.IntOpt('server_timeout', default=10,
                help=_("Maximum number of seconds to wait for proxy request "
                       "to connect and complete.")),
+    cfg.IntOpt('server_max_connections', default=4,
+               help=_("Maximum number of keep-alive connections open to "
+                      "each server")),
     cfg.StrOpt('quantum_id', default='Quantum-' + utils.get_hostname(),
                help=_("User defined identifier for this Quantum deployment")),
     cfg.BoolOpt('add_meta_server_route', default=True,
@@ -116,6 +130,8 @@ SYNTAX_ERROR_MESSAGE = 'Syntax error in server config file, aborting plugin'
 BASE_URI = '/networkService/v1.1'
 ORCHESTRATION_SERVICE_ID = 'Quantum v2.0'
 METADATA_SERVER_IP = '169.254.169.254'
+# Weight of the last call in the average latency of a server
+LATENCY_WEIGHT = 0.2
 
 
 class RemoteRestError(exceptions.QuantumException):
@@ -131,7 +147,7 @@ class ServerProxy(object):
     """REST server proxy to a network controller."""
 
     def __init__(self, server, port, ssl, auth, quantum_id, timeout,
-                 base_uri, name):
+                 base_uri, name, max_connections=1):
         self.server = server
         self.port = port
         self.ssl = ssl
@@ -143,8 +159,23 @@ class ServerProxy(object):
         self.quantum_id = quantum_id
         if auth:
             self.auth = 'Basic ' + base64.encodestring(auth).strip()
+        self.connections = http_pool.ConnectionPool(server, port, ssl,
+                                                    max_connections,
+                                                    timeout=timeout)
+        # Average duration of the calls answered by the server, and if the
+        # last call failed, set by the ServerPool
+        self.latency = None
+        self.failed = False
+        # Version of the topology the server was last synchronized at
+        self.topology_version = None
+
+    def _record_latency(self, duration):
+        if self.latency is None:
+            self.latency = duration
+        else:
+            self.latency = (LATENCY_WEIGHT * duration +
+                            (1 - LATENCY_WEIGHT) * self.latency)
 
-    @lockutils.synchronized('rest_call', 'bsn-', external=True)
     def rest_call(self, action, resource, data, headers):
         uri = self.base_uri + resource
         body = json.dumps(data)
@@ -165,26 +196,10 @@ class ServerProxy(object):
         LOG.debug(_("ServerProxy: resource=%(resource)s, data=%(data)r, "
                     "headers=%(headers)r"), locals())
 
-        conn = None
-        if self.ssl:
-            conn = httplib.HTTPSConnection(
-                self.server, self.port, timeout=self.timeout)
-            if conn is None:
-                LOG.error(_('ServerProxy: Could not establish HTTPS '
-                            'connection'))
-                return 0, None, None, None
-        else:
-            conn = httplib.HTTPConnection(
-                self.server, self.port, timeout=self.timeout)
-            if conn is None:
-                LOG.error(_('ServerProxy: Could not establish HTTP '
-                            'connection'))
-                return 0, None, None, None
-
+        started = time.time()
         try:
-            conn.request(action, uri, body, headers)
-            response = conn.getresponse()
-            respstr = response.read()
+            response, respstr = self.connections.request(action, uri, body,
+                                                         headers)
             respdata = respstr
             if response.status in self.success_codes:
                 try:
@@ -193,34 +208,41 @@ class ServerProxy(object):
                     # response was not JSON, ignore the exception
                     pass
             ret = (response.status, response.reason, respstr, respdata)
-        except (socket.timeout, socket.error) as e:
+            self._record_latency(time.time() - started)
+        except (socket.timeout, socket.error, httplib.HTTPException) as e:
             LOG.error(_('ServerProxy: %(action)s failure, %(e)r'), locals())
             ret = 0, None, None, None
-        conn.close()
         LOG.debug(_("ServerProxy: status=%(status)d, reason=%(reason)r, "
-                    "ret=%(ret)s, data=%(data)r"), {'status': ret[0],
-                                                    'reason': ret[1],
-                                                    'ret': ret[2],
-                                                    'data': ret[3]})
+                    "ret=%(ret)s, data=%(data)r, latency=%(latency)s"),
+                  {'status': ret[0], 'reason': ret[1], 'ret': ret[2],
+                   'data': ret[3], 'latency': self.latency})
         return ret
 
 
 class ServerPool(object):
     def __init__(self, servers, ssl, auth, quantum_id, timeout=10,
-                 base_uri='/quantum/v1.0', name='QuantumRestProxy'):
+                 base_uri='/quantum/v1.0', name='QuantumRestProxy',
+                 max_connections=1):
         self.base_uri = base_uri
         self.timeout = timeout
         self.name = name
         self.auth = auth
         self.ssl = ssl
         self.quantum_id = quantum_id
+        self.max_connections = max_connections
         self.servers = []
         for server_port in servers:
             self.servers.append(self.server_proxy_for(*server_port))
+        # Called with a server before it is used instead of the previous
+        # one, to send it the topology. Returns False if the server did not
+        # accept it.
+        self.sync_server = None
+        self.active_server = None
 
     def server_proxy_for(self, server, port):
         return ServerProxy(server, port, self.ssl, self.auth, self.quantum_id,
-                           self.timeout, self.base_uri, self.name)
+                           self.timeout, self.base_uri, self.name,
+                           self.max_connections)
 
     def server_failure(self, resp):
         """Define failure codes as required.
@@ -235,29 +257,56 @@ class ServerPool(object):
         """
         return resp[0] in SUCCESS_CODES
 
+    def _sorted_servers(self):
+        # The servers which did not fail last time are tried first, the
+        # fastest first. A server which was not used yet is tried early.
+        # When the servers are synchronized, the active server is kept as
+        # long as it does not fail.
+        def key(server):
+            switch = (self.sync_server is not None and
+                      server is not self.active_server)
+            return (server.failed, switch, server.latency or 0)
+        return sorted(self.servers, key=key)
+
+    def _activate(self, server):
+        if server is self.active_server:
+            return True
+        if self.sync_server is not None and not self.sync_server(server):
+            return False
+        self.active_server = server
+        return True
+
+    def sync(self):
+        """Sends the topology to the first server which accepts it."""
+        for server in self._sorted_servers():
+            server.failed = not self._activate(server)
+            if not server.failed:
+                return True
+        LOG.error(_('ServerProxy: unable to synchronize any server'))
+        return False
+
     def rest_call(self, action, resource, data, headers):
-        failed_servers = []
-        while self.servers:
-            active_server = self.servers[0]
-            ret = active_server.rest_call(action, resource, data, headers)
-            if not self.server_failure(ret):
-                self.servers.extend(failed_servers)
-                return ret
+        servers = self._sorted_servers()
+        for active_server in servers:
+            if self._activate(active_server):
+                ret = active_server.rest_call(action, resource, data,
+                                              headers)
+                active_server.failed = self.server_failure(ret)
             else:
-                LOG.error(_('ServerProxy: %(action)s failure for servers: '
-                            '%(server)r'),
-                          {'action': action,
-                           'server': (active_server.server,
-                                      active_server.port)})
-                failed_servers.append(self.servers.pop(0))
-
-        # All servers failed, reset server list and try again next time
+                active_server.failed = True
+            if not active_server.failed:
+                return ret
+            LOG.error(_('ServerProxy: %(action)s failure for servers: '
+                        '%(server)r'),
+                      {'action': action,
+                       'server': (active_server.server,
+                                  active_server.port)})
+
         LOG.error(_('ServerProxy: %(action)s failure for all servers: '
                     '%(server)r'),
                   {'action': action,
                    'server': tuple((s.server,
-                                    s.port) for s in failed_servers)})
-        self.servers.extend(failed_servers)
+                                    s.port) for s in servers)})
         return (0, None, None, None)
 
     def get(self, resource, data='', headers=None):
@@ -297,13 +346,14 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         db.configure_db()
 
         # 'servers' is the list of network controller REST end-points
-        # (used in order specified till one suceeds, and it is sticky
-        # till next failure). Use 'server_auth' to encode api-key
+        # (the ones which answered the last call are used first, the
+        # fastest first). Use 'server_auth' to encode api-key
         servers = cfg.CONF.RESTPROXY.servers
         server_auth = cfg.CONF.RESTPROXY.server_auth
         server_ssl = cfg.CONF.RESTPROXY.server_ssl
         sync_data = cfg.CONF.RESTPROXY.sync_data
         timeout = cfg.CONF.RESTPROXY.server_timeout
+        max_connections = cfg.CONF.RESTPROXY.server_max_connections
         quantum_id = cfg.CONF.RESTPROXY.quantum_id
         self.add_meta_server_route = cfg.CONF.RESTPROXY.add_meta_server_route
 
@@ -315,7 +365,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
 
         # init network ctrl connections
         self.servers = ServerPool(servers, server_ssl, server_auth, quantum_id,
-                                  timeout, BASE_URI)
+                                  timeout, BASE_URI,
+                                  max_connections=max_connections)
 
         # init dhcp support
         self.topic = topics.PLUGIN
@@ -326,8 +377,10 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                   fanout=False)
         # Consume from all consumers in a thread
         self.conn.consume_in_thread()
+        self.sync_data = sync_data
         if sync_data:
-            self._send_all_data()
+            self.servers.sync_server = self._sync_server
+            self.servers.sync()
 
         self._dhcp_agent_notifier = dhcp_rpc_agent_api.DhcpAgentNotifyAPI()
         LOG.debug(_("QuantumRestProxyV2: initialization done"))
@@ -368,6 +421,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                                      network)
             self._process_l3_create(context, network['network'], new_net['id'])
             self._extend_network_dict_l3(context, new_net)
+            self._record_change(context, bsn_db.NETWORK, new_net['id'],
+                                tenant_id)
 
         # create network on the network controller
         try:
@@ -425,6 +480,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                                                      network)
             self._process_l3_update(context, network['network'], net_id)
             self._extend_network_dict_l3(context, new_net)
+            self._record_change(context, bsn_db.NETWORK, net_id,
+                                new_net['tenant_id'])
 
         # update network on network controller
         try:
@@ -467,6 +524,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
 
         if not only_auto_del:
             raise exceptions.NetworkInUse(net_id=net_id)
+        self._record_change(context, bsn_db.NETWORK, net_id, tenant_id)
 
         # delete from network ctrl. Remote error on delete is ignored
         try:
@@ -498,8 +556,10 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             nets = super(QuantumRestProxyV2,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_l3(context, net)
+            with self._dict_extension_prefetch(context, attributes.NETWORKS,
+                                               nets):
+                for net in nets:
+                    self._extend_network_dict_l3(context, net)
 
         return [self._fields(net, fields) for net in nets]
 
@@ -541,6 +601,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             if new_port['device_owner'] == 'network:dhcp':
                 destination = METADATA_SERVER_IP + '/32'
                 self._add_host_route(context, destination, new_port)
+        self._record_change(context, bsn_db.PORT, new_port['id'],
+                            net['tenant_id'], net['id'])
 
         # create on networl ctrl
         try:
@@ -624,6 +686,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         # Update DB
         new_port = super(QuantumRestProxyV2, self).update_port(context,
                                                                port_id, port)
+        self._record_change(context, bsn_db.PORT, port_id,
+                            orig_port['tenant_id'], orig_port['network_id'])
 
         # update on networl ctrl
         try:
@@ -681,6 +745,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
     def _delete_port(self, context, port_id):
         # Delete from DB
         port = super(QuantumRestProxyV2, self).get_port(context, port_id)
+        self._record_change(context, bsn_db.PORT, port_id, port['tenant_id'],
+                            port['network_id'])
 
         # delete from network ctrl. Remote error on delete is ignored
         try:
@@ -765,6 +831,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         net_id = new_subnet['network_id']
         orig_net = super(QuantumRestProxyV2, self).get_network(context,
                                                                net_id)
+        self._record_change(context, bsn_db.NETWORK, net_id,
+                            orig_net['tenant_id'])
         # update network on network controller
         try:
             self._send_update_network(orig_net)
@@ -788,6 +856,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         net_id = new_subnet['network_id']
         orig_net = super(QuantumRestProxyV2, self).get_network(context,
                                                                net_id)
+        self._record_change(context, bsn_db.NETWORK, net_id,
+                            orig_net['tenant_id'])
         # update network on network controller
         try:
             self._send_update_network(orig_net)
@@ -806,6 +876,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         super(QuantumRestProxyV2, self).delete_subnet(context, id)
         orig_net = super(QuantumRestProxyV2, self).get_network(context,
                                                                net_id)
+        self._record_change(context, bsn_db.NETWORK, net_id,
+                            orig_net['tenant_id'])
         # update network on network controller
         try:
             self._send_update_network(orig_net)
@@ -823,6 +895,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         # create router in DB
         new_router = super(QuantumRestProxyV2, self).create_router(context,
                                                                    router)
+        self._record_change(context, bsn_db.ROUTER, new_router['id'],
+                            tenant_id)
 
         # create router on the network controller
         try:
@@ -856,6 +930,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         new_router = super(QuantumRestProxyV2, self).update_router(context,
                                                                    router_id,
                                                                    router)
+        self._record_change(context, bsn_db.ROUTER, router_id, tenant_id)
 
         # update router on network controller
         try:
@@ -900,6 +975,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                                          filters=device_filter)
             if ports:
                 raise l3.RouterInUse(router_id=router_id)
+        self._record_change(context, bsn_db.ROUTER, router_id, tenant_id)
 
         # delete from network ctrl. Remote error on delete is ignored
         try:
@@ -933,6 +1009,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         subnet_id = new_interface_info['subnet_id']
         # we will use the port's network id as interface's id
         interface_id = net_id
+        self._record_change(context, bsn_db.ROUTER_INTERFACE, router_id,
+                            tenant_id, interface_id)
         intf_details = self._get_router_intf_details(context,
                                                      interface_id,
                                                      subnet_id)
@@ -981,6 +1059,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                               self).remove_router_interface(context,
                                                             router_id,
                                                             interface_info)
+        self._record_change(context, bsn_db.ROUTER_INTERFACE, router_id,
+                            tenant_id, interface_id)
 
         # create router on the network controller
         try:
@@ -1006,6 +1086,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         net_id = new_fl_ip['floating_network_id']
         orig_net = super(QuantumRestProxyV2, self).get_network(context,
                                                                net_id)
+        self._record_change(context, bsn_db.NETWORK, net_id,
+                            orig_net['tenant_id'])
         # create floatingip on the network controller
         try:
             self._send_update_network(orig_net)
@@ -1032,6 +1114,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         net_id = new_fl_ip['floating_network_id']
         orig_net = super(QuantumRestProxyV2, self).get_network(context,
                                                                net_id)
+        self._record_change(context, bsn_db.NETWORK, net_id,
+                            orig_net['tenant_id'])
         # update network on network controller
         try:
             self._send_update_network(orig_net)
@@ -1053,6 +1137,8 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
 
         orig_net = super(QuantumRestProxyV2, self).get_network(context,
                                                                net_id)
+        self._record_change(context, bsn_db.NETWORK, net_id,
+                            orig_net['tenant_id'])
         # update network on network controller
         try:
             self._send_update_network(orig_net)
@@ -1060,58 +1146,212 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
             # TODO(Sumit): rollback deletion of floating IP
             raise
 
-    def _send_all_data(self):
+    def _record_change(self, context, resource, resource_id, tenant_id,
+                       network_id=None):
+        if self.sync_data:
+            bsn_db.add_topology_change(
+                context.session, resource, resource_id, tenant_id,
+                network_id, cfg.CONF.RESTPROXY.sync_journal_size)
+
+    def _sync_server(self, server):
+        """Sends a server the resources changed since its last sync.
+
+        The server gets the whole topology if it was never synchronized,
+        if it missed more changes than the journal keeps or if it refused
+        one of them. Changes are sent again to a server which already got
+        them since its last sync, which is harmless as the current state
+        of the resources is sent. Returns False if the server refused the
+        topology.
+        """
+        admin_context = qcontext.get_admin_context()
+        version = bsn_db.get_topology_version(admin_context.session)
+        changes = None
+        if server.topology_version is not None:
+            changes = bsn_db.get_topology_changes(admin_context.session,
+                                                  server.topology_version)
+        if changes is not None:
+            try:
+                self._send_topology_changes(admin_context, server, changes)
+                LOG.info(_("QuantumRestProxy: sent %(count)d topology "
+                           "changes to %(server)s"),
+                         {'count': len(changes), 'server': server.server})
+                server.topology_version = version
+                return True
+            except RemoteRestError as e:
+                LOG.warning(_("QuantumRestProxy: Unable to send the "
+                              "topology changes, sending the whole "
+                              "topology: %s"), e.message)
+        try:
+            self._send_all_data(server)
+        except RemoteRestError:
+            return False
+        server.topology_version = version
+        return True
+
+    def _sync_call(self, server, action, resource, data='', missing_ok=False):
+        ret = server.rest_call(action, resource, data, None)
+        if missing_ok and ret[0] == 404:
+            return ret
+        if not self.servers.action_success(ret):
+            raise RemoteRestError(ret[2])
+        return ret
+
+    def _sync_put(self, server, resource, collection, data):
+        # PUT the resource, or create it if the server does not have it
+        ret = server.rest_call('PUT', resource, data, None)
+        if ret[0] == 404:
+            ret = server.rest_call('POST', collection, data, None)
+        if not self.servers.action_success(ret):
+            raise RemoteRestError(ret[2])
+
+    def _send_topology_changes(self, context, server, changes):
+        """Sends the current state of the resources changed."""
+        # Only the last change of each resource matters
+        latest = dict(((change.resource, change.resource_id,
+                        change.network_id), change) for change in changes)
+        changed = collections.defaultdict(list)
+        for change in latest.values():
+            changed[change.resource].append(change)
+        session = context.session
+
+        networks = self._get_mapped_networks(
+            context,
+            sqlalchemyutils.query_in(
+                session.query(models_v2.Network), models_v2.Network.id,
+                [change.resource_id for change in changed[bsn_db.NETWORK]]))
+        floatingips = self._get_floatingips_by_network(context, networks)
+        ports = self._get_port_dicts(
+            context,
+            sqlalchemyutils.query_in(
+                session.query(models_v2.Port), models_v2.Port.id,
+                [change.resource_id for change in changed[bsn_db.PORT]]))
+        routers = dict((router['id'], router) for router in
+                       self._get_router_dicts(
+                           context,
+                           set(change.resource_id for change in
+                               changed[bsn_db.ROUTER] +
+                               changed[bsn_db.ROUTER_INTERFACE])))
+        interfaces = dict(((router_id, port['network_id']), port)
+                          for router_id, router_ports in
+                          self._get_router_interface_ports(
+                              context, routers).items()
+                          for port in router_ports)
+        intf_networks = self._get_mapped_networks(
+            context,
+            sqlalchemyutils.query_in(
+                session.query(models_v2.Network), models_v2.Network.id,
+                set(port['network_id'] for port in interfaces.values())))
+
+        # Removed resources first, the ones depending on others first
+        existing = {
+            bsn_db.ROUTER_INTERFACE: interfaces,
+            bsn_db.PORT: set(port['id'] for port in ports),
+            bsn_db.ROUTER: routers,
+            bsn_db.NETWORK: networks,
+        }
+        for resource in (bsn_db.ROUTER_INTERFACE, bsn_db.PORT, bsn_db.ROUTER,
+                         bsn_db.NETWORK):
+            for change in changed[resource]:
+                key = change.resource_id
+                if resource == bsn_db.ROUTER_INTERFACE:
+                    key = (change.resource_id, change.network_id)
+                if key in existing[resource]:
+                    continue
+                if resource == bsn_db.ROUTER_INTERFACE:
+                    path = ROUTER_INTF_PATH % (change.tenant_id,
+                                               change.resource_id,
+                                               change.network_id)
+                elif resource == bsn_db.PORT:
+                    path = PORTS_PATH % (change.tenant_id, change.network_id,
+                                         change.resource_id)
+                elif resource == bsn_db.ROUTER:
+                    path = ROUTERS_PATH % (change.tenant_id,
+                                           change.resource_id)
+                else:
+                    path = NETWORKS_PATH % (change.tenant_id,
+                                            change.resource_id)
+                self._sync_call(server, 'DELETE', path, missing_ok=True)
+
+        # Then the existing ones, the ones others depend on first
+        for net_id, network in networks.items():
+            tenant_id = network['tenant_id']
+            data = {'network': dict(network,
+                                    floatingips=floatingips[net_id])}
+            self._sync_put(server, NETWORKS_PATH % (tenant_id, net_id),
+                           NET_RESOURCE_PATH % tenant_id, data)
+        for change in changed[bsn_db.ROUTER]:
+            router = routers.get(change.resource_id)
+            if router:
+                tenant_id = router['tenant_id']
+                data = {'router': self._map_state_and_status(router)}
+                self._sync_put(server, ROUTERS_PATH % (tenant_id,
+                                                       router['id']),
+                               ROUTER_RESOURCE_PATH % tenant_id, data)
+        for port in ports:
+            tenant_id = port['tenant_id']
+            net_id = port['network_id']
+            data = {'port': self._map_state_and_status(port)}
+            self._sync_put(server, PORTS_PATH % (tenant_id, net_id,
+                                                 port['id']),
+                           PORT_RESOURCE_PATH % (tenant_id, net_id), data)
+            resource = ATTACHMENT_PATH % (tenant_id, net_id, port['id'])
+            if port['device_id']:
+                data = {'attachment': {'id': port['device_id'],
+                                       'mac': port['mac_address']}}
+                self._sync_call(server, 'PUT', resource, data)
+            else:
+                self._sync_call(server, 'DELETE', resource, missing_ok=True)
+        for change in changed[bsn_db.ROUTER_INTERFACE]:
+            port = interfaces.get((change.resource_id, change.network_id))
+            if port:
+                resource = ROUTER_INTF_OP_PATH % (change.tenant_id,
+                                                  change.resource_id)
+                data = {'interface': self._map_router_interface(
+                    port, intf_networks)}
+                self._sync_call(server, 'POST', resource, data)
+
+    def _send_all_data(self, server=None):
         """Pushes all data to network ctrl (networks/ports, ports/attachments)
         to give the controller an option to re-sync it's persistent store
         with quantum's current view of that data.
+
+        The topology is read with a few queries per chunk of resources,
+        instead of a few queries per network and per router.
         """
         admin_context = qcontext.get_admin_context()
+        session = admin_context.session
+
+        mapped_networks = self._get_mapped_networks(
+            admin_context, session.query(models_v2.Network))
+        floatingips = self._get_floatingips_by_network(admin_context,
+                                                       mapped_networks)
+        net_ports = collections.defaultdict(list)
+        for port in self._get_port_dicts(
+            admin_context,
+            sqlalchemyutils.query_in(session.query(models_v2.Port),
+                                     models_v2.Port.network_id,
+                                     mapped_networks.keys())):
+            mapped_port = self._map_state_and_status(port)
+            mapped_port['attachment'] = {
+                'id': port.get('device_id'),
+                'mac': port.get('mac_address'),
+            }
+            net_ports[port['network_id']].append(mapped_port)
         networks = []
-        routers = []
+        for net_id, network in mapped_networks.items():
+            networks.append(dict(network, floatingips=floatingips[net_id],
+                                 ports=net_ports[net_id]))
 
-        all_networks = super(QuantumRestProxyV2,
-                             self).get_networks(admin_context) or []
-        for net in all_networks:
-            mapped_network = self._get_mapped_network_with_subnets(net)
-            net_fl_ips = self._get_network_with_floatingips(mapped_network)
-
-            ports = []
-            net_filter = {'network_id': [net.get('id')]}
-            net_ports = super(QuantumRestProxyV2,
-                              self).get_ports(admin_context,
-                                              filters=net_filter) or []
-            for port in net_ports:
-                mapped_port = self._map_state_and_status(port)
-                mapped_port['attachment'] = {
-                    'id': port.get('device_id'),
-                    'mac': port.get('mac_address'),
-                }
-                ports.append(mapped_port)
-            net_fl_ips['ports'] = ports
-
-            networks.append(net_fl_ips)
-
-        all_routers = super(QuantumRestProxyV2,
-                            self).get_routers(admin_context) or []
+        routers = []
+        all_routers = self._get_router_dicts(admin_context)
+        router_ports = self._get_router_interface_ports(
+            admin_context, dict((router['id'], router)
+                                for router in all_routers))
         for router in all_routers:
-            interfaces = []
             mapped_router = self._map_state_and_status(router)
-            router_filter = {
-                'device_owner': ["network:router_interface"],
-                'device_id': [router.get('id')]
-            }
-            router_ports = super(QuantumRestProxyV2,
-                                 self).get_ports(admin_context,
-                                                 filters=router_filter) or []
-            for port in router_ports:
-                net_id = port.get('network_id')
-                subnet_id = port['fixed_ips'][0]['subnet_id']
-                intf_details = self._get_router_intf_details(admin_context,
-                                                             net_id,
-                                                             subnet_id)
-                interfaces.append(intf_details)
-            mapped_router['interfaces'] = interfaces
-
+            mapped_router['interfaces'] = [
+                self._map_router_interface(port, mapped_networks)
+                for port in router_ports.get(router['id'], [])]
             routers.append(mapped_router)
 
         try:
@@ -1120,7 +1360,10 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                 'networks': networks,
                 'routers': routers,
             }
-            ret = self.servers.put(resource, data)
+            if server is None:
+                ret = self.servers.put(resource, data)
+            else:
+                ret = server.rest_call('PUT', resource, data, None)
             if not self.servers.action_success(ret):
                 raise RemoteRestError(ret[2])
             return ret
@@ -1129,6 +1372,102 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
                         'topology: %s'), e.message)
             raise
 
+    def _get_subnet_dicts(self, context, subnets):
+        """Makes the dicts of subnets, with their pools, DNS servers and
+        routes read in a few queries.
+        """
+        subnets = list(subnets)
+        subnet_ids = [subnet['id'] for subnet in subnets]
+        children = {}
+        for name, model in (('allocation_pools', models_v2.IPAllocationPool),
+                            ('dns_nameservers', models_v2.DNSNameServer),
+                            ('routes', models_v2.SubnetRoute)):
+            rows = children[name] = collections.defaultdict(list)
+            for row in sqlalchemyutils.query_in(
+                context.session.query(model), model.subnet_id, subnet_ids):
+                rows[row['subnet_id']].append(row)
+        subnet_dicts = []
+        for subnet in subnets:
+            values = dict(subnet)
+            for name, rows in children.items():
+                values[name] = rows[subnet['id']]
+            subnet_dicts.append(self._make_subnet_dict(values))
+        return subnet_dicts
+
+    def _get_port_dicts(self, context, ports):
+        """Makes the dicts of ports, with their fixed IPs read in a few
+        queries.
+        """
+        ports = list(ports)
+        fixed_ips = collections.defaultdict(list)
+        for ip in sqlalchemyutils.query_in(
+            context.session.query(models_v2.IPAllocation),
+            models_v2.IPAllocation.port_id, [port['id'] for port in ports]):
+            fixed_ips[ip['port_id']].append(ip)
+        return [self._make_port_dict(
+            dict(port, fixed_ips=fixed_ips[port['id']]),
+            process_extensions=False) for port in ports]
+
+    def _get_router_dicts(self, context, router_ids=None):
+        query = context.session.query(l3_db.Router).options(
+            orm.joinedload('gw_port'))
+        if router_ids is not None:
+            query = sqlalchemyutils.query_in(query, l3_db.Router.id,
+                                             router_ids)
+        return [self._make_router_dict(router) for router in query]
+
+    def _get_router_interface_ports(self, context, routers):
+        """Returns the interface ports of routers, by router id."""
+        query = context.session.query(models_v2.Port).filter_by(
+            device_owner=l3_db.DEVICE_OWNER_ROUTER_INTF)
+        router_ports = collections.defaultdict(list)
+        for port in self._get_port_dicts(
+            context,
+            sqlalchemyutils.query_in(query, models_v2.Port.device_id,
+                                     routers.keys())):
+            router_ports[port['device_id']].append(port)
+        return router_ports
+
+    def _get_mapped_networks(self, context, networks):
+        """Maps networks with their subnets, by network id."""
+        networks = list(networks)
+        net_ids = [network['id'] for network in networks]
+        session = context.session
+        subnets = collections.defaultdict(list)
+        for subnet in self._get_subnet_dicts(
+            context,
+            sqlalchemyutils.query_in(session.query(models_v2.Subnet),
+                                     models_v2.Subnet.network_id, net_ids)):
+            subnets[subnet['network_id']].append(
+                self._map_state_and_status(subnet))
+        external = set(row['network_id'] for row in sqlalchemyutils.query_in(
+            session.query(l3_db.ExternalNetwork),
+            l3_db.ExternalNetwork.network_id, net_ids))
+        # The subnets of the network dicts are replaced by the mapped ones
+        return dict((network['id'],
+                     self._map_network(dict(network), subnets[network['id']],
+                                       network['id'] in external))
+                    for network in networks)
+
+    def _get_floatingips_by_network(self, context, networks):
+        floatingips = collections.defaultdict(list)
+        for floatingip in sqlalchemyutils.query_in(
+            context.session.query(l3_db.FloatingIP),
+            l3_db.FloatingIP.floating_network_id, networks.keys()):
+            floatingips[floatingip['floating_network_id']].append(
+                self._make_floatingip_dict(floatingip))
+        return floatingips
+
+    def _map_router_interface(self, port, mapped_networks):
+        # we will use the network id as interface's id
+        network = mapped_networks[port['network_id']]
+        subnet_id = port['fixed_ips'][0]['subnet_id']
+        subnet = [subnet for subnet in network['subnets']
+                  if subnet['id'] == subnet_id][0]
+        return {'id': network['id'],
+                'network': network,
+                'subnet': subnet}
+
     def _add_host_route(self, context, destination, port):
         subnet = {}
         for fixed_ip in port['fixed_ips']:
@@ -1173,8 +1512,12 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
 
     def _get_mapped_network_with_subnets(self, network):
         admin_context = qcontext.get_admin_context()
-        network = self._map_state_and_status(network)
         subnets = self._get_all_subnets_json_for_network(network['id'])
+        external = self._network_is_external(admin_context, network['id'])
+        return self._map_network(network, subnets, external)
+
+    def _map_network(self, network, subnets, external):
+        network = self._map_state_and_status(network)
         network['subnets'] = subnets
         for subnet in (subnets or []):
             if subnet['gateway_ip']:
@@ -1184,8 +1527,7 @@ class QuantumRestProxyV2(db_base_plugin_v2.QuantumDbPluginV2,
         else:
             network['gateway'] = ''
 
-        network[l3.EXTERNAL] = self._network_is_external(admin_context,
-                                                         network['id'])
+        network[l3.EXTERNAL] = external
 
         return network
 
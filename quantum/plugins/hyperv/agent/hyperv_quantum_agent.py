@@ -243,20 +243,19 @@ class HyperVQuantumAgent(object):
             LOG.debug(_("No port %s defined on agent."), port_id)
 
     def _treat_devices_added(self, devices):
-        resync = False
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context,
+                list(devices),
+                self.agent_id)
+        except Exception as e:
+            LOG.debug(_(
+                "Unable to get ports details for devices %s: %s"),
+                devices, e)
+            return True
+        for device_details in devices_details_list:
+            device = device_details['device']
             LOG.info(_("Adding port %s") % device)
-            try:
-                device_details = self.plugin_rpc.get_device_details(
-                    self.context,
-                    device,
-                    self.agent_id)
-            except Exception as e:
-                LOG.debug(_(
-                    "Unable to get port details for device %s: %s"),
-                    device, e)
-                resync = True
-                continue
             if 'port_id' in device_details:
                 LOG.info(_(
                     "Port %(device)s updated. Details: %(device_details)s") %
@@ -268,23 +267,21 @@ class HyperVQuantumAgent(object):
                     device_details['physical_network'],
                     device_details['segmentation_id'],
                     device_details['admin_state_up'])
-        return resync
+        return False
 
     def _treat_devices_removed(self, devices):
-        resync = False
+        try:
+            self.plugin_rpc.update_devices_down(self.context,
+                                                list(devices),
+                                                self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Removing ports failed for devices %s: %s"),
+                      devices, e)
+            return True
         for device in devices:
             LOG.info(_("Removing port %s"), device)
-            try:
-                self.plugin_rpc.update_device_down(self.context,
-                                                   device,
-                                                   self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Removing port failed for device %s: %s"),
-                          device, e)
-                resync = True
-                continue
             self._port_unbound(device)
-        return resync
+        return False
 
     def _process_network_ports(self, port_info):
         resync_a = False
@@ -21,6 +21,7 @@ from sqlalchemy.orm import exc
 from quantum.common import exceptions as q_exc
 import quantum.db.api as db_api
 from quantum.db import models_v2
+from quantum.db import sqlalchemyutils
 from quantum.openstack.common import log as logging
 from quantum.plugins.hyperv.common import constants
 from quantum.plugins.hyperv import model as hyperv_model
@@ -104,6 +105,13 @@ class HyperVPluginDB(object):
             port = None
         return port
 
+    def get_ports(self, port_ids):
+        session = db_api.get_session()
+        port_q = session.query(models_v2.Port)
+        return dict((port.id, port) for port in
+                    sqlalchemyutils.query_in(port_q, models_v2.Port.id,
+                                             port_ids))
+
     def get_network_binding(self, session, network_id):
         session = session or db_api.get_session()
         try:
@@ -113,6 +121,14 @@ class HyperVPluginDB(object):
         except exc.NoResultFound:
             return
 
+    def get_network_bindings(self, session, network_ids):
+        session = session or db_api.get_session()
+        binding_q = session.query(hyperv_model.NetworkBinding)
+        return dict((binding.network_id, binding) for binding in
+                    sqlalchemyutils.query_in(
+                        binding_q, hyperv_model.NetworkBinding.network_id,
+                        network_ids))
+
     def set_port_status(self, port_id, status):
         session = db_api.get_session()
         try:
@@ -123,6 +139,13 @@ class HyperVPluginDB(object):
         except exc.NoResultFound:
             raise q_exc.PortNotFound(port_id=port_id)
 
+    def set_ports_status(self, port_ids, status):
+        session = db_api.get_session()
+        with session.begin():
+            sqlalchemyutils.update_in(session.query(models_v2.Port),
+                                      models_v2.Port.id, port_ids,
+                                      {'status': status})
+
     def release_vlan(self, session, physical_network, vlan_id):
         with session.begin(subtransactions=True):
             try:
@@ -284,10 +284,19 @@ class HyperVQuantumPlugin(db_base_plugin_v2.QuantumDbPluginV2,
             LOG.debug(_("Created network: %s"), net['id'])
             return net
 
+    def _prefetch_network_dict_provider(self, context, network_ids):
+        return self._db.get_network_bindings(context.session, network_ids)
+
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attributes.NETWORKS, ['_prefetch_network_dict_provider'])
+
     def _extend_network_dict_provider(self, context, network):
         if self._check_view_auth(context, network, self.network_view):
-            binding = self._db.get_network_binding(
-                context.session, network['id'])
+            found, binding = self._get_prefetched(
+                context, '_prefetch_network_dict_provider', network['id'])
+            if not found:
+                binding = self._db.get_network_binding(
+                    context.session, network['id'])
             network[provider.NETWORK_TYPE] = binding.network_type
             p = self._network_providers_map[binding.network_type]
             p.extend_network_dict(network, binding)
@@ -343,9 +352,11 @@ class HyperVQuantumPlugin(db_base_plugin_v2.QuantumDbPluginV2,
     def get_networks(self, context, filters=None, fields=None):
         nets = super(HyperVQuantumPlugin, self).get_networks(
             context, filters, None)
-        for net in nets:
-            self._extend_network_dict_provider(context, net)
-            self._extend_network_dict_l3(context, net)
+        with self._dict_extension_prefetch(context, attributes.NETWORKS,
+                                           nets):
+            for net in nets:
+                self._extend_network_dict_provider(context, net)
+                self._extend_network_dict_l3(context, net)
 
         return [self._fields(net, fields) for net in nets]
 
@@ -31,8 +31,10 @@ class HyperVRpcCallbacks(
         dhcp_rpc_base.DhcpRpcCallbackMixin,
         l3_rpc_base.L3RpcCallbackMixin):
 
-    # Set RPC API version to 1.0 by default.
-    RPC_API_VERSION = '1.0'
+    # history
+    #   1.0 Initial version
+    #   1.2 Support get_devices_details_list and update_devices_down
+    RPC_API_VERSION = '1.2'
 
     def __init__(self, notifier):
         self.notifier = notifier
@@ -69,6 +71,34 @@ class HyperVRpcCallbacks(
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices at once"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices')
+        LOG.debug(_("Devices %(devices)s details requested from %(agent_id)s"),
+                  locals())
+        ports = self._db.get_ports(devices)
+        bindings = self._db.get_network_bindings(
+            None, set(port['network_id'] for port in ports.values()))
+        entries = []
+        for device in devices:
+            port = ports.get(device)
+            if not port:
+                entries.append({'device': device})
+                LOG.debug(_("%s can not be found in database"), device)
+                continue
+            binding = bindings[port['network_id']]
+            entries.append({'device': device,
+                            'network_id': port['network_id'],
+                            'port_id': port['id'],
+                            'admin_state_up': port['admin_state_up'],
+                            'network_type': binding.network_type,
+                            'segmentation_id': binding.segmentation_id,
+                            'physical_network': binding.physical_network})
+        # Set the ports status to UP
+        self._db.set_ports_status(ports.keys(), q_const.PORT_STATUS_ACTIVE)
+        return entries
+
     def update_device_down(self, rpc_context, **kwargs):
         """Device no longer exists on agent"""
         # (TODO) garyk - live migration and port status
@@ -88,6 +118,18 @@ class HyperVRpcCallbacks(
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def update_devices_down(self, rpc_context, **kwargs):
+        """Devices no longer exist on agent"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices')
+        LOG.debug(_("Devices %(devices)s no longer exist on %(agent_id)s"),
+                  locals())
+        ports = self._db.get_ports(devices)
+        # Set ports status to DOWN
+        self._db.set_ports_status(ports.keys(), q_const.PORT_STATUS_DOWN)
+        return [{'device': device, 'exists': device in ports}
+                for device in devices]
+
     def tunnel_sync(self, rpc_context, **kwargs):
         """Dummy function for ovs agent running on Linux to
         work with Hyper-V plugin and agent."""
@@ -20,6 +20,8 @@ from quantum.common import exceptions as q_exc
 import quantum.db.api as db
 from quantum.db import models_v2
 from quantum.db import securitygroups_db as sg_db
+from quantum.db import securitygroups_rpc_base as sg_db_rpc
+from quantum.db import sqlalchemyutils
 from quantum import manager
 from quantum.openstack.common import log as logging
 # NOTE (e0ne): this import is needed for config init
@@ -193,6 +195,14 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    query = session.query(l2network_models_v2.NetworkBinding)
+    return dict((binding.network_id, binding) for binding in
+                sqlalchemyutils.query_in(
+                    query, l2network_models_v2.NetworkBinding.network_id,
+                    network_ids))
+
+
 def get_port_from_device(device):
     """Get port from database"""
     LOG.debug(_("get_port_from_device() called"))
@@ -221,6 +231,23 @@ def get_port_from_device(device):
     return port_dict
 
 
+def get_ports_from_devices(devices):
+    """Get the ports whose ids start with devices from database"""
+    LOG.debug(_("get_ports_from_devices() called"))
+    return sg_db_rpc.get_ports_from_port_ids(db.get_session(), devices,
+                                             match_prefix=True)
+
+
+def set_ports_status(port_ids, status):
+    """Set the status of several ports"""
+    LOG.debug(_("set_ports_status as %s called"), status)
+    session = db.get_session()
+    with session.begin():
+        sqlalchemyutils.update_in(session.query(models_v2.Port),
+                                  models_v2.Port.id, port_ids,
+                                  {'status': status})
+
+
 def set_port_status(port_id, status):
     """Set the port status"""
     LOG.debug(_("set_port_status as %s called"), status)
@@ -60,7 +60,8 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
 
     # history
     #   1.1 Support Security Group RPC
-    RPC_API_VERSION = '1.1'
+    #   1.2 Support get_devices_details_list and update_devices_down
+    RPC_API_VERSION = '1.2'
     # Device names start with "tap"
     TAP_PREFIX_LEN = 3
 
@@ -81,6 +82,18 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             port['device'] = device
         return port
 
+    @classmethod
+    def get_ports_from_devices(cls, devices):
+        ports = db.get_ports_from_devices(
+            [device[cls.TAP_PREFIX_LEN:] for device in devices])
+        devices_ports = {}
+        for device in devices:
+            port = ports.get(device[cls.TAP_PREFIX_LEN:])
+            if port:
+                port['device'] = device
+                devices_ports[device] = port
+        return devices_ports
+
     def get_device_details(self, rpc_context, **kwargs):
         """Agent requests device details"""
         agent_id = kwargs.get('agent_id')
@@ -106,6 +119,41 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices at once"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices')
+        LOG.debug(_("Devices %(devices)s details requested from %(agent_id)s"),
+                  locals())
+        ports = self.get_ports_from_devices(devices)
+        bindings = db.get_network_bindings(
+            db_api.get_session(),
+            set(port['network_id'] for port in ports.values()))
+        entries = []
+        new_status = {q_const.PORT_STATUS_ACTIVE: [],
+                      q_const.PORT_STATUS_DOWN: []}
+        for device in devices:
+            port = ports.get(device)
+            if not port:
+                entries.append({'device': device})
+                LOG.debug(_("%s can not be found in database"), device)
+                continue
+            binding = bindings[port['network_id']]
+            entries.append({'device': device,
+                            'physical_network': binding.physical_network,
+                            'vlan_id': binding.vlan_id,
+                            'network_id': port['network_id'],
+                            'port_id': port['id'],
+                            'admin_state_up': port['admin_state_up']})
+            status = (q_const.PORT_STATUS_ACTIVE if port['admin_state_up']
+                      else q_const.PORT_STATUS_DOWN)
+            if port['status'] != status:
+                new_status[status].append(port['id'])
+        for status, port_ids in new_status.items():
+            if port_ids:
+                db.set_ports_status(port_ids, status)
+        return entries
+
     def update_device_down(self, rpc_context, **kwargs):
         """Device no longer exists on agent"""
         # (TODO) garyk - live migration and port status
@@ -126,6 +174,20 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def update_devices_down(self, rpc_context, **kwargs):
+        """Devices no longer exist on agent"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices')
+        LOG.debug(_("Devices %(devices)s no longer exist on %(agent_id)s"),
+                  locals())
+        ports = self.get_ports_from_devices(devices)
+        db.set_ports_status(
+            [port['id'] for port in ports.values()
+             if port['status'] != q_const.PORT_STATUS_DOWN],
+            q_const.PORT_STATUS_DOWN)
+        return [{'device': device, 'exists': device in ports}
+                for device in devices]
+
     def update_device_up(self, rpc_context, **kwargs):
         """Device is up on agent"""
         agent_id = kwargs.get('agent_id')
@@ -297,9 +359,19 @@ class LinuxBridgePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     # REVISIT(rkukura) Use core mechanism for attribute authorization
     # when available.
 
+    def _prefetch_network_dict_provider(self, context, network_ids):
+        return db.get_network_bindings(context.session, network_ids)
+
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attributes.NETWORKS, ['_prefetch_network_dict_provider'])
+
     def _extend_network_dict_provider(self, context, network):
         if self._check_view_auth(context, network, self.network_view):
-            binding = db.get_network_binding(context.session, network['id'])
+            found, binding = self._get_prefetched(
+                context, '_prefetch_network_dict_provider', network['id'])
+            if not found:
+                binding = db.get_network_binding(context.session,
+                                                 network['id'])
             if binding.vlan_id == constants.FLAT_VLAN_ID:
                 network[provider.NETWORK_TYPE] = constants.TYPE_FLAT
                 network[provider.PHYSICAL_NETWORK] = binding.physical_network
@@ -478,10 +550,12 @@ class LinuxBridgePluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             nets = super(LinuxBridgePluginV2,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_provider(context, net)
-                self._extend_network_dict_l3(context, net)
-                self._extend_network_dict_multihost(context, net)
+            with self._dict_extension_prefetch(context, attributes.NETWORKS,
+                                               nets):
+                for net in nets:
+                    self._extend_network_dict_provider(context, net)
+                    self._extend_network_dict_l3(context, net)
+                    self._extend_network_dict_multihost(context, net)
         return [self._fields(net, fields) for net in nets]
 
     def get_port(self, context, id, fields=None):
@@ -40,7 +40,12 @@ midonet_opts = [
                help=_('Virtual metadata router ID.')),
     cfg.StrOpt('mode',
                default='dev',
-               help=_('Operational mode. Internal dev use only.'))
+               help=_('Operational mode. Internal dev use only.')),
+    cfg.IntOpt('cache_timeout',
+               default=10,
+               help=_('Number of seconds during which the MidoNet resources '
+                      'known to exist are not looked up again, 0 to '
+                      'disable.'))
 ]
 
 
@@ -19,6 +19,7 @@
 # @author: Tomoe Sugihara, Midokura Japan KK
 # @author: Ryu Ishimoto, Midokura Japan KK
 
+import time
 
 from quantum.openstack.common import log as logging
 
@@ -48,6 +49,37 @@ def chain_names(sg_id, sg_name):
     return {'in': in_chain_name, 'out': out_chain_name}
 
 
+class PresenceCache:
+    """Remembers for a while the MidoNet resources known to exist.
+
+    The resources found, created or deleted by the plugin are added or
+    removed, so that they are not looked up again before timeout seconds.
+    A timeout of 0 disables the cache.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._expires = {}
+
+    def add(self, resource_type, ids):
+        if self.timeout > 0:
+            expires = time.time() + self.timeout
+            for id in ids:
+                self._expires[(resource_type, id)] = expires
+
+    def discard(self, resource_type, id):
+        self._expires.pop((resource_type, id), None)
+
+    def __contains__(self, key):
+        expires = self._expires.get(key)
+        if expires is None:
+            return False
+        if expires < time.time():
+            del self._expires[key]
+            return False
+        return True
+
+
 class ChainManager:
 
     def __init__(self, mido_api):
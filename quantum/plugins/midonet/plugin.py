@@ -20,10 +20,13 @@
 # @author: Tomoe Sugihara, Midokura Japan KK
 # @author: Ryu Ishimoto, Midokura Japan KK
 
+import collections
+
 from midonetclient import api
 from oslo.config import cfg
 from webob import exc as w_exc
 
+from quantum.api.v2 import attributes
 from quantum.common import exceptions as q_exc
 from quantum.common.utils import find_config_file
 from quantum.db import api as db
@@ -94,9 +97,44 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         self.chain_manager = midonet_lib.ChainManager(self.mido_api)
         self.pg_manager = midonet_lib.PortGroupManager(self.mido_api)
         self.rule_manager = midonet_lib.RuleManager(self.mido_api)
+        self.presence = midonet_lib.PresenceCache(midonet_conf.cache_timeout)
 
         db.configure_db()
 
+    def _check_present(self, resource_type, id, get):
+        """Raises MidonetResourceNotFound unless id exists in MidoNet."""
+        if (resource_type, id) in self.presence:
+            return
+        try:
+            get(id)
+        except w_exc.HTTPNotFound:
+            raise MidonetResourceNotFound(resource_type=resource_type, id=id)
+        self.presence.add(resource_type, [id])
+
+    def _check_all_present(self, resource_type, items, group_by, fetch):
+        """Raises MidonetResourceNotFound unless all items exist in MidoNet.
+
+        Instead of looking up the items one by one, the MidoNet resources
+        are fetched with one call to fetch per value of the group_by key of
+        the items not known to exist.
+        """
+        groups = collections.defaultdict(set)
+        for item in items:
+            if (resource_type, item['id']) not in self.presence:
+                groups[item[group_by]].add(item['id'])
+        for key, ids in groups.iteritems():
+            found = set(r.get_id() for r in fetch(key))
+            self.presence.add(resource_type, found)
+            for id in ids - found:
+                raise MidonetResourceNotFound(resource_type=resource_type,
+                                              id=id)
+
+    def _get_bridge_ports(self, bridge_id):
+        try:
+            return self.mido_api.get_bridge(bridge_id).get_ports()
+        except w_exc.HTTPNotFound:
+            return []
+
     def create_subnet(self, context, subnet):
         """Create Quantum subnet.
 
@@ -294,6 +332,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         with session.begin(subtransactions=True):
             bridge = self.mido_api.add_bridge().name(
                 network['network']['name']).tenant_id(tenant_id).create()
+            self.presence.add('Bridge', [bridge.get_id()])
 
             # Set MidoNet bridge ID to the quantum DB entry
             network['network']['id'] = bridge.get_id()
@@ -346,10 +385,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         # NOTE: Get network data with all fields (fields=None) for
         #       _extend_network_dict_l3() method, which needs 'id' field
         qnet = super(MidonetPluginV2, self).get_network(context, id, None)
-        try:
-            self.mido_api.get_bridge(id)
-        except w_exc.HTTPNotFound:
-            raise MidonetResourceNotFound(resource_type='Bridge', id=id)
+        self._check_present('Bridge', id, self.mido_api.get_bridge)
 
         self._extend_network_dict_l3(context, qnet)
         LOG.debug(_("MidonetPluginV2.get_network exiting: qnet=%r"), qnet)
@@ -365,14 +401,14 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         #       _extend_network_dict_l3() method, which needs 'id' field
         qnets = super(MidonetPluginV2, self).get_networks(context, filters,
                                                           None)
-        self.mido_api.get_bridges({'tenant_id': context.tenant_id})
-        for n in qnets:
-            try:
-                self.mido_api.get_bridge(n['id'])
-            except w_exc.HTTPNotFound:
-                raise MidonetResourceNotFound(resource_type='Bridge',
-                                              id=n['id'])
-            self._extend_network_dict_l3(context, n)
+        self._check_all_present(
+            'Bridge', qnets, 'tenant_id',
+            lambda tenant_id: self.mido_api.get_bridges(
+                {'tenant_id': tenant_id}))
+        with self._dict_extension_prefetch(context, attributes.NETWORKS,
+                                           qnets):
+            for n in qnets:
+                self._extend_network_dict_l3(context, n)
 
         return [self._fields(net, fields) for net in qnets]
 
@@ -381,6 +417,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         LOG.debug(_("MidonetPluginV2.delete_network called: id=%r"), id)
 
         self.mido_api.get_bridge(id).delete()
+        self.presence.discard('Bridge', id)
         try:
             super(MidonetPluginV2, self).delete_network(context, id)
         except Exception:
@@ -418,6 +455,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         if bridge_port:
             # set midonet port id to quantum port id and create a DB record.
             port_data['id'] = bridge_port.get_id()
+            self.presence.add('Port', [port_data['id']])
 
         session = context.session
         with session.begin(subtransactions=True):
@@ -457,10 +495,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         port_db_entry = super(MidonetPluginV2, self).get_port(context,
                                                               id, fields)
         # verify that corresponding port exists in MidoNet.
-        try:
-            self.mido_api.get_port(id)
-        except w_exc.HTTPNotFound:
-            raise MidonetResourceNotFound(resource_type='Port', id=id)
+        self._check_present('Port', id, self.mido_api.get_port)
 
         LOG.debug(_("MidonetPluginV2.get_port exiting: port_db_entry=%r"),
                   port_db_entry)
@@ -471,17 +506,14 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         LOG.debug(_("MidonetPluginV2.get_ports called: filters=%(filters)s "
                     "fields=%(fields)r"),
                   {'filters': filters, 'fields': fields})
+        # NOTE: Get port data with all fields (fields=None) to look up the
+        #       ports in MidoNet by network
         ports_db_entry = super(MidonetPluginV2, self).get_ports(context,
                                                                 filters,
-                                                                fields)
-        if ports_db_entry:
-            try:
-                for port in ports_db_entry:
-                    self.mido_api.get_port(port['id'])
-            except w_exc.HTTPNotFound:
-                raise MidonetResourceNotFound(resource_type='Port',
-                                              id=port['id'])
-        return ports_db_entry
+                                                                None)
+        self._check_all_present('Port', ports_db_entry, 'network_id',
+                                self._get_bridge_ports)
+        return [self._fields(port, fields) for port in ports_db_entry]
 
     def delete_port(self, context, id, l3_port_check=True):
         """Delete a quantum port and corresponding MidoNet bridge port."""
@@ -512,6 +544,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                             dh.delete()
 
             self.mido_api.get_port(id).delete()
+            self.presence.discard('Port', id)
             return super(MidonetPluginV2, self).delete_port(context, id)
 
     #
@@ -531,6 +564,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         with session.begin(subtransactions=True):
             mrouter = self.mido_api.add_router().name(
                 router['router']['name']).tenant_id(tenant_id).create()
+            self.presence.add('Router', [mrouter.get_id()])
             qrouter = super(MidonetPluginV2, self).create_router(context,
                                                                  router)
 
@@ -720,6 +754,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
 
         # delete the router
         mrouter.delete()
+        self.presence.discard('Router', id)
 
         result = super(MidonetPluginV2, self).delete_router(context, id)
         LOG.debug(_("MidonetPluginV2.delete_router exiting: result=%s"),
@@ -730,11 +765,7 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         LOG.debug(_("MidonetPluginV2.get_router called: id=%(id)s "
                     "fields=%(fields)r"), {'id': id, 'fields': fields})
         qrouter = super(MidonetPluginV2, self).get_router(context, id, fields)
-
-        try:
-            self.mido_api.get_router(id)
-        except w_exc.HTTPNotFound:
-            raise MidonetResourceNotFound(resource_type='Router', id=id)
+        self._check_present('Router', id, self.mido_api.get_router)
 
         LOG.debug(_("MidonetPluginV2.get_router exiting: qrouter=%r"),
                   qrouter)
@@ -746,14 +777,12 @@ class MidonetPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
                   {'filters': filters, 'fields': fields})
 
         qrouters = super(MidonetPluginV2, self).get_routers(
-            context, filters, fields)
-        for qr in qrouters:
-            try:
-                self.mido_api.get_router(qr['id'])
-            except w_exc.HTTPNotFound:
-                raise MidonetResourceNotFound(resource_type='Router',
-                                              id=qr['id'])
-        return qrouters
+            context, filters, None)
+        self._check_all_present(
+            'Router', qrouters, 'tenant_id',
+            lambda tenant_id: self.mido_api.get_routers(
+                {'tenant_id': tenant_id}))
+        return [self._fields(qr, fields) for qr in qrouters]
 
     def add_router_interface(self, context, router_id, interface_info):
         LOG.debug(_("MidonetPluginV2.add_router_interface called: "
@@ -49,6 +49,10 @@ ofc_opts = [
                help=_("Key file")),
     cfg.StrOpt('cert_file', default=None,
                help=_("Certificate file")),
+    cfg.IntOpt('job_workers', default=0,
+               help=_("Number of greenthreads applying the changes of the "
+                      "ports and packet filters to OFC in the background. "
+                      "With 0, the API requests apply them.")),
 ]
 
 
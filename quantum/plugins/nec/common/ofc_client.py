@@ -19,6 +19,7 @@ import httplib
 import json
 import socket
 
+from quantum.common import http_pool
 from quantum.openstack.common import log as logging
 from quantum.plugins.nec.common import exceptions as nexc
 
@@ -30,7 +31,7 @@ class OFCClient(object):
     """A HTTP/HTTPS client for OFC Drivers"""
 
     def __init__(self, host="127.0.0.1", port=8888, use_ssl=False,
-                 key_file=None, cert_file=None):
+                 key_file=None, cert_file=None, max_connections=1):
         """Creates a new client to some OFC.
 
         :param host: The host where service resides
@@ -38,20 +39,21 @@ class OFCClient(object):
         :param use_ssl: True to use SSL, False to use HTTP
         :param key_file: The SSL key file to use if use_ssl is true
         :param cert_file: The SSL cert file to use if use_ssl is true
+        :param max_connections: The number of connections kept open
         """
         self.host = host
         self.port = port
         self.use_ssl = use_ssl
         self.key_file = key_file
         self.cert_file = cert_file
-        self.connection = None
-
-    def get_connection_type(self):
-        """Returns the proper connection type"""
+        certs = {}
         if self.use_ssl:
-            return httplib.HTTPSConnection
-        else:
-            return httplib.HTTPConnection
+            # Handle SSL certs
+            certs = {'key_file': self.key_file, 'cert_file': self.cert_file}
+            certs = dict((x, certs[x]) for x in certs if certs[x] is not None)
+        self.connections = http_pool.ConnectionPool(self.host, self.port,
+                                                    self.use_ssl,
+                                                    max_connections, **certs)
 
     def do_request(self, method, action, body=None):
         LOG.debug(_("Client request: %(host)s:%(port)s "
@@ -61,18 +63,9 @@ class OFCClient(object):
         if type(body) is dict:
             body = json.dumps(body)
         try:
-            connection_type = self.get_connection_type()
             headers = {"Content-Type": "application/json"}
-            # Open connection and send request, handling SSL certs
-            certs = {'key_file': self.key_file, 'cert_file': self.cert_file}
-            certs = dict((x, certs[x]) for x in certs if certs[x] is not None)
-            if self.use_ssl and len(certs):
-                conn = connection_type(self.host, self.port, **certs)
-            else:
-                conn = connection_type(self.host, self.port)
-            conn.request(method, action, body, headers)
-            res = conn.getresponse()
-            data = res.read()
+            res, data = self.connections.request(method, action, body,
+                                                 headers)
             LOG.debug(_("OFC returns [%(status)s:%(data)s]"),
                       {'status': res.status,
                        'data': data})
@@ -85,7 +78,7 @@ class OFCClient(object):
             else:
                 reason = _("An operation on OFC is failed.")
                 raise nexc.OFCException(reason=reason)
-        except (socket.error, IOError), e:
+        except (socket.error, IOError, httplib.HTTPException), e:
             reason = _("Failed to connect OFC : %s") % str(e)
             LOG.error(reason)
             raise nexc.OFCException(reason=reason)
@@ -15,15 +15,19 @@
 #    under the License.
 # @author: Ryota MIBU
 
+import datetime
+
 import sqlalchemy as sa
 
 from quantum.db import api as db
 from quantum.db import model_base
 from quantum.db import models_v2
 from quantum.db import securitygroups_db as sg_db
+from quantum.db import securitygroups_rpc_base as sg_db_rpc
 from quantum.extensions import securitygroup as ext_sg
 from quantum import manager
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import timeutils
 # NOTE (e0ne): this import is needed for config init
 from quantum.plugins.nec.common import config
 from quantum.plugins.nec.common import exceptions as nexc
@@ -203,6 +207,77 @@ def del_portinfo(session, id):
                       "port_id: %s"), id)
 
 
+def add_ofc_job(session, network_id, resource, resource_id, action):
+    try:
+        job = nmodels.OFCJob(network_id=network_id, resource=resource,
+                             resource_id=resource_id, action=action)
+        with session.begin(subtransactions=True):
+            session.add(job)
+            session.flush()
+    except Exception as exc:
+        LOG.exception(exc)
+        raise nexc.NECDBException(reason=exc.message)
+    return job
+
+
+def get_ofc_job(session, id):
+    try:
+        return session.query(nmodels.OFCJob).filter_by(id=id).one()
+    except sa.orm.exc.NoResultFound:
+        return None
+
+
+def get_ofc_jobs(session):
+    """Returns all the jobs, the oldest first."""
+    return session.query(nmodels.OFCJob).order_by(nmodels.OFCJob.id).all()
+
+
+def get_ofc_job_network_ids(session):
+    """Returns the ids of the networks which have jobs."""
+    query = session.query(nmodels.OFCJob.network_id).distinct()
+    return [network_id for (network_id,) in query]
+
+
+def get_next_ofc_job(session, network_id):
+    """Returns the oldest job of a network, None if it has none."""
+    return (session.query(nmodels.OFCJob).
+            filter_by(network_id=network_id).
+            order_by(nmodels.OFCJob.id).first())
+
+
+def get_last_ofc_job_id(session, network_id):
+    """Returns the id of the newest job of a network, None if it has none."""
+    return (session.query(sa.func.max(nmodels.OFCJob.id)).
+            filter_by(network_id=network_id).scalar())
+
+
+def claim_ofc_job(session, id, owner, timeout):
+    """Claims a job for owner.
+
+    Returns False if the job was run already, or if another owner claimed
+    it less than timeout seconds ago.
+    """
+    now = timeutils.utcnow()
+    expired = now - datetime.timedelta(seconds=timeout)
+    with session.begin(subtransactions=True):
+        count = (session.query(nmodels.OFCJob).
+                 filter_by(id=id).
+                 filter(sa.or_(nmodels.OFCJob.owner == None,
+                               nmodels.OFCJob.claimed_at < expired)).
+                 update({'owner': owner, 'claimed_at': now},
+                        synchronize_session=False))
+    return count == 1
+
+
+def del_ofc_job(session, id, owner=None):
+    """Deletes a job, only if it is claimed by owner when given."""
+    with session.begin(subtransactions=True):
+        query = session.query(nmodels.OFCJob).filter_by(id=id)
+        if owner is not None:
+            query = query.filter_by(owner=owner)
+        query.delete(synchronize_session=False)
+
+
 def get_port_from_device(port_id):
     """Get port from database"""
     LOG.debug(_("get_port_with_securitygroups() called:port_id=%s"), port_id)
@@ -227,3 +302,9 @@ def get_port_from_device(port_id):
     port_dict['fixed_ips'] = [ip['ip_address']
                               for ip in port['fixed_ips']]
     return port_dict
+
+
+def get_ports_from_devices(port_ids):
+    """Get ports with their security groups from database"""
+    LOG.debug(_("get_ports_from_devices() called:port_ids=%s"), port_ids)
+    return sg_db_rpc.get_ports_from_port_ids(db.get_session(), port_ids)
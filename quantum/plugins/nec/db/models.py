@@ -102,3 +102,16 @@ class PacketFilter(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     # status
     admin_state_up = sa.Column(sa.Boolean(), nullable=False)
     status = sa.Column(sa.String(16), nullable=False)
+
+
+class OFCJob(model_base.BASEV2):
+    """Represents a change of a resource to apply on OFC."""
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    # The jobs of a network are run in order
+    network_id = sa.Column(sa.String(36), nullable=False)
+    resource = sa.Column(sa.String(16), nullable=False)
+    resource_id = sa.Column(sa.String(36), nullable=False)
+    action = sa.Column(sa.String(16), nullable=False)
+    # The server process running the job, and since when
+    owner = sa.Column(sa.String(255))
+    claimed_at = sa.Column(sa.DateTime)
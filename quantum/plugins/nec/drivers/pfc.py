@@ -34,11 +34,11 @@ class PFCDriverBase(ofc_driver_base.OFCDriverBase):
     """
 
     def __init__(self, conf_ofc):
-        self.client = ofc_client.OFCClient(host=conf_ofc.host,
-                                           port=conf_ofc.port,
-                                           use_ssl=conf_ofc.use_ssl,
-                                           key_file=conf_ofc.key_file,
-                                           cert_file=conf_ofc.cert_file)
+        # One connection for each job worker, and one for the API requests
+        self.client = ofc_client.OFCClient(
+            host=conf_ofc.host, port=conf_ofc.port, use_ssl=conf_ofc.use_ssl,
+            key_file=conf_ofc.key_file, cert_file=conf_ofc.cert_file,
+            max_connections=conf_ofc.job_workers + 1)
 
     @classmethod
     def filter_supported(cls):
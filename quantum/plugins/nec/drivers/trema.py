@@ -29,8 +29,10 @@ class TremaDriverBase(ofc_driver_base.OFCDriverBase):
 
     def __init__(self, conf_ofc):
         # Trema sliceable REST API does not support HTTPS
-        self.client = ofc_client.OFCClient(host=conf_ofc.host,
-                                           port=conf_ofc.port)
+        # One connection for each job worker, and one for the API requests
+        self.client = ofc_client.OFCClient(
+            host=conf_ofc.host, port=conf_ofc.port,
+            max_connections=conf_ofc.job_workers + 1)
 
     def _get_network_id(self, ofc_network_id):
         # ofc_network_id : /networks/<network-id>
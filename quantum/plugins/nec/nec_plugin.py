@@ -19,6 +19,7 @@
 from quantum.agent import securitygroups_rpc as sg_rpc
 from quantum.api.rpc.agentnotifiers import dhcp_rpc_agent_api
 from quantum.api.rpc.agentnotifiers import l3_rpc_agent_api
+from quantum.api.v2 import attributes
 from quantum.common import constants as q_const
 from quantum.common import exceptions as q_exc
 from quantum.common import rpc as q_rpc
@@ -42,6 +43,7 @@ from quantum.plugins.nec.common import config
 from quantum.plugins.nec.common import exceptions as nexc
 from quantum.plugins.nec.db import api as ndb
 from quantum.plugins.nec.db import nec_plugin_base
+from quantum.plugins.nec import ofc_jobs
 from quantum.plugins.nec import ofc_manager
 from quantum import policy
 
@@ -55,11 +57,13 @@ class OperationalStatus:
        DOWN: The resource is not operational.  This might indicate
              admin_state_up=False, or lack of OpenFlow info for the port.
        BUILD: The plugin is creating the resource.
+       PENDING: A job applying a change of the resource to OFC is queued.
        ERROR: Some error occured.
     """
     ACTIVE = "ACTIVE"
     DOWN = "DOWN"
     BUILD = "BUILD"
+    PENDING = "PENDING"
     ERROR = "ERROR"
 
 
@@ -117,6 +121,12 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         self.router_scheduler = importutils.import_object(
             config.CONF.router_scheduler_driver)
 
+        self.ofc_jobs = None
+        if config.OFC.job_workers > 0:
+            self.ofc_jobs = ofc_jobs.OFCJobQueue(config.OFC.job_workers,
+                                                 self._run_ofc_job)
+            self.ofc_jobs.start()
+
     def setup_rpc(self):
         self.topic = topics.PLUGIN
         self.conn = rpc.create_connection(new=True)
@@ -148,9 +158,57 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         obj_updater = getattr(super(NECPluginV2, self), "update_%s" % resource)
         obj_updater(context, id, request)
 
+    def _queue_ofc_job(self, context, resource, item, action):
+        """Queue a job activating or deactivating a resource on OFC.
+
+        The status of the resource is PENDING until the job is run.
+        """
+        self._update_resource_status(context, resource, item['id'],
+                                     OperationalStatus.PENDING)
+        self.ofc_jobs.put(context, item['network_id'], resource, item['id'],
+                          action)
+
+    def _wait_ofc_jobs(self, network_id):
+        """Wait until the queued jobs of the network are run."""
+        if self.ofc_jobs:
+            self.ofc_jobs.wait(network_id)
+
+    def _run_ofc_job(self, context, job):
+        """Apply a queued change of a port or packet_filter to OFC."""
+        if job.resource == "port":
+            try:
+                port = super(NECPluginV2, self).get_port(context,
+                                                         job.resource_id)
+            except q_exc.PortNotFound:
+                return
+            if job.action == ofc_jobs.ACTIVATE:
+                self._create_ofc_port_if_ready(context, port)
+            else:
+                self._delete_ofc_port(context, port)
+        else:
+            try:
+                pf = super(NECPluginV2, self).get_packet_filter(
+                    context, job.resource_id)
+            except nexc.PacketFilterNotFound:
+                return
+            if job.action == ofc_jobs.ACTIVATE:
+                self._create_ofc_packet_filter_if_ready(context, pf)
+            else:
+                self._delete_ofc_packet_filter(context, pf)
+
     def activate_port_if_ready(self, context, port, network=None):
         """Activate port by creating port on OFC if ready.
 
+        With job workers, the port is activated in the background.
+        """
+        if self.ofc_jobs:
+            self._queue_ofc_job(context, "port", port, ofc_jobs.ACTIVATE)
+        else:
+            self._create_ofc_port_if_ready(context, port, network)
+
+    def _create_ofc_port_if_ready(self, context, port, network=None):
+        """Create port on OFC if ready.
+
         Activate port and packet_filters associated with the port.
         Conditions to activate port on OFC are:
             * port admin_state is UP
@@ -163,15 +221,15 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
 
         port_status = OperationalStatus.ACTIVE
         if not port['admin_state_up']:
-            LOG.debug(_("activate_port_if_ready(): skip, "
+            LOG.debug(_("_create_ofc_port_if_ready(): skip, "
                         "port.admin_state_up is False."))
             port_status = OperationalStatus.DOWN
         elif not network['admin_state_up']:
-            LOG.debug(_("activate_port_if_ready(): skip, "
+            LOG.debug(_("_create_ofc_port_if_ready(): skip, "
                         "network.admin_state_up is False."))
             port_status = OperationalStatus.DOWN
         elif not ndb.get_portinfo(context.session, port['id']):
-            LOG.debug(_("activate_port_if_ready(): skip, "
+            LOG.debug(_("_create_ofc_port_if_ready(): skip, "
                         "no portinfo for this port."))
             port_status = OperationalStatus.DOWN
 
@@ -184,13 +242,13 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
                 pfs = (super(NECPluginV2, self).
                        get_packet_filters(context, filters=filters))
                 for pf in pfs:
-                    self._activate_packet_filter_if_ready(context, pf,
-                                                          network=network,
-                                                          in_port=port)
+                    self._create_ofc_packet_filter_if_ready(context, pf,
+                                                            network=network,
+                                                            in_port=port)
 
         if port_status in [OperationalStatus.ACTIVE]:
             if self.ofc.exists_ofc_port(context, port['id']):
-                LOG.debug(_("activate_port_if_ready(): skip, "
+                LOG.debug(_("_create_ofc_port_if_ready(): skip, "
                             "ofc_port already exists."))
             else:
                 try:
@@ -207,6 +265,16 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
     def deactivate_port(self, context, port):
         """Deactivate port by deleting port from OFC if exists.
 
+        With job workers, the port is deactivated in the background.
+        """
+        if self.ofc_jobs:
+            self._queue_ofc_job(context, "port", port, ofc_jobs.DEACTIVATE)
+        else:
+            self._delete_ofc_port(context, port)
+
+    def _delete_ofc_port(self, context, port):
+        """Delete port from OFC if exists.
+
         Deactivate port and packet_filters associated with the port.
         """
         port_status = OperationalStatus.DOWN
@@ -218,7 +286,7 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
                 LOG.error(reason)
                 port_status = OperationalStatus.ERROR
         else:
-            LOG.debug(_("deactivate_port(): skip, ofc_port does not "
+            LOG.debug(_("_delete_ofc_port(): skip, ofc_port does not "
                         "exist."))
 
         if port_status is not port['status']:
@@ -232,7 +300,7 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
             pfs = super(NECPluginV2, self).get_packet_filters(context,
                                                               filters=filters)
             for pf in pfs:
-                self._deactivate_packet_filter(context, pf)
+                self._delete_ofc_packet_filter(context, pf)
 
     # Quantm Plugin Basic methods
 
@@ -285,12 +353,16 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
             self._process_l3_update(context, network['network'], id)
             self._extend_network_dict_l3(context, new_net)
 
+        # Resources which are PENDING may be changed again: their jobs are
+        # run in order.
         changed = (old_net['admin_state_up'] is not new_net['admin_state_up'])
         if changed and not new_net['admin_state_up']:
             self._update_resource_status(context, "network", id,
                                          OperationalStatus.DOWN)
             # disable all active ports and packet_filters of the network
-            filters = dict(network_id=[id], status=[OperationalStatus.ACTIVE])
+            filters = dict(network_id=[id],
+                           status=[OperationalStatus.ACTIVE,
+                                   OperationalStatus.PENDING])
             ports = super(NECPluginV2, self).get_ports(context,
                                                        filters=filters)
             for port in ports:
@@ -303,18 +375,20 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         elif changed and new_net['admin_state_up']:
             self._update_resource_status(context, "network", id,
                                          OperationalStatus.ACTIVE)
-            # enable ports and packet_filters of the network
-            filters = dict(network_id=[id], status=[OperationalStatus.DOWN],
+            # enable packet_filters, then ports of the network
+            filters = dict(network_id=[id],
+                           status=[OperationalStatus.DOWN,
+                                   OperationalStatus.PENDING],
                            admin_state_up=[True])
-            ports = super(NECPluginV2, self).get_ports(context,
-                                                       filters=filters)
-            for port in ports:
-                self.activate_port_if_ready(context, port, new_net)
             if self.packet_filter_enabled:
                 pfs = (super(NECPluginV2, self).
                        get_packet_filters(context, filters=filters))
                 for pf in pfs:
                     self._activate_packet_filter_if_ready(context, pf, new_net)
+            ports = super(NECPluginV2, self).get_ports(context,
+                                                       filters=filters)
+            for port in ports:
+                self.activate_port_if_ready(context, port, new_net)
 
         return new_net
 
@@ -327,6 +401,7 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         """
         LOG.debug(_("NECPluginV2.delete_network() called, id=%s ."), id)
         net = super(NECPluginV2, self).get_network(context, id)
+        self._wait_ofc_jobs(id)
         tenant_id = net['tenant_id']
 
         # get packet_filters associated with the network
@@ -368,8 +443,10 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
 
     def get_networks(self, context, filters=None, fields=None):
         nets = super(NECPluginV2, self).get_networks(context, filters, None)
-        for net in nets:
-            self._extend_network_dict_l3(context, net)
+        with self._dict_extension_prefetch(context, attributes.NETWORKS,
+                                           nets):
+            for net in nets:
+                self._extend_network_dict_l3(context, net)
         return [self._fields(net, fields) for net in nets]
 
     def _extend_port_dict_binding(self, context, port):
@@ -433,7 +510,8 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         # Thus we need to call self.get_port() instead of super().get_port()
         port = self.get_port(context, id)
 
-        self.deactivate_port(context, port)
+        self._wait_ofc_jobs(port['network_id'])
+        self._delete_ofc_port(context, port)
 
         # delete all packet_filters of the port
         if self.packet_filter_enabled:
@@ -471,9 +549,22 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
     # For PacketFilter Extension
 
     def _activate_packet_filter_if_ready(self, context, packet_filter,
-                                         network=None, in_port=None):
+                                         network=None):
         """Activate packet_filter by creating filter on OFC if ready.
 
+        With job workers, the packet_filter is activated in the background.
+        """
+        if self.ofc_jobs:
+            self._queue_ofc_job(context, "packet_filter", packet_filter,
+                                ofc_jobs.ACTIVATE)
+        else:
+            self._create_ofc_packet_filter_if_ready(context, packet_filter,
+                                                    network)
+
+    def _create_ofc_packet_filter_if_ready(self, context, packet_filter,
+                                           network=None, in_port=None):
+        """Create packet_filter on OFC if ready.
+
         Conditions to create packet_filter on OFC are:
             * packet_filter admin_state is UP
             * network admin_state is UP
@@ -488,25 +579,25 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
 
         pf_status = OperationalStatus.ACTIVE
         if not packet_filter['admin_state_up']:
-            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+            LOG.debug(_("_create_ofc_packet_filter_if_ready(): skip, "
                         "packet_filter.admin_state_up is False."))
             pf_status = OperationalStatus.DOWN
         elif not network['admin_state_up']:
-            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+            LOG.debug(_("_create_ofc_packet_filter_if_ready(): skip, "
                         "network.admin_state_up is False."))
             pf_status = OperationalStatus.DOWN
         elif in_port_id and in_port_id is in_port.get('id'):
-            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+            LOG.debug(_("_create_ofc_packet_filter_if_ready(): skip, "
                         "invalid in_port_id."))
             pf_status = OperationalStatus.DOWN
         elif in_port_id and not ndb.get_portinfo(context.session, in_port_id):
-            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+            LOG.debug(_("_create_ofc_packet_filter_if_ready(): skip, "
                         "no portinfo for in_port."))
             pf_status = OperationalStatus.DOWN
 
         if pf_status in [OperationalStatus.ACTIVE]:
             if self.ofc.exists_ofc_packet_filter(context, packet_filter['id']):
-                LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+                LOG.debug(_("_create_ofc_packet_filter_if_ready(): skip, "
                             "ofc_packet_filter already exists."))
             else:
                 try:
@@ -525,10 +616,21 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
                                          packet_filter['id'], pf_status)
 
     def _deactivate_packet_filter(self, context, packet_filter):
-        """Deactivate packet_filter by deleting filter from OFC if exixts."""
+        """Deactivate packet_filter by deleting filter from OFC if exixts.
+
+        With job workers, the packet_filter is deactivated in the background.
+        """
+        if self.ofc_jobs:
+            self._queue_ofc_job(context, "packet_filter", packet_filter,
+                                ofc_jobs.DEACTIVATE)
+        else:
+            self._delete_ofc_packet_filter(context, packet_filter)
+
+    def _delete_ofc_packet_filter(self, context, packet_filter):
+        """Delete packet_filter from OFC if exists."""
         pf_status = OperationalStatus.DOWN
         if not self.ofc.exists_ofc_packet_filter(context, packet_filter['id']):
-            LOG.debug(_("_deactivate_packet_filter(): skip, "
+            LOG.debug(_("_delete_ofc_packet_filter(): skip, "
                         "ofc_packet_filter does not exist."))
         else:
             try:
@@ -587,7 +689,8 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         """Deactivate and delete packet_filter."""
         LOG.debug(_("NECPluginV2.delete_packet_filter() called, id=%s ."), id)
         pf = super(NECPluginV2, self).get_packet_filter(context, id)
-        self._deactivate_packet_filter(context, pf)
+        self._wait_ofc_jobs(pf['network_id'])
+        self._delete_ofc_packet_filter(context, pf)
 
         super(NECPluginV2, self).delete_packet_filter(context, id)
 
@@ -636,6 +739,16 @@ class SecurityGroupServerRpcCallback(
                   {'device': device, 'ret': port})
         return port
 
+    @staticmethod
+    def get_ports_from_devices(devices):
+        ports = ndb.get_ports_from_devices(devices)
+        for device, port in ports.items():
+            port['device'] = device
+        LOG.debug(_("NECPluginV2RPCCallbacks.get_ports_from_devices() "
+                    "called, devices=%(devices)s => %(ret)s."),
+                  {'devices': devices, 'ret': ports})
+        return ports
+
 
 class NECPluginV2RPCCallbacks(object):
 
@@ -0,0 +1,157 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Background jobs applying the changes of the resources to OFC.
+
+A job is recorded in the database by the request changing a resource, then
+run by a worker greenthread of any server process. The jobs of a network
+are run in the order they were queued: only the oldest job of a network
+can be claimed, and a worker claims it in the database before running it.
+The jobs left by a server which stopped are run by the other ones, once
+their claim expired.
+"""
+
+import os
+
+import eventlet
+from eventlet import queue
+from oslo.config import cfg
+
+from quantum import context as q_context
+from quantum.openstack.common import log as logging
+from quantum.plugins.nec.db import api as ndb
+
+LOG = logging.getLogger(__name__)
+
+ACTIVATE = 'activate'
+DEACTIVATE = 'deactivate'
+
+# Seconds after which a job claimed by a worker which did not complete it
+# can be claimed by another one
+CLAIM_TIMEOUT = 600
+# Seconds between two lookups of the jobs queued by other server processes
+POLL_INTERVAL = 60
+# Seconds between two checks of the jobs being waited for
+WAIT_INTERVAL = 0.1
+
+
+class OFCJobQueue(object):
+    """Runs the OFC jobs with a number of worker greenthreads.
+
+    run_job is called with an admin context and the job to run.
+    """
+
+    def __init__(self, workers, run_job):
+        self.workers = workers
+        self.run_job = run_job
+        self._pid = None
+        self._owner = None
+        self._queues = []
+
+    def start(self):
+        """Starts the workers and queues the jobs left in the database."""
+        self._start()
+        self._queue_pending_jobs()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._owner = '%s:%d' % (cfg.CONF.host, self._pid)
+        self._queues = []
+        for i in range(self.workers):
+            networks = queue.LightQueue()
+            self._queues.append(networks)
+            eventlet.spawn_n(self._work, networks)
+        eventlet.spawn_n(self._poll)
+
+    def _check_process(self):
+        # A process forked by the server needs its own workers
+        if self._pid != os.getpid():
+            self._start()
+
+    def _queue_for(self, network_id):
+        self._check_process()
+        return self._queues[hash(network_id) % self.workers]
+
+    def _queue_pending_jobs(self):
+        session = q_context.get_admin_context().session
+        for network_id in ndb.get_ofc_job_network_ids(session):
+            self._queue_for(network_id).put(network_id)
+
+    def put(self, context, network_id, resource, resource_id, action):
+        """Queues a job.
+
+        It must be called outside of any transaction, for the worker to
+        find the job in the database.
+        """
+        ndb.add_ofc_job(context.session, network_id, resource, resource_id,
+                        action)
+        self._queue_for(network_id).put(network_id)
+
+    def wait(self, network_id):
+        """Waits until the jobs queued so far for a network are run.
+
+        The jobs queued by any server process are waited for. Those which
+        are not being run by another worker are run by the caller.
+        """
+        self._check_process()
+        context = q_context.get_admin_context()
+        last_id = ndb.get_last_ofc_job_id(context.session, network_id)
+        while (last_id is not None and
+               self._run_jobs(context, network_id, last_id)):
+            eventlet.sleep(WAIT_INTERVAL)
+
+    def _work(self, networks):
+        while True:
+            network_id = networks.get()
+            try:
+                self._run_jobs(q_context.get_admin_context(), network_id)
+            except Exception:
+                LOG.exception(_("Unable to run the OFC jobs of network %s"),
+                              network_id)
+
+    def _poll(self):
+        while True:
+            eventlet.sleep(POLL_INTERVAL)
+            try:
+                self._queue_pending_jobs()
+            except Exception:
+                LOG.exception(_("Unable to look up the pending OFC jobs"))
+
+    def _run_jobs(self, context, network_id, last_id=None):
+        """Runs the jobs of a network in order, up to last_id if given.
+
+        Returns True if it stopped at a job which another worker claimed.
+        """
+        while True:
+            job = ndb.get_next_ofc_job(context.session, network_id)
+            if not job or (last_id is not None and job.id > last_id):
+                return False
+            if not ndb.claim_ofc_job(context.session, job.id, self._owner,
+                                     CLAIM_TIMEOUT):
+                return True
+            self._run(context, job)
+
+    def _run(self, context, job):
+        LOG.debug(_("Running OFC job %(id)s: %(action)s %(resource)s "
+                    "%(resource_id)s"),
+                  {'id': job.id, 'action': job.action,
+                   'resource': job.resource, 'resource_id': job.resource_id})
+        try:
+            self.run_job(context, job)
+        except Exception:
+            LOG.exception(_("OFC job %s failed"), job.id)
+        finally:
+            ndb.del_ofc_job(context.session, job.id, self._owner)
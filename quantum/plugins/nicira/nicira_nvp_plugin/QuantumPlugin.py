@@ -69,6 +69,7 @@ from quantum.plugins.nicira.nicira_nvp_plugin import (nicira_networkgw_db
                                                       as networkgw_db)
 from quantum.plugins.nicira.nicira_nvp_plugin import nicira_qos_db as qos_db
 from quantum.plugins.nicira.nicira_nvp_plugin import nvp_cluster
+from quantum.plugins.nicira.nicira_nvp_plugin import nvp_sync
 from quantum.plugins.nicira.nicira_nvp_plugin.nvp_plugin_version import (
     PLUGIN_VERSION)
 from quantum.plugins.nicira.nicira_nvp_plugin import NvpApiClient
@@ -238,6 +239,8 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     novazone_cluster_map = {}
     # Default controller cluster (to be used when nova zone id is unspecified)
     default_cluster = None
+    # Synchronizes the operational status with NVP, if enabled
+    _synchronizer = None
 
     provider_network_view = "extension:provider_network:view"
     provider_network_set = "extension:provider_network:set"
@@ -298,6 +301,15 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             cfg.CONF.network_scheduler_driver)
         # TODO(salvatore-orlando): Handle default gateways in multiple clusters
         self._ensure_default_network_gateway()
+        if self.nvp_opts.state_sync_interval > 0:
+            self._synchronizer = nvp_sync.NvpSynchronizer(
+                self, self.nvp_opts.state_sync_interval,
+                self.nvp_opts.max_state_staleness)
+            self._synchronizer.start()
+
+    def _status_is_synchronized(self):
+        """Whether the operational status in the DB can be returned."""
+        return bool(self._synchronizer and self._synchronizer.is_fresh())
 
     def _ensure_default_network_gateway(self):
         # Add the gw in the db as default, and unset any previous default
@@ -858,11 +870,20 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         # TODO(salvatore-orlando): Validate tranport zone uuid
         # which should be specified in physical_network
 
+    def _prefetch_network_dict_provider(self, context, network_ids):
+        return nicira_db.get_network_bindings(context.session, network_ids)
+
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attr.NETWORKS, ['_prefetch_network_dict_provider'])
+
     def _extend_network_dict_provider(self, context, network, binding=None):
         if self._check_view_auth(context, network, self.provider_network_view):
             if not binding:
-                binding = nicira_db.get_network_binding(context.session,
-                                                        network['id'])
+                found, binding = self._get_prefetched(
+                    context, '_prefetch_network_dict_provider', network['id'])
+                if not found:
+                    binding = nicira_db.get_network_binding(context.session,
+                                                            network['id'])
             # With NVP plugin 'normal' overlay networks will have no binding
             # TODO(salvatore-orlando) make sure users can specify a distinct
             # phy_uuid as 'provider network' for STT net type
@@ -1058,7 +1079,8 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             # goto to the plugin DB and fetch the network
             network = self._get_network(context, id)
             # if the network is external, do not go to NVP
-            if not self._network_is_external(context, id):
+            if (not self._network_is_external(context, id) and
+                not self._status_is_synchronized()):
                 # verify the fabric status of the corresponding
                 # logical switch(es) in nvp
                 try:
@@ -1108,13 +1130,17 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         with context.session.begin(subtransactions=True):
             quantum_lswitches = (
                 super(NvpPluginV2, self).get_networks(context, filters))
-            for net in quantum_lswitches:
-                self._extend_network_dict_provider(context, net)
-                self._extend_network_port_security_dict(context, net)
-                self._extend_network_dict_l3(context, net)
-                self._extend_network_qos_queue(context, net)
+            with self._dict_extension_prefetch(context, attr.NETWORKS,
+                                               quantum_lswitches):
+                for net in quantum_lswitches:
+                    self._extend_network_dict_provider(context, net)
+                    self._extend_network_port_security_dict(context, net)
+                    self._extend_network_dict_l3(context, net)
+                    self._extend_network_qos_queue(context, net)
 
             tenant_ids = filters and filters.get('tenant_id') or None
+        if self._status_is_synchronized():
+            return [self._fields(net, fields) for net in quantum_lswitches]
         filter_fmt = "&tag=%s&tag_scope=os_tid"
         if context.is_admin and not tenant_ids:
             tenant_filter = ""
@@ -1217,12 +1243,17 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
         with context.session.begin(subtransactions=True):
             quantum_lports = super(NvpPluginV2, self).get_ports(
                 context, filters)
-            for quantum_lport in quantum_lports:
-                self._extend_port_port_security_dict(context, quantum_lport)
+            with self._dict_extension_prefetch(context, attr.PORTS,
+                                               quantum_lports):
+                for quantum_lport in quantum_lports:
+                    self._extend_port_port_security_dict(context,
+                                                         quantum_lport)
         if (filters.get('network_id') and len(filters.get('network_id')) and
             self._network_is_external(context, filters['network_id'][0])):
             # Do not perform check on NVP platform
             return quantum_lports
+        if self._status_is_synchronized():
+            return [self._fields(lport, fields) for lport in quantum_lports]
 
         vm_filter = ""
         tenant_filter = ""
@@ -1516,8 +1547,9 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self._extend_port_port_security_dict(context, quantum_db_port)
             self._extend_port_qos_queue(context, quantum_db_port)
 
-            if self._network_is_external(context,
-                                         quantum_db_port['network_id']):
+            if (self._network_is_external(context,
+                                          quantum_db_port['network_id']) or
+                self._status_is_synchronized()):
                 return quantum_db_port
             nvp_id = self._nvp_get_port_id(context, self.default_cluster,
                                            quantum_db_port)
@@ -1659,6 +1691,8 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
 
     def get_router(self, context, id, fields=None):
         router = self._get_router(context, id)
+        if self._status_is_synchronized():
+            return self._make_router_dict(router, fields)
         try:
             # FIXME(salvatore-orlando): We need to
             # find the appropriate cluster!
@@ -1696,6 +1730,9 @@ class NvpPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             self._model_query(context, l3_db.Router),
             l3_db.Router, filters)
         routers = router_query.all()
+        if self._status_is_synchronized():
+            return [self._make_router_dict(router, fields)
+                    for router in routers]
         # Query routers on NVP for updating operational status
         if context.is_admin and not filters.get("tenant_id"):
             tenant_id = None
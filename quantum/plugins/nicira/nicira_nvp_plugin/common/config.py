@@ -42,6 +42,15 @@ nvp_opts = [
     cfg.StrOpt('default_transport_type', default='stt',
                help=_("The default network tranport type to use (stt, gre, "
                       "bridge, ipsec_gre, or ipsec_stt)")),
+    cfg.IntOpt('state_sync_interval', default=0,
+               help=_("Interval in seconds between two synchronizations of "
+                      "the operational status of networks, ports and "
+                      "routers with NVP (default 0 meaning the status is "
+                      "fetched from NVP on every request)")),
+    cfg.IntOpt('max_state_staleness', default=120,
+               help=_("Number of seconds after the last successful "
+                      "synchronization during which the operational status "
+                      "is read from the database (default 120)")),
 ]
 
 cluster_opts = [
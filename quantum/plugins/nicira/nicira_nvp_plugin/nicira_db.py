@@ -15,9 +15,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from sqlalchemy import func
 from sqlalchemy.orm import exc
 
 import quantum.db.api as db
+from quantum.db import sqlalchemyutils
 from quantum.openstack.common import log as logging
 from quantum.plugins.nicira.nicira_nvp_plugin import nicira_models
 from quantum.plugins.nicira.nicira_nvp_plugin import nicira_networkgw_db
@@ -36,6 +38,15 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    session = session or db.get_session()
+    query = session.query(nicira_models.NvpNetworkBinding)
+    return dict((binding.network_id, binding) for binding in
+                sqlalchemyutils.query_in(
+                    query, nicira_models.NvpNetworkBinding.network_id,
+                    network_ids))
+
+
 def get_network_binding_by_vlanid(session, vlan_id):
     session = session or db.get_session()
     try:
@@ -95,3 +106,22 @@ def set_default_network_gateway(session, gw_id):
         gw = (session.query(nicira_networkgw_db.NetworkGateway).
               filter_by(id=gw_id).one())
         gw['default'] = True
+
+
+def get_last_sync_time(session):
+    """Returns the start of the last successful synchronization with NVP
+    of any server, None if there was none.
+    """
+    session = session or db.get_session()
+    return session.query(
+        func.max(nicira_models.NvpSyncTime.last_sync)).scalar()
+
+
+def set_last_sync_time(session, host, last_sync):
+    with session.begin(subtransactions=True):
+        sync_time = (session.query(nicira_models.NvpSyncTime).
+                     filter_by(host=host).first())
+        if sync_time:
+            sync_time.last_sync = last_sync
+        else:
+            session.add(nicira_models.NvpSyncTime(host, last_sync))
@@ -16,7 +16,7 @@
 #    under the License.
 
 
-from sqlalchemy import Column, Enum, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
 
 from quantum.db.models_v2 import model_base
 
@@ -64,3 +64,20 @@ class QuantumNvpPortMapping(model_base.BASEV2):
     def __init__(self, quantum_id, nvp_id):
         self.quantum_id = quantum_id
         self.nvp_id = nvp_id
+
+
+class NvpSyncTime(model_base.BASEV2):
+    """Represents the last successful status synchronization of a server.
+
+    The API workers read it to know whether the operational status in the
+    database can be returned.
+    """
+
+    __tablename__ = 'nvp_sync_times'
+    host = Column(String(255), primary_key=True)
+    # Start of the last successful synchronization
+    last_sync = Column(DateTime, nullable=False)
+
+    def __init__(self, host, last_sync):
+        self.host = host
+        self.last_sync = last_sync
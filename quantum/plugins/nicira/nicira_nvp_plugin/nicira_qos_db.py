@@ -20,8 +20,10 @@ import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from quantum.api.v2 import attributes as attr
+from quantum.db import db_base_plugin_v2
 from quantum.db import model_base
 from quantum.db import models_v2
+from quantum.db import sqlalchemyutils
 from quantum.openstack.common import uuidutils
 from quantum.plugins.nicira.nicira_nvp_plugin.extensions import (nvp_qos
                                                                  as ext_qos)
@@ -144,28 +146,53 @@ class NVPQoSDbMixin(ext_qos.QueuePluginBase):
             # if there is one before deleting if we return here.
             return
 
+    def _prefetch_port_qos_queue(self, context, port_ids):
+        query = self._model_query(context, PortQueueMapping)
+        queues = {}
+        for binding in sqlalchemyutils.query_in(
+                query, PortQueueMapping.port_id, port_ids):
+            queues.setdefault(binding.port_id, binding.queue_id)
+        return queues
+
+    def _prefetch_network_qos_queue(self, context, network_ids):
+        query = self._model_query(context, NetworkQueueMapping)
+        return dict((binding.network_id, binding.queue_id) for binding in
+                    sqlalchemyutils.query_in(
+                        query, NetworkQueueMapping.network_id, network_ids))
+
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attr.NETWORKS, ['_prefetch_network_qos_queue'])
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attr.PORTS, ['_prefetch_port_qos_queue'])
+
     def _extend_port_qos_queue(self, context, port):
         if self._check_view_auth(context, {'qos_queue': None},
                                  ext_qos.qos_queue_get):
-            filters = {'port_id': [port['id']]}
-            fields = ['queue_id']
-            port[ext_qos.QUEUE] = None
-            queue_id = self._get_port_queue_bindings(
-                context, filters, fields)
-            if queue_id:
-                port[ext_qos.QUEUE] = queue_id[0]['queue_id']
+            found, queue_id = self._get_prefetched(
+                context, '_prefetch_port_qos_queue', port['id'])
+            port[ext_qos.QUEUE] = queue_id
+            if not found:
+                filters = {'port_id': [port['id']]}
+                fields = ['queue_id']
+                queue_id = self._get_port_queue_bindings(
+                    context, filters, fields)
+                if queue_id:
+                    port[ext_qos.QUEUE] = queue_id[0]['queue_id']
         return port
 
     def _extend_network_qos_queue(self, context, network):
         if self._check_view_auth(context, {'qos_queue': None},
                                  ext_qos.qos_queue_get):
-            filters = {'network_id': [network['id']]}
-            fields = ['queue_id']
-            network[ext_qos.QUEUE] = None
-            queue_id = self._get_network_queue_bindings(
-                context, filters, fields)
-            if queue_id:
-                network[ext_qos.QUEUE] = queue_id[0]['queue_id']
+            found, queue_id = self._get_prefetched(
+                context, '_prefetch_network_qos_queue', network['id'])
+            network[ext_qos.QUEUE] = queue_id
+            if not found:
+                filters = {'network_id': [network['id']]}
+                fields = ['queue_id']
+                queue_id = self._get_network_queue_bindings(
+                    context, filters, fields)
+                if queue_id:
+                    network[ext_qos.QUEUE] = queue_id[0]['queue_id']
         return network
 
     def _make_qos_queue_dict(self, queue, fields=None):
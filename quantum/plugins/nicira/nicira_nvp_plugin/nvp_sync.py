@@ -0,0 +1,263 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Nicira, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.config import cfg
+
+from quantum.common import constants
+from quantum import context as q_context
+from quantum.db import l3_db
+from quantum.db import models_v2
+from quantum.openstack.common import log as logging
+from quantum.openstack.common import loopingcall
+from quantum.openstack.common import timeutils
+from quantum.plugins.nicira.nicira_nvp_plugin import nicira_db
+from quantum.plugins.nicira.nicira_nvp_plugin import nvplib
+
+LOG = logging.getLogger(__name__)
+
+LSWITCH_FIELDS = "uuid,tags,fabric_status"
+LPORT_FIELDS = "tags,admin_status_enabled,fabric_status_up"
+LROUTER_FIELDS = "uuid,fabric_status"
+
+# Ports which are not mapped to a logical switch port in NVP
+UNMAPPED_DEVICE_OWNERS = (l3_db.DEVICE_OWNER_FLOATINGIP,
+                          l3_db.DEVICE_OWNER_ROUTER_GW)
+
+
+class NvpSynchronizer(object):
+    """Synchronizes the operational status of resources with NVP.
+
+    Every interval seconds, the status of all the logical switches, ports
+    and routers is fetched with paginated queries on each cluster, and the
+    status of the corresponding networks, ports and routers is updated in
+    the Quantum database when it has changed. As long as the last
+    successful run is more recent than max_staleness seconds, the plugin
+    can read the status from the database instead of querying NVP. The
+    time of the last successful run is kept in the database, for the API
+    workers, which do not run the synchronization.
+
+    The status of the resources is read before NVP is queried. A resource
+    created or changed while NVP is queried is left alone, its status
+    being newer than the one fetched from NVP.
+    """
+
+    def __init__(self, plugin, interval, max_staleness):
+        self._plugin = plugin
+        self._interval = interval
+        self._max_staleness = max_staleness
+        self._loop = None
+        # Start of the last successful synchronization known, by any server
+        self._last_sync = None
+        # Statistics about the synchronization, see get_stats
+        self._last_duration = None
+        self._last_changes = 0
+        self._failures = 0
+
+    def start(self):
+        self._loop = loopingcall.LoopingCall(self._synchronize)
+        self._loop.start(interval=self._interval)
+
+    def stop(self):
+        if self._loop:
+            self._loop.stop()
+            self._loop = None
+
+    def _is_recent(self, last_sync):
+        return (last_sync is not None and
+                not timeutils.is_older_than(last_sync, self._max_staleness))
+
+    def is_fresh(self):
+        """Returns True if the status in the database can be trusted.
+
+        The database is only read once the last synchronization known is
+        too old.
+        """
+        if not self._is_recent(self._last_sync):
+            self._last_sync = nicira_db.get_last_sync_time(None)
+        return self._is_recent(self._last_sync)
+
+    def _get_lag(self):
+        if self._last_sync is not None:
+            return timeutils.delta_seconds(self._last_sync,
+                                           timeutils.utcnow())
+
+    def get_stats(self):
+        """Returns metrics about the synchronization.
+
+        'lag' is the number of seconds elapsed since the start of the last
+        successful synchronization, None if there was none yet.
+        """
+        return {'lag': self._get_lag(),
+                'last_duration': self._last_duration,
+                'last_changes': self._last_changes,
+                'failures': self._failures}
+
+    def _synchronize(self):
+        try:
+            self.synchronize()
+        except Exception:
+            self._failures += 1
+            LOG.exception(_("Unable to synchronize operational status with "
+                            "NVP. Sync lag: %s seconds"), self._get_lag())
+
+    def synchronize(self):
+        started = timeutils.utcnow()
+        context = q_context.get_admin_context()
+        external_ids = self._external_network_ids(context)
+        networks = self._get_networks(context, external_ids)
+        ports = self._get_ports(context, external_ids)
+        routers = self._get_routers(context)
+
+        lswitches = self._fetch_all(nvplib._build_uri_path(
+            nvplib.LSWITCH_RESOURCE, fields=LSWITCH_FIELDS,
+            relations='LogicalSwitchStatus'))
+        lports = self._fetch_all(nvplib._build_uri_path(
+            nvplib.LSWITCHPORT_RESOURCE, parent_resource_id='*',
+            fields=LPORT_FIELDS, relations='LogicalPortStatus',
+            filters={'tag_scope': 'q_port_id'}))
+        lrouters = self._fetch_all(nvplib._build_uri_path(
+            nvplib.LROUTER_RESOURCE, fields=LROUTER_FIELDS,
+            relations='LogicalRouterStatus'))
+
+        with context.session.begin(subtransactions=True):
+            changes = (self._sync_networks(context, networks, lswitches) +
+                       self._sync_ports(context, ports, lports) +
+                       self._sync_routers(context, routers, lrouters))
+            nicira_db.set_last_sync_time(context.session, cfg.CONF.host,
+                                         started)
+        # The lag reached before this synchronization completed
+        lag = self._get_lag()
+        self._last_sync = started
+        self._last_duration = timeutils.delta_seconds(started,
+                                                      timeutils.utcnow())
+        self._last_changes = changes
+        LOG.info(_("Synchronized operational status with NVP in "
+                   "%(duration)s seconds, %(changes)s resources updated. "
+                   "Sync lag: %(lag)s seconds"),
+                 {'duration': self._last_duration, 'changes': changes,
+                  'lag': lag})
+
+    def _fetch_all(self, path):
+        results = []
+        for cluster in self._plugin.clusters.itervalues():
+            results.extend(nvplib.get_all_query_pages(path, cluster))
+        return results
+
+    def _external_network_ids(self, context):
+        query = context.session.query(l3_db.ExternalNetwork.network_id)
+        return set(network_id for (network_id,) in query)
+
+    def _get_networks(self, context, external_ids):
+        query = context.session.query(models_v2.Network.id,
+                                      models_v2.Network.status)
+        return dict((network_id, status) for network_id, status in query
+                    if network_id not in external_ids)
+
+    def _get_ports(self, context, external_ids):
+        query = context.session.query(
+            models_v2.Port.id, models_v2.Port.status,
+            models_v2.Port.admin_state_up).filter(
+                ~models_v2.Port.device_owner.in_(UNMAPPED_DEVICE_OWNERS))
+        if external_ids:
+            query = query.filter(
+                ~models_v2.Port.network_id.in_(external_ids))
+        return dict((port_id, (status, admin_state_up))
+                    for port_id, status, admin_state_up in query)
+
+    def _get_routers(self, context):
+        query = context.session.query(l3_db.Router.id, l3_db.Router.status)
+        return dict(query.all())
+
+    def _update(self, context, model, id, old, new):
+        """Updates a row unless it was changed since it was read."""
+        query = context.session.query(model).filter_by(id=id, **old)
+        return query.update(new, synchronize_session=False)
+
+    def _sync_networks(self, context, networks, lswitches):
+        # A network is up only if all of its logical switches are
+        net_status = {}
+        for lswitch in lswitches:
+            net_ids = [lswitch['uuid']]
+            net_ids.extend(tag['tag'] for tag in lswitch.get('tags', [])
+                           if tag['scope'] == 'quantum_net_id')
+            fabric_status = lswitch['_relations'][
+                'LogicalSwitchStatus']['fabric_status']
+            for net_id in net_ids:
+                net_status[net_id] = (net_status.get(net_id, True) and
+                                      fabric_status)
+
+        changes = 0
+        for network_id, old_status in networks.iteritems():
+            if network_id not in net_status:
+                status = constants.NET_STATUS_ERROR
+            elif net_status[network_id]:
+                status = constants.NET_STATUS_ACTIVE
+            else:
+                status = constants.NET_STATUS_DOWN
+            if status != old_status:
+                changes += self._update(context, models_v2.Network,
+                                        network_id, {'status': old_status},
+                                        {'status': status})
+        return changes
+
+    def _sync_ports(self, context, ports, lports):
+        nvp_lports = {}
+        for lport in lports:
+            for tag in lport['tags']:
+                if tag['scope'] == 'q_port_id':
+                    nvp_lports[tag['tag']] = lport
+
+        changes = 0
+        for port_id, (old_status, old_admin_state_up) in ports.iteritems():
+            lport = nvp_lports.get(port_id)
+            admin_state_up = old_admin_state_up
+            if not lport:
+                status = constants.PORT_STATUS_ERROR
+            else:
+                admin_state_up = lport['admin_status_enabled']
+                if lport['_relations']['LogicalPortStatus'][
+                        'fabric_status_up']:
+                    status = constants.PORT_STATUS_ACTIVE
+                else:
+                    status = constants.PORT_STATUS_DOWN
+            if (status != old_status or
+                admin_state_up != old_admin_state_up):
+                changes += self._update(
+                    context, models_v2.Port, port_id,
+                    {'status': old_status,
+                     'admin_state_up': old_admin_state_up},
+                    {'status': status, 'admin_state_up': admin_state_up})
+        return changes
+
+    def _sync_routers(self, context, routers, lrouters):
+        nvp_lrouters = dict((lrouter['uuid'], lrouter)
+                            for lrouter in lrouters)
+        changes = 0
+        for router_id, old_status in routers.iteritems():
+            lrouter = nvp_lrouters.get(router_id)
+            if not lrouter:
+                status = constants.NET_STATUS_ERROR
+            elif lrouter['_relations']['LogicalRouterStatus'][
+                    'fabric_status']:
+                status = constants.NET_STATUS_ACTIVE
+            else:
+                status = constants.NET_STATUS_DOWN
+            if status != old_status:
+                changes += self._update(context, l3_db.Router, router_id,
+                                        {'status': old_status},
+                                        {'status': status})
+        return changes
@@ -28,6 +28,7 @@ from oslo.config import cfg
 
 from quantum.agent.linux import ip_lib
 from quantum.agent.linux import ovs_lib
+from quantum.agent.linux import ovsdb_monitor
 from quantum.agent.linux import utils
 from quantum.agent import rpc as agent_rpc
 from quantum.agent import securitygroups_rpc as sg_rpc
@@ -152,7 +153,8 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
 
     def __init__(self, integ_br, tun_br, local_ip,
                  bridge_mappings, root_helper,
-                 polling_interval, enable_tunneling):
+                 polling_interval, enable_tunneling,
+                 minimize_polling=False, full_polling_interval=60):
         '''Constructor.
 
         :param integ_br: name of the integration bridge.
@@ -162,6 +164,10 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         :param root_helper: utility to use when running shell cmds.
         :param polling_interval: interval (secs) to poll DB.
         :param enable_tunneling: if True enable GRE networks.
+        :param minimize_polling: if True only poll the ports when ovsdb
+               reports an interface change.
+        :param full_polling_interval: interval (secs) after which the ports
+               are polled anyway when minimize_polling is set.
         '''
         self.root_helper = root_helper
         self.available_local_vlans = set(
@@ -172,6 +178,14 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         self.local_vlan_map = {}
 
         self.polling_interval = polling_interval
+        self.full_polling_interval = full_polling_interval
+        self.ovsdb_monitor = None
+        if minimize_polling:
+            self.ovsdb_monitor = ovsdb_monitor.InterfaceMonitor(root_helper)
+        self.last_poll = None
+        self.last_monitor_start = None
+        # Devices whose interface was updated since the last poll
+        self.updated_devices = set()
 
         self.enable_tunneling = enable_tunneling
         self.local_ip = local_ip
@@ -575,11 +589,44 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
             int_veth.link.set_up()
             phys_veth.link.set_up()
 
+    def ports_changed(self):
+        """Returns True if the integration bridge ports must be polled.
+
+        Without an ovsdb monitor the ports are always polled. Otherwise they
+        are polled when an interface was added, removed or updated, when
+        the last poll is older than full_polling_interval, and while the
+        monitor is not running.
+        """
+        if not self.ovsdb_monitor:
+            return True
+        now = time.time()
+        if not self.ovsdb_monitor.is_active():
+            if (self.last_monitor_start is None or
+                now - self.last_monitor_start >= self.full_polling_interval):
+                LOG.info(_("Starting the ovsdb monitor"))
+                self.last_monitor_start = now
+                self.ovsdb_monitor.start()
+            return True
+        changed = False
+        for event in self.ovsdb_monitor.get_events():
+            changed = True
+            device = event['external_ids'].get('iface-id')
+            if event['action'] == 'updated' and device:
+                self.updated_devices.add(device)
+        return (changed or self.last_poll is None or
+                now - self.last_poll >= self.full_polling_interval)
+
     def update_ports(self, registered_ports):
+        self.last_poll = time.time()
         ports = self.int_br.get_vif_port_set()
-        if ports == registered_ports:
+        # Ports updated in place, e.g. with a new ofport, are bound again
+        updated = set()
+        if self.updated_devices:
+            updated = self.updated_devices & registered_ports & ports
+            self.updated_devices = set()
+        if ports == registered_ports and not updated:
             return
-        added = ports - registered_ports
+        added = (ports - registered_ports) | updated
         removed = registered_ports - ports
         return {'current': ports,
                 'added': added,
@@ -597,20 +644,20 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
             LOG.debug(_("No VIF port for port %s defined on agent."), port_id)
 
     def treat_devices_added(self, devices):
-        resync = False
         self.sg_agent.prepare_devices_filter(devices)
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"), locals())
+            # resync is needed
+            return True
+        vif_ports = self.int_br.get_vif_ports_by_id()
+        for details in devices_details_list:
+            device = details['device']
             LOG.info(_("Port %s added"), device)
-            try:
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"), locals())
-                resync = True
-                continue
-            port = self.int_br.get_vif_port_by_id(details['device'])
+            port = vif_ports.get(device)
             if 'port_id' in details:
                 LOG.info(_("Port %(device)s updated. Details: %(details)s"),
                          locals())
@@ -624,29 +671,28 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
                 LOG.debug(_("Device %s not defined on plugin"), device)
                 if (port and int(port.ofport) != -1):
                     self.port_dead(port)
-        return resync
+        return False
 
     def treat_devices_removed(self, devices):
-        resync = False
         self.sg_agent.remove_devices_filter(devices)
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.update_devices_down(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      locals())
+            # resync is needed
+            return True
+        for details in devices_details_list:
+            device = details['device']
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          locals())
-                resync = True
-                continue
             if details['exists']:
                 LOG.info(_("Port %s updated."), device)
                 # Nothing to do regarding local networking
             else:
                 LOG.debug(_("Device %s not defined on plugin"), device)
                 self.port_unbound(device)
-        return resync
+        return False
 
     def process_network_ports(self, port_info):
         resync_a = False
@@ -681,6 +727,7 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
         while True:
             try:
                 start = time.time()
+                poll = sync
                 if sync:
                     LOG.info(_("Agent out of sync with plugin!"))
                     ports.clear()
@@ -691,7 +738,9 @@ class OVSQuantumAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
                     LOG.info(_("Agent tunnel out of sync with plugin!"))
                     tunnel_sync = self.tunnel_sync()
 
-                port_info = self.update_ports(ports)
+                port_info = None
+                if self.ports_changed() or poll:
+                    port_info = self.update_ports(ports)
 
                 # notify plugin about port deltas
                 if port_info:
@@ -738,6 +787,8 @@ def create_agent_config_map(config):
         root_helper=config.AGENT.root_helper,
         polling_interval=config.AGENT.polling_interval,
         enable_tunneling=config.OVS.enable_tunneling,
+        minimize_polling=config.AGENT.minimize_polling,
+        full_polling_interval=config.AGENT.full_polling_interval,
     )
 
     if kwargs['enable_tunneling'] and not kwargs['local_ip']:
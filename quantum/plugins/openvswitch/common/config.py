@@ -58,6 +58,13 @@ agent_opts = [
     cfg.IntOpt('polling_interval', default=2,
                help=_("The number of seconds the agent will wait between "
                       "polling for local device changes.")),
+    cfg.BoolOpt('minimize_polling', default=False,
+                help=_("Monitor ovsdb for interface changes, and only poll "
+                       "the integration bridge ports when they changed.")),
+    cfg.IntOpt('full_polling_interval', default=60,
+               help=_("The number of seconds after which the agent polls "
+                      "the integration bridge ports even though ovsdb "
+                      "reported no change, when minimize_polling is set.")),
 ]
 
 
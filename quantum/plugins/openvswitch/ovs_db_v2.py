@@ -24,6 +24,8 @@ from quantum.common import exceptions as q_exc
 import quantum.db.api as db
 from quantum.db import models_v2
 from quantum.db import securitygroups_db as sg_db
+from quantum.db import securitygroups_rpc_base as sg_db_rpc
+from quantum.db import sqlalchemyutils
 from quantum.extensions import securitygroup as ext_sg
 from quantum import manager
 from quantum.openstack.common import log as logging
@@ -48,6 +50,15 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    session = session or db.get_session()
+    query = session.query(ovs_models_v2.NetworkBinding)
+    return dict((binding.network_id, binding) for binding in
+                sqlalchemyutils.query_in(
+                    query, ovs_models_v2.NetworkBinding.network_id,
+                    network_ids))
+
+
 def add_network_binding(session, network_id, network_type,
                         physical_network, segmentation_id):
     with session.begin(subtransactions=True):
@@ -311,6 +322,13 @@ def get_port(port_id):
     return port
 
 
+def get_ports(port_ids):
+    session = db.get_session()
+    query = session.query(models_v2.Port)
+    return dict((port.id, port) for port in
+                sqlalchemyutils.query_in(query, models_v2.Port.id, port_ids))
+
+
 def get_port_from_device(port_id):
     """Get port from database"""
     LOG.debug(_("get_port_with_securitygroups() called:port_id=%s"), port_id)
@@ -337,6 +355,12 @@ def get_port_from_device(port_id):
     return port_dict
 
 
+def get_ports_from_devices(port_ids):
+    """Get ports with their security groups from database"""
+    LOG.debug(_("get_ports_from_devices() called:port_ids=%s"), port_ids)
+    return sg_db_rpc.get_ports_from_port_ids(db.get_session(), port_ids)
+
+
 def set_port_status(port_id, status):
     session = db.get_session()
     try:
@@ -348,6 +372,14 @@ def set_port_status(port_id, status):
         raise q_exc.PortNotFound(port_id=port_id)
 
 
+def set_ports_status(port_ids, status):
+    session = db.get_session()
+    with session.begin():
+        sqlalchemyutils.update_in(session.query(models_v2.Port),
+                                  models_v2.Port.id, port_ids,
+                                  {'status': status})
+
+
 def get_tunnel_endpoints():
     session = db.get_session()
     try:
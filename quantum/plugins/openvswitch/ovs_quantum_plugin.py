@@ -66,8 +66,9 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
     # history
     #   1.0 Initial version
     #   1.1 Support Security Group RPC
+    #   1.2 Support get_devices_details_list and update_devices_down
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.2'
 
     def __init__(self, notifier):
         self.notifier = notifier
@@ -90,6 +91,13 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             port['device'] = device
         return port
 
+    @classmethod
+    def get_ports_from_devices(cls, devices):
+        ports = ovs_db_v2.get_ports_from_devices(devices)
+        for device, port in ports.items():
+            port['device'] = device
+        return ports
+
     def get_device_details(self, rpc_context, **kwargs):
         """Agent requests device details"""
         agent_id = kwargs.get('agent_id')
@@ -115,6 +123,41 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests the details of several devices at once"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices')
+        LOG.debug(_("Devices %(devices)s details requested from %(agent_id)s"),
+                  locals())
+        ports = ovs_db_v2.get_ports(devices)
+        bindings = ovs_db_v2.get_network_bindings(
+            None, set(port['network_id'] for port in ports.values()))
+        entries = []
+        new_status = {q_const.PORT_STATUS_ACTIVE: [],
+                      q_const.PORT_STATUS_DOWN: []}
+        for device in devices:
+            port = ports.get(device)
+            if not port:
+                entries.append({'device': device})
+                LOG.debug(_("%s can not be found in database"), device)
+                continue
+            binding = bindings[port['network_id']]
+            entries.append({'device': device,
+                            'network_id': port['network_id'],
+                            'port_id': port['id'],
+                            'admin_state_up': port['admin_state_up'],
+                            'network_type': binding.network_type,
+                            'segmentation_id': binding.segmentation_id,
+                            'physical_network': binding.physical_network})
+            status = (q_const.PORT_STATUS_ACTIVE if port['admin_state_up']
+                      else q_const.PORT_STATUS_DOWN)
+            if port['status'] != status:
+                new_status[status].append(port['id'])
+        for status, port_ids in new_status.items():
+            if port_ids:
+                ovs_db_v2.set_ports_status(port_ids, status)
+        return entries
+
     def update_device_down(self, rpc_context, **kwargs):
         """Device no longer exists on agent"""
         # (TODO) garyk - live migration and port status
@@ -135,6 +178,20 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             LOG.debug(_("%s can not be found in database"), device)
         return entry
 
+    def update_devices_down(self, rpc_context, **kwargs):
+        """Devices no longer exist on agent"""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices')
+        LOG.debug(_("Devices %(devices)s no longer exist on %(agent_id)s"),
+                  locals())
+        ports = ovs_db_v2.get_ports(devices)
+        ovs_db_v2.set_ports_status(
+            [port['id'] for port in ports.values()
+             if port['status'] != q_const.PORT_STATUS_DOWN],
+            q_const.PORT_STATUS_DOWN)
+        return [{'device': device, 'exists': device in ports}
+                for device in devices]
+
     def update_device_up(self, rpc_context, **kwargs):
         """Device is up on agent"""
         agent_id = kwargs.get('agent_id')
@@ -359,10 +416,19 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     def _enforce_set_auth(self, context, resource, action):
         policy.enforce(context, action, resource)
 
+    def _prefetch_network_dict_provider(self, context, network_ids):
+        return ovs_db_v2.get_network_bindings(context.session, network_ids)
+
+    db_base_plugin_v2.QuantumDbPluginV2.register_dict_prefetch_funcs(
+        attributes.NETWORKS, ['_prefetch_network_dict_provider'])
+
     def _extend_network_dict_provider(self, context, network):
         if self._check_view_auth(context, network, self.network_view):
-            binding = ovs_db_v2.get_network_binding(context.session,
-                                                    network['id'])
+            found, binding = self._get_prefetched(
+                context, '_prefetch_network_dict_provider', network['id'])
+            if not found:
+                binding = ovs_db_v2.get_network_binding(context.session,
+                                                        network['id'])
             network[provider.NETWORK_TYPE] = binding.network_type
             if binding.network_type == constants.TYPE_GRE:
                 network[provider.PHYSICAL_NETWORK] = None
@@ -567,10 +633,12 @@ class OVSQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
             nets = super(OVSQuantumPluginV2,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_provider(context, net)
-                self._extend_network_dict_l3(context, net)
-                self._extend_network_dict_multihost(context, net)
+            with self._dict_extension_prefetch(context, attributes.NETWORKS,
+                                               nets):
+                for net in nets:
+                    self._extend_network_dict_provider(context, net)
+                    self._extend_network_dict_l3(context, net)
+                    self._extend_network_dict_multihost(context, net)
         return [self._fields(net, fields) for net in nets]
 
     def create_port(self, context, port):
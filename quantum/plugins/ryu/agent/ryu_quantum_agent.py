@@ -112,29 +112,27 @@ class OVSBridge(ovs_lib.OVSBridge):
 
     def _get_ports(self, get_port):
         ports = []
-        port_names = self.get_port_name_list()
-        for name in port_names:
-            if self.get_ofport(name) < 0:
+        interfaces = self.get_interfaces(['ofport', 'external_ids',
+                                          'options'])
+        for iface in interfaces:
+            if iface['ofport'] < 0:
                 continue
-            port = get_port(name)
+            port = get_port(iface)
             if port:
                 ports.append(port)
 
         return ports
 
-    def _get_external_port(self, name):
+    def _get_external_port(self, iface):
         # exclude vif ports
-        external_ids = self.db_get_map("Interface", name, "external_ids")
-        if external_ids:
+        if iface['external_ids']:
             return
 
         # exclude tunnel ports
-        options = self.db_get_map("Interface", name, "options")
-        if "remote_ip" in options:
+        if "remote_ip" in iface['options']:
             return
 
-        ofport = self.get_ofport(name)
-        return VifPort(name, ofport, None, None, self)
+        return VifPort(iface['name'], iface['ofport'], None, None, self)
 
     def get_external_ports(self):
         return self._get_ports(self._get_external_port)
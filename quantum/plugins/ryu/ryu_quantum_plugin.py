@@ -21,6 +21,7 @@ from ryu.app import client
 from ryu.app import rest_nw_id
 
 from quantum.agent import securitygroups_rpc as sg_rpc
+from quantum.api.v2 import attributes
 from quantum.common import constants as q_const
 from quantum.common import exceptions as q_exc
 from quantum.common import rpc as q_rpc
@@ -66,6 +67,13 @@ class RyuRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
             port['device'] = device
         return port
 
+    @classmethod
+    def get_ports_from_devices(cls, devices):
+        ports = db_api_v2.get_ports_from_devices(devices)
+        for device, port in ports.items():
+            port['device'] = device
+        return ports
+
 
 class AgentNotifierApi(proxy.RpcProxy,
                        sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -191,8 +199,10 @@ class RyuQuantumPluginV2(db_base_plugin_v2.QuantumDbPluginV2,
     def get_networks(self, context, filters=None, fields=None):
         nets = super(RyuQuantumPluginV2, self).get_networks(context, filters,
                                                             None)
-        for net in nets:
-            self._extend_network_dict_l3(context, net)
+        with self._dict_extension_prefetch(context, attributes.NETWORKS,
+                                           nets):
+            for net in nets:
+                self._extend_network_dict_l3(context, net)
 
         return [self._fields(net, fields) for net in nets]
 
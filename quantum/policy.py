@@ -25,35 +25,66 @@ from quantum.api.v2 import attributes
 from quantum.common import exceptions
 import quantum.common.utils as utils
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import loopingcall
 from quantum.openstack.common import policy
 
 
 LOG = logging.getLogger(__name__)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+_POLICY_WATCHER = None
+# Maps actions to their compiled match rules (see _compile_match_rule)
+_MATCH_RULES = {}
 cfg.CONF.import_opt('policy_file', 'quantum.common.config')
+cfg.CONF.import_opt('policy_reload_interval', 'quantum.common.config')
 
 
 def reset():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _POLICY_WATCHER
+    global _MATCH_RULES
+    if _POLICY_WATCHER:
+        _POLICY_WATCHER.stop()
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _POLICY_WATCHER = None
+    _MATCH_RULES = {}
     policy.reset()
 
 
 def init():
+    """Load the policy file, unless it has already been loaded.
+
+    Changes to the file are then picked up by a timer every
+    policy_reload_interval seconds, so that checking a policy does not
+    access the file system.
+    """
     global _POLICY_PATH
-    global _POLICY_CACHE
-    if not _POLICY_PATH:
-        _POLICY_PATH = utils.find_config_file({}, cfg.CONF.policy_file)
-        if not _POLICY_PATH:
-            raise exceptions.PolicyNotFound(path=cfg.CONF.policy_file)
-    # pass _set_brain to read_cached_file so that the policy brain
-    # is reset only if the file has changed
-    LOG.debug(_("loading policy file at %s"), _POLICY_PATH)
-    utils.read_cached_file(_POLICY_PATH, _POLICY_CACHE,
+    global _POLICY_WATCHER
+    if _POLICY_PATH:
+        return
+    policy_path = utils.find_config_file({}, cfg.CONF.policy_file)
+    if not policy_path:
+        raise exceptions.PolicyNotFound(path=cfg.CONF.policy_file)
+    LOG.debug(_("loading policy file at %s"), policy_path)
+    utils.read_cached_file(policy_path, _POLICY_CACHE,
                            reload_func=_set_rules)
+    _POLICY_PATH = policy_path
+    interval = cfg.CONF.policy_reload_interval
+    if interval > 0:
+        _POLICY_WATCHER = loopingcall.LoopingCall(_reload_if_modified)
+        _POLICY_WATCHER.start(interval=interval, initial_delay=interval)
+
+
+def _reload_if_modified():
+    # pass _set_rules to read_cached_file so that the policy brain
+    # is reset only if the file has changed
+    try:
+        utils.read_cached_file(_POLICY_PATH, _POLICY_CACHE,
+                               reload_func=_set_rules)
+    except Exception:
+        LOG.exception(_("Unable to reload policy file %s"), _POLICY_PATH)
 
 
 def get_resource_and_action(action):
@@ -63,8 +94,14 @@ def get_resource_and_action(action):
 
 
 def _set_rules(data):
+    global _MATCH_RULES
     default_rule = 'default'
-    policy.set_rules(policy.Rules.load_json(data, default_rule))
+    rules = policy.Rules.load_json(data, default_rule)
+    # Actions are the rules whose name does not refer to an attribute
+    match_rules = dict((action, _compile_match_rule(action))
+                       for action in rules if ':' not in action)
+    policy.set_rules(rules)
+    _MATCH_RULES = match_rules
 
 
 def _is_attribute_explicitly_set(attribute_name, resource, target):
@@ -75,55 +112,83 @@ def _is_attribute_explicitly_set(attribute_name, resource, target):
             target[attribute_name] != resource[attribute_name]['default'])
 
 
-def _build_target(action, original_target, plugin, context):
+def _build_target(action, original_target, plugin, context,
+                  parent_tenants=None):
     """Augment dictionary of target attributes for policy engine.
 
     This routine adds to the dictionary attributes belonging to the
-    "parent" resource of the targeted one.
+    "parent" resource of the targeted one. When a parent_tenants dict is
+    passed, the tenant of each parent resource is retrieved only once and
+    cached in it.
     """
-    target = original_target.copy()
     resource, _a = get_resource_and_action(action)
     hierarchy_info = attributes.RESOURCE_HIERARCHY_MAP.get(resource, None)
-    if hierarchy_info and plugin:
-        # use the 'singular' version of the resource name
-        parent_resource = hierarchy_info['parent'][:-1]
-        parent_id = hierarchy_info['identified_by']
+    if not (hierarchy_info and plugin):
+        return original_target
+    target = original_target.copy()
+    # use the 'singular' version of the resource name
+    parent_resource = hierarchy_info['parent'][:-1]
+    parent_id = target[hierarchy_info['identified_by']]
+    if parent_tenants is not None and parent_id in parent_tenants:
+        parent_tenant_id = parent_tenants[parent_id]
+    else:
         f = getattr(plugin, 'get_%s' % parent_resource)
         # f *must* exist, if not found it is better to let quantum explode
         # Note: we do not use admin context
-        data = f(context, target[parent_id], fields=['tenant_id'])
-        target['%s_tenant_id' % parent_resource] = data['tenant_id']
+        data = f(context, parent_id, fields=['tenant_id'])
+        parent_tenant_id = data['tenant_id']
+        if parent_tenants is not None:
+            parent_tenants[parent_id] = parent_tenant_id
+    target['%s_tenant_id' % parent_resource] = parent_tenant_id
     return target
 
 
-def _build_match_rule(action, target):
-    """Create the rule to match for a given action.
+def _compile_match_rule(action):
+    """Create the rules to match for a given action.
 
-    The policy rule to be matched is built in the following way:
-    1) add entries for matching permission on objects
-    2) add an entry for the specific action (e.g.: create_network)
-    3) add an entry for attributes of a resource for which the action
+    The policy rule to be matched is made of:
+    1) an entry for the specific action (e.g.: create_network)
+    2) entries for attributes of a resource for which the action
        is being executed (e.g.: create_network:shared)
 
-    """
+    The rule for an attribute is matched only when the target explicitly
+    sets the attribute. Rules reference policies by name, so they do not
+    need to be compiled again when the policy file is reloaded.
 
-    match_rule = policy.RuleCheck('rule', action)
+    :return: a tuple made of the action rule and of a list of
+        (attribute name, resource attributes, attribute rule) tuples.
+    """
+    attribute_rules = []
     resource, is_write = get_resource_and_action(action)
-    if is_write:
-        # assigning to variable with short name for improving readability
-        res_map = attributes.RESOURCE_ATTRIBUTE_MAP
-        if resource in res_map:
-            for attribute_name in res_map[resource]:
-                if _is_attribute_explicitly_set(attribute_name,
-                                                res_map[resource],
-                                                target):
-                    attribute = res_map[resource][attribute_name]
-                    if 'enforce_policy' in attribute and is_write:
-                        attr_rule = policy.RuleCheck('rule', '%s:%s' %
-                                                     (action, attribute_name))
-                        match_rule = policy.AndCheck([match_rule, attr_rule])
-
-    return match_rule
+    res_map = attributes.RESOURCE_ATTRIBUTE_MAP
+    if is_write and resource in res_map:
+        for attribute_name, attribute in res_map[resource].iteritems():
+            if 'enforce_policy' in attribute and 'default' in attribute:
+                attr_rule = policy.RuleCheck('rule', '%s:%s' %
+                                             (action, attribute_name))
+                attribute_rules.append((attribute_name, res_map[resource],
+                                        attr_rule))
+    return policy.RuleCheck('rule', action), attribute_rules
+
+
+def _get_match_rule(action):
+    try:
+        return _MATCH_RULES[action]
+    except KeyError:
+        # Actions not defined in the policy file fall back to the default
+        # rule; compile them only once as well
+        return _MATCH_RULES.setdefault(action, _compile_match_rule(action))
+
+
+def _check_match_rule(action, target, credentials):
+    action_rule, attribute_rules = _get_match_rule(action)
+    if not action_rule(target, credentials):
+        return False
+    for attribute_name, resource, attr_rule in attribute_rules:
+        if (_is_attribute_explicitly_set(attribute_name, resource, target)
+                and not attr_rule(target, credentials)):
+            return False
+    return True
 
 
 @policy.register('field')
@@ -175,9 +240,36 @@ def check(context, action, target, plugin=None):
     """
     init()
     real_target = _build_target(action, target, plugin, context)
-    match_rule = _build_match_rule(action, real_target)
     credentials = context.to_dict()
-    return policy.check(match_rule, real_target, credentials)
+    return _check_match_rule(action, real_target, credentials)
+
+
+def check_many(context, action, targets, plugin=None):
+    """Verifies that the action is valid on each of the targets.
+
+    This is equivalent to calling check for every target, but the
+    credentials are built only once, and the tenant of parent resources is
+    retrieved once for each distinct parent.
+
+    :param context: quantum context
+    :param action: string representing the action to be checked
+        this should be colon separated for clarity.
+    :param targets: list of dictionaries representing the objects of the
+        action
+    :param plugin: quantum plugin used to retrieve information required
+        for augmenting the targets
+
+    :return: Returns a list of booleans, True for each target on which
+        access is permitted.
+    """
+    init()
+    credentials = context.to_dict()
+    parent_tenants = {}
+    return [_check_match_rule(action,
+                              _build_target(action, target, plugin, context,
+                                            parent_tenants),
+                              credentials)
+            for target in targets]
 
 
 def enforce(context, action, target, plugin=None):
@@ -197,7 +289,7 @@ def enforce(context, action, target, plugin=None):
 
     init()
     real_target = _build_target(action, target, plugin, context)
-    match_rule = _build_match_rule(action, real_target)
     credentials = context.to_dict()
-    return policy.check(match_rule, real_target, credentials,
-                        exceptions.PolicyNotAuthorized, action=action)
+    if not _check_match_rule(action, real_target, credentials):
+        raise exceptions.PolicyNotAuthorized(action=action)
+    return True
@@ -0,0 +1,120 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import binascii
+import json
+import shlex
+import socket
+import threading
+
+from eventlet.green import subprocess
+
+from quantum.common import utils
+from quantum.openstack.common import log as logging
+from quantum.rootwrap import daemon
+
+LOG = logging.getLogger(__name__)
+
+
+class Client(object):
+    """Runs commands through a quantum-rootwrap-daemon.
+
+    The daemon is started with daemon_cmd on the first command, and
+    started again if it died.
+    """
+
+    def __init__(self, daemon_cmd):
+        self.daemon_cmd = shlex.split(daemon_cmd)
+        self._process = None
+        self._socket_path = None
+        self._authkey = None
+        self._lock = threading.Lock()
+
+    def _initialize(self):
+        if self._process:
+            # The previous daemon exits once its stdin is closed
+            self._process.stdin.close()
+            self._process = None
+        LOG.debug(_("Starting the root helper daemon: %s"), self.daemon_cmd)
+        process = utils.subprocess_popen(self.daemon_cmd,
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE)
+        socket_path = process.stdout.readline().strip()
+        authkey = process.stdout.readline().strip()
+        if not authkey:
+            raise RuntimeError(_("Unable to start the root helper daemon "
+                                 "%(cmd)s: %(stderr)s") %
+                               {'cmd': self.daemon_cmd,
+                                'stderr': process.stderr.read()})
+        self._process = process
+        self._socket_path = socket_path
+        self._authkey = binascii.unhexlify(authkey)
+
+    def _connect(self):
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._initialize()
+            process = self._process
+            socket_path = self._socket_path
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+        except Exception:
+            sock.close()
+            raise
+        return process, sock
+
+    def _stop(self, process):
+        with self._lock:
+            # Another command may have started a new daemon already
+            if self._process is process:
+                self._process.stdin.close()
+                self._process = None
+
+    def execute(self, cmd, stdin=None):
+        """Returns the exit code, stdout and stderr of a command.
+
+        Raises RuntimeError if the daemon failed while the command was sent
+        or run. The command is not sent again, it may have run already: the
+        daemon is started again by the next command.
+        """
+        try:
+            process, sock = self._connect()
+        except socket.error:
+            # The daemon is gone, the command was not sent yet
+            LOG.warn(_("Unable to connect to the root helper daemon, "
+                       "starting it again"))
+            with self._lock:
+                self._initialize()
+            process, sock = self._connect()
+        try:
+            daemon.answer_challenge(sock, self._authkey)
+            daemon.send_frame(sock, json.dumps(cmd))
+            daemon.send_frame(sock, stdin or '')
+            returncode = int(daemon.recv_frame(sock))
+            stdout = daemon.recv_frame(sock)
+            stderr = daemon.recv_frame(sock)
+        except (EOFError, socket.error, ValueError,
+                daemon.AuthenticationError) as e:
+            self._stop(process)
+            raise RuntimeError(_("Root helper daemon failed to run "
+                                 "%(cmd)s: %(error)r") %
+                               {'cmd': cmd, 'error': e})
+        finally:
+            sock.close()
+        return returncode, stdout, stderr
@@ -0,0 +1,204 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long-running root wrapper, serving commands over a UNIX socket.
+
+The daemon loads the filters once, then runs the commands sent by its
+clients if they match a filter, exactly like quantum-rootwrap does.
+
+On startup it prints the path of its socket and a random key on stdout,
+which only the process which started it can read. A client must prove
+it knows the key by answering a HMAC challenge before sending a command.
+The daemon exits when its stdin is closed, i.e. when that process exits.
+
+Every message is made of frames, each one prefixed by its length. A
+request is the JSON encoded command and its stdin, a reply is the exit
+code, stdout and stderr of the command.
+"""
+
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import signal
+import socket
+import SocketServer
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+from quantum.rootwrap import wrapper
+
+AUTHKEY_LEN = 32
+CHALLENGE_LEN = 32
+FRAME_HEADER = struct.Struct('!I')
+WELCOME = 'welcome'
+FAILURE = 'failure'
+
+
+class AuthenticationError(Exception):
+    pass
+
+
+def send_frame(sock, data):
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError()
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def recv_frame(sock):
+    (length,) = FRAME_HEADER.unpack(_recv_exactly(sock, FRAME_HEADER.size))
+    return _recv_exactly(sock, length)
+
+
+def _digest(authkey, challenge):
+    return hmac.new(authkey, challenge, hashlib.sha256).digest()
+
+
+def _equal_digests(a, b):
+    """Compares two digests in a time independent of their contents."""
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+def deliver_challenge(sock, authkey):
+    """Returns True if the peer proved it knows authkey."""
+    challenge = os.urandom(CHALLENGE_LEN)
+    send_frame(sock, challenge)
+    if _equal_digests(recv_frame(sock), _digest(authkey, challenge)):
+        send_frame(sock, WELCOME)
+        return True
+    send_frame(sock, FAILURE)
+    return False
+
+
+def answer_challenge(sock, authkey):
+    send_frame(sock, _digest(authkey, recv_frame(sock)))
+    if recv_frame(sock) != WELCOME:
+        raise AuthenticationError(_("Authentication to the root helper "
+                                    "daemon failed"))
+
+
+def _subprocess_setup():
+    # Python installs a SIGPIPE handler by default. This is usually not what
+    # non-Python subprocesses expect.
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+class RootwrapHandler(SocketServer.BaseRequestHandler):
+
+    def handle(self):
+        sock = self.request
+        try:
+            if not deliver_challenge(sock, self.server.authkey):
+                return
+            userargs = json.loads(recv_frame(sock))
+            stdin = recv_frame(sock)
+            returncode, stdout, stderr = self.server.run_one_command(
+                userargs, stdin)
+            send_frame(sock, str(returncode))
+            send_frame(sock, stdout)
+            send_frame(sock, stderr)
+        except (EOFError, socket.error, ValueError, TypeError):
+            # The client went away or sent garbage
+            return
+
+
+class RootwrapServer(SocketServer.ThreadingUnixStreamServer):
+    """Runs the commands matching the filters, each in its own thread."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, filters, authkey):
+        SocketServer.ThreadingUnixStreamServer.__init__(self, socket_path,
+                                                        RootwrapHandler)
+        self.filters = filters
+        self.authkey = authkey
+
+    def run_one_command(self, userargs, stdin=None):
+        """Returns the exit code, stdout and stderr of a command.
+
+        The exit codes are the ones of quantum-rootwrap.
+        """
+        if not userargs:
+            return wrapper.RC_NOCOMMAND, 'No command specified\n', ''
+        userargs = [str(arg) for arg in userargs]
+        filtermatch = wrapper.match_filter(self.filters, userargs)
+        if not filtermatch:
+            return (wrapper.RC_UNAUTHORIZED,
+                    'Unauthorized command: %s\n' % ' '.join(userargs), '')
+        try:
+            obj = subprocess.Popen(filtermatch.get_command(userargs),
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   preexec_fn=_subprocess_setup,
+                                   close_fds=True,
+                                   env=filtermatch.get_environment(userargs))
+        except OSError, e:
+            # quantum-rootwrap dies with a traceback in this case
+            return 1, '', '%s\n' % e
+        stdout, stderr = obj.communicate(stdin or None)
+        return obj.returncode, stdout, stderr
+
+
+def daemon_start(filters):
+    """Serves commands until stdin is closed."""
+    temp_dir = tempfile.mkdtemp(prefix='quantum-rootwrap-')
+    try:
+        socket_path = os.path.join(temp_dir, 'rootwrap.sock')
+        authkey = os.urandom(AUTHKEY_LEN)
+        server = RootwrapServer(socket_path, filters, authkey)
+        # Only the user who started us through sudo may connect
+        os.chmod(socket_path, stat.S_IRUSR | stat.S_IWUSR)
+        uid = int(os.environ.get('SUDO_UID', -1))
+        gid = int(os.environ.get('SUDO_GID', -1))
+        for path in (temp_dir, socket_path):
+            os.chown(path, uid, gid)
+
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        sys.stdout.write('%s\n%s\n' % (socket_path,
+                                       binascii.hexlify(authkey)))
+        sys.stdout.flush()
+        sys.stdout.close()
+        # Wait for the client to exit
+        while sys.stdin.read(4096):
+            pass
+        server.shutdown()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
@@ -17,11 +17,14 @@
 
 import os
 
+import mock
 from mock import patch
+from oslo.config import cfg
 
 import quantum.common.test_lib as test_lib
 from quantum.extensions import portbindings
 from quantum.manager import QuantumManager
+from quantum.plugins.bigswitch import plugin
 from quantum.tests.unit import _test_extension_portbindings as test_bindings
 import quantum.tests.unit.test_db_plugin as test_plugin
 
@@ -111,3 +114,69 @@ class TestBigSwitchProxySync(BigSwitchProxyPluginV2TestCase):
         plugin_obj = QuantumManager.get_plugin()
         result = plugin_obj._send_all_data()
         self.assertEqual(result[0], 200)
+
+
+class TestBigSwitchProxyTopologySync(BigSwitchProxyPluginV2TestCase):
+
+    def setUp(self):
+        cfg.CONF.set_override('sync_data', True, 'RESTPROXY')
+        super(TestBigSwitchProxyTopologySync, self).setUp()
+        self.plugin = QuantumManager.get_plugin()
+        self.server = self.plugin.servers.servers[0]
+        self.calls = []
+        self.server.rest_call = mock.Mock(side_effect=self._rest_call)
+
+    def _rest_call(self, action, resource, data, headers):
+        self.calls.append((action, resource))
+        return (200, None, None, None)
+
+    def _sync(self):
+        self.calls = []
+        self.assertTrue(self.plugin._sync_server(self.server))
+        return self.calls
+
+    def test_initial_sync_sends_all_data(self):
+        self.assertEqual(self.server.topology_version, 0)
+        self.assertIs(self.plugin.servers.active_server, self.server)
+        self.server.topology_version = None
+        self.assertEqual(self._sync(), [('PUT', '/topology')])
+
+    def test_sync_sends_changes(self):
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            tenant_id = subnet['subnet']['tenant_id']
+            self.assertEqual(
+                self._sync(),
+                [('PUT', plugin.NETWORKS_PATH % (tenant_id, net_id))])
+            version = self.server.topology_version
+            with self.port(subnet=subnet) as port:
+                port_id = port['port']['id']
+                self.assertEqual(
+                    self._sync(),
+                    [('PUT', plugin.PORTS_PATH % (tenant_id, net_id,
+                                                  port_id)),
+                     ('DELETE', plugin.ATTACHMENT_PATH % (tenant_id, net_id,
+                                                          port_id))])
+                self.assertTrue(self.server.topology_version > version)
+            self.assertEqual(
+                self._sync(),
+                [('DELETE', plugin.PORTS_PATH % (tenant_id, net_id,
+                                                 port_id))])
+        self.assertEqual(
+            self._sync(),
+            [('DELETE', plugin.NETWORKS_PATH % (tenant_id, net_id))])
+        self.assertEqual(self._sync(), [])
+
+    def test_sync_sends_all_data_when_changes_were_dropped(self):
+        cfg.CONF.set_override('sync_journal_size', 1, 'RESTPROXY')
+        with self.subnet():
+            self.assertEqual(self._sync(), [('PUT', '/topology')])
+
+    def test_refused_change_sends_all_data(self):
+        with self.network():
+            self.server.rest_call.side_effect = None
+            self.server.rest_call.return_value = (500, None, None, None)
+            self.assertFalse(self.plugin._sync_server(self.server))
+            self.assertEqual(self.server.rest_call.call_args[0][:2],
+                             ('PUT', '/topology'))
+            self.server.rest_call.side_effect = self._rest_call
@@ -0,0 +1,214 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+# Copyright 2013 Big Switch Networks, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import BaseHTTPServer
+import json
+import socket
+import SocketServer
+import threading
+
+import mock
+
+from quantum.plugins.bigswitch import plugin
+from quantum.tests import base
+
+
+class ControllerHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        self.rfile.read(int(self.headers.getheader('Content-Length', 0)))
+        self.server.wait_for_requests()
+        body = json.dumps({'path': self.path})
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Close the connection without telling the client
+        self.close_connection = int(self.server.drop_connections)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeController(SocketServer.ThreadingMixIn,
+                     BaseHTTPServer.HTTPServer):
+    """Answers every request, counting the accepted connections."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           ControllerHandler)
+        self.connections = 0
+        self.drop_connections = False
+        # Number of requests answered together, once they all arrived
+        self.parallel_requests = 1
+        self.pending = 0
+        self.timeouts = 0
+        self.answered = threading.Condition()
+
+    def get_request(self):
+        self.connections += 1
+        return BaseHTTPServer.HTTPServer.get_request(self)
+
+    def wait_for_requests(self):
+        with self.answered:
+            self.pending += 1
+            if self.pending < self.parallel_requests:
+                self.answered.wait(2)
+                if self.pending < self.parallel_requests:
+                    self.timeouts += 1
+            else:
+                self.answered.notify_all()
+
+
+class ServerProxyTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ServerProxyTestCase, self).setUp()
+        self.controller = FakeController()
+        thread = threading.Thread(target=self.controller.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.controller.server_close)
+        self.addCleanup(self.controller.shutdown)
+        self.proxy = plugin.ServerProxy(
+            '127.0.0.1', self.controller.server_address[1], False, None,
+            'quantum-id', 10, '/base', 'test', max_connections=2)
+
+    def test_connection_is_reused(self):
+        for i in range(3):
+            ret = self.proxy.rest_call('POST', '/networks', {}, None)
+            self.assertEqual(ret[0], 200)
+            self.assertEqual(ret[3], {'path': '/base/networks'})
+        self.assertEqual(self.controller.connections, 1)
+        self.assertEqual(self.proxy.connections.current_size, 1)
+
+    def test_closed_connection_is_reopened(self):
+        self.controller.drop_connections = True
+        for i in range(2):
+            ret = self.proxy.rest_call('GET', '/networks', '', None)
+            self.assertEqual(ret[0], 200)
+        self.assertEqual(self.controller.connections, 2)
+
+    def test_calls_are_sent_in_parallel(self):
+        self.controller.parallel_requests = 2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            self.proxy.rest_call('GET', '/networks', '', None)))
+            for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([ret[0] for ret in results], [200, 200])
+        self.assertEqual(self.controller.connections, 2)
+        # Both requests arrived before either was answered
+        self.assertEqual(self.controller.timeouts, 0)
+
+    def test_latency_is_recorded(self):
+        self.assertIsNone(self.proxy.latency)
+        self.proxy.rest_call('GET', '/networks', '', None)
+        latency = self.proxy.latency
+        self.assertTrue(latency >= 0)
+        with mock.patch.object(self.proxy.connections, 'request',
+                               side_effect=socket.error()):
+            self.assertEqual(self.proxy.rest_call('GET', '/networks', '',
+                                                  None),
+                             (0, None, None, None))
+        self.assertEqual(self.proxy.latency, latency)
+
+
+class ServerPoolTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ServerPoolTestCase, self).setUp()
+        self.pool = plugin.ServerPool([('server1', 80), ('server2', 80),
+                                       ('server3', 80)],
+                                      False, None, 'quantum-id')
+        self.calls = []
+        self.status = {}
+        for server in self.pool.servers:
+            server.rest_call = mock.Mock(
+                side_effect=self._rest_call(server.server))
+
+    def _rest_call(self, name):
+        def rest_call(action, resource, data, headers):
+            self.calls.append(name)
+            return (self.status.get(name, 200), None, None, None)
+        return rest_call
+
+    def _set_latencies(self, *latencies):
+        for server, latency in zip(self.pool.servers, latencies):
+            server.latency = latency
+
+    def test_fastest_server_is_used(self):
+        self._set_latencies(0.3, 0.1, 0.2)
+        self.assertEqual(self.pool.get('/networks')[0], 200)
+        self.assertEqual(self.calls, ['server2'])
+
+    def test_failed_server_is_used_last(self):
+        self._set_latencies(0.3, 0.1, 0.2)
+        self.status['server2'] = 503
+        self.pool.get('/networks')
+        self.assertTrue(self.pool.servers[1].failed)
+        self.pool.get('/networks')
+        self.assertEqual(self.calls, ['server2', 'server3', 'server3'])
+
+    def test_all_servers_failed(self):
+        self.status = {'server1': 0, 'server2': 503, 'server3': 301}
+        self.assertEqual(self.pool.get('/networks'), (0, None, None, None))
+        self.assertEqual(self.calls, ['server1', 'server2', 'server3'])
+        self.status = {}
+        self.assertEqual(self.pool.get('/networks')[0], 200)
+        self.assertFalse(self.pool.servers[0].failed)
+
+    def test_server_is_synchronized_before_use(self):
+        self._set_latencies(0.3, 0.1, 0.2)
+        synced = []
+
+        def sync_server(server):
+            synced.append(server.server)
+            return True
+        self.pool.sync_server = sync_server
+        self.assertTrue(self.pool.sync())
+        self.assertEqual(synced, ['server2'])
+        self.pool.get('/networks')
+        self.assertEqual(synced, ['server2'])
+        self.assertEqual(self.calls, ['server2'])
+        self.status['server2'] = 503
+        self.pool.get('/networks')
+        self.assertEqual(synced, ['server2', 'server3'])
+        self.assertEqual(self.calls, ['server2', 'server2', 'server3'])
+
+    def test_server_refusing_sync_is_skipped(self):
+        self._set_latencies(0.3, 0.1, 0.2)
+        self.pool.sync_server = lambda server: server.server != 'server2'
+        self.assertEqual(self.pool.get('/networks')[0], 200)
+        self.assertEqual(self.calls, ['server3'])
+        self.assertTrue(self.pool.servers[1].failed)
+        self.assertIs(self.pool.active_server, self.pool.servers[2])
+
+    def test_active_server_is_kept(self):
+        self.pool.sync_server = lambda server: True
+        self._set_latencies(0.3, 0.1, 0.2)
+        self.pool.get('/networks')
+        self._set_latencies(0.3, 0.1, 0.05)
+        self.pool.get('/networks')
+        self.assertEqual(self.calls, ['server2', 'server2'])
@@ -69,7 +69,7 @@ class TestHyperVQuantumAgent(base.BaseTestCase):
                 self.agent._port_unbound(net_uuid)
 
     def test_treat_devices_added_returns_true_for_missing_device(self):
-        attrs = {'get_device_details.side_effect': Exception()}
+        attrs = {'get_devices_details_list.side_effect': Exception()}
         self.agent.plugin_rpc.configure_mock(**attrs)
         self.assertTrue(self.agent._treat_devices_added([{}]))
 
@@ -79,7 +79,7 @@ class TestHyperVQuantumAgent(base.BaseTestCase):
         :param func_name: the function that should be called
         :returns: whether the named function was called
         """
-        attrs = {'get_device_details.return_value': details}
+        attrs = {'get_devices_details_list.return_value': [details]}
         self.agent.plugin_rpc.configure_mock(**attrs)
         with mock.patch.object(self.agent, func_name) as func:
             self.assertFalse(self.agent._treat_devices_added([{}]))
@@ -92,13 +92,13 @@ class TestHyperVQuantumAgent(base.BaseTestCase):
                                                       '_treat_vif_port'))
 
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        attrs = {'update_device_down.side_effect': Exception()}
+        attrs = {'update_devices_down.side_effect': Exception()}
         self.agent.plugin_rpc.configure_mock(**attrs)
         self.assertTrue(self.agent._treat_devices_removed([{}]))
 
     def mock_treat_devices_removed(self, port_exists):
-        details = dict(exists=port_exists)
-        attrs = {'update_device_down.return_value': details}
+        details = dict(device='fake_device', exists=port_exists)
+        attrs = {'update_devices_down.return_value': [details]}
         self.agent.plugin_rpc.configure_mock(**attrs)
         with mock.patch.object(self.agent, '_port_unbound') as func:
             self.assertFalse(self.agent._treat_devices_removed([{}]))
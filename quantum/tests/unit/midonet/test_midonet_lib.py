@@ -236,3 +236,27 @@ class MidonetRuleManagerTestCase(MidonetLibTestCase):
 
         mock_rule_in.delete.assert_called_once_with()
         mock_rule_out.delete.assert_called_once_with()
+
+
+class MidonetPresenceCacheTestCase(base.BaseTestCase):
+
+    def test_add_and_discard(self):
+        cache = midonet_lib.PresenceCache(10)
+        cache.add('Bridge', ['bridge1', 'bridge2'])
+        self.assertIn(('Bridge', 'bridge1'), cache)
+        self.assertNotIn(('Port', 'bridge1'), cache)
+        cache.discard('Bridge', 'bridge1')
+        self.assertNotIn(('Bridge', 'bridge1'), cache)
+        self.assertIn(('Bridge', 'bridge2'), cache)
+
+    def test_expiry(self):
+        cache = midonet_lib.PresenceCache(10)
+        with mock.patch('time.time', return_value=100):
+            cache.add('Bridge', ['bridge1'])
+        with mock.patch('time.time', return_value=111):
+            self.assertNotIn(('Bridge', 'bridge1'), cache)
+
+    def test_disabled(self):
+        cache = midonet_lib.PresenceCache(0)
+        cache.add('Bridge', ['bridge1'])
+        self.assertNotIn(('Bridge', 'bridge1'), cache)
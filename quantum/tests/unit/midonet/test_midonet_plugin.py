@@ -20,6 +20,7 @@
 # @author: Ryu Ishimoto, Midokura Japan KK
 # @author: Tomoe Sugihara, Midokura Japan KK
 
+import contextlib
 import sys
 import uuid
 
@@ -27,6 +28,9 @@ import mock
 from webob import exc as w_exc
 
 import quantum.common.test_lib as test_lib
+from quantum import context
+from quantum import manager
+from quantum.plugins.midonet import midonet_lib
 import quantum.tests.unit.midonet as midonet
 import quantum.tests.unit.test_db_plugin as test_plugin
 
@@ -764,3 +768,76 @@ class TestMidonetPortsV2(test_plugin.TestPortsV2,
 
     def test_update_max_fixed_ips_exceeded(self):
         pass
+
+
+class TestMidonetListLookups(MidonetPluginV2TestCase):
+
+    def setUp(self):
+        super(TestMidonetListLookups, self).setUp()
+        self.mido_api = self.instance.return_value
+        self.bridges = []
+        self.mido_api.add_bridge.return_value.name.return_value.tenant_id\
+            .return_value.create.side_effect = self._create_bridge
+        self.mido_api.get_bridges.side_effect = lambda query: self.bridges
+        self.plugin = manager.QuantumManager.get_plugin()
+
+    def _new_resource(self):
+        resource = mock.Mock()
+        resource.get_id.return_value = str(uuid.uuid4())
+        return resource
+
+    def _create_bridge(self):
+        bridge = self._new_resource()
+        ports = []
+
+        def create_port():
+            port = self._new_resource()
+            ports.append(port)
+            return port
+        bridge.add_exterior_port.return_value.create.side_effect = create_port
+        bridge.get_ports.side_effect = lambda: ports
+        bridge.get_dhcp_subnets.return_value = []
+        self.bridges.append(bridge)
+        return bridge
+
+    def _forget_resources(self):
+        self.plugin.presence = midonet_lib.PresenceCache(10)
+        self.mido_api.reset_mock()
+
+    def test_list_networks_fetches_bridges_once(self):
+        with contextlib.nested(self.network(), self.network(),
+                               self.network()):
+            self._forget_resources()
+            res = self._list('networks')
+            self.assertEqual(len(res['networks']), 3)
+            self.assertEqual(self.mido_api.get_bridges.call_count, 1)
+            self.assertFalse(self.mido_api.get_bridge.called)
+            self._list('networks')
+            self.assertEqual(self.mido_api.get_bridges.call_count, 1)
+
+    def test_list_networks_missing_bridge(self):
+        with self.network():
+            del self.bridges[:]
+            self._forget_resources()
+            req = self.new_list_request('networks')
+            res = req.get_response(self.api)
+            self.assertEqual(res.status_int, w_exc.HTTPNotFound.code)
+
+    def test_list_ports_fetches_ports_by_network(self):
+        self.mido_api.get_bridge.side_effect = lambda id: [
+            b for b in self.bridges if b.get_id() == id][0]
+        for i in range(2):
+            net = self._make_network('json', 'net%d' % i, True)
+            for j in range(2):
+                self._make_port('json', net['network']['id'])
+        self._forget_resources()
+        ports = self.plugin.get_ports(context.get_admin_context())
+        self.assertEqual(len(ports), 4)
+        self.assertEqual(self.mido_api.get_bridge.call_count, 2)
+        self.assertFalse(self.mido_api.get_port.called)
+
+    def test_created_and_deleted_resources_update_cache(self):
+        with self.network() as net:
+            key = ('Bridge', net['network']['id'])
+            self.assertIn(key, self.plugin.presence)
+        self.assertNotIn(key, self.plugin.presence)
@@ -0,0 +1,75 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import BaseHTTPServer
+import json
+import SocketServer
+import threading
+
+
+class FakeOFCHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        length = int(self.headers.getheader('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.server.requests.append((self.command, self.path,
+                                     body and json.loads(body)))
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        # Close the connection without telling the client
+        self.close_connection = int(self.server.drop_connections)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeOFCServer(SocketServer.ThreadingMixIn,
+                    BaseHTTPServer.HTTPServer):
+    """Records the requests and counts the accepted connections.
+
+    Every request is answered with status, without any content.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           FakeOFCHandler)
+        self.requests = []
+        self.connections = 0
+        self.status = 200
+        self.drop_connections = False
+
+    def get_request(self):
+        self.connections += 1
+        return BaseHTTPServer.HTTPServer.get_request(self)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    @property
+    def port(self):
+        return self.server_address[1]
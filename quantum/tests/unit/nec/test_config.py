@@ -32,3 +32,4 @@ class ConfigurationTest(base.BaseTestCase):
         self.assertFalse(config.CONF.OFC.use_ssl)
         self.assertEqual(None, config.CONF.OFC.key_file)
         self.assertEqual(None, config.CONF.OFC.cert_file)
+        self.assertEqual(0, config.CONF.OFC.job_workers)
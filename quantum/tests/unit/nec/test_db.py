@@ -15,9 +15,11 @@
 #    under the License.
 # @author: Ryota MIBU
 
+import datetime
 import random
 
 from quantum.db import api as db_api
+from quantum.openstack.common import timeutils
 from quantum.openstack.common import uuidutils
 from quantum.plugins.nec.common import exceptions as nexc
 from quantum.plugins.nec.db import api as ndb
@@ -162,6 +164,50 @@ class NECPluginV2DBTest(NECPluginV2DBTestBase):
         portinfo_none = ndb.get_portinfo(self.session, i)
         self.assertEqual(None, portinfo_none)
 
+    def testg_ofc_jobs(self):
+        """test add, get and delete OFC jobs"""
+        o, q, n = self.get_ofc_item_random_params()
+        job1 = ndb.add_ofc_job(self.session, n, 'port', q, 'activate')
+        job2 = ndb.add_ofc_job(self.session, n, 'port', q, 'deactivate')
+        self.assertEqual(ndb.get_ofc_jobs(self.session), [job1, job2])
+        job = ndb.get_ofc_job(self.session, job2.id)
+        self.assertEqual(job.network_id, n)
+        self.assertEqual(job.resource_id, q)
+        self.assertEqual(job.action, 'deactivate')
+        ndb.del_ofc_job(self.session, job1.id)
+        self.assertEqual(None, ndb.get_ofc_job(self.session, job1.id))
+        self.assertEqual(ndb.get_ofc_jobs(self.session), [job2])
+
+    def testh_ofc_jobs_of_network(self):
+        """test get the OFC jobs of a network"""
+        o, q, n = self.get_ofc_item_random_params()
+        self.assertEqual(ndb.get_next_ofc_job(self.session, n), None)
+        self.assertEqual(ndb.get_last_ofc_job_id(self.session, n), None)
+        job1 = ndb.add_ofc_job(self.session, n, 'port', q, 'activate')
+        job2 = ndb.add_ofc_job(self.session, n, 'port', q, 'deactivate')
+        ndb.add_ofc_job(self.session, o, 'port', q, 'activate')
+        self.assertEqual(ndb.get_next_ofc_job(self.session, n), job1)
+        self.assertEqual(ndb.get_last_ofc_job_id(self.session, n), job2.id)
+        self.assertEqual(sorted(ndb.get_ofc_job_network_ids(self.session)),
+                         sorted([n, o]))
+
+    def testi_claim_ofc_job(self):
+        """test claim and delete OFC jobs"""
+        o, q, n = self.get_ofc_item_random_params()
+        job = ndb.add_ofc_job(self.session, n, 'port', q, 'activate')
+        self.assertTrue(ndb.claim_ofc_job(self.session, job.id, 'a', 60))
+        self.assertFalse(ndb.claim_ofc_job(self.session, job.id, 'b', 60))
+        # The claim of a process which did not complete the job expires
+        timeutils.set_time_override(
+            timeutils.utcnow() + datetime.timedelta(seconds=61))
+        self.addCleanup(timeutils.clear_time_override)
+        self.assertTrue(ndb.claim_ofc_job(self.session, job.id, 'b', 60))
+        ndb.del_ofc_job(self.session, job.id, 'a')
+        self.assertNotEqual(ndb.get_ofc_job(self.session, job.id), None)
+        ndb.del_ofc_job(self.session, job.id, 'b')
+        self.assertEqual(ndb.get_ofc_job(self.session, job.id), None)
+        self.assertFalse(ndb.claim_ofc_job(self.session, job.id, 'a', 60))
+
 
 class NECPluginV2DBOldMappingTest(NECPluginV2DBTestBase):
     """Test related to old ID mapping"""
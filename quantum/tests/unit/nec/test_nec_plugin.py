@@ -13,14 +13,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
 import mock
 
 from quantum import context as q_context
 from quantum import manager
 from quantum.common import topics
 from quantum.extensions import portbindings
+from quantum.plugins.nec.common import config
+from quantum.plugins.nec.db import api as ndb
 from quantum.plugins.nec import nec_plugin
+from quantum.plugins.nec import ofc_jobs
 from quantum.tests.unit import _test_extension_portbindings as test_bindings
+from quantum.tests.unit.nec import fake_ofc_server
 from quantum.tests.unit import test_db_plugin as test_plugin
 from quantum.tests.unit import test_security_groups_rpc as test_sg_rpc
 
@@ -180,3 +186,131 @@ class TestNecPortsV2Callback(NecPluginV2TestCase):
             self.ofc.assert_has_calls(expected)
             self.assertEqual(2, self.ofc.create_ofc_port.call_count)
             self.assertEqual(1, self.ofc.delete_ofc_port.call_count)
+
+
+class InlineOFCJobQueue(ofc_jobs.OFCJobQueue):
+    """Runs the queued jobs of a network only when they are waited for.
+
+    There are no worker greenthreads, the jobs are run by the thread waiting
+    for them, so that the tests can check the status of pending resources.
+    """
+
+    def _work(self, networks):
+        pass
+
+    def _poll(self):
+        pass
+
+
+class TestNecOFCJobs(NecPluginV2TestCase):
+
+    def setUp(self):
+        self.server = fake_ofc_server.FakeOFCServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        config.CONF.set_override('port', str(self.server.port), 'OFC')
+        config.CONF.set_override('job_workers', 2, 'OFC')
+        queue_p = mock.patch.object(nec_plugin.ofc_jobs, 'OFCJobQueue',
+                                    new=InlineOFCJobQueue)
+        queue_p.start()
+        self.addCleanup(queue_p.stop)
+        super(TestNecOFCJobs, self).setUp()
+        self.context = q_context.get_admin_context()
+        self.plugin = manager.QuantumManager.get_plugin()
+        self.callbacks = nec_plugin.NECPluginV2RPCCallbacks(self.plugin)
+
+    def _plug(self, port, port_no):
+        portinfo = {'id': port['id'], 'port_no': port_no}
+        self.callbacks.update_ports(self.context, topic=topics.AGENT,
+                                    datapath_id='0xabc',
+                                    port_added=[portinfo])
+
+    def _status(self, port):
+        return self.plugin.get_port(self.context, port['id'])['status']
+
+    def _ofc_requests(self, method):
+        return [path for m, path, body in self.server.requests
+                if m == method]
+
+    def _set_admin_state_up(self, network_id, admin_state_up):
+        self._update('networks', network_id,
+                     {'network': {'admin_state_up': admin_state_up}})
+
+    def test_port_is_activated_by_job(self):
+        with self.port() as port:
+            port = port['port']
+            self._plug(port, 1)
+            self.assertEqual(self._status(port), 'PENDING')
+            self.plugin.ofc_jobs.wait(port['network_id'])
+            self.assertEqual(self._status(port), 'ACTIVE')
+            self.assertEqual(self._ofc_requests('POST'),
+                             ['/networks',
+                              '/networks/%s/ports' % port['network_id']])
+            self.assertEqual(self.server.connections, 1)
+
+    def test_network_admin_state_change(self):
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            with contextlib.nested(self.port(subnet),
+                                   self.port(subnet)) as ports:
+                ports = [p['port'] for p in ports]
+                for i, port in enumerate(ports):
+                    self._plug(port, i)
+                self.plugin.ofc_jobs.wait(net_id)
+
+                self._set_admin_state_up(net_id, False)
+                for port in ports:
+                    self.assertEqual(self._status(port), 'PENDING')
+                self.plugin.ofc_jobs.wait(net_id)
+                for port in ports:
+                    self.assertEqual(self._status(port), 'DOWN')
+                self.assertEqual(len(self._ofc_requests('DELETE')), 2)
+
+                self._set_admin_state_up(net_id, True)
+                for port in ports:
+                    self.assertEqual(self._status(port), 'PENDING')
+                self.plugin.ofc_jobs.wait(net_id)
+                for port in ports:
+                    self.assertEqual(self._status(port), 'ACTIVE')
+
+    def test_pending_port_is_changed_again(self):
+        with self.port() as port:
+            port = port['port']
+            self._plug(port, 1)
+            self._set_admin_state_up(port['network_id'], False)
+            self._set_admin_state_up(port['network_id'], True)
+            self.plugin.ofc_jobs.wait(port['network_id'])
+            self.assertEqual(self._status(port), 'ACTIVE')
+
+    def test_ofc_error(self):
+        with self.port() as port:
+            port = port['port']
+            self.server.status = 500
+            self._plug(port, 1)
+            self.plugin.ofc_jobs.wait(port['network_id'])
+            self.assertEqual(self._status(port), 'ERROR')
+            self.server.status = 200
+
+    def test_delete_port_waits_for_jobs(self):
+        with self.port(no_delete=True) as port:
+            port = port['port']
+            self._plug(port, 1)
+            self._delete('ports', port['id'])
+            self.assertEqual(self._ofc_requests('DELETE'),
+                             ['/networks/%(network_id)s/ports/%(id)s' %
+                              port])
+
+    def test_jobs_left_in_database_are_run(self):
+        with self.port() as port:
+            port = port['port']
+            self.plugin.ofc_jobs = mock.Mock()
+            self._plug(port, 1)
+            ndb.add_ofc_job(self.context.session, port['network_id'], 'port',
+                            port['id'], ofc_jobs.ACTIVATE)
+
+            self.plugin.ofc_jobs = InlineOFCJobQueue(
+                2, self.plugin._run_ofc_job)
+            self.plugin.ofc_jobs.start()
+            self.plugin.ofc_jobs.wait(port['network_id'])
+            self.assertEqual(self._status(port), 'ACTIVE')
+            self.assertEqual(ndb.get_ofc_jobs(self.context.session), [])
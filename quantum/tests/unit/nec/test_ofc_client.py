@@ -0,0 +1,70 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from quantum.plugins.nec.common import exceptions as nexc
+from quantum.plugins.nec import drivers
+from quantum.tests import base
+from quantum.tests.unit.nec import fake_ofc_server
+
+
+class TestConfig(object):
+    """Configuration for this test"""
+    host = '127.0.0.1'
+    port = None
+    job_workers = 0
+
+
+class OFCClientTest(base.BaseTestCase):
+
+    def setUp(self):
+        super(OFCClientTest, self).setUp()
+        self.server = fake_ofc_server.FakeOFCServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        conf = TestConfig()
+        conf.port = self.server.port
+        self.driver = drivers.get_driver('trema')(conf)
+
+    def test_connection_is_reused(self):
+        for i in range(3):
+            self.driver.create_network('/tenants/t', 'desc', 'net%d' % i)
+        self.driver.delete_network('/networks/net0')
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.requests[0],
+                         ('POST', '/networks',
+                          {'id': 'net0', 'description': 'desc'}))
+        self.assertEqual(self.server.requests[3],
+                         ('DELETE', '/networks/net0', ''))
+
+    def test_closed_connection_is_reopened(self):
+        self.server.drop_connections = True
+        for i in range(2):
+            self.driver.create_network('/tenants/t', 'desc', 'net%d' % i)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_error_status(self):
+        self.server.status = 500
+        self.assertRaises(nexc.OFCException,
+                          self.driver.delete_network, '/networks/net0')
+        self.server.status = 200
+        self.driver.delete_network('/networks/net0')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_connection_refused(self):
+        self.server.stop()
+        self.assertRaises(nexc.OFCException,
+                          self.driver.delete_network, '/networks/net0')
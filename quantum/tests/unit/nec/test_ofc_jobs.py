@@ -0,0 +1,127 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import eventlet
+
+from quantum import context as q_context
+from quantum.openstack.common import timeutils
+from quantum.plugins.nec.db import api as ndb
+from quantum.plugins.nec import ofc_jobs
+from quantum.tests import base
+
+
+class OFCJobQueueTest(base.BaseTestCase):
+
+    def setUp(self):
+        super(OFCJobQueueTest, self).setUp()
+        ndb.initialize()
+        self.addCleanup(ndb.clear_db)
+        self.context = q_context.get_admin_context()
+        self.runs = []
+        self.jobs = ofc_jobs.OFCJobQueue(2, self._run_job)
+
+    def _run_job(self, context, job):
+        self.runs.append((job.network_id, job.resource_id))
+        # Let the other workers run
+        eventlet.sleep(0)
+
+    def _add_job(self, network_id, resource_id, owner=None, claimed_at=None):
+        job = ndb.add_ofc_job(self.context.session, network_id, 'port',
+                              resource_id, ofc_jobs.ACTIVATE)
+        if owner:
+            # Claimed by another server process
+            ndb.claim_ofc_job(self.context.session, job.id, owner, 60)
+            if claimed_at:
+                with self.context.session.begin(subtransactions=True):
+                    job.claimed_at = claimed_at
+        return job
+
+    def _run_workers(self):
+        for i in range(100):
+            eventlet.sleep(0)
+
+    def test_jobs_are_run_by_workers_in_order(self):
+        self.jobs.start()
+        for network_id in ('net1', 'net2'):
+            for resource_id in ('port1', 'port2', 'port3'):
+                self.jobs.put(self.context, network_id, 'port', resource_id,
+                              ofc_jobs.ACTIVATE)
+        self._run_workers()
+        for network_id in ('net1', 'net2'):
+            self.assertEqual([resource_id for net, resource_id in self.runs
+                              if net == network_id],
+                             ['port1', 'port2', 'port3'])
+        self.assertEqual(ndb.get_ofc_jobs(self.context.session), [])
+
+    def test_failed_job_is_deleted(self):
+        self.jobs.run_job = lambda context, job: 1 / 0
+        self.jobs.start()
+        self.jobs.put(self.context, 'net1', 'port', 'port1',
+                      ofc_jobs.ACTIVATE)
+        self._run_workers()
+        self.assertEqual(ndb.get_ofc_jobs(self.context.session), [])
+
+    def test_start_runs_jobs_left_in_database(self):
+        self._add_job('net1', 'port1')
+        self._add_job('net2', 'port2', owner='other:1')
+        self.jobs.start()
+        self._run_workers()
+        # The job claimed by a live server process is left to it
+        self.assertEqual(self.runs, [('net1', 'port1')])
+        self.assertEqual(len(ndb.get_ofc_jobs(self.context.session)), 1)
+
+    def test_expired_claim_is_run(self):
+        self._add_job('net1', 'port1', owner='other:1',
+                      claimed_at=timeutils.utcnow() - datetime.timedelta(
+                          seconds=ofc_jobs.CLAIM_TIMEOUT + 1))
+        self.jobs.start()
+        self._run_workers()
+        self.assertEqual(self.runs, [('net1', 'port1')])
+
+    def test_jobs_after_claimed_job_wait_for_it(self):
+        job = self._add_job('net1', 'port1', owner='other:1')
+        self.jobs.start()
+        self.jobs.put(self.context, 'net1', 'port', 'port2',
+                      ofc_jobs.ACTIVATE)
+        self._run_workers()
+        self.assertEqual(self.runs, [])
+        # Run by the other server process
+        ndb.del_ofc_job(self.context.session, job.id)
+        self.jobs.wait('net1')
+        self.assertEqual(self.runs, [('net1', 'port2')])
+
+    def test_wait_for_job_run_by_other_process(self):
+        job = self._add_job('net1', 'port1', owner='other:1')
+        self.jobs.start()
+        waiter = eventlet.spawn(self.jobs.wait, 'net1')
+        self._run_workers()
+        self.assertFalse(waiter.dead)
+        ndb.del_ofc_job(self.context.session, job.id)
+        waiter.wait()
+        self.assertEqual(self.runs, [])
+
+    def test_wait_runs_pending_jobs(self):
+        self.jobs.start()
+        self.jobs.put(self.context, 'net1', 'port', 'port1',
+                      ofc_jobs.ACTIVATE)
+        # Before the workers had a chance to run it
+        self.jobs.wait('net1')
+        self.assertEqual(self.runs, [('net1', 'port1')])
+        self.assertEqual(ndb.get_ofc_jobs(self.context.session), [])
+        self.jobs.wait('net1')
+        self.assertEqual(self.runs, [('net1', 'port1')])
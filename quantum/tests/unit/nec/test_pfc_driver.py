@@ -33,6 +33,7 @@ class TestConfig(object):
     """Configuration for this test"""
     host = '127.0.0.1'
     port = 8888
+    job_workers = 0
     use_ssl = False
     key_file = None
     cert_file = None
@@ -84,6 +84,33 @@ class TestNecSecurityGroups(NecSecurityGroupsTestCase,
                                  port_dict['fixed_ips'])
                 self._delete('ports', port_id)
 
+    def test_security_group_get_ports_from_devices(self):
+        with self.network() as n:
+            with self.subnet(n):
+                with self.security_group() as sg:
+                    sg_id = sg['security_group']['id']
+                    res1 = self._create_port(self.fmt, n['network']['id'],
+                                             security_groups=[sg_id])
+                    port1 = self.deserialize(self.fmt, res1)['port']
+                    res2 = self._create_port(self.fmt, n['network']['id'])
+                    port2 = self.deserialize(self.fmt, res2)['port']
+                    devices = [port1['id'], port2['id'], 'bad_device_id']
+                    plugin = manager.QuantumManager.get_plugin()
+                    ports = plugin.callback_sg.get_ports_from_devices(
+                        devices)
+                    self.assertEqual(sorted(ports), sorted(devices[:2]))
+                    port_dict = ports[devices[0]]
+                    self.assertEqual(port1['id'], port_dict['id'])
+                    self.assertEqual([sg_id],
+                                     port_dict[ext_sg.SECURITYGROUPS])
+                    self.assertEqual([], port_dict['security_group_rules'])
+                    self.assertEqual(
+                        [port1['fixed_ips'][0]['ip_address']],
+                        port_dict['fixed_ips'])
+                    self.assertEqual(devices[0], port_dict['device'])
+                    self._delete('ports', port1['id'])
+                    self._delete('ports', port2['id'])
+
 
 class TestNecSecurityGroupsXML(TestNecSecurityGroups):
     fmt = 'xml'
@@ -0,0 +1,250 @@
+# Copyright (c) 2013 OpenStack Foundation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+import mock
+
+from quantum.common import constants
+from quantum import context
+from quantum.db import api as db
+from quantum.db import l3_db
+from quantum.db import models_v2
+from quantum.openstack.common import timeutils
+from quantum.plugins.nicira.nicira_nvp_plugin import nvp_sync
+from quantum.tests import base
+
+
+def _lswitch(uuid, fabric_status, net_id=None):
+    tags = net_id and [{'scope': 'quantum_net_id', 'tag': net_id}] or []
+    return {'uuid': uuid, 'tags': tags,
+            '_relations': {'LogicalSwitchStatus':
+                           {'fabric_status': fabric_status}}}
+
+
+def _lport(port_id, fabric_status_up, admin_status_enabled=True):
+    return {'tags': [{'scope': 'q_port_id', 'tag': port_id}],
+            'admin_status_enabled': admin_status_enabled,
+            '_relations': {'LogicalPortStatus':
+                           {'fabric_status_up': fabric_status_up}}}
+
+
+def _lrouter(uuid, fabric_status):
+    return {'uuid': uuid,
+            '_relations': {'LogicalRouterStatus':
+                           {'fabric_status': fabric_status}}}
+
+
+class NvpSynchronizerTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(NvpSynchronizerTestCase, self).setUp()
+        db.configure_db()
+        self.addCleanup(db.clear_db)
+        self.context = context.get_admin_context()
+        self.lswitches = []
+        self.lports = []
+        self.lrouters = []
+        pages_p = mock.patch.object(nvp_sync.nvplib, 'get_all_query_pages',
+                                    side_effect=self._get_all_query_pages)
+        self.get_all_query_pages = pages_p.start()
+        self.addCleanup(pages_p.stop)
+        self.plugin = mock.Mock()
+        self.plugin.clusters = {'fake_cluster': mock.sentinel.cluster}
+        self.synchronizer = nvp_sync.NvpSynchronizer(self.plugin, 10, 60)
+
+    def _get_all_query_pages(self, path, cluster):
+        if path.startswith('/ws.v1/lswitch/*/lport'):
+            return self.lports
+        elif path.startswith('/ws.v1/lswitch'):
+            return self.lswitches
+        return self.lrouters
+
+    def _add(self, model, **kwargs):
+        with self.context.session.begin(subtransactions=True):
+            item = model(tenant_id='fake_tenant', **kwargs)
+            self.context.session.add(item)
+        return item
+
+    def _add_network(self, network_id, status=constants.NET_STATUS_ACTIVE):
+        return self._add(models_v2.Network, id=network_id, name='net',
+                         status=status, admin_state_up=True, shared=False)
+
+    def _add_port(self, port_id, network_id, device_owner='',
+                  status=constants.PORT_STATUS_ACTIVE):
+        return self._add(models_v2.Port, id=port_id, network_id=network_id,
+                         mac_address='ff:ff:ff:ff:ff:ff',
+                         admin_state_up=True, status=status,
+                         device_id='fake_device', device_owner=device_owner)
+
+    def _get_status(self, model, id):
+        session = db.get_session()
+        return session.query(model).filter_by(id=id).one().status
+
+    def test_synchronize_networks(self):
+        self._add_network('net1')
+        self._add_network('net2', status=constants.NET_STATUS_DOWN)
+        self._add_network('net3')
+        self._add_network('ext_net')
+        with self.context.session.begin(subtransactions=True):
+            self.context.session.add(
+                l3_db.ExternalNetwork(network_id='ext_net'))
+        # net2 is up only if all of its logical switches are
+        self.lswitches = [_lswitch('net1', False),
+                          _lswitch('net2', True),
+                          _lswitch('net2_extra', True, net_id='net2')]
+        self.synchronizer.synchronize()
+        self.assertEqual(self._get_status(models_v2.Network, 'net1'),
+                         constants.NET_STATUS_DOWN)
+        self.assertEqual(self._get_status(models_v2.Network, 'net2'),
+                         constants.NET_STATUS_ACTIVE)
+        self.assertEqual(self._get_status(models_v2.Network, 'net3'),
+                         constants.NET_STATUS_ERROR)
+        self.assertEqual(self._get_status(models_v2.Network, 'ext_net'),
+                         constants.NET_STATUS_ACTIVE)
+        self.assertEqual(self.synchronizer.get_stats()['last_changes'], 3)
+
+    def test_synchronize_ports(self):
+        self._add_network('net1')
+        self._add_port('port1', 'net1')
+        self._add_port('port2', 'net1', status=constants.PORT_STATUS_DOWN)
+        self._add_port('port3', 'net1')
+        self._add_port('fip_port', 'net1',
+                       device_owner=l3_db.DEVICE_OWNER_FLOATINGIP)
+        self.lswitches = [_lswitch('net1', True)]
+        self.lports = [_lport('port1', False, admin_status_enabled=False),
+                       _lport('port2', True)]
+        self.synchronizer.synchronize()
+        session = db.get_session()
+        port1 = session.query(models_v2.Port).filter_by(id='port1').one()
+        self.assertEqual(port1.status, constants.PORT_STATUS_DOWN)
+        self.assertFalse(port1.admin_state_up)
+        self.assertEqual(self._get_status(models_v2.Port, 'port2'),
+                         constants.PORT_STATUS_ACTIVE)
+        self.assertEqual(self._get_status(models_v2.Port, 'port3'),
+                         constants.PORT_STATUS_ERROR)
+        self.assertEqual(self._get_status(models_v2.Port, 'fip_port'),
+                         constants.PORT_STATUS_ACTIVE)
+
+    def test_synchronize_routers(self):
+        self._add(l3_db.Router, id='router1', name='r1',
+                  status=constants.NET_STATUS_ACTIVE, admin_state_up=True)
+        self._add(l3_db.Router, id='router2', name='r2',
+                  status=constants.NET_STATUS_ACTIVE, admin_state_up=True)
+        self.lrouters = [_lrouter('router1', False)]
+        self.synchronizer.synchronize()
+        self.assertEqual(self._get_status(l3_db.Router, 'router1'),
+                         constants.NET_STATUS_DOWN)
+        self.assertEqual(self._get_status(l3_db.Router, 'router2'),
+                         constants.NET_STATUS_ERROR)
+
+    def _during_fetch(self, func):
+        def get_all_query_pages(path, cluster):
+            if self.get_all_query_pages.call_count == 1:
+                func()
+            return self._get_all_query_pages(path, cluster)
+        self.get_all_query_pages.side_effect = get_all_query_pages
+
+    def test_resources_created_during_fetch_are_left_alone(self):
+        def create():
+            self._add_network('net1')
+            self._add_port('port1', 'net1')
+            self._add(l3_db.Router, id='router1', name='r1',
+                      status=constants.NET_STATUS_ACTIVE,
+                      admin_state_up=True)
+        self._during_fetch(create)
+        self.synchronizer.synchronize()
+        self.assertEqual(self._get_status(models_v2.Network, 'net1'),
+                         constants.NET_STATUS_ACTIVE)
+        self.assertEqual(self._get_status(models_v2.Port, 'port1'),
+                         constants.PORT_STATUS_ACTIVE)
+        self.assertEqual(self._get_status(l3_db.Router, 'router1'),
+                         constants.NET_STATUS_ACTIVE)
+        self.assertEqual(self.synchronizer.get_stats()['last_changes'], 0)
+
+    def test_changes_made_during_fetch_are_kept(self):
+        self._add_network('net1')
+        self._add_port('port1', 'net1')
+        self._add_port('port2', 'net1')
+        self.lswitches = [_lswitch('net1', False)]
+        self.lports = [_lport('port1', True), _lport('port2', False)]
+
+        def update():
+            session = db.get_session()
+            with session.begin():
+                session.query(models_v2.Network).filter_by(id='net1').update(
+                    {'status': constants.NET_STATUS_BUILD})
+                session.query(models_v2.Port).filter_by(id='port1').update(
+                    {'admin_state_up': False})
+        self._during_fetch(update)
+        self.synchronizer.synchronize()
+        self.assertEqual(self._get_status(models_v2.Network, 'net1'),
+                         constants.NET_STATUS_BUILD)
+        session = db.get_session()
+        port1 = session.query(models_v2.Port).filter_by(id='port1').one()
+        self.assertFalse(port1.admin_state_up)
+        self.assertEqual(self._get_status(models_v2.Port, 'port2'),
+                         constants.PORT_STATUS_DOWN)
+        self.assertEqual(self.synchronizer.get_stats()['last_changes'], 1)
+
+    def test_synchronize_queries_all_clusters(self):
+        self.plugin.clusters['other_cluster'] = mock.sentinel.other_cluster
+        self.synchronizer.synchronize()
+        clusters = set(call[0][1] for call in
+                       self.get_all_query_pages.call_args_list)
+        self.assertEqual(clusters, set([mock.sentinel.cluster,
+                                        mock.sentinel.other_cluster]))
+        self.assertEqual(self.get_all_query_pages.call_count, 6)
+
+    def test_is_fresh(self):
+        self.assertFalse(self.synchronizer.is_fresh())
+        self.assertEqual(self.synchronizer.get_stats()['lag'], None)
+        self.synchronizer.synchronize()
+        self.assertTrue(self.synchronizer.is_fresh())
+        timeutils.set_time_override(
+            timeutils.utcnow() + datetime.timedelta(seconds=61))
+        self.addCleanup(timeutils.clear_time_override)
+        self.assertFalse(self.synchronizer.is_fresh())
+        self.assertTrue(self.synchronizer.get_stats()['lag'] > 60)
+
+    def test_is_fresh_in_other_process(self):
+        # An API worker, which does not run the synchronization
+        worker = nvp_sync.NvpSynchronizer(self.plugin, 10, 60)
+        self.assertFalse(worker.is_fresh())
+        self.synchronizer.synchronize()
+        self.assertTrue(worker.is_fresh())
+        with mock.patch.object(nvp_sync.nicira_db,
+                               'get_last_sync_time') as get_last_sync:
+            self.assertTrue(worker.is_fresh())
+            self.assertFalse(get_last_sync.called)
+        timeutils.set_time_override(
+            timeutils.utcnow() + datetime.timedelta(seconds=61))
+        self.addCleanup(timeutils.clear_time_override)
+        self.assertFalse(worker.is_fresh())
+
+    def test_sync_lag_is_logged(self):
+        timeutils.set_time_override(timeutils.utcnow())
+        self.addCleanup(timeutils.clear_time_override)
+        self.synchronizer.synchronize()
+        timeutils.advance_time_seconds(30)
+        with mock.patch.object(nvp_sync.LOG, 'info') as info:
+            self.synchronizer.synchronize()
+        self.assertEqual(info.call_args[0][1]['lag'], 30)
+
+    def test_failed_synchronization_is_not_fresh(self):
+        self.get_all_query_pages.side_effect = Exception()
+        self.synchronizer._synchronize()
+        self.assertFalse(self.synchronizer.is_fresh())
+        self.assertEqual(self.synchronizer.get_stats()['failures'], 1)
@@ -13,12 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
 import mock
 
 from quantum.api import extensions
 from quantum.api.rpc.agentnotifiers import dhcp_rpc_agent_api
 from quantum import context
 from quantum.extensions import portbindings
+from quantum.extensions import providernet as provider
+from quantum import manager
+from quantum.plugins.openvswitch import ovs_db_v2
 from quantum.tests.unit import _test_extension_mutihost as test_mutihost
 from quantum.tests.unit import _test_extension_portbindings as test_bindings
 from quantum.tests.unit import test_agent_ext_plugin
@@ -57,9 +62,62 @@ class TestOpenvswitchPortsV2(test_plugin.TestPortsV2,
             self.assertEqual(self.port_create_status, 'DOWN')
 
 
+class TestOpenvswitchRpcCallbacks(OpenvswitchPluginV2TestCase):
+
+    def test_get_devices_details_list(self):
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet, admin_state_up=True),
+                self.port(subnet=subnet, admin_state_up=False)) as (p1, p2):
+                port1 = p1['port']
+                port2 = p2['port']
+                plugin = manager.QuantumManager.get_plugin()
+                devices = [port1['id'], port2['id'], 'bad_device']
+                entries = plugin.callbacks.get_devices_details_list(
+                    None, devices=devices, agent_id='fake_agent')
+                self.assertEqual([entry['device'] for entry in entries],
+                                 devices)
+                self.assertEqual(entries[0]['port_id'], port1['id'])
+                self.assertEqual(entries[0]['network_id'],
+                                 port1['network_id'])
+                self.assertEqual(entries[0]['network_type'], 'local')
+                self.assertTrue(entries[0]['admin_state_up'])
+                self.assertFalse(entries[1]['admin_state_up'])
+                self.assertEqual(entries[2], {'device': 'bad_device'})
+                self.assertEqual(ovs_db_v2.get_port(port1['id']).status,
+                                 'ACTIVE')
+                self.assertEqual(ovs_db_v2.get_port(port2['id']).status,
+                                 'DOWN')
+
+    def test_update_devices_down(self):
+        with self.port() as p:
+            port = p['port']
+            ovs_db_v2.set_port_status(port['id'], 'ACTIVE')
+            plugin = manager.QuantumManager.get_plugin()
+            entries = plugin.callbacks.update_devices_down(
+                None, devices=[port['id'], 'bad_device'],
+                agent_id='fake_agent')
+            self.assertEqual(entries,
+                             [{'device': port['id'], 'exists': True},
+                              {'device': 'bad_device', 'exists': False}])
+            self.assertEqual(ovs_db_v2.get_port(port['id']).status, 'DOWN')
+
+
 class TestOpenvswitchNetworksV2(test_plugin.TestNetworksV2,
                                 OpenvswitchPluginV2TestCase):
-    pass
+
+    def test_list_networks_prefetches_provider_bindings(self):
+        with contextlib.nested(self.network(), self.network()):
+            with contextlib.nested(
+                mock.patch.object(ovs_db_v2, 'get_network_binding'),
+                mock.patch.object(ovs_db_v2, 'get_network_bindings',
+                                  side_effect=ovs_db_v2.get_network_bindings)
+            ) as (get_binding, get_bindings):
+                res = self._list('networks')
+            self.assertFalse(get_binding.called)
+            self.assertEqual(get_bindings.call_count, 1)
+            for net in res['networks']:
+                self.assertEqual(net[provider.NETWORK_TYPE], 'local')
 
 
 class TestOpenvswitchPortBinding(OpenvswitchPluginV2TestCase,
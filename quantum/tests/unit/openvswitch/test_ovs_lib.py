@@ -18,6 +18,7 @@
 import mox
 
 from quantum.agent.linux import ovs_lib, utils
+from quantum.openstack.common import jsonutils
 from quantum.openstack.common import uuidutils
 from quantum.tests import base
 
@@ -225,28 +226,36 @@ class OVS_Lib_Test(base.BaseTestCase):
         self.assertEqual(self.br.add_patch_port(pname, peer), ofport)
         self.mox.VerifyAll()
 
+    def _interfaces_output(self, interfaces, port_names):
+        data = [[name, ofport, ['map', sorted(external_ids.items())]]
+                for name, ofport, external_ids in interfaces]
+        table = jsonutils.dumps({'headings': ['name', 'ofport',
+                                              'external_ids'],
+                                 'data': data})
+        return '%s\n%s\n' % (table, '\n'.join(port_names))
+
+    def _expect_list_interfaces(self, output):
+        utils.execute(["ovs-vsctl", self.TO, "--format=json", "--",
+                       "--columns=name,ofport,external_ids",
+                       "list", "Interface", "--", "list-ports", self.BR_NAME],
+                      root_helper=self.root_helper).AndReturn(output)
+
     def _test_get_vif_ports(self, is_xen=False):
         pname = "tap99"
-        ofport = "6"
+        ofport = 6
         vif_id = uuidutils.generate_uuid()
         mac = "ca:fe:de:ad:be:ef"
 
-        utils.execute(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
-                      root_helper=self.root_helper).AndReturn("%s\n" % pname)
-
         if is_xen:
-            external_ids = ('{xs-vif-uuid="%s", attached-mac="%s"}'
-                            % (vif_id, mac))
+            external_ids = {'xs-vif-uuid': vif_id, 'attached-mac': mac}
         else:
-            external_ids = ('{iface-id="%s", attached-mac="%s"}'
-                            % (vif_id, mac))
-
-        utils.execute(["ovs-vsctl", self.TO, "get",
-                       "Interface", pname, "external_ids"],
-                      root_helper=self.root_helper).AndReturn(external_ids)
-        utils.execute(["ovs-vsctl", self.TO, "get",
-                       "Interface", pname, "ofport"],
-                      root_helper=self.root_helper).AndReturn(ofport)
+            external_ids = {'iface-id': vif_id, 'attached-mac': mac}
+        interfaces = [(pname, ofport, external_ids),
+                      ('patch-tun', 1, {}),
+                      ('tap-other-bridge', 2, {'iface-id': 'other',
+                                               'attached-mac': mac})]
+        self._expect_list_interfaces(
+            self._interfaces_output(interfaces, [pname, 'patch-tun']))
         if is_xen:
             utils.execute(["xe", "vif-param-get", "param-name=other-config",
                            "param-key=nicira-iface-id", "uuid=" + vif_id],
@@ -268,6 +277,57 @@ class OVS_Lib_Test(base.BaseTestCase):
     def test_get_vif_ports_xen(self):
         self._test_get_vif_ports(True)
 
+    def test_get_vif_ports_scale(self):
+        # The ports are read with a single ovs-vsctl call whatever their
+        # number
+        mac = "ca:fe:de:ad:be:ef"
+        interfaces = [('tap%d' % i, i, {'iface-id': 'port%d' % i,
+                                        'attached-mac': mac})
+                      for i in range(300)]
+        port_names = [name for name, _ofport, _ids in interfaces]
+        self._expect_list_interfaces(
+            self._interfaces_output(interfaces, port_names))
+        self.mox.ReplayAll()
+        self.assertEqual(self.br.get_vif_port_set(),
+                         set('port%d' % i for i in range(300)))
+        self.mox.VerifyAll()
+
+    def test_get_vif_ports_by_id(self):
+        mac = "ca:fe:de:ad:be:ef"
+        interfaces = [('tap1', ['set', []], {'iface-id': 'port1',
+                                             'attached-mac': mac})]
+        self._expect_list_interfaces(
+            self._interfaces_output(interfaces, ['tap1']))
+        self.mox.ReplayAll()
+        ports = self.br.get_vif_ports_by_id()
+        self.assertEqual(ports.keys(), ['port1'])
+        # the ofport of the interface is not set yet
+        self.assertEqual(ports['port1'].ofport, -1)
+        self.mox.VerifyAll()
+
+    def test_get_interfaces_vsctl_error(self):
+        self._expect_list_interfaces(None)
+        self.mox.ReplayAll()
+        self.assertEqual(self.br.get_interfaces(['ofport']), [])
+        self.mox.VerifyAll()
+
+    def test_parse_ovsdb_value(self):
+        self.assertEqual(ovs_lib.parse_ovsdb_value('tap1'), 'tap1')
+        self.assertEqual(ovs_lib.parse_ovsdb_value(1), 1)
+        self.assertEqual(ovs_lib.parse_ovsdb_value(['uuid', 'a-b']), 'a-b')
+        self.assertEqual(ovs_lib.parse_ovsdb_value(['set', [1, 2]]), [1, 2])
+        self.assertEqual(ovs_lib.parse_ovsdb_value(
+            ['map', [['iface-id', 'port1'], ['ref', ['uuid', 'a']]]]),
+            {'iface-id': 'port1', 'ref': 'a'})
+
+    def test_parse_ovsdb_table(self):
+        output = ('{"data":[["tap1",["set",[]],'
+                  '["map",[["iface-id","port1"]]]]],'
+                  '"headings":["name","ofport","external_ids"]}')
+        self.assertEqual(ovs_lib.parse_ovsdb_table(output),
+                         [{'name': 'tap1', 'ofport': [],
+                           'external_ids': {'iface-id': 'port1'}}])
+
     def test_clear_db_attribute(self):
         pname = "tap77"
         utils.execute(["ovs-vsctl", self.TO, "clear", "Port",
@@ -14,6 +14,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 import mock
 from oslo.config import cfg
 import testtools
@@ -98,8 +100,56 @@ class TestOvsQuantumAgent(base.BaseTestCase):
         actual = self.mock_update_ports(vif_port_set, registered_ports)
         self.assertEqual(expected, actual)
 
+    def test_ports_changed_without_monitor(self):
+        self.assertIsNone(self.agent.ovsdb_monitor)
+        self.assertTrue(self.agent.ports_changed())
+
+    def _setup_monitor(self, events=None):
+        self.agent.ovsdb_monitor = mock.Mock()
+        self.agent.ovsdb_monitor.is_active.return_value = True
+        self.agent.ovsdb_monitor.get_events.return_value = events or []
+        self.agent.last_poll = time.time()
+
+    def test_ports_changed_starts_monitor(self):
+        self._setup_monitor()
+        self.agent.ovsdb_monitor.is_active.return_value = False
+        self.assertTrue(self.agent.ports_changed())
+        self.agent.ovsdb_monitor.start.assert_called_once_with()
+        # the monitor is not restarted before full_polling_interval
+        self.assertTrue(self.agent.ports_changed())
+        self.assertEqual(self.agent.ovsdb_monitor.start.call_count, 1)
+
+    def test_ports_changed_without_events(self):
+        self._setup_monitor()
+        self.assertFalse(self.agent.ports_changed())
+
+    def test_ports_changed_after_full_polling_interval(self):
+        self._setup_monitor()
+        self.agent.last_poll -= self.agent.full_polling_interval
+        self.assertTrue(self.agent.ports_changed())
+
+    def test_ports_changed_with_events(self):
+        events = [{'action': 'added', 'name': 'tap1', 'ofport': None,
+                   'external_ids': {'iface-id': 'port1'}},
+                  {'action': 'updated', 'name': 'tap2', 'ofport': 2,
+                   'external_ids': {'iface-id': 'port2'}}]
+        self._setup_monitor(events)
+        self.assertTrue(self.agent.ports_changed())
+        self.assertEqual(self.agent.updated_devices, set(['port2']))
+
+    def test_update_ports_binds_updated_devices_again(self):
+        self.agent.updated_devices = set(['port2', 'port3'])
+        with mock.patch.object(self.agent.int_br, 'get_vif_port_set',
+                               return_value=set(['port1', 'port2'])):
+            port_info = self.agent.update_ports(set(['port2', 'port3']))
+        self.assertEqual(port_info, {'current': set(['port1', 'port2']),
+                                     'added': set(['port1', 'port2']),
+                                     'removed': set(['port3'])})
+        self.assertEqual(self.agent.updated_devices, set())
+
     def test_treat_devices_added_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'get_devices_details_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_added([{}]))
 
@@ -107,14 +157,15 @@ class TestOvsQuantumAgent(base.BaseTestCase):
         """
 
         :param details: the details to return for the device
-        :param port: the port that get_vif_port_by_id should return
+        :param port: the VIF port of the device on the integration bridge
         :param func_name: the function that should be called
         :returns: whether the named function was called
         """
-        with mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                               return_value=details):
-            with mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                                   return_value=port):
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'get_devices_details_list',
+                               return_value=[details]):
+            with mock.patch.object(self.agent.int_br, 'get_vif_ports_by_id',
+                                   return_value={details['device']: port}):
                 with mock.patch.object(self.agent, func_name) as func:
                     self.assertFalse(self.agent.treat_devices_added([{}]))
         return func.called
@@ -139,14 +190,14 @@ class TestOvsQuantumAgent(base.BaseTestCase):
                                                       'treat_vif_port'))
 
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
+        with mock.patch.object(self.agent.plugin_rpc, 'update_devices_down',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_removed([{}]))
 
     def mock_treat_devices_removed(self, port_exists):
-        details = dict(exists=port_exists)
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
-                               return_value=details):
+        details = dict(device='tap1', exists=port_exists)
+        with mock.patch.object(self.agent.plugin_rpc, 'update_devices_down',
+                               return_value=[details]):
             with mock.patch.object(self.agent, 'port_unbound') as port_unbound:
                 self.assertFalse(self.agent.treat_devices_removed([{}]))
         self.assertEqual(port_unbound.called, not port_exists)
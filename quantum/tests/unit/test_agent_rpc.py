@@ -20,6 +20,7 @@ from oslo.config import cfg
 
 from quantum.agent import rpc
 from quantum.openstack.common import context
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.tests import base
 
 
@@ -46,6 +47,55 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_tunnel_sync(self):
         self._test_rpc_call('tunnel_sync')
 
+    def _test_devices_list_call(self, method):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch.object(agent, 'call') as call:
+            call.return_value = ['foo', 'bar']
+            actual_val = getattr(agent, method)(ctxt, ['dev1', 'dev2'],
+                                                'fake_agent_id')
+        self.assertEqual(actual_val, ['foo', 'bar'])
+        call.assert_called_once_with(
+            ctxt, agent.make_msg(method, devices=['dev1', 'dev2'],
+                                 agent_id='fake_agent_id'),
+            topic='fake_topic', version='1.2')
+
+    def test_get_devices_details_list(self):
+        self._test_devices_list_call('get_devices_details_list')
+
+    def test_update_devices_down(self):
+        self._test_devices_list_call('update_devices_down')
+
+    def test_devices_list_falls_back_on_older_plugin(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        error = rpc_common.RemoteError('UnsupportedRpcVersion')
+        with mock.patch.object(agent, 'call',
+                               side_effect=error) as call:
+            with mock.patch.object(agent, 'get_device_details',
+                                   side_effect=['foo', 'bar']) as details:
+                actual_val = agent.get_devices_details_list(
+                    ctxt, ['dev1', 'dev2'], 'fake_agent_id')
+            self.assertEqual(actual_val, ['foo', 'bar'])
+            details.assert_has_calls(
+                [mock.call(ctxt, 'dev1', 'fake_agent_id'),
+                 mock.call(ctxt, 'dev2', 'fake_agent_id')])
+            self.assertFalse(agent.devices_list_supported)
+            # the device list method is not called anymore
+            with mock.patch.object(agent, 'update_device_down'):
+                agent.update_devices_down(ctxt, ['dev1'], 'fake_agent_id')
+            self.assertEqual(call.call_count, 1)
+
+    def test_devices_list_reraises_other_errors(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        error = rpc_common.RemoteError('PortNotFound')
+        with mock.patch.object(agent, 'call', side_effect=error):
+            self.assertRaises(rpc_common.RemoteError,
+                              agent.get_devices_details_list,
+                              ctxt, ['dev1'], 'fake_agent_id')
+        self.assertTrue(agent.devices_list_supported)
+
 
 class AgentPluginReportState(base.BaseTestCase):
     def test_plugin_report_state(self):
@@ -1206,6 +1206,35 @@ class XMLV2TestCase(JSONV2TestCase):
     fmt = 'xml'
 
 
+class StreamingJSONV2TestCase(JSONV2TestCase):
+    def setUp(self):
+        super(StreamingJSONV2TestCase, self).setUp()
+        cfg.CONF.set_override('stream_collection_responses', True)
+
+    def test_list_is_streamed(self):
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = [
+            {'id': _uuid(), 'name': 'net%d' % i, 'tenant_id': ''}
+            for i in range(3)]
+        request = webob.Request.blank(_get_path('networks', fmt=self.fmt))
+        with mock.patch.object(wsgi.JSONDictSerializer,
+                               'STREAM_CHUNK_SIZE', 1):
+            res = request.get_response(self.api.app)
+            chunks = list(res.app_iter)
+        self.assertNotIn('Content-Length', res.headers)
+        self.assertTrue(len(chunks) > 3)
+        res.app_iter = chunks
+        networks = self.deserialize(res)['networks']
+        self.assertEqual([net['name'] for net in networks],
+                         ['net0', 'net1', 'net2'])
+
+
+class StreamingXMLV2TestCase(XMLV2TestCase):
+    def setUp(self):
+        super(StreamingXMLV2TestCase, self).setUp()
+        cfg.CONF.set_override('stream_collection_responses', True)
+
+
 class V2Views(base.BaseTestCase):
     def _view(self, keys, collection, resource):
         data = dict((key, 'value') for key in keys)
@@ -0,0 +1,125 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import httplib
+import socket
+
+import mock
+
+from quantum.common import http_pool
+from quantum.tests import base
+
+
+class TestConnectionPool(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestConnectionPool, self).setUp()
+        self.pool = http_pool.ConnectionPool('127.0.0.1', 80, timeout=10)
+        self.conns = []
+        self.pool.create = self._create
+
+    def _create(self):
+        conn = mock.Mock()
+        conn.sock = None
+        conn.getresponse.return_value.read.return_value = 'data'
+        self.conns.append(conn)
+        return conn
+
+    def _idle_connection(self):
+        # A connection opened by a previous request
+        self.pool.request('GET', '/')
+        conn = self.conns[0]
+        conn.request.reset_mock()
+        conn.close.reset_mock()
+        conn.sock = mock.Mock()
+        return conn
+
+    def test_connection_types(self):
+        pool = http_pool.ConnectionPool('127.0.0.1', 80, timeout=10)
+        self.assertIsInstance(pool.create(), httplib.HTTPConnection)
+        pool = http_pool.ConnectionPool('127.0.0.1', 443, ssl=True)
+        self.assertIsInstance(pool.create(), httplib.HTTPSConnection)
+
+    def test_connection_is_reused(self):
+        for i in range(3):
+            response, data = self.pool.request('POST', '/networks', '{}',
+                                               {'Accept': 'text/plain'})
+            self.assertEqual(data, 'data')
+        self.assertEqual(len(self.conns), 1)
+        self.assertEqual(self.conns[0].request.call_count, 3)
+        self.conns[0].request.assert_called_with(
+            'POST', '/networks', '{}', {'Accept': 'text/plain'})
+
+    def _assert_retried(self, conn):
+        self.assertEqual(conn.request.call_count, 2)
+        self.assertEqual(conn.close.call_count, 1)
+
+    def test_closed_connection_is_reopened(self):
+        conn = self._idle_connection()
+        conn.getresponse.side_effect = [httplib.BadStatusLine(''),
+                                        conn.getresponse.return_value]
+        response, data = self.pool.request('GET', '/')
+        self.assertEqual(data, 'data')
+        self._assert_retried(conn)
+
+    def _test_send_error_is_retried(self, error):
+        conn = self._idle_connection()
+        conn.request.side_effect = [socket.error(error, 'closed'), None]
+        self.pool.request('GET', '/')
+        self._assert_retried(conn)
+
+    def test_reset_connection_is_reopened(self):
+        self._test_send_error_is_retried(errno.ECONNRESET)
+
+    def test_broken_pipe_is_retried(self):
+        self._test_send_error_is_retried(errno.EPIPE)
+
+    def _assert_not_retried(self, conn, error):
+        self.assertRaises(type(error), self.pool.request, 'GET', '/')
+        self.assertEqual(conn.close.call_count, 1)
+        # The connection is reopened by the next request
+        self.assertEqual(self.pool.free_items[0], conn)
+
+    def test_timeout_is_not_retried(self):
+        conn = self._idle_connection()
+        conn.getresponse.side_effect = socket.timeout()
+        self._assert_not_retried(conn, socket.timeout())
+        self.assertEqual(conn.request.call_count, 1)
+
+    def test_error_on_new_connection_is_not_retried(self):
+        self.pool.create().getresponse.side_effect = (
+            httplib.BadStatusLine(''))
+        self.pool.put(self.conns[0])
+        self._assert_not_retried(self.conns[0], httplib.BadStatusLine(''))
+        self.assertEqual(self.conns[0].request.call_count, 1)
+
+    def test_refused_connection_is_not_retried(self):
+        conn = self._idle_connection()
+        conn.request.side_effect = socket.error(errno.ECONNREFUSED,
+                                                'refused')
+        self._assert_not_retried(conn, socket.error())
+        self.assertEqual(conn.request.call_count, 1)
+
+    def test_connections_are_not_shared_with_forked_process(self):
+        conn = self._idle_connection()
+        with mock.patch('os.getpid', return_value=-1):
+            self.pool.request('GET', '/')
+        self.assertEqual(len(self.conns), 2)
+        self.assertEqual(conn.close.call_count, 1)
+        self.assertEqual(conn.request.call_count, 0)
+        self.assertEqual(self.pool.current_size, 1)
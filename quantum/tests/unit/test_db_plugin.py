@@ -40,6 +40,7 @@ from quantum.common.test_lib import test_config
 from quantum import context
 from quantum.db import api as db
 from quantum.db import db_base_plugin_v2
+from quantum.db import ipam_db
 from quantum.db import models_v2
 from quantum.manager import QuantumManager
 from quantum.openstack.common import timeutils
@@ -840,6 +841,53 @@ class TestPortsV2(QuantumDbPluginV2TestCase):
             for p in self.deserialize(self.fmt, res)['ports']:
                 self._delete('ports', p['id'])
 
+    def test_create_ports_bulk_native_allocates_in_one_pass(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        plugin = QuantumManager.get_plugin()
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            net_id = subnet['subnet']['network_id']
+            with contextlib.nested(
+                mock.patch.object(plugin, '_check_unique_mac'),
+                mock.patch.object(plugin, '_generate_macs',
+                                  wraps=plugin._generate_macs),
+                mock.patch.object(
+                    ipam_db.get_ipam_driver(context.get_admin_context()),
+                    'generate_ip')
+            ) as (check_mac, generate_macs, generate_ip):
+                res = self._create_port_bulk(self.fmt, 5, net_id, 'test',
+                                             True)
+                self.assertEqual(res.status_int, 201)
+                self.assertFalse(check_mac.called)
+                self.assertFalse(generate_ip.called)
+                generate_macs.assert_called_once_with(mock.ANY, net_id, 5,
+                                                      ())
+            ports = self.deserialize(self.fmt, res)['ports']
+            self.assertEqual(len(set(p['mac_address'] for p in ports)), 5)
+            self.assertEqual([p['fixed_ips'][0]['ip_address']
+                              for p in ports],
+                             ['10.0.0.%d' % i for i in range(2, 7)])
+            for p in ports:
+                self._delete('ports', p['id'])
+
+    def test_create_ports_bulk_native_with_fixed_ips(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            net_id = subnet['subnet']['network_id']
+            overrides = {0: {'fixed_ips': [{'subnet_id':
+                                            subnet['subnet']['id']}]},
+                         1: {'fixed_ips': [{'ip_address': '10.0.0.3'}]}}
+            res = self._create_port_bulk(self.fmt, 3, net_id, 'test', True,
+                                         override=overrides)
+            self.assertEqual(res.status_int, 201)
+            ports = self.deserialize(self.fmt, res)['ports']
+            self.assertEqual(sorted(p['fixed_ips'][0]['ip_address']
+                                    for p in ports),
+                             ['10.0.0.2', '10.0.0.3', '10.0.0.4'])
+            for p in ports:
+                self._delete('ports', p['id'])
+
     def test_create_ports_bulk_emulated(self):
         real_has_attr = hasattr
 
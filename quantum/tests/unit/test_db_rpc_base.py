@@ -64,6 +64,30 @@ class TestDhcpRpcCallackMixin(base.BaseTestCase):
         self.assertEqual(retval['subnets'], subnet_retval)
         self.assertEqual(retval['ports'], port_retval)
 
+    def test_get_networks_info(self):
+        self.plugin.get_networks.return_value = [dict(id='a'), dict(id='b')]
+        self.plugin.get_subnets.return_value = [
+            dict(id='s1', network_id='a'), dict(id='s2', network_id='a')]
+        self.plugin.get_ports.return_value = [
+            dict(id='p1', network_id='b'), dict(id='p2', network_id='c')]
+
+        retval = self.callbacks.get_networks_info(mock.Mock(),
+                                                  network_ids=['a', 'b', 'c'],
+                                                  host='host')
+
+        self.assertEqual(retval, [
+            dict(id='a', ports=[],
+                 subnets=[dict(id='s1', network_id='a'),
+                          dict(id='s2', network_id='a')]),
+            dict(id='b', subnets=[],
+                 ports=[dict(id='p1', network_id='b')])])
+        filters = dict(network_id=['a', 'b', 'c'])
+        self.plugin.assert_has_calls(
+            [mock.call.get_networks(mock.ANY,
+                                    filters=dict(id=['a', 'b', 'c'])),
+             mock.call.get_subnets(mock.ANY, filters=filters),
+             mock.call.get_ports(mock.ANY, filters=filters)])
+
     def _test_get_dhcp_port_helper(self, port_retval, other_expectations=[],
                                    update_port=None, create_port=None):
         subnets_retval = [dict(id='a', enable_dhcp=True),
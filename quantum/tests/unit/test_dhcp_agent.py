@@ -33,6 +33,7 @@ from quantum.agent.linux import interface
 from quantum.common import constants
 from quantum.common import exceptions
 from quantum.openstack.common import jsonutils
+from quantum.openstack.common.rpc import common as rpc_common
 from quantum.tests import base
 
 
@@ -45,6 +46,11 @@ def etcdir(*p):
     return os.path.join(ETCDIR, *p)
 
 
+def _networks_info(network_ids):
+    return [dhcp_agent.DictModel(dict(id=network_id, subnets=[], ports=[]))
+            for network_id in network_ids]
+
+
 class FakeModel:
     def __init__(self, id_, **kwargs):
         self.id = id_
@@ -267,6 +273,7 @@ class TestDhcpAgent(base.BaseTestCase):
         with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
             mock_plugin = mock.Mock()
             mock_plugin.get_active_networks.return_value = active_networks
+            mock_plugin.get_networks_info.side_effect = _networks_info
             plug.return_value = mock_plugin
 
             dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
@@ -280,7 +287,7 @@ class TestDhcpAgent(base.BaseTestCase):
                 dhcp.sync_state()
 
                 exp_refresh = [
-                    mock.call(net_id) for net_id in active_networks]
+                    mock.call(net_id, mock.ANY) for net_id in active_networks]
 
                 diff = set(known_networks) - set(active_networks)
                 exp_disable = [mock.call(net_id) for net_id in diff]
@@ -288,6 +295,7 @@ class TestDhcpAgent(base.BaseTestCase):
                 mocks['cache'].assert_has_calls([mock.call.get_network_ids()])
                 mocks['refresh_dhcp_helper'].assert_has_called(exp_refresh)
                 mocks['disable_dhcp_helper'].assert_has_called(exp_disable)
+                self.assertFalse(dhcp.needs_resync)
 
     def test_sync_state_initial(self):
         self._test_sync_state_helper([], ['a'])
@@ -311,6 +319,162 @@ class TestDhcpAgent(base.BaseTestCase):
                 self.assertTrue(log.called)
                 self.assertTrue(dhcp.needs_resync)
 
+    def _test_sync_state_concurrency(self, active_networks, refresh):
+        with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
+            plug.return_value.get_active_networks.return_value = (
+                active_networks)
+            plug.return_value.get_networks_info.side_effect = _networks_info
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(dhcp, 'refresh_dhcp_helper',
+                                   side_effect=refresh):
+                dhcp.sync_state()
+        return dhcp
+
+    def test_sync_state_bounded_concurrency(self):
+        cfg.CONF.set_override('num_sync_threads', 2)
+        running = []
+        max_running = []
+
+        def refresh(network_id, network):
+            running.append(network_id)
+            max_running.append(len(running))
+            eventlet.sleep(0.01)
+            running.remove(network_id)
+
+        self._test_sync_state_concurrency(['a', 'b', 'c', 'd', 'e'], refresh)
+        self.assertEqual(len(max_running), 5)
+        self.assertEqual(max(max_running), 2)
+
+    def test_sync_state_network_error(self):
+        refreshed = []
+
+        def refresh(network_id, network):
+            if network_id == 'a':
+                raise Exception()
+            refreshed.append(network_id)
+
+        with mock.patch.object(dhcp_agent.LOG, 'exception') as log:
+            dhcp = self._test_sync_state_concurrency(['a', 'b', 'c'],
+                                                     refresh)
+        self.assertEqual(sorted(refreshed), ['b', 'c'])
+        self.assertTrue(dhcp.needs_resync)
+        self.assertEqual(log.call_count, 1)
+
+    def test_sync_state_serializes_network_notifications(self):
+        events = []
+
+        def refresh(network_id, network):
+            events.append(('refresh start', network_id))
+            eventlet.sleep(0.01)
+            events.append(('refresh end', network_id))
+
+        def enable(network_id):
+            events.append(('enable', network_id))
+
+        with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
+            plug.return_value.get_active_networks.return_value = ['a']
+            plug.return_value.get_networks_info.side_effect = _networks_info
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.multiple(dhcp, refresh_dhcp_helper=refresh,
+                                     enable_dhcp_helper=enable):
+                sync = eventlet.spawn(dhcp.sync_state)
+                while not events:
+                    eventlet.sleep(0)
+                # a notification for another network is not blocked
+                dhcp.network_create_end(None, {'network': {'id': 'b'}})
+                dhcp.network_create_end(None, {'network': {'id': 'a'}})
+                sync.wait()
+        self.assertEqual([('refresh start', 'a'),
+                          ('enable', 'b'),
+                          ('refresh end', 'a'),
+                          ('enable', 'a')], events)
+
+    def test_sync_state_fetches_networks_notified_since_fetch_again(self):
+        calls = []
+
+        def refresh(network_id, network=None):
+            calls.append((network_id, network and network.id))
+
+        def networks_info(network_ids):
+            # Handled before the fetched networks are refreshed
+            eventlet.spawn_n(dhcp.port_update_end, None,
+                             {'port': {'network_id': 'b'}})
+            eventlet.spawn_n(dhcp.network_delete_end, None,
+                             {'network_id': 'c'})
+            return _networks_info(['a', 'b'])
+
+        with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
+            plug.return_value.get_active_networks.return_value = ['a', 'b',
+                                                                  'c']
+            plug.return_value.get_networks_info.side_effect = networks_info
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.multiple(dhcp, refresh_dhcp_helper=refresh,
+                                     disable_dhcp_helper=mock.DEFAULT,
+                                     cache=mock.DEFAULT) as mocks:
+                mocks['cache'].get_network_ids.return_value = []
+                mocks['cache'].get_network_by_id.return_value = None
+                dhcp.sync_state()
+                self.assertEqual(sorted(calls), [('a', 'a'), ('b', None)])
+                # Disabled by the notification only
+                mocks['disable_dhcp_helper'].assert_called_once_with('c')
+                self.assertEqual(dhcp._notified_networks, [])
+                self.assertFalse(dhcp.needs_resync)
+
+    def _test_sync_state_networks_info(self, active_networks,
+                                       get_networks_info):
+        with mock.patch('quantum.agent.dhcp_agent.DhcpPluginApi') as plug:
+            mock_plugin = plug.return_value
+            mock_plugin.get_active_networks.return_value = active_networks
+            mock_plugin.get_networks_info.side_effect = get_networks_info
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.multiple(dhcp, refresh_dhcp_helper=mock.DEFAULT,
+                                     disable_dhcp_helper=mock.DEFAULT) as m:
+                dhcp.sync_state()
+        return dhcp, mock_plugin, m['refresh_dhcp_helper'], m[
+            'disable_dhcp_helper']
+
+    def test_sync_state_fetches_networks_in_chunks(self):
+        cfg.CONF.set_override('sync_chunk_size', 2)
+        dhcp, plugin, refresh, disable = self._test_sync_state_networks_info(
+            ['a', 'b', 'c', 'd', 'e'], _networks_info)
+        chunks = [args[0] for args, kwargs in
+                  plugin.get_networks_info.call_args_list]
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(sorted(sum(chunks, [])), ['a', 'b', 'c', 'd', 'e'])
+        self.assertFalse(plugin.get_network_info.called)
+        self.assertEqual(
+            sorted((args[0], args[1].id) for args, kwargs in
+                   refresh.call_args_list),
+            [(n, n) for n in ['a', 'b', 'c', 'd', 'e']])
+        self.assertFalse(dhcp.needs_resync)
+
+    def test_sync_state_disables_networks_deleted_during_sync(self):
+        dhcp, plugin, refresh, disable = self._test_sync_state_networks_info(
+            ['a', 'b'], lambda network_ids: _networks_info(['a']))
+        refresh.assert_called_once_with('a', mock.ANY)
+        disable.assert_called_once_with('b')
+
+    def test_sync_state_networks_info_unsupported(self):
+        error = rpc_common.RemoteError('AttributeError')
+        dhcp, plugin, refresh, disable = self._test_sync_state_networks_info(
+            ['a', 'b'], error)
+        self.assertEqual(sorted(refresh.call_args_list),
+                         [mock.call('a'), mock.call('b')])
+        self.assertFalse(dhcp.networks_info_supported)
+        self.assertFalse(dhcp.needs_resync)
+
+        with mock.patch.object(dhcp, 'refresh_dhcp_helper'):
+            dhcp.sync_state()
+        self.assertEqual(plugin.get_networks_info.call_count, 1)
+
+    def test_sync_state_networks_info_error(self):
+        error = rpc_common.RemoteError('ValueError')
+        dhcp, plugin, refresh, disable = self._test_sync_state_networks_info(
+            ['a'], error)
+        self.assertFalse(refresh.called)
+        self.assertTrue(dhcp.networks_info_supported)
+        self.assertTrue(dhcp.needs_resync)
+
     def test_periodic_resync(self):
         dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
         with mock.patch.object(dhcp_agent.eventlet, 'spawn') as spawn:
@@ -660,6 +824,21 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
             self.cache.assert_has_calls(
                 [mock.call.get_network_by_id('net-id')])
 
+    def test_refresh_dhcp_helper_given_network(self):
+        self.cache.get_network_by_id.return_value = fake_network
+        self.dhcp.refresh_dhcp_helper(fake_network.id, fake_network)
+        self.assertFalse(self.plugin.get_network_info.called)
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+        self.cache.assert_has_calls([mock.call.put(fake_network)])
+
+    def test_refresh_dhcp_helper_given_unknown_network(self):
+        self.cache.get_network_by_id.return_value = None
+        self.dhcp.refresh_dhcp_helper(fake_network.id, fake_network)
+        self.assertFalse(self.plugin.get_network_info.called)
+        self.call_driver.assert_called_once_with('enable', fake_network)
+        self.cache.assert_has_calls([mock.call.put(fake_network)])
+
     def test_refresh_dhcp_helper_exception_during_rpc(self):
         network = FakeModel('net-id',
                             tenant_id='aaaaaaaa-aaaa-aaaa-aaaaaaaaaaaa',
@@ -728,15 +907,55 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
                                                  fake_network)
 
     def test_port_update_end(self):
+        cfg.CONF.set_override('port_reload_delay', 0)
         payload = dict(port=vars(fake_port2))
         self.cache.get_network_by_id.return_value = fake_network
         self.dhcp.port_update_end(None, payload)
         self.cache.assert_has_calls(
             [mock.call.get_network_by_id(fake_port2.network_id),
              mock.call.put_port(mock.ANY)])
+        self.call_driver.assert_called_once_with('reload_hosts',
+                                                 fake_network)
+
+    def test_port_update_end_dhcp_port(self):
+        cfg.CONF.set_override('port_reload_delay', 0)
+        port = dict(vars(fake_port2), device_owner=constants.DEVICE_OWNER_DHCP)
+        self.cache.get_network_by_id.return_value = fake_network
+        self.dhcp.port_update_end(None, dict(port=port))
         self.call_driver.assert_called_once_with('reload_allocations',
                                                  fake_network)
 
+    def test_port_update_end_coalesced(self):
+        cfg.CONF.set_override('port_reload_delay', 0.01)
+        self.cache.get_network_by_id.return_value = fake_network
+        for port in (fake_port1, fake_port2):
+            self.dhcp.port_update_end(None, dict(port=vars(port)))
+        self.assertFalse(self.call_driver.called)
+        eventlet.sleep(0.05)
+        self.call_driver.assert_called_once_with('reload_hosts',
+                                                 fake_network)
+        self.assertEqual(self.dhcp.pending_reloads, {})
+
+    def test_port_events_coalesced_with_dhcp_port(self):
+        cfg.CONF.set_override('port_reload_delay', 0.01)
+        self.cache.get_network_by_id.return_value = fake_network
+        self.cache.get_port_by_id.return_value = FakeModel(
+            'dhcp-port', network_id=fake_network.id,
+            device_owner=constants.DEVICE_OWNER_DHCP)
+        self.dhcp.port_update_end(None, dict(port=vars(fake_port2)))
+        self.dhcp.port_delete_end(None, dict(port_id='dhcp-port'))
+        eventlet.sleep(0.05)
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+
+    def test_coalesced_reload_of_removed_network(self):
+        cfg.CONF.set_override('port_reload_delay', 0.01)
+        self.cache.get_network_by_id.return_value = fake_network
+        self.dhcp.port_update_end(None, dict(port=vars(fake_port2)))
+        self.cache.get_network_by_id.return_value = None
+        eventlet.sleep(0.05)
+        self.assertFalse(self.call_driver.called)
+
     def test_port_update_end_multihost(self):
         cfg.CONF.set_override('enable_multi_host', True)
         payload = dict(port=vars(fake_port2))
@@ -752,6 +971,7 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
             [mock.call.get_network_by_id(fake_port2.network_id)])
 
     def test_port_delete_end(self):
+        cfg.CONF.set_override('port_reload_delay', 0)
         payload = dict(port_id=fake_port2.id)
         self.cache.get_network_by_id.return_value = fake_network
         self.cache.get_port_by_id.return_value = fake_port2
@@ -760,9 +980,9 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
 
         self.cache.assert_has_calls(
             [mock.call.get_port_by_id(fake_port2.id),
-             mock.call.get_network_by_id(fake_network.id),
-             mock.call.remove_port(fake_port2)])
-        self.call_driver.assert_called_once_with('reload_allocations',
+             mock.call.remove_port(fake_port2),
+             mock.call.get_network_by_id(fake_network.id)])
+        self.call_driver.assert_called_once_with('reload_hosts',
                                                  fake_network)
 
     def test_port_delete_end_unknown_port(self):
@@ -806,6 +1026,15 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
                                               network_id='netid',
                                               host='foo')
 
+    def test_get_networks_info(self):
+        self.call.return_value = [dict(id='a'), dict(id='b')]
+        retval = self.proxy.get_networks_info(['a', 'b'])
+        self.assertEqual([network.id for network in retval], ['a', 'b'])
+        self.assertTrue(self.call.called)
+        self.make_msg.assert_called_once_with('get_networks_info',
+                                              network_ids=['a', 'b'],
+                                              host='foo')
+
     def test_get_dhcp_port(self):
         self.call.return_value = dict(a=1)
         retval = self.proxy.get_dhcp_port('netid', 'devid')
@@ -0,0 +1,158 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.config import cfg
+
+from quantum import context
+from quantum.db import ipam_db
+from quantum.tests import base
+from quantum.tests.unit import test_db_plugin
+
+
+class IpKeyTestCase(base.BaseTestCase):
+
+    def test_key_roundtrip_v4(self):
+        key = ipam_db.ip_to_key('10.0.0.1')
+        self.assertEqual(len(key), ipam_db.IP_KEY_WIDTH)
+        self.assertEqual(ipam_db.key_to_ip(key, 4), '10.0.0.1')
+
+    def test_key_roundtrip_v6(self):
+        key = ipam_db.ip_to_key('fe80::1')
+        self.assertEqual(len(key), ipam_db.IP_KEY_WIDTH)
+        self.assertEqual(ipam_db.key_to_ip(key, 6), 'fe80::1')
+
+    def test_key_order_matches_ip_order(self):
+        ips = ['10.0.0.9', '10.0.0.10', '10.0.1.0', '9.255.255.255']
+        self.assertEqual(sorted(ips, key=ipam_db.ip_to_key),
+                         ['9.255.255.255', '10.0.0.9', '10.0.0.10',
+                          '10.0.1.0'])
+
+
+class IntegerIpamTestMixin(object):
+
+    def setUp(self):
+        super(IntegerIpamTestMixin, self).setUp()
+        cfg.CONF.set_override('ipam_driver', ipam_db.INTEGER_IPAM_DRIVER)
+
+    def _get_int_ranges(self, subnet_id):
+        ctx = context.get_admin_context()
+        query = ctx.session.query(ipam_db.IPAvailabilityIntRange)
+        query = query.filter_by(subnet_id=subnet_id)
+        query = query.order_by(ipam_db.IPAvailabilityIntRange.first_ip)
+        return [(ipam_db.key_to_ip(r['first_ip'], 4),
+                 ipam_db.key_to_ip(r['last_ip'], 4)) for r in query]
+
+
+class TestIntegerIpamPortsV2(IntegerIpamTestMixin,
+                             test_db_plugin.TestPortsV2):
+
+    def test_allocate_specific_splits_and_recycle_merges(self):
+        with self.subnet(cidr='10.0.0.0/28') as subnet:
+            subnet_id = subnet['subnet']['id']
+            self.assertEqual(self._get_int_ranges(subnet_id),
+                             [('10.0.0.2', '10.0.0.14')])
+            kwargs = {'fixed_ips': [{'subnet_id': subnet_id,
+                                     'ip_address': '10.0.0.5'}]}
+            res = self._create_port(self.fmt,
+                                    net_id=subnet['subnet']['network_id'],
+                                    **kwargs)
+            port = self.deserialize(self.fmt, res)
+            self.assertEqual(self._get_int_ranges(subnet_id),
+                             [('10.0.0.2', '10.0.0.4'),
+                              ('10.0.0.6', '10.0.0.14')])
+            ctx = context.get_admin_context()
+            with ctx.session.begin(subtransactions=True):
+                ipam_db.get_ipam_driver(ctx).release_ip(ctx, subnet_id,
+                                                        '10.0.0.5')
+            self.assertEqual(self._get_int_ranges(subnet_id),
+                             [('10.0.0.2', '10.0.0.14')])
+            self._delete('ports', port['port']['id'])
+
+    def test_generate_ip_uses_lowest_free_address(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet_id = subnet['subnet']['id']
+            net_id = subnet['subnet']['network_id']
+            kwargs = {'fixed_ips': [{'subnet_id': subnet_id,
+                                     'ip_address': '10.0.0.3'}]}
+            res = self._create_port(self.fmt, net_id=net_id, **kwargs)
+            port1 = self.deserialize(self.fmt, res)
+            res = self._create_port(self.fmt, net_id=net_id)
+            port2 = self.deserialize(self.fmt, res)
+            res = self._create_port(self.fmt, net_id=net_id)
+            port3 = self.deserialize(self.fmt, res)
+            self.assertEqual(port2['port']['fixed_ips'][0]['ip_address'],
+                             '10.0.0.2')
+            self.assertEqual(port3['port']['fixed_ips'][0]['ip_address'],
+                             '10.0.0.4')
+            self.assertEqual(self._get_int_ranges(subnet_id),
+                             [('10.0.0.5', '10.0.0.6')])
+            for port in (port1, port2, port3):
+                self._delete('ports', port['port']['id'])
+
+
+class TestIntegerIpamSubnetsV2(IntegerIpamTestMixin,
+                               test_db_plugin.TestSubnetsV2):
+    pass
+
+
+class TestIpamDriverSwitch(test_db_plugin.QuantumDbPluginV2TestCase):
+
+    def _use_driver(self, driver_class):
+        cfg.CONF.set_override('ipam_driver', driver_class)
+        # As if the server was restarted
+        ipam_db._drivers.clear()
+
+    def _ip(self, port):
+        return port['port']['fixed_ips'][0]['ip_address']
+
+    def _create_ports(self, net_id, count):
+        return [self.deserialize(self.fmt,
+                                 self._create_port(self.fmt, net_id=net_id))
+                for i in range(count)]
+
+    def test_free_addresses_are_rebuilt(self):
+        self.addCleanup(ipam_db._drivers.clear)
+        with self.subnet(cidr='10.0.0.0/28') as subnet:
+            subnet_id = subnet['subnet']['id']
+            net_id = subnet['subnet']['network_id']
+            ports = self._create_ports(net_id, 2)
+            kwargs = {'fixed_ips': [{'subnet_id': subnet_id,
+                                     'ip_address': '10.0.0.5'}]}
+            ports.append(self.deserialize(
+                self.fmt, self._create_port(self.fmt, net_id=net_id,
+                                            **kwargs)))
+
+            self._use_driver(ipam_db.INTEGER_IPAM_DRIVER)
+            ports += self._create_ports(net_id, 2)
+            self.assertEqual([self._ip(p) for p in ports[3:]],
+                             ['10.0.0.4', '10.0.0.6'])
+
+            self._use_driver(ipam_db.RANGE_IPAM_DRIVER)
+            ports += self._create_ports(net_id, 1)
+            self.assertEqual(self._ip(ports[-1]), '10.0.0.7')
+            for port in ports:
+                self._delete('ports', port['port']['id'])
+
+    def test_active_driver_is_recorded(self):
+        self.addCleanup(ipam_db._drivers.clear)
+        self._use_driver(ipam_db.INTEGER_IPAM_DRIVER)
+        ctx = context.get_admin_context()
+        driver = ipam_db.get_ipam_driver(ctx)
+        self.assertTrue(driver.active)
+        self.assertEqual([r['driver'] for r in
+                          ctx.session.query(ipam_db.IPAMActiveDriver)],
+                         [ipam_db.INTEGER_IPAM_DRIVER])
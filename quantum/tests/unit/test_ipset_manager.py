@@ -0,0 +1,68 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from quantum.agent.linux import ipset_manager
+from quantum.tests import base
+
+
+class IpsetManagerTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IpsetManagerTestCase, self).setUp()
+        self.execute = mock.Mock()
+        self.ipset = ipset_manager.IpsetManager(self.execute,
+                                                root_helper='sudo')
+
+    def test_get_ipset_name(self):
+        name = ipset_manager.get_ipset_name('a' * 36, 'IPv6')
+        self.assertEqual(name, 'IPv6' + 'a' * 27)
+
+    def test_set_members_creates_set(self):
+        self.ipset.set_members('IPv4sg', 'IPv4', ['10.0.0.2', '10.0.0.1'])
+        self.execute.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input='create IPv4sg hash:ip family inet\n'
+                          'flush IPv4sg\n'
+                          'add IPv4sg 10.0.0.1\n'
+                          'add IPv4sg 10.0.0.2\n',
+            root_helper='sudo')
+
+    def test_set_members_updates_changed_members(self):
+        self.ipset.set_members('IPv6sg', 'IPv6', ['fe80::1', 'fe80::2'])
+        self.execute.reset_mock()
+        self.ipset.set_members('IPv6sg', 'IPv6', ['fe80::2', 'fe80::3'])
+        self.execute.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input='add IPv6sg fe80::3\n'
+                          'del IPv6sg fe80::1\n',
+            root_helper='sudo')
+
+    def test_set_members_unchanged(self):
+        self.ipset.set_members('IPv4sg', 'IPv4', ['10.0.0.1'])
+        self.execute.reset_mock()
+        self.ipset.set_members('IPv4sg', 'IPv4', ['10.0.0.1'])
+        self.assertFalse(self.execute.called)
+
+    def test_destroy(self):
+        self.ipset.set_members('IPv4sg', 'IPv4', [])
+        self.execute.reset_mock()
+        self.ipset.destroy('IPv4sg')
+        self.execute.assert_called_once_with(['ipset', 'destroy', 'IPv4sg'],
+                                             root_helper='sudo')
+        self.assertEqual(self.ipset.sets, {})
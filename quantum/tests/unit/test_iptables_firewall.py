@@ -64,7 +64,6 @@ class IptablesFirewallTestCase(base.BaseTestCase):
         self.firewall.prepare_port_filter(port)
         calls = [call.add_chain('sg-fallback'),
                  call.add_rule('sg-fallback', '-j DROP'),
-                 call.ensure_remove_chain('sg-chain'),
                  call.add_chain('sg-chain'),
                  call.add_chain('ifake_dev'),
                  call.add_rule('FORWARD',
@@ -714,7 +713,6 @@ class IptablesFirewallTestCase(base.BaseTestCase):
         self.firewall.prepare_port_filter(port)
         calls = [call.add_chain('sg-fallback'),
                  call.add_rule('sg-fallback', '-j DROP'),
-                 call.ensure_remove_chain('sg-chain'),
                  call.add_chain('sg-chain'),
                  call.add_chain('ifake_dev'),
                  call.add_rule('FORWARD',
@@ -778,15 +776,14 @@ class IptablesFirewallTestCase(base.BaseTestCase):
         port['security_group_rules'] = [{'ethertype': 'IPv4',
                                          'direction': 'ingress'}]
         self.firewall.prepare_port_filter(port)
-        port['security_group_rules'] = [{'ethertype': 'IPv4',
-                                         'direction': 'egress'}]
+        port = dict(port, security_group_rules=[{'ethertype': 'IPv4',
+                                                 'direction': 'egress'}])
         self.firewall.update_port_filter(port)
         self.firewall.update_port_filter({'device': 'no-exist-device'})
         self.firewall.remove_port_filter(port)
         self.firewall.remove_port_filter({'device': 'no-exist-device'})
         calls = [call.add_chain('sg-fallback'),
                  call.add_rule('sg-fallback', '-j DROP'),
-                 call.ensure_remove_chain('sg-chain'),
                  call.add_chain('sg-chain'),
                  call.add_chain('ifake_dev'),
                  call.add_rule(
@@ -836,10 +833,17 @@ class IptablesFirewallTestCase(base.BaseTestCase):
                      '-m state --state ESTABLISHED,RELATED -j RETURN'),
                  call.add_rule('ofake_dev', '-j $sg-fallback'),
                  call.add_rule('sg-chain', '-j ACCEPT'),
+                 call.remove_rule(
+                     'FORWARD',
+                     '-m physdev --physdev-is-bridged '
+                     '--physdev-out tapfake_dev -j $sg-chain'),
                  call.ensure_remove_chain('ifake_dev'),
+                 call.remove_rule(
+                     'FORWARD',
+                     '-m physdev --physdev-is-bridged '
+                     '--physdev-in tapfake_dev -j $sg-chain'),
                  call.ensure_remove_chain('ofake_dev'),
-                 call.ensure_remove_chain('sg-chain'),
-                 call.add_chain('sg-chain'),
+                 call.remove_rule('sg-chain', '-j ACCEPT'),
                  call.add_chain('ifake_dev'),
                  call.add_rule(
                      'FORWARD',
@@ -886,13 +890,103 @@ class IptablesFirewallTestCase(base.BaseTestCase):
                  call.add_rule('ofake_dev', '-j RETURN'),
                  call.add_rule('ofake_dev', '-j $sg-fallback'),
                  call.add_rule('sg-chain', '-j ACCEPT'),
+                 call.remove_rule(
+                     'FORWARD',
+                     '-m physdev --physdev-is-bridged '
+                     '--physdev-out tapfake_dev -j $sg-chain'),
                  call.ensure_remove_chain('ifake_dev'),
+                 call.remove_rule(
+                     'FORWARD',
+                     '-m physdev --physdev-is-bridged '
+                     '--physdev-in tapfake_dev -j $sg-chain'),
                  call.ensure_remove_chain('ofake_dev'),
-                 call.ensure_remove_chain('sg-chain'),
-                 call.add_chain('sg-chain')]
+                 call.remove_rule('sg-chain', '-j ACCEPT')]
 
         self.v4filter_inst.assert_has_calls(calls)
 
+    def test_update_unchanged_port_filter(self):
+        port = self._fake_port()
+        self.firewall.prepare_port_filter(port)
+        self.v4filter_inst.reset_mock()
+        self.iptables_inst.apply.reset_mock()
+        self.firewall.update_port_filter(dict(port))
+        self.assertEqual(self.v4filter_inst.mock_calls, [])
+        self.assertFalse(self.iptables_inst.apply.called)
+
+    def test_prepare_port_filter_leaves_other_ports(self):
+        port = self._fake_port()
+        self.firewall.prepare_port_filter(port)
+        self.v4filter_inst.reset_mock()
+        port2 = dict(port, device='tapfake_dev2')
+        self.firewall.prepare_port_filter(port2)
+        removed = [c for c in self.v4filter_inst.mock_calls
+                   if c[0] in ('remove_chain', 'ensure_remove_chain')]
+        self.assertEqual(removed, [])
+        self.assertEqual(self.v4filter_inst.mock_calls[0],
+                         call.remove_rule('sg-chain', '-j ACCEPT'))
+        self.assertEqual(self.v4filter_inst.mock_calls[-1],
+                         call.add_rule('sg-chain', '-j ACCEPT'))
+
+    def test_update_filters(self):
+        port1 = self._fake_port()
+        port2 = dict(port1, device='tapfake_dev2')
+        self.firewall.prepare_port_filter(port1)
+        self.firewall.prepare_port_filter(port2)
+        port3 = dict(port1, device='tapfake_dev3')
+        with mock.patch.object(self.firewall, 'prepare_port_filter') as pre:
+            with mock.patch.object(self.firewall,
+                                   'update_port_filter') as upd:
+                with mock.patch.object(self.firewall,
+                                       'remove_port_filter') as rem:
+                    self.iptables_inst.reset_mock()
+                    self.firewall.update_filters(
+                        [port1, port3], removed_devices=['tapfake_dev2',
+                                                         'tapunknown'])
+        rem.assert_called_once_with(port2)
+        upd.assert_called_once_with(port1)
+        pre.assert_called_once_with(port3)
+        self.iptables_inst.assert_has_calls([call.defer_apply_on(),
+                                             call.defer_apply_off()])
+
+    def test_filter_ipv4_ingress_remote_group_with_ipset(self):
+        self.firewall.use_ipset = True
+        rule = {'ethertype': 'IPv4',
+                'direction': 'ingress',
+                'protocol': 'tcp',
+                'remote_group_id': 'fake_sgid'}
+        ingress = call.add_rule(
+            'ifake_dev',
+            '-j RETURN -p tcp -m set --match-set IPv4fake_sgid src')
+        egress = None
+        self._test_prepare_port_filter(rule, ingress, egress)
+        self.utils_exec.assert_called_once_with(
+            ['ipset', 'restore', '-exist'],
+            process_input='create IPv4fake_sgid hash:ip family inet\n'
+                          'flush IPv4fake_sgid\n',
+            root_helper=mock.ANY)
+
+    def test_update_security_group_members(self):
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.2'], 'IPv6': []})
+        self.assertEqual(self.firewall.ipset.sets,
+                         {'IPv4fake_sgid': set(['10.0.0.2']),
+                          'IPv6fake_sgid': set()})
+
+    def test_remove_port_filter_destroys_unused_ipset(self):
+        self.firewall.use_ipset = True
+        self.iptables_inst.iptables_apply_deferred = False
+        port = self._fake_port()
+        port['security_group_rules'] = [{'ethertype': 'IPv4',
+                                         'direction': 'ingress',
+                                         'remote_group_id': 'fake_sgid'}]
+        self.firewall.prepare_port_filter(port)
+        self.assertIn('IPv4fake_sgid', self.firewall.ipset.sets)
+        self.utils_exec.reset_mock()
+        self.firewall.remove_port_filter(port)
+        self.utils_exec.assert_called_once_with(
+            ['ipset', 'destroy', 'IPv4fake_sgid'], root_helper=mock.ANY)
+        self.assertEqual(self.firewall.ipset.sets, {})
+
     def test_remove_unknown_port(self):
         port = self._fake_port()
         self.firewall.remove_port_filter(port)
@@ -18,6 +18,7 @@
 
 import copy
 
+import eventlet
 import mock
 from oslo.config import cfg
 
@@ -413,14 +414,129 @@ class TestBasicRouterOperations(base.BaseTestCase):
              'routes': [],
              'external_gateway_info': {}}]
         agent._process_routers(routers)
+        agent.router_pool.waitall()
+        self.assertIn(routers[0]['id'], agent.router_info)
 
         agent.router_deleted(None, routers[0]['id'])
+        agent.router_pool.waitall()
         # verify that remove is called
         self.assertEqual(self.mock_ip.get_devices.call_count, 1)
+        self.assertNotIn(routers[0]['id'], agent.router_info)
 
         self.device_exists.assert_has_calls(
             [mock.call(self.conf.external_network_bridge)])
 
+    def _router(self, **kwargs):
+        router = {'id': _uuid(),
+                  'admin_state_up': True,
+                  'routes': [],
+                  'external_gateway_info': {}}
+        router.update(kwargs)
+        return router
+
+    def testRouterUpdatesMerged(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router_id = _uuid()
+        processed = []
+
+        def process_router(ri):
+            processed.append(ri.router['name'])
+            eventlet.sleep(0.01)
+
+        with mock.patch.object(agent, 'process_router',
+                               side_effect=process_router):
+            for name in ('first', 'second', 'third'):
+                agent.routers_updated(None, [self._router(id=router_id,
+                                                          name=name)])
+                eventlet.sleep(0)
+            agent.router_pool.waitall()
+        # The updates queued while the first one was processed are merged
+        self.assertEqual(processed, ['first', 'third'])
+        self.assertEqual(agent._router_updates, {})
+        self.assertEqual(agent._busy_routers, set())
+
+    def testRouterDeletionReplacesPendingUpdate(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = self._router()
+        with mock.patch.object(agent, '_process_router_update') as update:
+            agent._busy_routers.add(router['id'])
+            agent.routers_updated(None, [router])
+            agent.router_deleted(None, router['id'])
+            agent._process_router_updates(router['id'])
+        update.assert_called_once_with(router['id'], None, None)
+
+    def testRoutersProcessedConcurrently(self):
+        self.conf.set_override('num_router_threads', 2)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        running = []
+        max_running = []
+
+        def process_router(ri):
+            running.append(ri.router_id)
+            max_running.append(len(running))
+            eventlet.sleep(0.01)
+            running.remove(ri.router_id)
+
+        with mock.patch.object(agent, 'process_router',
+                               side_effect=process_router):
+            agent.routers_updated(None, [self._router() for i in range(5)])
+            agent.router_pool.waitall()
+        self.assertEqual(len(max_running), 5)
+        self.assertEqual(max(max_running), 2)
+
+    def testRouterProcessingFailureTriggersFullSync(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.fullsync = False
+        with mock.patch.object(agent, 'process_router',
+                               side_effect=RuntimeError):
+            agent.routers_updated(None, [self._router()])
+            agent.router_pool.waitall()
+        self.assertTrue(agent.fullsync)
+
+    def testProcessRouterDefersIptablesApply(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = self._router()
+        agent._process_router_update(router['id'], router, None)
+        ri = agent.router_info[router['id']]
+        with mock.patch.object(ri.iptables_manager, '_apply') as apply:
+            with mock.patch.object(agent, 'process_router') as process:
+                # e.g. one apply per interface and floating ip
+                process.side_effect = lambda ri: [
+                    ri.iptables_manager.apply() for i in range(3)]
+                agent._process_router_update(router['id'], router, None)
+        apply.assert_called_once_with()
+
+    def testSyncRoutersRemovesUnknownRouters(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        old_router = self._router()
+        new_router = self._router()
+        agent._process_routers([old_router])
+        agent.router_pool.waitall()
+
+        self.plugin_api.get_routers.return_value = [new_router]
+        agent._sync_routers_task(None)
+        self.assertEqual(list(agent.router_info), [new_router['id']])
+        self.assertFalse(agent.fullsync)
+
+    def testSyncRoutersKeepsNotificationsReceivedDuringFetch(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        self.plugin_api.get_external_network_id.return_value = None
+        deleted_router = self._router()
+        created_router = self._router()
+        agent._process_routers([deleted_router])
+        agent.router_pool.waitall()
+
+        def get_routers(context, router_id):
+            agent.router_deleted(None, deleted_router['id'])
+            agent.routers_updated(None, [created_router])
+            agent.router_pool.waitall()
+            return [deleted_router]
+        self.plugin_api.get_routers.side_effect = get_routers
+        agent._sync_routers_task(None)
+        self.assertEqual(list(agent.router_info), [created_router['id']])
+        self.assertIsNone(agent._notified_routers)
+
     def testDestroyNamespace(self):
 
         class FakeDev(object):
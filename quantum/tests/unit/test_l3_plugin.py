@@ -296,8 +296,10 @@ class TestL3NatPlugin(db_base_plugin_v2.QuantumDbPluginV2,
         nets = super(TestL3NatPlugin, self).get_networks(
             context, filters=filters, fields=fields, sorts=sorts, limit=limit,
             marker=marker, page_reverse=page_reverse)
-        for net in nets:
-            self._extend_network_dict_l3(context, net)
+        with self._dict_extension_prefetch(context, attributes.NETWORKS,
+                                           nets):
+            for net in nets:
+                self._extend_network_dict_l3(context, net)
         return [self._fields(net, fields) for net in nets]
 
     def delete_port(self, context, id, l3_port_check=True):
@@ -1446,6 +1448,24 @@ class L3NatDBTestCase(L3NatTestCaseBase):
                                   query_params="%s=False" % l3.EXTERNAL)
                 self.assertEqual(len(body['networks']), 1)
 
+    def test_list_nets_external_single_query(self):
+        with contextlib.nested(self.network(),
+                               self.network()) as (n1, n2):
+            self._set_net_external(n1['network']['id'])
+            plugin = QuantumManager.get_plugin()
+            with contextlib.nested(
+                mock.patch.object(plugin, '_network_is_external'),
+                mock.patch.object(plugin, '_prefetch_network_dict_l3',
+                                  side_effect=plugin._prefetch_network_dict_l3)
+            ) as (is_external, prefetch):
+                body = self._list('networks')
+            self.assertFalse(is_external.called)
+            self.assertEqual(prefetch.call_count, 1)
+            external = dict((net['id'], net[l3.EXTERNAL])
+                            for net in body['networks'])
+            self.assertEqual(external, {n1['network']['id']: True,
+                                        n2['network']['id']: False})
+
     def test_list_nets_external_pagination(self):
         if self._skip_native_pagination:
             self.skipTest("Skip test for not implemented pagination feature")
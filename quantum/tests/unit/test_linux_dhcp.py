@@ -18,6 +18,7 @@
 import os
 import socket
 
+import fixtures
 import mock
 from oslo.config import cfg
 
@@ -170,6 +171,14 @@ class TestDhcpBase(base.BaseTestCase):
         c.restart()
         self.assertEqual(c.called, ['disable True', 'enable'])
 
+    def test_reload_hosts_reloads_allocations(self):
+        class SubClass(dhcp.DhcpBase):
+            enable = disable = active = None
+            reload_allocations = mock.Mock()
+
+        SubClass(None, None).reload_hosts()
+        SubClass.reload_allocations.assert_called_once_with()
+
 
 class LocalChild(dhcp.DhcpLocalProcess):
     PORTS = {4: [4], 6: [6]}
@@ -644,6 +653,68 @@ tag:tag1,option:classless-static-route,%s,%s""".lstrip() % (fake_v6,
                                     mock.call(exp_opt_name, exp_opt_data)])
         self.execute.assert_called_once_with(exp_args, 'sudo')
 
+    def _test_reload(self, method, host_changed=True, opts_changed=True):
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(), namespace='qdhcp-ns',
+                          version=float(2.59))
+        changed = {'host': host_changed, 'opts': opts_changed}
+        with mock.patch.multiple(dm, _build_hosts=mock.DEFAULT,
+                                 _build_opts=mock.DEFAULT,
+                                 _replace_conf_file=mock.DEFAULT) as mocks:
+            mocks['_replace_conf_file'].side_effect = (
+                lambda kind, contents: changed[kind])
+            with mock.patch.object(dhcp.Dnsmasq, 'active') as active:
+                active.__get__ = mock.Mock(return_value=True)
+                with mock.patch.object(dhcp.Dnsmasq, 'pid') as pid:
+                    pid.__get__ = mock.Mock(return_value=5)
+                    getattr(dm, method)()
+        return mocks
+
+    def test_reload_allocations_unchanged(self):
+        mocks = self._test_reload('reload_allocations', False, False)
+        self.assertEqual(mocks['_replace_conf_file'].call_count, 2)
+        # The files may have been written by a reload which failed
+        self.execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'qdhcp-ns', 'kill', '-HUP', 5],
+            root_helper='sudo', check_exit_code=True)
+
+    def test_reload_hosts(self):
+        mocks = self._test_reload('reload_hosts')
+        self.assertFalse(mocks['_build_opts'].called)
+        mocks['_replace_conf_file'].assert_called_once_with(
+            'host', mocks['_build_hosts'].return_value)
+        self.execute.assert_called_once_with(
+            ['ip', 'netns', 'exec', 'qdhcp-ns', 'kill', '-HUP', 5],
+            root_helper='sudo', check_exit_code=True)
+
+    def test_reload_hosts_unchanged(self):
+        self._test_reload('reload_hosts', host_changed=False)
+        self.assertFalse(self.execute.called)
+
+    def test_reload_hosts_no_dhcp_subnet(self):
+        dm = dhcp.Dnsmasq(self.conf, FakeV4Network())
+        with mock.patch.multiple(dm, _enable_dhcp=mock.DEFAULT,
+                                 reload_allocations=mock.DEFAULT) as mocks:
+            mocks['_enable_dhcp'].return_value = False
+            dm.reload_hosts()
+            mocks['reload_allocations'].assert_called_once_with()
+
+    def test_replace_conf_file(self):
+        conf_dir = self.useFixture(fixtures.TempDir()).path
+        self.conf.set_override('dhcp_confs', conf_dir)
+        dm = dhcp.Dnsmasq(self.conf, FakeV4Network())
+        file_name = dm.get_conf_file_name('host', ensure_conf_dir=True)
+
+        self.assertTrue(dm._replace_conf_file('host', 'foo'))
+        self.safe.assert_called_once_with(file_name, 'foo')
+
+        with open(file_name, 'w') as f:
+            f.write('foo')
+        self.safe.reset_mock()
+        self.assertFalse(dm._replace_conf_file('host', 'foo'))
+        self.assertFalse(self.safe.called)
+        self.assertTrue(dm._replace_conf_file('host', 'bar'))
+        self.safe.assert_called_once_with(file_name, 'bar')
+
     def test_make_subnet_interface_ip_map(self):
         with mock.patch('quantum.agent.linux.ip_lib.IPDevice') as ip_dev:
             ip_dev.return_value.addr.list.return_value = [
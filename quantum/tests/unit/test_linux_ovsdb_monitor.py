@@ -0,0 +1,88 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import StringIO
+
+import mock
+
+from quantum.agent.linux import ovsdb_monitor
+from quantum.tests import base
+
+HEADINGS = '"headings":["row","action","name","ofport","external_ids"]'
+INITIAL = ('{"data":[["uuid1","initial","tap1",1,'
+           '["map",[["attached-mac","fa:16:3e:00:00:01"],'
+           '["iface-id","port1"]]]],'
+           '["uuid2","initial","br-int",65534,["map",[]]]],%s}' % HEADINGS)
+INSERT = ('{"data":[["uuid3","insert","tap3",["set",[]],'
+          '["map",[["iface-id","port3"]]]]],%s}' % HEADINGS)
+UPDATE = ('{"data":[["uuid3","old",null,["set",[]],null],'
+          '["uuid3","new","tap3",3,["map",[["iface-id","port3"]]]]],%s}'
+          % HEADINGS)
+DELETE = ('{"data":[["uuid1","delete","tap1",1,'
+          '["map",[["iface-id","port1"]]]]],%s}' % HEADINGS)
+
+
+class TestInterfaceMonitor(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestInterfaceMonitor, self).setUp()
+        self.monitor = ovsdb_monitor.InterfaceMonitor(root_helper='sudo')
+        popen_p = mock.patch.object(ovsdb_monitor.utils, 'subprocess_popen')
+        self.popen = popen_p.start()
+        self.addCleanup(popen_p.stop)
+        self.addCleanup(self.monitor.stop)
+
+    def _start(self, *lines):
+        process = self.popen.return_value
+        output = ''.join(line + '\n' for line in lines)
+        process.stdout = StringIO.StringIO(output)
+        process.stderr = StringIO.StringIO('')
+        self.monitor.start()
+        # let the reader consume the output
+        self.monitor._reader.wait()
+
+    def test_start_runs_ovsdb_client(self):
+        self._start()
+        self.assertEqual(self.popen.call_args[0][0],
+                         ['sudo', 'ovsdb-client', 'monitor', 'Interface',
+                          'name,ofport,external_ids', '--format=json'])
+
+    def test_get_events(self):
+        self._start(INITIAL, INSERT, UPDATE, DELETE)
+        events = self.monitor.get_events()
+        self.assertEqual([(e['action'], e['name'], e['ofport'])
+                          for e in events],
+                         [('added', 'tap1', 1),
+                          ('added', 'br-int', 65534),
+                          ('added', 'tap3', None),
+                          ('updated', 'tap3', 3),
+                          ('removed', 'tap1', 1)])
+        self.assertEqual(events[3]['external_ids'], {'iface-id': 'port3'})
+        self.assertEqual(self.monitor.get_events(), [])
+
+    def test_get_events_skips_invalid_output(self):
+        self._start('garbage', INSERT)
+        self.assertEqual([e['name'] for e in self.monitor.get_events()],
+                         ['tap3'])
+
+    def test_is_active(self):
+        self.assertFalse(self.monitor.is_active())
+        self.popen.return_value.poll.return_value = None
+        self._start()
+        self.assertTrue(self.monitor.is_active())
+        self.popen.return_value.poll.return_value = 1
+        self.assertFalse(self.monitor.is_active())
@@ -19,6 +19,7 @@
 import socket
 
 import mock
+from quantumclient.common import exceptions as qclient_exc
 import testtools
 import webob
 
@@ -37,6 +38,8 @@ class FakeConf(object):
     nova_metadata_ip = '9.9.9.9'
     nova_metadata_port = 8775
     metadata_proxy_shared_secret = 'secret'
+    instance_cache_ttl = 5
+    instance_cache_size = 2
 
 
 class TestMetadataProxyHandler(base.BaseTestCase):
@@ -95,7 +98,9 @@ class TestMetadataProxyHandler(base.BaseTestCase):
                 region_name=FakeConf.auth_region,
                 auth_url=FakeConf.auth_url,
                 password=FakeConf.admin_password,
-                auth_strategy=FakeConf.auth_strategy)
+                auth_strategy=FakeConf.auth_strategy,
+                token=None,
+                endpoint_url=None)
         ]
 
         if router_id:
@@ -178,6 +183,67 @@ class TestMetadataProxyHandler(base.BaseTestCase):
             self._get_instance_id_helper(headers, ports, networks=['the_id'])
         )
 
+    def test_get_instance_id_cached(self):
+        req = mock.Mock(headers={'X-Forwarded-For': '192.168.1.1',
+                                 'X-Quantum-Network-ID': 'the_id'})
+        list_ports = self.qclient.return_value.list_ports
+        list_ports.return_value = {'ports': [{'device_id': 'device_id'}]}
+        for i in range(2):
+            self.assertEqual(self.handler._get_instance_id(req), 'device_id')
+        self.assertEqual(list_ports.call_count, 1)
+        self.assertEqual(self.handler.instances.hits, 1)
+        self.assertEqual(self.handler.instances.misses, 1)
+
+    def test_get_instance_id_no_match_not_cached(self):
+        req = mock.Mock(headers={'X-Forwarded-For': '192.168.1.1',
+                                 'X-Quantum-Network-ID': 'the_id'})
+        list_ports = self.qclient.return_value.list_ports
+        list_ports.return_value = {'ports': []}
+        for i in range(2):
+            self.assertIsNone(self.handler._get_instance_id(req))
+        self.assertEqual(list_ports.call_count, 2)
+
+    def test_auth_token_reused(self):
+        httpclient = self.qclient.return_value.httpclient
+        httpclient.auth_token = 'token'
+        httpclient.endpoint_url = 'http://quantum'
+        self.qclient.return_value.list_ports.return_value = {'ports': []}
+        for address in ('192.168.1.1', '192.168.1.2'):
+            req = mock.Mock(headers={'X-Forwarded-For': address,
+                                     'X-Quantum-Network-ID': 'the_id'})
+            self.handler._get_instance_id(req)
+        self.assertIsNone(self.qclient.call_args_list[0][1]['token'])
+        self.assertEqual(self.qclient.call_args_list[1][1]['token'], 'token')
+        self.assertEqual(self.qclient.call_args_list[1][1]['endpoint_url'],
+                         'http://quantum')
+
+    def test_expired_auth_token(self):
+        self.handler.auth_token = 'expired'
+        self.handler.endpoint_url = 'http://quantum'
+        httpclient = self.qclient.return_value.httpclient
+        httpclient.auth_token = 'token'
+        httpclient.endpoint_url = 'http://quantum'
+        list_ports = self.qclient.return_value.list_ports
+        list_ports.side_effect = [qclient_exc.Unauthorized(),
+                                  {'ports': [{'device_id': 'device_id'}]}]
+        req = mock.Mock(headers={'X-Forwarded-For': '192.168.1.1',
+                                 'X-Quantum-Network-ID': 'the_id'})
+        self.assertEqual(self.handler._get_instance_id(req), 'device_id')
+        self.assertEqual(self.qclient.call_args_list[0][1]['token'],
+                         'expired')
+        self.assertIsNone(self.qclient.call_args_list[1][1]['token'])
+        self.assertIsNone(self.qclient.call_args_list[1][1]['endpoint_url'])
+        self.assertEqual(self.handler.auth_token, 'token')
+
+    def test_unauthorized_without_saved_token_is_raised(self):
+        self.qclient.return_value.list_ports.side_effect = (
+            qclient_exc.Unauthorized())
+        req = mock.Mock(headers={'X-Forwarded-For': '192.168.1.1',
+                                 'X-Quantum-Network-ID': 'the_id'})
+        self.assertRaises(qclient_exc.Unauthorized,
+                          self.handler._get_instance_id, req)
+        self.assertEqual(self.qclient.call_count, 1)
+
     def _proxy_request_test_helper(self, response_code=200, method='GET'):
         hdrs = {'X-Forwarded-For': '8.8.8.8'}
         body = 'body'
@@ -233,6 +299,17 @@ class TestMetadataProxyHandler(base.BaseTestCase):
         with testtools.ExpectedException(Exception) as e:
             self._proxy_request_test_helper(302)
 
+    def test_proxy_request_connection_reused(self):
+        self._proxy_request_test_helper()
+        http = self.handler.nova_connections[0]
+        with mock.patch('httplib2.Http') as mock_http:
+            http.request.return_value = (mock.Mock(status=200), 'content')
+            req = mock.Mock(path_info='/the_path', query_string='',
+                            headers={}, method='GET', body='')
+            self.handler._proxy_request('the_id', req)
+            self.assertFalse(mock_http.called)
+        self.assertEqual(self.handler.nova_connections, [http])
+
     def test_sign_instance_id(self):
         self.assertEqual(
             self.handler._sign_instance_id('foo'),
@@ -240,6 +317,38 @@ class TestMetadataProxyHandler(base.BaseTestCase):
         )
 
 
+class TestInstanceCache(base.BaseTestCase):
+    def setUp(self):
+        super(TestInstanceCache, self).setUp()
+        self.time_p = mock.patch('time.time', return_value=100)
+        self.time = self.time_p.start()
+        self.addCleanup(self.time_p.stop)
+        self.cache = agent.InstanceCache(5, 2)
+
+    def test_get(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', 'id')
+        self.assertEqual(self.cache.get('key'), 'id')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_expiry(self):
+        self.cache.set('key', 'id')
+        self.time.return_value = 105
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_size(self):
+        for key in ('key1', 'key2', 'key3'):
+            self.cache.set(key, 'id')
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertEqual(self.cache.get('key2'), 'id')
+        self.assertEqual(self.cache.get('key3'), 'id')
+
+    def test_disabled(self):
+        cache = agent.InstanceCache(0, 2)
+        cache.set('key', 'id')
+        self.assertIsNone(cache.get('key'))
+
+
 class TestUnixDomainHttpProtocol(base.BaseTestCase):
     def test_init_empty_client(self):
         u = agent.UnixDomainHttpProtocol(mock.Mock(), '', mock.Mock())
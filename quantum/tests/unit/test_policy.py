@@ -23,11 +23,13 @@ import urllib2
 
 import fixtures
 import mock
+from oslo.config import cfg
 
 import quantum
 from quantum.common import exceptions
 from quantum import context
 from quantum.openstack.common import importutils
+from quantum.openstack.common import loopingcall
 from quantum.openstack.common import policy as common_policy
 from quantum import policy
 from quantum.tests import base
@@ -59,12 +61,34 @@ class PolicyFileTestCase(base.BaseTestCase):
             # NOTE(vish): reset stored policy cache so we don't have to
             # sleep(1)
             policy._POLICY_CACHE = {}
+            # Checking the policy does not look at the file
+            policy.enforce(self.context, action, self.target)
+            policy._reload_if_modified()
             self.assertRaises(exceptions.PolicyNotAuthorized,
                               policy.enforce,
                               self.context,
                               action,
                               self.target)
 
+    def test_init_starts_reload_timer(self):
+        cfg.CONF.set_override('policy_reload_interval', 5)
+        self.addCleanup(cfg.CONF.clear_override, 'policy_reload_interval')
+        with mock.patch.object(loopingcall, 'LoopingCall') as looping_call:
+            policy.init()
+            policy.init()
+        looping_call.assert_called_once_with(policy._reload_if_modified)
+        looping_call.return_value.start.assert_called_once_with(
+            interval=5, initial_delay=5)
+        policy.reset()
+        looping_call.return_value.stop.assert_called_once_with()
+
+    def test_init_compiles_attribute_rules(self):
+        policy.init()
+        action_rule, attribute_rules = policy._MATCH_RULES['create_network']
+        self.assertEqual(str(action_rule), 'rule:create_network')
+        self.assertIn('rule:create_network:shared',
+                      [str(rule) for _n, _r, rule in attribute_rules])
+
 
 class PolicyTestCase(base.BaseTestCase):
     def setUp(self):
@@ -303,3 +327,41 @@ class QuantumPolicyTestCase(base.BaseTestCase):
             target = {'network_id': 'whatever'}
             result = policy.enforce(self.context, action, target, self.plugin)
             self.assertTrue(result)
+
+    def test_check_many(self):
+        targets = [{'shared': True, 'tenant_id': 'somebody_else'},
+                   {'shared': False, 'tenant_id': 'somebody_else'},
+                   {'shared': False, 'tenant_id': 'fake'}]
+        result = policy.check_many(self.context, 'get_network', targets)
+        self.assertEqual(result, [True, False, True])
+
+    def test_check_compiles_rule_once(self):
+        targets = [{'shared': True, 'tenant_id': 'fake'}] * 3
+        with contextlib.nested(
+            mock.patch.object(policy, '_MATCH_RULES', {}),
+            mock.patch.object(policy, '_compile_match_rule',
+                              wraps=policy._compile_match_rule)
+        ) as (_rules, compile):
+            result = policy.check_many(self.context, 'get_network', targets)
+            self.assertTrue(policy.check(self.context, 'get_network',
+                                         targets[0]))
+        self.assertEqual(result, [True] * 3)
+        self.assertEqual(compile.call_count, 1)
+
+    def test_check_many_write_attribute_rules(self):
+        targets = [{'tenant_id': 'fake'},
+                   {'tenant_id': 'fake', 'shared': True}]
+        result = policy.check_many(self.context, 'create_network', targets)
+        self.assertEqual(result, [True, False])
+
+    def test_check_many_parentresource_fetched_once(self):
+        action = "create_port:mac"
+        targets = [{'network_id': 'net1'}, {'network_id': 'net1'},
+                   {'network_id': 'net2'}]
+        with mock.patch.object(self.plugin, 'get_network') as get_network:
+            get_network.side_effect = lambda context, id, fields: (
+                {'tenant_id': id == 'net1' and 'fake' or 'other'})
+            result = policy.check_many(self.context, action, targets,
+                                       self.plugin)
+        self.assertEqual(result, [True, True, False])
+        self.assertEqual(get_network.call_count, 2)
@@ -0,0 +1,181 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import threading
+
+import fixtures
+import mock
+from oslo.config import cfg
+
+from quantum.agent.common import config
+from quantum.agent.linux import utils
+from quantum.rootwrap import client
+from quantum.rootwrap import daemon
+from quantum.rootwrap import filters
+from quantum.rootwrap import wrapper
+from quantum.tests import base
+
+
+class RootwrapDaemonTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        temp_dir = self.useFixture(fixtures.TempDir()).path
+        self.test_file = os.path.join(temp_dir, 'test_file')
+        open(self.test_file, 'w').close()
+        socket_path = os.path.join(temp_dir, 'rootwrap.sock')
+        self.filters = [filters.CommandFilter('/bin/cat', 'root'),
+                        filters.CommandFilter('/bin/ls', 'root')]
+        self.server = daemon.RootwrapServer(socket_path, self.filters,
+                                            'authkey')
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.client = client.Client('sudo quantum-rootwrap-daemon conf')
+        self.client._process = mock.Mock()
+        self.client._process.poll.return_value = None
+        self.client._socket_path = socket_path
+        self.client._authkey = 'authkey'
+
+    def test_execute(self):
+        self.assertEqual(self.client.execute(['ls', self.test_file]),
+                         (0, '%s\n' % self.test_file, ''))
+
+    def test_execute_with_stdin(self):
+        self.assertEqual(self.client.execute(['cat'], 'foo\nbar\n'),
+                         (0, 'foo\nbar\n', ''))
+
+    def test_execute_returns_exit_code(self):
+        returncode, stdout, stderr = self.client.execute(
+            ['ls', self.test_file + 'x'])
+        self.assertNotEqual(returncode, 0)
+        self.assertEqual(stdout, '')
+        self.assertTrue(stderr)
+
+    def test_execute_unauthorized(self):
+        self.assertEqual(self.client.execute(['rm', self.test_file]),
+                         (wrapper.RC_UNAUTHORIZED,
+                          'Unauthorized command: rm %s\n' % self.test_file,
+                          ''))
+        self.assertTrue(os.path.exists(self.test_file))
+
+    def test_execute_no_command(self):
+        returncode, _stdout, _stderr = self.client.execute([])
+        self.assertEqual(returncode, wrapper.RC_NOCOMMAND)
+
+    def _assert_daemon_stopped(self, process):
+        process.stdin.close.assert_called_once_with()
+        self.assertIsNone(self.client._process)
+
+    def test_execute_wrong_authkey(self):
+        self.client._authkey = 'wrong'
+        process = self.client._process
+        self.assertRaises(RuntimeError, self.client.execute,
+                          ['rm', self.test_file])
+        self.assertTrue(os.path.exists(self.test_file))
+        self._assert_daemon_stopped(process)
+
+    def test_execute_daemon_closed_connection(self):
+        process = self.client._process
+        with mock.patch.object(self.server, 'run_one_command',
+                               side_effect=EOFError()):
+            self.assertRaises(RuntimeError, self.client.execute, ['cat'])
+        self._assert_daemon_stopped(process)
+
+    def test_execute_failure_keeps_restarted_daemon(self):
+        new_process = mock.Mock()
+
+        def restart(*args):
+            self.client._process = new_process
+            raise EOFError()
+
+        with mock.patch.object(self.server, 'run_one_command',
+                               side_effect=restart):
+            self.assertRaises(RuntimeError, self.client.execute, ['cat'])
+        self.assertEqual(self.client._process, new_process)
+        self.assertFalse(new_process.stdin.close.called)
+
+    def test_execute_restarts_dead_daemon(self):
+        self.client._process.poll.return_value = 1
+        process = mock.Mock()
+        process.stdout.readline.side_effect = [
+            self.client._socket_path + '\n', '617574686b6579\n']
+        process.poll.return_value = None
+        with mock.patch.object(client.utils, 'subprocess_popen',
+                               return_value=process) as popen:
+            self.assertEqual(self.client.execute(['cat'], 'foo'),
+                             (0, 'foo', ''))
+        self.assertEqual(popen.call_args[0][0],
+                         ['sudo', 'quantum-rootwrap-daemon', 'conf'])
+
+    def test_daemon_start_failure(self):
+        self.client._process = None
+        process = mock.Mock()
+        process.stdout.readline.return_value = ''
+        process.stderr.read.return_value = 'sudo: no tty present'
+        with mock.patch.object(client.utils, 'subprocess_popen',
+                               return_value=process):
+            self.assertRaises(RuntimeError, self.client.execute, ['cat'])
+
+
+class ExecuteWithDaemonTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ExecuteWithDaemonTestCase, self).setUp()
+        # The options are registered on a private configuration, the global
+        # one may already have them or get them registered later
+        self.conf = cfg.ConfigOpts()
+        config.register_root_helper(self.conf)
+        conf_p = mock.patch.object(utils.cfg, 'CONF', self.conf)
+        conf_p.start()
+        self.addCleanup(conf_p.stop)
+        self.addCleanup(utils._rootwrap_clients.clear)
+        client_p = mock.patch.object(utils.client, 'Client')
+        self.client_cls = client_p.start()
+        self.addCleanup(client_p.stop)
+        self.client = self.client_cls.return_value
+
+    def test_execute_without_daemon(self):
+        self.assertIsNone(utils.get_rootwrap_client())
+        self.assertEqual(utils.execute(['ls', '/'], 'echo'), 'ls /\n')
+
+    def test_execute_with_daemon(self):
+        self.conf.set_override('root_helper_daemon', 'daemon', 'AGENT')
+        self.client.execute.return_value = (0, 'out', 'err')
+        self.assertEqual(utils.execute(['cat'], 'sudo', process_input='in',
+                                       return_stderr=True), ('out', 'err'))
+        self.client_cls.assert_called_once_with('daemon')
+        self.client.execute.assert_called_once_with(['cat'], 'in')
+        # the client is reused
+        utils.execute(['cat'], 'sudo')
+        self.assertEqual(self.client_cls.call_count, 1)
+
+    def test_execute_with_daemon_raises_on_error(self):
+        self.conf.set_override('root_helper_daemon', 'daemon', 'AGENT')
+        self.client.execute.return_value = (1, '', 'err')
+        self.assertRaises(RuntimeError, utils.execute, ['cat'], 'sudo')
+        self.assertEqual(utils.execute(['cat'], 'sudo',
+                                       check_exit_code=False), '')
+
+    def test_execute_without_root_helper_ignores_daemon(self):
+        self.conf.set_override('root_helper_daemon', 'daemon', 'AGENT')
+        self.assertEqual(utils.execute(['echo', 'foo']), 'foo\n')
+        self.assertFalse(self.client.execute.called)
@@ -213,6 +213,62 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
+    def test_security_group_info_for_devices_source_group(self):
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group(),
+                        self.security_group()) as (subnet_v4,
+                                                   sg1,
+                                                   sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id,
+                    'ingress', 'tcp', '24',
+                    '25', remote_group_id=sg2_id)
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.deserialize(self.fmt, res)
+                self.assertEqual(res.status_int, 201)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                ports_rest1 = self.deserialize(self.fmt, res1)
+                port_id1 = ports_rest1['port']['id']
+                self.rpc.devices = {port_id1: ports_rest1['port']}
+
+                res2 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg2_id])
+                ports_rest2 = self.deserialize(self.fmt, res2)
+                port_id2 = ports_rest2['port']['id']
+                port_ip2 = ports_rest2['port']['fixed_ips'][0]['ip_address']
+                ctx = context.get_admin_context()
+                info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=[port_id1])
+                port_rpc = info['devices'][port_id1]
+                expected = [{'direction': 'egress', 'ethertype': 'IPv4',
+                             'security_group_id': sg1_id},
+                            {'direction': 'egress', 'ethertype': 'IPv6',
+                             'security_group_id': sg1_id},
+                            {'direction': u'ingress',
+                             'protocol': u'tcp', 'ethertype': u'IPv4',
+                             'port_range_max': 25, 'port_range_min': 24,
+                             'remote_group_id': sg2_id,
+                             'security_group_id': sg1_id},
+                            ]
+                self.assertEqual(port_rpc['security_group_rules'],
+                                 expected)
+                self.assertEqual(port_rpc['security_group_source_groups'],
+                                 [sg2_id])
+                self.assertEqual(info['sg_member_ips'],
+                                 {sg2_id: {'IPv4': [port_ip2],
+                                           'IPv6': []}})
+                self._delete('ports', port_id1)
+                self._delete('ports', port_id2)
+
     def test_security_group_rules_for_devices_ipv6_ingress(self):
         fake_prefix = test_fw.FAKE_PREFIX['IPv6']
         with self.network() as n:
@@ -432,6 +488,7 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.agent.root_helper = 'sudo'
         self.agent.init_firewall()
         self.firewall = mock.Mock()
+        self.firewall.use_ipset = False
         firewall_object = firewall_base.FirewallDriver()
         self.firewall.defer_apply.side_effect = firewall_object.defer_apply
         self.agent.firewall = self.firewall
@@ -451,14 +508,9 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
     def test_prepare_and_remove_devices_filter(self):
         self.agent.prepare_devices_filter(['fake_device'])
         self.agent.remove_devices_filter(['fake_device'])
-        # ignore device which is not filtered
-        self.firewall.assert_has_calls([call.defer_apply(),
-                                        call.prepare_port_filter(
-                                            self.fake_device),
-                                        call.defer_apply(),
-                                        call.remove_port_filter(
-                                            self.fake_device),
-                                        ])
+        self.firewall.assert_has_calls([
+            call.update_filters([self.fake_device]),
+            call.update_filters([], removed_devices=['fake_device'])])
 
     def test_security_groups_rule_updated(self):
         self.agent.refresh_firewall = mock.Mock()
@@ -495,12 +547,23 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
     def test_refresh_firewall(self):
         self.agent.prepare_devices_filter(['fake_port_id'])
         self.agent.refresh_firewall()
-        calls = [call.defer_apply(),
-                 call.prepare_port_filter(self.fake_device),
-                 call.defer_apply(),
-                 call.update_port_filter(self.fake_device)]
+        calls = [call.update_filters([self.fake_device]),
+                 call.update_filters([self.fake_device])]
         self.firewall.assert_has_calls(calls)
 
+    def test_prepare_devices_filter_with_ipset(self):
+        self.firewall.use_ipset = True
+        sg_members = {'IPv4': ['10.0.0.3'], 'IPv6': []}
+        self.agent.plugin_rpc.security_group_info_for_devices.return_value = {
+            'devices': {'fake_device': self.fake_device},
+            'sg_member_ips': {'fake_sgid2': sg_members}}
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.assertFalse(
+            self.agent.plugin_rpc.security_group_rules_for_devices.called)
+        self.firewall.assert_has_calls(
+            [call.update_security_group_members('fake_sgid2', sg_members),
+             call.update_filters([self.fake_device])])
+
 
 class FakeSGRpcApi(agent_rpc.PluginApi,
                    sg_rpc.SecurityGroupServerRpcApiMixin):
@@ -524,6 +587,15 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
              version=sg_rpc.SG_RPC_VERSION,
              topic='fake_topic')])
 
+    def test_security_group_info_for_devices(self):
+        self.rpc.security_group_info_for_devices(None, ['fake_device'])
+        self.rpc.call.assert_has_calls(
+            [call(None,
+                  {'args': {'devices': ['fake_device']},
+                   'method': 'security_group_info_for_devices'},
+                  version=sg_rpc.SG_RPC_VERSION,
+                  topic='fake_topic')])
+
 
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -754,24 +826,6 @@ IPTABLES_FILTER_2_2 = """:%(bn)s-(%(chains)s) - [0:0]
 -A OUTPUT -j %(bn)s-OUTPUT
 -A FORWARD -j %(bn)s-FORWARD
 -A %(bn)s-sg-fallback -j DROP
--A %(bn)s-FORWARD %(physdev)s --physdev-INGRESS tap_port1 -j %(bn)s-sg-chain
--A %(bn)s-sg-chain %(physdev)s --physdev-INGRESS tap_port1 -j %(bn)s-i_port1
--A %(bn)s-i_port1 -m state --state INVALID -j DROP
--A %(bn)s-i_port1 -m state --state ESTABLISHED,RELATED -j RETURN
--A %(bn)s-i_port1 -j RETURN -p udp --dport 68 --sport 67 -s 10.0.0.2
--A %(bn)s-i_port1 -j RETURN -p tcp --dport 22
--A %(bn)s-i_port1 -j %(bn)s-sg-fallback
--A %(bn)s-FORWARD %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-sg-chain
--A %(bn)s-sg-chain %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-o_port1
--A %(bn)s-INPUT %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-o_port1
--A %(bn)s-o_port1 -m mac ! --mac-source 12:34:56:78:9a:bc -j DROP
--A %(bn)s-o_port1 -p udp --sport 68 --dport 67 -j RETURN
--A %(bn)s-o_port1 ! -s 10.0.0.3 -j DROP
--A %(bn)s-o_port1 -p udp --sport 67 --dport 68 -j DROP
--A %(bn)s-o_port1 -m state --state INVALID -j DROP
--A %(bn)s-o_port1 -m state --state ESTABLISHED,RELATED -j RETURN
--A %(bn)s-o_port1 -j RETURN
--A %(bn)s-o_port1 -j %(bn)s-sg-fallback
 -A %(bn)s-FORWARD %(physdev)s --physdev-INGRESS tap_port2 -j %(bn)s-sg-chain
 -A %(bn)s-sg-chain %(physdev)s --physdev-INGRESS tap_port2 -j %(bn)s-i_port2
 -A %(bn)s-i_port2 -m state --state INVALID -j DROP
@@ -791,6 +845,24 @@ IPTABLES_FILTER_2_2 = """:%(bn)s-(%(chains)s) - [0:0]
 -A %(bn)s-o_port2 -m state --state ESTABLISHED,RELATED -j RETURN
 -A %(bn)s-o_port2 -j RETURN
 -A %(bn)s-o_port2 -j %(bn)s-sg-fallback
+-A %(bn)s-FORWARD %(physdev)s --physdev-INGRESS tap_port1 -j %(bn)s-sg-chain
+-A %(bn)s-sg-chain %(physdev)s --physdev-INGRESS tap_port1 -j %(bn)s-i_port1
+-A %(bn)s-i_port1 -m state --state INVALID -j DROP
+-A %(bn)s-i_port1 -m state --state ESTABLISHED,RELATED -j RETURN
+-A %(bn)s-i_port1 -j RETURN -p udp --dport 68 --sport 67 -s 10.0.0.2
+-A %(bn)s-i_port1 -j RETURN -p tcp --dport 22
+-A %(bn)s-i_port1 -j %(bn)s-sg-fallback
+-A %(bn)s-FORWARD %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-sg-chain
+-A %(bn)s-sg-chain %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-o_port1
+-A %(bn)s-INPUT %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-o_port1
+-A %(bn)s-o_port1 -m mac ! --mac-source 12:34:56:78:9a:bc -j DROP
+-A %(bn)s-o_port1 -p udp --sport 68 --dport 67 -j RETURN
+-A %(bn)s-o_port1 ! -s 10.0.0.3 -j DROP
+-A %(bn)s-o_port1 -p udp --sport 67 --dport 68 -j DROP
+-A %(bn)s-o_port1 -m state --state INVALID -j DROP
+-A %(bn)s-o_port1 -m state --state ESTABLISHED,RELATED -j RETURN
+-A %(bn)s-o_port1 -j RETURN
+-A %(bn)s-o_port1 -j %(bn)s-sg-fallback
 -A %(bn)s-sg-chain -j ACCEPT
 """ % IPTABLES_ARG
 
@@ -953,6 +1025,53 @@ IPTABLES_FILTER_V6_2 = """:%(bn)s-(%(chains)s) - [0:0]
 -A %(bn)s-sg-chain -j ACCEPT
 """ % IPTABLES_ARG
 
+IPTABLES_FILTER_V6_2_2 = """:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:%(bn)s-(%(chains)s) - [0:0]
+:quantum-filter-top - [0:0]
+-A FORWARD -j quantum-filter-top
+-A OUTPUT -j quantum-filter-top
+-A quantum-filter-top -j %(bn)s-local
+-A INPUT -j %(bn)s-INPUT
+-A OUTPUT -j %(bn)s-OUTPUT
+-A FORWARD -j %(bn)s-FORWARD
+-A %(bn)s-sg-fallback -j DROP
+-A %(bn)s-FORWARD %(physdev)s --physdev-INGRESS tap_port2 -j %(bn)s-sg-chain
+-A %(bn)s-sg-chain %(physdev)s --physdev-INGRESS tap_port2 -j %(bn)s-i_port2
+-A %(bn)s-i_port2 -m state --state INVALID -j DROP
+-A %(bn)s-i_port2 -m state --state ESTABLISHED,RELATED -j RETURN
+-A %(bn)s-i_port2 -j %(bn)s-sg-fallback
+-A %(bn)s-FORWARD %(physdev)s --physdev-EGRESS tap_port2 -j %(bn)s-sg-chain
+-A %(bn)s-sg-chain %(physdev)s --physdev-EGRESS tap_port2 -j %(bn)s-o_port2
+-A %(bn)s-INPUT %(physdev)s --physdev-EGRESS tap_port2 -j %(bn)s-o_port2
+-A %(bn)s-o_port2 -m mac ! --mac-source 12:34:56:78:9a:bd -j DROP
+-A %(bn)s-o_port2 -p icmpv6 -j RETURN
+-A %(bn)s-o_port2 -m state --state INVALID -j DROP
+-A %(bn)s-o_port2 -m state --state ESTABLISHED,RELATED -j RETURN
+-A %(bn)s-o_port2 -j %(bn)s-sg-fallback
+-A %(bn)s-FORWARD %(physdev)s --physdev-INGRESS tap_port1 -j %(bn)s-sg-chain
+-A %(bn)s-sg-chain %(physdev)s --physdev-INGRESS tap_port1 -j %(bn)s-i_port1
+-A %(bn)s-i_port1 -m state --state INVALID -j DROP
+-A %(bn)s-i_port1 -m state --state ESTABLISHED,RELATED -j RETURN
+-A %(bn)s-i_port1 -j %(bn)s-sg-fallback
+-A %(bn)s-FORWARD %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-sg-chain
+-A %(bn)s-sg-chain %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-o_port1
+-A %(bn)s-INPUT %(physdev)s --physdev-EGRESS tap_port1 -j %(bn)s-o_port1
+-A %(bn)s-o_port1 -m mac ! --mac-source 12:34:56:78:9a:bc -j DROP
+-A %(bn)s-o_port1 -p icmpv6 -j RETURN
+-A %(bn)s-o_port1 -m state --state INVALID -j DROP
+-A %(bn)s-o_port1 -m state --state ESTABLISHED,RELATED -j RETURN
+-A %(bn)s-o_port1 -j %(bn)s-sg-fallback
+-A %(bn)s-sg-chain -j ACCEPT
+""" % IPTABLES_ARG
+
 IPTABLES_ARG['chains'] = CHAINS_EMPTY
 IPTABLES_FILTER_V6_EMPTY = """:%(bn)s-(%(chains)s) - [0:0]
 :%(bn)s-(%(chains)s) - [0:0]
@@ -1111,10 +1230,35 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
             process_input=self._regex(v6_filter),
             root_helper=self.root_helper).AndReturn('')
 
+    def _rules_match(self, table, expected):
+        regex = self._regex(expected)
+
+        def _match(process_input):
+            # Only the changed chains are restored, check the whole table
+            rules = '\n'.join(self.iptables._modify_rules([''], table))
+            return (process_input.startswith('*filter\n') and
+                    regex.equals(rules))
+        return mox.Func(_match)
+
+    def _replay_iptables_changes(self, v4_filter, v6_filter=None):
+        self.iptables.execute(
+            ['iptables-restore', '--noflush'],
+            process_input=self._rules_match(self.iptables.ipv4['filter'],
+                                            v4_filter),
+            root_helper=self.root_helper).AndReturn('')
+
+        if v6_filter:
+            self.iptables.execute(
+                ['ip6tables-restore', '--noflush'],
+                process_input=self._rules_match(
+                    self.iptables.ipv6['filter'], v6_filter),
+                root_helper=self.root_helper).AndReturn('')
+
     def test_prepare_remove_port(self):
         self.rpc.security_group_rules_for_devices.return_value = self.devices1
         self._replay_iptables(IPTABLES_FILTER_1, IPTABLES_FILTER_V6_1)
-        self._replay_iptables(IPTABLES_FILTER_EMPTY, IPTABLES_FILTER_V6_EMPTY)
+        self._replay_iptables_changes(IPTABLES_FILTER_EMPTY,
+                                      IPTABLES_FILTER_V6_EMPTY)
         self.mox.ReplayAll()
 
         self.agent.prepare_devices_filter(['tap_port1'])
@@ -1124,11 +1268,16 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
     def test_security_group_member_updated(self):
         self.rpc.security_group_rules_for_devices.return_value = self.devices1
         self._replay_iptables(IPTABLES_FILTER_1, IPTABLES_FILTER_V6_1)
-        self._replay_iptables(IPTABLES_FILTER_1_2, IPTABLES_FILTER_V6_1)
-        self._replay_iptables(IPTABLES_FILTER_2, IPTABLES_FILTER_V6_2)
-        self._replay_iptables(IPTABLES_FILTER_2_2, IPTABLES_FILTER_V6_2)
-        self._replay_iptables(IPTABLES_FILTER_1, IPTABLES_FILTER_V6_1)
-        self._replay_iptables(IPTABLES_FILTER_EMPTY, IPTABLES_FILTER_V6_EMPTY)
+        # The IPv6 rules of port1 did not change
+        self._replay_iptables_changes(IPTABLES_FILTER_1_2)
+        self._replay_iptables_changes(IPTABLES_FILTER_2,
+                                      IPTABLES_FILTER_V6_2)
+        self._replay_iptables_changes(IPTABLES_FILTER_2_2,
+                                      IPTABLES_FILTER_V6_2_2)
+        self._replay_iptables_changes(IPTABLES_FILTER_1,
+                                      IPTABLES_FILTER_V6_1)
+        self._replay_iptables_changes(IPTABLES_FILTER_EMPTY,
+                                      IPTABLES_FILTER_V6_EMPTY)
         self.mox.ReplayAll()
 
         self.agent.prepare_devices_filter(['tap_port1'])
@@ -1145,7 +1294,8 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
     def test_security_group_rule_udpated(self):
         self.rpc.security_group_rules_for_devices.return_value = self.devices2
         self._replay_iptables(IPTABLES_FILTER_2, IPTABLES_FILTER_V6_2)
-        self._replay_iptables(IPTABLES_FILTER_2_3, IPTABLES_FILTER_V6_2)
+        # The IPv6 rules of the ports did not change
+        self._replay_iptables_changes(IPTABLES_FILTER_2_3)
         self.mox.ReplayAll()
 
         self.agent.prepare_devices_filter(['tap_port1', 'tap_port3'])
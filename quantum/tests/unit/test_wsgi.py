@@ -15,6 +15,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
+import signal
 import socket
 
 import mock
@@ -25,6 +27,7 @@ import webob.exc
 from quantum.api.v2 import attributes
 from quantum.common import constants
 from quantum.common import exceptions as exception
+from quantum.openstack.common import jsonutils
 from quantum.tests import base
 from quantum import wsgi
 
@@ -84,6 +87,44 @@ class TestWSGIServer(base.BaseTestCase):
                             mock_listen.return_value)
                     ])
 
+    def test_start_multiple_workers(self):
+        server = wsgi.Server("test_app")
+        with mock.patch.object(wsgi.eventlet, 'listen') as mock_listen:
+            with mock.patch.object(wsgi, 'ProcessLauncher') as launcher:
+                with mock.patch.object(server, 'pool') as mock_pool:
+                    server.start(None, 0, host="127.0.0.1", workers=2)
+                    server.wait()
+        self.assertFalse(mock_pool.spawn.called)
+        service = launcher.return_value.launch_service.call_args[0][0]
+        launcher.return_value.launch_service.assert_called_once_with(
+            service, workers=2)
+        launcher.return_value.wait.assert_called_once_with()
+
+        with mock.patch.object(wsgi.db_api, 'dispose_engine') as dispose:
+            with mock.patch.object(wsgi.q_rpc,
+                                   'reset_connection_pool') as reset:
+                with mock.patch.object(wsgi.eventlet, 'spawn') as spawn:
+                    with mock.patch.object(server, 'pool') as mock_pool:
+                        service.start()
+                        service.stop()
+        dispose.assert_called_once_with()
+        reset.assert_called_once_with()
+        spawn.assert_called_once_with(server._run, None,
+                                      mock_listen.return_value)
+        spawn.return_value.kill.assert_called_once_with()
+        mock_pool.waitall.assert_called_once_with()
+
+    def test_sighup_restarts_workers(self):
+        with mock.patch('signal.signal') as signal_signal:
+            launcher = wsgi.ProcessLauncher()
+        signal_signal.assert_any_call(signal.SIGHUP, launcher._handle_sighup)
+        launcher.children = {1: mock.Mock(), 2: mock.Mock()}
+        with mock.patch('os.kill') as kill:
+            kill.side_effect = [None, OSError(errno.ESRCH, 'No such process')]
+            launcher._handle_sighup(signal.SIGHUP, None)
+        self.assertEqual(sorted(call[0] for call in kill.call_args_list),
+                         [(1, signal.SIGTERM), (2, signal.SIGTERM)])
+
 
 class SerializerTest(base.BaseTestCase):
     def test_serialize_unknown_content_type(self):
@@ -605,6 +646,23 @@ class JSONDictSerializerTest(base.BaseTestCase):
 
         self.assertEqual(result, expected_json)
 
+    def test_stream(self):
+        servers = [dict(id=i, name=u'\u7f51\u7edc') for i in range(5)]
+        serializer = wsgi.JSONDictSerializer()
+        serializer.STREAM_CHUNK_SIZE = 40
+        chunks = list(serializer.stream(
+            dict(servers=iter(servers), servers_links=[{'rel': 'next'}])))
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(jsonutils.loads(''.join(chunks)),
+                         dict(servers=servers,
+                              servers_links=[{'rel': 'next'}]))
+
+    def test_stream_empty_collection(self):
+        serializer = wsgi.JSONDictSerializer()
+        self.assertEqual(list(serializer.stream(dict(servers=iter([])))),
+                         ['{"servers": []}'])
+
 
 class TextDeserializerTest(base.BaseTestCase):
 
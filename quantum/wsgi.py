@@ -18,12 +18,16 @@
 """
 Utility methods for working with WSGI servers
 """
+import errno
+import os
+import signal
 import socket
 import sys
 from xml.etree import ElementTree as etree
 from xml.parsers import expat
 
 import eventlet.wsgi
+import greenlet
 eventlet.patcher.monkey_patch(all=False, socket=True)
 import routes.middleware
 import webob.dec
@@ -31,9 +35,12 @@ import webob.exc
 
 from quantum.common import constants
 from quantum.common import exceptions as exception
+from quantum.common import rpc as q_rpc
 from quantum import context
+from quantum.db import api as db_api
 from quantum.openstack.common import jsonutils
 from quantum.openstack.common import log as logging
+from quantum.openstack.common import service as common_service
 
 LOG = logging.getLogger(__name__)
 
@@ -50,9 +57,16 @@ class Server(object):
     def __init__(self, name, threads=1000):
         self.pool = eventlet.GreenPool(threads)
         self.name = name
+        self._server = None
+        self._launcher = None
 
-    def start(self, application, port, host='0.0.0.0', backlog=128):
-        """Run a WSGI server with the given application."""
+    def start(self, application, port, host='0.0.0.0', backlog=128,
+              workers=0):
+        """Run a WSGI server with the given application.
+
+        With workers, the application is served by as many child processes
+        sharing the listening socket instead of this process.
+        """
         self._host = host
         self._port = port
 
@@ -75,7 +89,13 @@ class Server(object):
                           {'host': host, 'port': port})
             sys.exit(1)
 
-        self._server = self.pool.spawn(self._run, application, self._socket)
+        if workers < 1:
+            self._server = self.pool.spawn(self._run, application,
+                                           self._socket)
+        else:
+            self._launcher = ProcessLauncher()
+            self._launcher.launch_service(WorkerService(self, application),
+                                          workers=workers)
 
     @property
     def host(self):
@@ -86,12 +106,17 @@ class Server(object):
         return self._socket.getsockname()[1] if self._socket else self._port
 
     def stop(self):
-        self._server.kill()
+        if self._server is not None:
+            self._server.kill()
 
     def wait(self):
         """Wait until all servers have completed running."""
         try:
-            self.pool.waitall()
+            if self._launcher:
+                # Returns once the workers have exited, after a SIGTERM
+                self._launcher.wait()
+            else:
+                self.pool.waitall()
         except KeyboardInterrupt:
             pass
 
@@ -102,6 +127,70 @@ class Server(object):
                              log=logging.WritableLogger(logger))
 
 
+class WorkerService(object):
+    """Serves the application of a server in a worker process."""
+
+    def __init__(self, server, application):
+        self._server = server
+        self._application = application
+        self._thread = None
+
+    def start(self):
+        # The connections inherited from the parent process are shared
+        # with it and with the other workers
+        db_api.dispose_engine()
+        q_rpc.reset_connection_pool()
+        # Outside of the pool of the requests, which eventlet waits for
+        # when the server is stopped
+        self._thread = eventlet.spawn(self._server._run, self._application,
+                                      self._server._socket)
+        # Raising from the signal handler would interrupt the hub and the
+        # current requests, stop from a green thread instead
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
+
+    def _handle_sigterm(self, signo, frame):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        eventlet.spawn_n(self.stop)
+
+    def wait(self):
+        if self._thread is not None:
+            try:
+                self._thread.wait()
+            except greenlet.GreenletExit:
+                pass
+
+    def stop(self):
+        """Stops accepting requests and completes the current ones."""
+        if self._thread is not None:
+            self._thread.kill()
+            self._server.pool.waitall()
+
+
+class ProcessLauncher(common_service.ProcessLauncher):
+    """Runs workers, and restarts them on SIGHUP.
+
+    The workers are stopped with a SIGTERM, which lets them complete their
+    current requests, and started again once they have exited.
+    """
+
+    def __init__(self):
+        super(ProcessLauncher, self).__init__()
+        signal.signal(signal.SIGHUP, self._handle_sighup)
+
+    def _handle_sighup(self, signo, frame):
+        LOG.info(_('Caught SIGHUP, restarting children'))
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError as exc:
+                if exc.errno != errno.ESRCH:
+                    raise
+
+    def _child_process(self, service):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        super(ProcessLauncher, self)._child_process(service)
+
+
 class Middleware(object):
     """
     Base WSGI middleware wrapper. These classes require an application to be
@@ -234,11 +323,44 @@ class DictSerializer(ActionDispatcher):
 class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization"""
 
+    # Size of the chunks yielded by stream
+    STREAM_CHUNK_SIZE = 65536
+
     def default(self, data):
         def sanitizer(obj):
             return unicode(obj)
         return jsonutils.dumps(data, default=sanitizer)
 
+    def stream(self, data):
+        """Yields the serialization of a dict in chunks.
+
+        The values of data which are iterators, such as the items of a
+        collection, are serialized one element at a time.
+        """
+        buf = ['{']
+        size = 0
+        for i, (key, value) in enumerate(data.iteritems()):
+            if i:
+                buf.append(', ')
+            buf.append('%s: ' % self.default(key))
+            if not hasattr(value, 'next'):
+                buf.append(self.default(value))
+                continue
+            buf.append('[')
+            for j, element in enumerate(value):
+                if j:
+                    buf.append(', ')
+                element = self.default(element)
+                buf.append(element)
+                size += len(element)
+                if size >= self.STREAM_CHUNK_SIZE:
+                    yield ''.join(buf)
+                    buf = []
+                    size = 0
+            buf.append(']')
+        buf.append('}')
+        yield ''.join(buf)
+
 
 class XMLDictSerializer(DictSerializer):
 
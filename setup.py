@@ -147,6 +147,7 @@ else:
 
     ProjectScripts = [
         'bin/quantum-rootwrap',
+        'bin/quantum-rootwrap-daemon',
     ]
 
 
@@ -0,0 +1,122 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Micro-benchmark of the IPAM drivers of QuantumDbPluginV2.
+
+A subnet is filled, every other address is released so that the free space
+is fragmented in as many ranges as possible, and the time taken by specific
+and generated allocations on the fragmented subnet is reported for each
+driver.
+
+    python tools/ipam_benchmark.py [--cidr 10.0.0.0/20] [--sql-connection URL]
+"""
+
+import optparse
+import sys
+import time
+
+import netaddr
+from oslo.config import cfg
+
+from quantum.common import config  # noqa
+from quantum import context
+from quantum.db import api as db
+from quantum.db import ipam_db
+from quantum.db import models_v2
+
+
+DRIVERS = [ipam_db.RANGE_IPAM_DRIVER, ipam_db.INTEGER_IPAM_DRIVER]
+
+
+def _create_subnet(ctx, cidr):
+    net = netaddr.IPNetwork(cidr)
+    with ctx.session.begin(subtransactions=True):
+        network = models_v2.Network(name='ipam-bench', status='ACTIVE',
+                                    admin_state_up=True, shared=False)
+        ctx.session.add(network)
+        ctx.session.flush()
+        subnet = models_v2.Subnet(network_id=network.id, ip_version=4,
+                                  cidr=cidr, gateway_ip=str(net[1]),
+                                  enable_dhcp=False, shared=False)
+        ctx.session.add(subnet)
+        ctx.session.flush()
+        pool = models_v2.IPAllocationPool(subnet=subnet,
+                                          first_ip=str(net[2]),
+                                          last_ip=str(net[-2]))
+        ctx.session.add(pool)
+        ipam_db.get_ipam_driver(ctx).add_pool(ctx, subnet, pool)
+    return {'id': subnet.id, 'network_id': network.id, 'cidr': cidr,
+            'ip_version': 4}
+
+
+def _timed(func, items):
+    start = time.time()
+    for item in items:
+        func(item)
+    return (time.time() - start) / max(len(items), 1) * 1000
+
+
+def run(driver_class, cidr):
+    cfg.CONF.set_override('ipam_driver', driver_class)
+    ctx = context.get_admin_context()
+    driver = ipam_db.get_ipam_driver(ctx)
+    subnet = _create_subnet(ctx, cidr)
+    net = netaddr.IPNetwork(cidr)
+    addresses = [str(ip) for ip in netaddr.iter_iprange(net[2], net[-2])
+                 if ip.words[3] not in (0, 255)]
+
+    def _allocate(ip_address):
+        with ctx.session.begin(subtransactions=True):
+            driver.allocate_specific_ip(ctx, subnet['id'], ip_address)
+
+    def _release(ip_address):
+        with ctx.session.begin(subtransactions=True):
+            driver.release_ip(ctx, subnet['id'], ip_address)
+
+    def _generate(_i):
+        with ctx.session.begin(subtransactions=True):
+            driver.generate_ip(ctx, [subnet])
+
+    _timed(_allocate, addresses)
+    fragmented = addresses[::2]
+    release = _timed(_release, fragmented)
+    allocate = _timed(_allocate, fragmented[len(fragmented) / 2:])
+    generate = _timed(_generate, range(len(fragmented) / 2))
+    return release, allocate, generate
+
+
+def main(argv):
+    parser = optparse.OptionParser()
+    parser.add_option('--cidr', default='10.0.0.0/22')
+    parser.add_option('--sql-connection', default='sqlite://')
+    options, _args = parser.parse_args(argv)
+
+    print('%-45s %12s %12s %12s' % ('driver (ms/op)', 'release',
+                                    'specific', 'generate'))
+    for driver_class in DRIVERS:
+        cfg.CONF.set_override('sql_connection', options.sql_connection,
+                              'DATABASE')
+        db.configure_db()
+        try:
+            timings = run(driver_class, options.cidr)
+        finally:
+            db.clear_db()
+        print('%-45s %12.3f %12.3f %12.3f' % ((driver_class,) + timings))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
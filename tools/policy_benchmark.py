@@ -0,0 +1,104 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Micro-benchmark of the policy checks performed on collection GETs.
+
+The time taken for authorizing the items of a network and a port listing
+is reported for a per-item policy.check loop and for policy.check_many.
+
+    python tools/policy_benchmark.py [--items 5000] [--networks 50]
+                                     [--policy-file etc/policy.json]
+"""
+
+import optparse
+import os
+import sys
+import time
+
+from oslo.config import cfg
+
+from quantum.common import config  # noqa
+from quantum import context
+from quantum import policy
+
+
+class _FakePlugin(object):
+    """Returns the parent network of ports, counting the lookups."""
+
+    def __init__(self):
+        self.lookups = 0
+
+    def get_network(self, context, id, fields=None):
+        self.lookups += 1
+        return {'tenant_id': 'tenant-%s' % id}
+
+
+def _per_item(ctx, action, targets, plugin):
+    return [policy.check(ctx, action, target, plugin=plugin)
+            for target in targets]
+
+
+def _batched(ctx, action, targets, plugin):
+    return policy.check_many(ctx, action, targets, plugin=plugin)
+
+
+def _timed(func, ctx, action, targets):
+    plugin = _FakePlugin()
+    start = time.time()
+    result = func(ctx, action, targets, plugin)
+    return (time.time() - start) * 1000, plugin.lookups, result
+
+
+def main(argv):
+    parser = optparse.OptionParser()
+    parser.add_option('--items', type='int', default=5000)
+    parser.add_option('--networks', type='int', default=50)
+    parser.add_option('--policy-file',
+                      default=os.path.join(os.path.dirname(__file__),
+                                           os.pardir, 'etc', 'policy.json'))
+    options, _args = parser.parse_args(argv)
+    cfg.CONF.set_override('policy_file',
+                          os.path.abspath(options.policy_file))
+    policy.reset()
+
+    tenants = ['tenant-%d' % i for i in range(options.networks)]
+    networks = [{'id': '%d' % i, 'tenant_id': tenants[i % len(tenants)],
+                 'shared': i % 7 == 0}
+                for i in range(options.items)]
+    ports = [{'id': 'port-%d' % i, 'tenant_id': tenants[i % len(tenants)],
+              'network_id': '%d' % (i % options.networks)}
+             for i in range(options.items)]
+    contexts = [('admin', context.get_admin_context()),
+                ('tenant', context.Context('user', tenants[0]))]
+
+    print('%-8s %-14s %12s %12s %12s' % ('context', 'action', 'per-item ms',
+                                         'batched ms', 'lookups'))
+    for ctx_name, ctx in contexts:
+        for action, targets in (('get_network', networks),
+                                ('get_port', ports)):
+            single, single_lookups, expected = _timed(_per_item, ctx,
+                                                      action, targets)
+            batch, batch_lookups, result = _timed(_batched, ctx,
+                                                  action, targets)
+            assert result == expected
+            print('%-8s %-14s %12.1f %12.1f %5d / %-5d' % (
+                ctx_name, action, single, batch, single_lookups,
+                batch_lookups))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])